@@ -1,3 +1,5 @@
+import re
+
 from d4k_ms_base.logger import application_logger
 from d4k_ms_base.service_environment import ServiceEnvironment
 
@@ -14,6 +16,15 @@ class Configuration:
         self.mount_path = self._se.get("MNT_PATH")
         self.database_path = self._se.get("DATABASE_PATH")
         self.database_name = self._se.get("DATABASE_NAME")
+        # SQLite pragmas applied to every new connection. The defaults put
+        # the database in WAL mode so background imports and validation
+        # jobs don't block page reads; DATABASE_PRAGMAS overrides or adds
+        # to them as 'name=value' pairs, e.g. 'synchronous=FULL,cache_size=-8000'.
+        self.database_pragmas = self._database_pragmas()
+        # Connection pool for the threads using SessionLocal: the request
+        # thread pool plus the import and validation workers.
+        self.database_pool_size = int(self._se.get("DATABASE_POOL_SIZE") or 10)
+        self.database_pool_overflow = int(self._se.get("DATABASE_POOL_OVERFLOW") or 20)
         # Secret used to sign the session cookie. Historically named
         # AUTH0_SESSION_SECRET; SESSION_SECRET takes precedence if set so
         # the Auth0 naming can be retired without breaking deployments.
@@ -57,6 +68,60 @@ class Configuration:
         # 'X-API-Key' header on the load request; when unset no auth
         # header is sent.
         self.backbone_api_key = self._se.get("BACKBONE_API_KEY")
+        # Memory budget (MB) for the process-wide parsed USDM cache used
+        # by USDMJson. Zero disables caching.
+        self.usdm_cache_size_mb = int(self._se.get("USDM_CACHE_SIZE_MB") or 256)
+        # Import worker pool. IMPORT_WORKERS is the number of imports of
+        # any one type that run at once; IMPORT_WORKERS_BY_TYPE overrides
+        # it per import type as 'TYPE=N' pairs, e.g. 'M11_DOCX=1,USDM_EXCEL=4'.
+        # M11 imports default to one at a time as each runs an AI-assisted
+        # extraction.
+        self.import_workers = int(self._se.get("IMPORT_WORKERS") or 2)
+        self.import_workers_by_type = self._import_workers_by_type()
+        # Number of validation jobs run at once. CDISC CORE runs are
+        # slow and memory hungry, so the default is one at a time.
+        self.validation_workers = int(self._se.get("VALIDATION_WORKERS") or 1)
+        # Threads used by the web routes to parse and render study USDM
+        # (views, SoA, protocol, exports) off the event loop.
+        self.render_workers = int(self._se.get("RENDER_WORKERS") or 4)
+        # Outbound HTTP (FHIR and backbone transmissions). Per endpoint:
+        # the most connections kept open, the most requests in flight
+        # and the default timeout (seconds). Idempotent requests are
+        # retried OUTBOUND_RETRIES times after OUTBOUND_BACKOFF seconds,
+        # the wait doubling each time.
+        self.outbound_connections = int(self._se.get("OUTBOUND_CONNECTIONS") or 10)
+        self.outbound_concurrency = int(self._se.get("OUTBOUND_CONCURRENCY") or 4)
+        self.outbound_timeout = float(self._se.get("OUTBOUND_TIMEOUT") or 30.0)
+        self.outbound_retries = int(self._se.get("OUTBOUND_RETRIES") or 2)
+        self.outbound_backoff = float(self._se.get("OUTBOUND_BACKOFF") or 0.5)
+        # Threads generating the messages of a bulk transmission.
+        self.bulk_transmit_workers = int(self._se.get("BULK_TRANSMIT_WORKERS") or 2)
+        # SQLite file through which the worker processes pass the user
+        # notifications to each other, polled every
+        # NOTIFICATION_POLL_SECONDS. Needed when running more than one
+        # worker; empty delivers them within the process.
+        self.notification_broker_path = self._se.get("NOTIFICATION_BROKER_PATH") or ""
+        self.notification_poll_seconds = float(
+            self._se.get("NOTIFICATION_POLL_SECONDS") or 0.25
+        )
+        # Time each request and its stages (SQL, USDM load, rendering),
+        # returned in a Server-Timing header and aggregated on /metrics.
+        self.request_timing = self._request_timing()
+        # Disk budget (MB) for cached validation results, keyed by file
+        # content, engine and rules version. Zero disables caching.
+        self.validation_cache_size_mb = int(
+            self._se.get("VALIDATION_CACHE_SIZE_MB") or 64
+        )
+        # Largest upload accepted (MB), per file and per request. Zero
+        # removes the limit.
+        self.upload_max_size_mb = int(self._se.get("UPLOAD_MAX_SIZE_MB") or 500)
+        # Compression of the stored USDM and validation JSON, "gzip" or
+        # "zstd" (needs the zstandard package). Empty stores them plain.
+        self.datafile_compression = (self._se.get("DATAFILE_COMPRESSION") or "").lower()
+        # Reuse the outputs of an earlier import of the same files, with
+        # the same versions of the import libraries, instead of running
+        # the import again.
+        self.import_reuse = self._import_reuse()
 
     def _email_dev_mode(self) -> bool:
         flag = self._se.get("EMAIL_DEV_MODE")
@@ -65,6 +130,48 @@ class Configuration:
         # Default: dev mode whenever no SMTP host has been configured.
         return not self.smtp_host
 
+    def _request_timing(self) -> bool:
+        flag = self._se.get("REQUEST_TIMING") or "TRUE"
+        return flag.upper() in ["TRUE", "T", "Y", "YES"]
+
+    def _import_reuse(self) -> bool:
+        flag = self._se.get("IMPORT_REUSE") or "FALSE"
+        return flag.upper() in ["TRUE", "T", "Y", "YES"]
+
+    def _database_pragmas(self) -> dict[str, str]:
+        busy_timeout = "30000"
+        result = {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": busy_timeout,
+            "cache_size": "-65536",
+            "mmap_size": "268435456",
+            "temp_store": "MEMORY",
+        }
+        value = self._se.get("DATABASE_PRAGMAS") or ""
+        for item in value.split(","):
+            name, _, setting = item.partition("=")
+            name = name.strip().lower()
+            setting = setting.strip()
+            if re.fullmatch(r"[a-z_]+", name) and re.fullmatch(r"-?\w+", setting):
+                result[name] = setting
+        # Also the connect and pool timeouts, so milliseconds, not negative.
+        if not result["busy_timeout"].isdigit():
+            application_logger.warning(
+                f"Invalid busy_timeout '{result['busy_timeout']}' in DATABASE_PRAGMAS, using {busy_timeout}"
+            )
+            result["busy_timeout"] = busy_timeout
+        return result
+
+    def _import_workers_by_type(self) -> dict[str, int]:
+        value = self._se.get("IMPORT_WORKERS_BY_TYPE") or "M11_DOCX=1"
+        result = {}
+        for item in value.split(","):
+            type, _, count = item.partition("=")
+            if type.strip() and count.strip().isdigit():
+                result[type.strip().upper()] = int(count)
+        return result
+
     def _single_user(self) -> bool:
         single = self._se.get("SINGLE_USER")
         application_logger.info(f"Single user mode '{single}'")
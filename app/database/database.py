@@ -1,14 +1,42 @@
 from d4k_ms_base.logger import application_logger
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
 from app.configuration.configuration import application_configuration
+from app.utility.request_timing import request_timing
+
+
+def create_database_engine(url: str) -> Engine:
+    pragmas = application_configuration.database_pragmas
+    busy_timeout = int(pragmas.get("busy_timeout", 5000))
+    db_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": busy_timeout / 1000},
+        pool_size=application_configuration.database_pool_size,
+        max_overflow=application_configuration.database_pool_overflow,
+        pool_timeout=busy_timeout / 1000,
+    )
+
+    @event.listens_for(db_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        # Connection level settings, so they are applied to every pooled
+        # connection rather than once per database file (only the WAL
+        # journal mode persists in the file itself).
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    request_timing.instrument(db_engine)
+    return db_engine
+
 
 db_path = application_configuration.database_path
 db_name = application_configuration.database_name
 db_url = f"sqlite:///{db_path}/{db_name}"
 application_logger.info(f"Database URL '{db_url}'")
-engine = create_engine(db_url, connect_args={"check_same_thread": False})
+engine = create_database_engine(db_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -12,6 +12,15 @@ from app.database.database_tables import (
 from app.database.database_tables import (
     FileImport as FileImportDB,
 )
+from app.database.database_tables import (
+    ImportBatch as ImportBatchDB,
+)
+from app.database.database_tables import (
+    ImportJob as ImportJobDB,
+)
+from app.database.database_tables import (
+    ImportStage as ImportStageDB,
+)
 from app.database.database_tables import (
     Study as StudyDB,
 )
@@ -24,6 +33,9 @@ from app.database.database_tables import (
 from app.database.database_tables import (
     UserEndpoint as UserEndpointDB,
 )
+from app.database.database_tables import (
+    ValidationJob as ValidationJobDB,
+)
 from app.database.database_tables import (
     Version as VersionDB,
 )
@@ -56,10 +68,14 @@ class DatabaseManager:
     def clear_all(self):
         self.session.query(StudyDB).delete()
         self.session.query(VersionDB).delete()
+        self.session.query(ImportStageDB).delete()
         self.session.query(FileImportDB).delete()
         self.session.query(EndpointDB).delete()
         self.session.query(UserEndpointDB).delete()
         self.session.query(TransmissionDB).delete()
+        self.session.query(ImportJobDB).delete()
+        self.session.query(ImportBatchDB).delete()
+        self.session.query(ValidationJobDB).delete()
         self.session.commit()
         DataFiles().delete_all()
 
@@ -112,6 +128,106 @@ class DatabaseManager:
                 cursor.execute("pragma user_version = 33")
                 self.session.commit()
                 application_logger.info("Database migrated to v33")
+            elif version == 33:
+                # Index the foreign keys used by the study list summary
+                # query. create_all() only adds indexes for new tables, so
+                # existing databases need them created here.
+                cursor = self.session.connection().connection.cursor()
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_study_user_id ON study (user_id)"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_version_study_id ON version (study_id)"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_version_import_id ON version (import_id)"
+                )
+                cursor.execute("pragma user_version = 34")
+                self.session.commit()
+                application_logger.info("Database migrated to v34")
+            elif version == 34:
+                # Import jobs can belong to a batch. The import_batch table
+                # itself is new, so create_all() makes it.
+                cursor = self.session.connection().connection.cursor()
+                existing = [
+                    row[1] for row in cursor.execute("pragma table_info(import_job)")
+                ]
+                if "batch_id" not in existing:
+                    cursor.execute(
+                        "ALTER TABLE import_job ADD COLUMN batch_id INTEGER "
+                        "REFERENCES import_batch (id)"
+                    )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_import_job_batch_id "
+                    "ON import_job (batch_id)"
+                )
+                cursor.execute("pragma user_version = 35")
+                self.session.commit()
+                application_logger.info("Database migrated to v35")
+            elif version == 35:
+                # Imports record the files imported, to find an earlier
+                # import of the same files to reuse.
+                cursor = self.session.connection().connection.cursor()
+                existing = [
+                    row[1] for row in cursor.execute("pragma table_info(import)")
+                ]
+                if "source_digest" not in existing:
+                    cursor.execute(
+                        "ALTER TABLE import ADD COLUMN source_digest VARCHAR"
+                    )
+                if "reused_from" not in existing:
+                    cursor.execute("ALTER TABLE import ADD COLUMN reused_from INTEGER")
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_import_source_digest "
+                    "ON import (source_digest)"
+                )
+                cursor.execute("pragma user_version = 36")
+                self.session.commit()
+                application_logger.info("Database migrated to v36")
+            elif version == 36:
+                # Import jobs record the process running them, so one
+                # process only recovers the jobs of processes that died.
+                cursor = self.session.connection().connection.cursor()
+                existing = [
+                    row[1] for row in cursor.execute("pragma table_info(import_job)")
+                ]
+                if "owner" not in existing:
+                    cursor.execute("ALTER TABLE import_job ADD COLUMN owner VARCHAR")
+                if "heartbeat" not in existing:
+                    cursor.execute(
+                        "ALTER TABLE import_job ADD COLUMN heartbeat DATETIME"
+                    )
+                cursor.execute("pragma user_version = 37")
+                self.session.commit()
+                application_logger.info("Database migrated to v37")
+            elif version == 37:
+                # Validation jobs record the process running them too.
+                cursor = self.session.connection().connection.cursor()
+                existing = [
+                    row[1]
+                    for row in cursor.execute("pragma table_info(validation_job)")
+                ]
+                if "owner" not in existing:
+                    cursor.execute(
+                        "ALTER TABLE validation_job ADD COLUMN owner VARCHAR"
+                    )
+                if "heartbeat" not in existing:
+                    cursor.execute(
+                        "ALTER TABLE validation_job ADD COLUMN heartbeat DATETIME"
+                    )
+                cursor.execute("pragma user_version = 38")
+                self.session.commit()
+                application_logger.info("Database migrated to v38")
+            elif version == 38:
+                # Index the import type, to read the latest imports of each
+                # type for the stage percentiles.
+                cursor = self.session.connection().connection.cursor()
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_import_type ON import (type)"
+                )
+                cursor.execute("pragma user_version = 39")
+                self.session.commit()
+                application_logger.info("Database migrated to v39")
             else:
                 if not migrated:
                     application_logger.info("No database migration")
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
 
@@ -40,7 +40,7 @@ class Study(Base):
     sponsor = Column(String, index=True, nullable=True)
     sponsor_identifier = Column(String, index=True, nullable=True)
     nct_identifier = Column(String, index=True, nullable=True)
-    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("user.id"), index=True, nullable=False)
     versions = relationship("Version", backref="study", cascade="all, delete")
 
 
@@ -49,8 +49,8 @@ class Version(Base):
 
     id = Column(Integer, primary_key=True)
     version = Column(Integer, index=True, nullable=False)
-    study_id = Column(Integer, ForeignKey("study.id"), nullable=False)
-    import_id = Column(Integer, ForeignKey("import.id"), nullable=False)
+    study_id = Column(Integer, ForeignKey("study.id"), index=True, nullable=False)
+    import_id = Column(Integer, ForeignKey("import.id"), index=True, nullable=False)
 
 
 class FileImport(Base):
@@ -58,15 +58,77 @@ class FileImport(Base):
 
     id = Column(Integer, primary_key=True)
     uuid = Column(String, index=True, nullable=False)
-    type = Column(String, nullable=False)
+    type = Column(String, index=True, nullable=False)
     created = Column(DateTime(timezone=True), default=func.now(), nullable=False)
     filepath = Column(String, nullable=False)
     filename = Column(String, nullable=False)
     status = Column(String, nullable=False)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    # Identifies the files imported, see ImportManager._source_digest,
+    # and the earlier import whose results were reused, if any.
+    source_digest = Column(String, index=True, nullable=True)
+    reused_from = Column(Integer, nullable=True)
     version = relationship(
         "Version", backref="file_import", uselist=False, cascade="all, delete"
     )
+    stages = relationship("ImportStage", backref="file_import", cascade="all, delete")
+
+
+class ImportStage(Base):
+    __tablename__ = "import_stage"
+
+    id = Column(Integer, primary_key=True)
+    import_id = Column(Integer, ForeignKey("import.id"), index=True, nullable=False)
+    name = Column(String, nullable=False)
+    started = Column(DateTime(timezone=True), nullable=False)
+    finished = Column(DateTime(timezone=True), nullable=False)
+    seconds = Column(Float, nullable=False)
+    # Peak resident memory of the process during the stage, in bytes.
+    peak_memory = Column(Integer, nullable=True)
+
+
+class ImportJob(Base):
+    __tablename__ = "import_job"
+
+    id = Column(Integer, primary_key=True)
+    uuid = Column(String, index=True, nullable=False)
+    type = Column(String, index=True, nullable=False)
+    filepath = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    status = Column(String, index=True, nullable=False)
+    created = Column(DateTime(timezone=True), default=func.now(), nullable=False)
+    started = Column(DateTime(timezone=True), nullable=True)
+    finished = Column(DateTime(timezone=True), nullable=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    batch_id = Column(Integer, ForeignKey("import_batch.id"), index=True, nullable=True)
+    # The process running the job and when it last said it still was.
+    owner = Column(String, nullable=True)
+    heartbeat = Column(DateTime(timezone=True), nullable=True)
+
+
+class ImportBatch(Base):
+    __tablename__ = "import_batch"
+
+    id = Column(Integer, primary_key=True)
+    created = Column(DateTime(timezone=True), default=func.now(), nullable=False)
+    rejected = Column(String, nullable=False, default="[]")
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+
+
+class ValidationJob(Base):
+    __tablename__ = "validation_job"
+
+    id = Column(Integer, primary_key=True)
+    uuid = Column(String, index=True, nullable=False)
+    engine = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    status = Column(String, index=True, nullable=False)
+    findings = Column(Integer, nullable=True)
+    created = Column(DateTime(timezone=True), default=func.now(), nullable=False)
+    finished = Column(DateTime(timezone=True), nullable=True)
+    user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
+    owner = Column(String, nullable=True)
+    heartbeat = Column(DateTime(timezone=True), nullable=True)
 
 
 class TransmissionTable(Base):
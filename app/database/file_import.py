@@ -6,6 +6,7 @@ from pydantic import BaseModel, ConfigDict
 from sqlalchemy.orm import Session
 
 from app.database.database_tables import FileImport as FileImportDB
+from app.database.database_tables import ImportStage as ImportStageDB
 
 
 class FileImportBase(BaseModel):
@@ -20,6 +21,8 @@ class FileImport(FileImportBase):
     id: int
     user_id: int
     created: datetime.datetime
+    source_digest: Optional[str] = None
+    reused_from: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -33,6 +36,7 @@ class FileImport(FileImportBase):
         uuid: str,
         user_id: int,
         session: Session,
+        source_digest: str = None,
     ) -> "FileImport":
         data = {
             "filepath": fullpath,
@@ -40,6 +44,7 @@ class FileImport(FileImportBase):
             "status": status,
             "type": type,
             "uuid": uuid,
+            "source_digest": source_digest,
         }
         db_item = FileImportDB(**data, user_id=user_id)
         session.add(db_item)
@@ -59,6 +64,51 @@ class FileImport(FileImportBase):
         db_item = session.query(FileImportDB).filter(FileImportDB.uuid == uuid).first()
         return cls(**db_item.__dict__) if db_item else None
 
+    @classmethod
+    def find_reusable(
+        cls, source_digest: str, session: Session, limit: int = 5
+    ) -> list["FileImport"]:
+        """The latest successful imports of the same files, newest first."""
+        db_items = (
+            session.query(FileImportDB)
+            .filter(
+                FileImportDB.source_digest == source_digest,
+                FileImportDB.status == "Success",
+            )
+            .order_by(FileImportDB.id.desc())
+            .limit(limit)
+        )
+        return [cls(**db_item.__dict__) for db_item in db_items]
+
+    @classmethod
+    def reuse_report(cls, session: Session) -> dict:
+        """The imports that reused the results of an earlier one, and
+        the import time that saved: the time the earlier import took
+        less the time the reuse did, from their stage timings."""
+        pairs = list(
+            session.query(FileImportDB.id, FileImportDB.reused_from).filter(
+                FileImportDB.reused_from.isnot(None)
+            )
+        )
+        ids = {id for pair in pairs for id in pair}
+        totals = {}
+        if ids:
+            data = session.query(ImportStageDB).filter(ImportStageDB.import_id.in_(ids))
+            for db_item in data:
+                total = totals.setdefault(db_item.import_id, [None, None])
+                total[0] = min(total[0] or db_item.started, db_item.started)
+                total[1] = max(total[1] or db_item.finished, db_item.finished)
+        seconds = {
+            id: (finished - started).total_seconds()
+            for id, (started, finished) in totals.items()
+        }
+        saved = sum(
+            max(seconds[prior] - seconds.get(id, 0.0), 0.0)
+            for id, prior in pairs
+            if prior in seconds
+        )
+        return {"reused": len(pairs), "seconds_saved": round(saved, 3)}
+
     @classmethod
     def find_by_filename(cls, filename: str, session: Session) -> list["FileImport"]:
         db_items = session.query(FileImportDB).filter(FileImportDB.filename == filename)
@@ -120,6 +170,13 @@ class FileImport(FileImportBase):
             application_logger.exception("Failed to delete file import record", e)
             return 0
 
+    def set_reused_from(self, prior_id: int, session: Session) -> "FileImport":
+        db_item = session.query(FileImportDB).filter(FileImportDB.id == self.id).first()
+        db_item.reused_from = prior_id
+        session.commit()
+        session.refresh(db_item)
+        return self.__class__(**db_item.__dict__)
+
     def update_status(self, status: str, session: Session) -> "FileImport":
         # print(f"update_status: {status}")
         db_item = session.query(FileImportDB).filter(FileImportDB.id == self.id).first()
@@ -0,0 +1,156 @@
+import datetime
+import json
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy.orm import Session
+
+from app.database.database_tables import FileImport as FileImportDB
+from app.database.database_tables import ImportBatch as ImportBatchDB
+from app.database.database_tables import ImportJob as ImportJobDB
+from app.database.import_job import ImportJob
+
+
+class ImportBatchBase(BaseModel):
+    user_id: int
+
+
+class ImportBatch(ImportBatchBase):
+    """A set of files submitted together through the batch import API.
+
+    Each accepted file is an ordinary ``ImportJob`` carrying the batch
+    id, so the files are run by the import queue's worker pool like any
+    other upload. Files refused before reaching the queue (unknown
+    type, too large, failed to save) are recorded on the batch with the
+    reason so they appear in the summary.
+    """
+
+    id: int
+    created: datetime.datetime
+    rejected: list[dict] = []
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def create(cls, user_id: int, session: Session) -> "ImportBatch":
+        db_item = ImportBatchDB(user_id=user_id, rejected="[]")
+        session.add(db_item)
+        session.commit()
+        session.refresh(db_item)
+        return cls._from_db(db_item)
+
+    @classmethod
+    def find(cls, id: int, session: Session) -> Optional["ImportBatch"]:
+        db_item = session.query(ImportBatchDB).filter(ImportBatchDB.id == id).first()
+        return cls._from_db(db_item) if db_item else None
+
+    @classmethod
+    def debug(cls, session: Session) -> list[dict]:
+        count = session.query(ImportBatchDB).count()
+        data = session.query(ImportBatchDB).all()
+        results = []
+        for db_item in data:
+            results.append(db_item.__dict__)
+            results[-1]["created"] = results[-1]["created"].isoformat()
+            results[-1].pop("_sa_instance_state")
+        result = {"items": results, "count": count}
+        return result
+
+    def update_rejected(self, rejected: list[dict], session: Session) -> "ImportBatch":
+        db_item = (
+            session.query(ImportBatchDB).filter(ImportBatchDB.id == self.id).first()
+        )
+        db_item.rejected = json.dumps(rejected)
+        session.commit()
+        session.refresh(db_item)
+        return self._from_db(db_item)
+
+    def status(self, session: Session) -> dict:
+        """Per-file and aggregate progress for the batch, read in one
+        query. Once every accepted file has finished the result also
+        carries a summary of the successes and failures."""
+        rows = (
+            session.query(ImportJobDB, FileImportDB.status)
+            .outerjoin(FileImportDB, FileImportDB.uuid == ImportJobDB.uuid)
+            .filter(ImportJobDB.batch_id == self.id)
+            .order_by(ImportJobDB.id)
+            .all()
+        )
+        files = [self._file_status(job, import_status) for job, import_status in rows]
+        complete = [x for x in files if x["job_status"] == ImportJob.COMPLETE]
+        succeeded = [x for x in complete if x["status"] == "Success"]
+        failed = [x for x in complete if x["status"] != "Success"]
+        finished = len(complete) == len(files)
+        end = (
+            max((x.finished for x, _ in rows if x.finished), default=self.created)
+            if finished
+            else self._now()
+        )
+        elapsed = max((end - self.created).total_seconds(), 0.0)
+        return {
+            "id": self.id,
+            "created": self.created.isoformat(),
+            "finished": finished,
+            "progress": {
+                "total": len(files),
+                "queued": sum(x["job_status"] == ImportJob.QUEUED for x in files),
+                "running": sum(x["job_status"] == ImportJob.RUNNING for x in files),
+                "complete": len(complete),
+                "succeeded": len(succeeded),
+                "failed": len(failed),
+                "rejected": len(self.rejected),
+                "percent": round(100 * len(complete) / len(files)) if files else 100,
+                "elapsed_seconds": round(elapsed, 3),
+                "files_per_minute": round(60 * len(complete) / elapsed, 2)
+                if elapsed
+                else 0.0,
+            },
+            "files": files,
+            "summary": {
+                "succeeded": [x["filename"] for x in succeeded],
+                "failed": [
+                    {"filename": x["filename"], "status": x["status"]} for x in failed
+                ],
+                "rejected": self.rejected,
+            }
+            if finished
+            else None,
+        }
+
+    @staticmethod
+    def _file_status(job: ImportJobDB, import_status: str | None) -> dict:
+        # The import row, when there is one, has the finer grained status
+        # (Processing, Saving, ..., Success, Failed, Exception). A job that
+        # completed without reaching a final import status failed.
+        if job.status == ImportJob.QUEUED:
+            status = ImportJob.QUEUED
+        elif job.status == ImportJob.RUNNING:
+            status = import_status or ImportJob.RUNNING
+        elif import_status in ["Success", "Failed", "Exception"]:
+            status = import_status
+        else:
+            status = "Failed"
+        seconds = (
+            round((job.finished - job.started).total_seconds(), 3)
+            if job.started and job.finished
+            else None
+        )
+        return {
+            "job_id": job.id,
+            "filename": job.filename,
+            "type": job.type,
+            "job_status": job.status,
+            "status": status,
+            "seconds": seconds,
+        }
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        # Timestamps are stored by SQLite as naive UTC.
+        return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+    @classmethod
+    def _from_db(cls, db_item: ImportBatchDB) -> "ImportBatch":
+        data = dict(db_item.__dict__)
+        data["rejected"] = json.loads(db_item.rejected or "[]")
+        return cls(**data)
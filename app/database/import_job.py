@@ -0,0 +1,226 @@
+import datetime
+from typing import ClassVar, Optional
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database.database_tables import FileImport as FileImportDB
+from app.database.database_tables import ImportJob as ImportJobDB
+from app.database.database_tables import Version as VersionDB
+from app.database.job_owner import owner_gone, stale_cutoff
+
+
+class ImportJobBase(BaseModel):
+    uuid: str
+    type: str
+    filepath: str
+    filename: str
+    status: str
+
+
+class ImportJob(ImportJobBase):
+    QUEUED: ClassVar[str] = "Queued"
+    RUNNING: ClassVar[str] = "Running"
+    COMPLETE: ClassVar[str] = "Complete"
+
+    id: int
+    user_id: int
+    created: datetime.datetime
+    started: Optional[datetime.datetime] = None
+    finished: Optional[datetime.datetime] = None
+    batch_id: Optional[int] = None
+    owner: Optional[str] = None
+    heartbeat: Optional[datetime.datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def create(
+        cls,
+        uuid: str,
+        type: str,
+        fullpath: str,
+        filename: str,
+        user_id: int,
+        session: Session,
+        batch_id: int = None,
+    ) -> "ImportJob":
+        db_item = ImportJobDB(
+            uuid=uuid,
+            type=type,
+            filepath=fullpath,
+            filename=filename,
+            status=cls.QUEUED,
+            user_id=user_id,
+            batch_id=batch_id,
+        )
+        session.add(db_item)
+        session.commit()
+        session.refresh(db_item)
+        return cls(**db_item.__dict__)
+
+    @classmethod
+    def find(cls, id: int, session: Session) -> Optional["ImportJob"]:
+        db_item = session.query(ImportJobDB).filter(ImportJobDB.id == id).first()
+        return cls(**db_item.__dict__) if db_item else None
+
+    @classmethod
+    def claim_next(
+        cls, type: str, session: Session, owner: str = None
+    ) -> Optional["ImportJob"]:
+        """Mark the oldest queued job of ``type`` as running for ``owner``
+        and return it, or None when nothing of that type is waiting.
+        Safe across processes: a job claimed by another process between
+        finding and claiming it is skipped."""
+        while True:
+            id = (
+                session.query(ImportJobDB.id)
+                .filter(ImportJobDB.type == type, ImportJobDB.status == cls.QUEUED)
+                .order_by(ImportJobDB.id)
+                .limit(1)
+                .scalar()
+            )
+            if id is None:
+                return None
+            if cls._claim(id, owner, session):
+                return cls.find(id, session)
+
+    @classmethod
+    def renew(cls, owner: str, session: Session) -> int:
+        """Record that the jobs run by ``owner`` are still running."""
+        count = (
+            session.query(ImportJobDB)
+            .filter(ImportJobDB.owner == owner, ImportJobDB.status == cls.RUNNING)
+            .update({ImportJobDB.heartbeat: func.now()}, synchronize_session=False)
+        )
+        session.commit()
+        return count
+
+    @classmethod
+    def queued_counts(cls, session: Session) -> dict[str, int]:
+        rows = (
+            session.query(ImportJobDB.type, func.count(ImportJobDB.id))
+            .filter(ImportJobDB.status == cls.QUEUED)
+            .group_by(ImportJobDB.type)
+            .all()
+        )
+        return {type: count for type, count in rows}
+
+    @classmethod
+    def recover(
+        cls, owner: str, stale_seconds: float, session: Session
+    ) -> list["ImportJob"]:
+        """Put jobs left running by a process that has gone back on the
+        queue. Jobs of live processes, this one or others, are left be.
+
+        A job is only orphaned if its process died mid-import. When its
+        import already reached a study version the work is done and the
+        job is simply closed off (the file import is marked as a
+        success). Otherwise any partial file import row is removed so
+        the re-run starts clean, and the job is queued again. Each
+        orphan is taken over by one process only, however many recover
+        at once.
+        """
+        results = []
+        cutoff = stale_cutoff(stale_seconds)
+        running = (
+            session.query(ImportJobDB).filter(ImportJobDB.status == cls.RUNNING).all()
+        )
+        for db_item in running:
+            if not owner_gone(db_item.owner, db_item.heartbeat, owner, cutoff):
+                continue
+            taken = (
+                session.query(ImportJobDB)
+                .filter(
+                    ImportJobDB.id == db_item.id,
+                    ImportJobDB.status == cls.RUNNING,
+                    ImportJobDB.owner.is_not_distinct_from(db_item.owner),
+                )
+                .update({ImportJobDB.owner: owner}, synchronize_session=False)
+            )
+            session.commit()
+            if not taken:
+                continue
+            session.refresh(db_item)
+            file_import = (
+                session.query(FileImportDB)
+                .filter(FileImportDB.uuid == db_item.uuid)
+                .first()
+            )
+            version = (
+                session.query(VersionDB)
+                .filter(VersionDB.import_id == file_import.id)
+                .first()
+                if file_import
+                else None
+            )
+            if version:
+                file_import.status = "Success"
+                db_item.status = cls.COMPLETE
+                db_item.finished = func.now()
+            else:
+                if file_import:
+                    session.delete(file_import)
+                db_item.status = cls.QUEUED
+                db_item.started = None
+                db_item.owner = None
+                db_item.heartbeat = None
+                results.append(db_item)
+            session.commit()
+        for db_item in results:
+            session.refresh(db_item)
+        return [cls(**x.__dict__) for x in results]
+
+    @classmethod
+    def wait_times(cls, limit: int, session: Session) -> list[float]:
+        """Queue wait, in seconds, of the most recently started jobs."""
+        data = (
+            session.query(ImportJobDB)
+            .filter(ImportJobDB.started.isnot(None))
+            .order_by(ImportJobDB.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return [(x.started - x.created).total_seconds() for x in data]
+
+    @classmethod
+    def debug(cls, session: Session) -> list[dict]:
+        count = session.query(ImportJobDB).count()
+        data = session.query(ImportJobDB).all()
+        results = []
+        for db_item in data:
+            results.append(db_item.__dict__)
+            for key in ["created", "started", "finished", "heartbeat"]:
+                if results[-1][key]:
+                    results[-1][key] = results[-1][key].isoformat()
+            results[-1].pop("_sa_instance_state")
+        result = {"items": results, "count": count}
+        return result
+
+    @classmethod
+    def _claim(cls, id: int, owner: str, session: Session) -> bool:
+        claimed = (
+            session.query(ImportJobDB)
+            .filter(ImportJobDB.id == id, ImportJobDB.status == cls.QUEUED)
+            .update(
+                {
+                    ImportJobDB.status: cls.RUNNING,
+                    ImportJobDB.started: func.now(),
+                    ImportJobDB.owner: owner,
+                    ImportJobDB.heartbeat: func.now(),
+                },
+                synchronize_session=False,
+            )
+        )
+        session.commit()
+        return claimed == 1
+
+    def update_status(self, status: str, session: Session) -> "ImportJob":
+        db_item = session.query(ImportJobDB).filter(ImportJobDB.id == self.id).first()
+        db_item.status = status
+        if status == self.COMPLETE:
+            db_item.finished = func.now()
+        session.commit()
+        session.refresh(db_item)
+        return self.__class__(**db_item.__dict__)
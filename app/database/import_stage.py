@@ -0,0 +1,145 @@
+import datetime
+from typing import ClassVar, Optional
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy.orm import Session
+
+from app.database.database_tables import FileImport as FileImportDB
+from app.database.database_tables import ImportStage as ImportStageDB
+
+
+class ImportStageBase(BaseModel):
+    import_id: int
+    name: str
+    started: datetime.datetime
+    finished: datetime.datetime
+    seconds: float
+    peak_memory: Optional[int] = None
+
+
+class ImportStage(ImportStageBase):
+    """The time taken by, and peak memory of, one stage of an import.
+
+    Recorded for every import by ``ImportTiming`` and shown on the import
+    status page, along with percentiles of each stage per import type
+    over the most recent ``SAMPLE`` imports of the type.
+    """
+
+    # Stages in the order they run, for display.
+    ORDER: ClassVar[list[str]] = [
+        "reuse",
+        "validate",
+        "convert",
+        "parameters",
+        "save",
+        "study",
+        "digest",
+    ]
+    TOTAL: ClassVar[str] = "total"
+    SAMPLE: ClassVar[int] = 200
+
+    id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @classmethod
+    def create(
+        cls, import_id: int, stages: list[dict], session: Session
+    ) -> list["ImportStage"]:
+        db_items = [ImportStageDB(import_id=import_id, **x) for x in stages]
+        session.add_all(db_items)
+        session.commit()
+        for db_item in db_items:
+            session.refresh(db_item)
+        return [cls(**x.__dict__) for x in db_items]
+
+    @classmethod
+    def for_imports(
+        cls, import_ids: list[int], session: Session
+    ) -> dict[int, list["ImportStage"]]:
+        """The stages of each of the imports, in the order they ran."""
+        if not import_ids:
+            return {}
+        data = (
+            session.query(ImportStageDB)
+            .filter(ImportStageDB.import_id.in_(import_ids))
+            .order_by(ImportStageDB.id)
+            .all()
+        )
+        results = {}
+        for db_item in data:
+            results.setdefault(db_item.import_id, []).append(cls(**db_item.__dict__))
+        return results
+
+    @classmethod
+    def percentiles(cls, session: Session) -> dict[str, list[dict]]:
+        """Import type -> the count, 50th, 90th and 95th percentile and
+        maximum duration (seconds) and 95th percentile peak memory (MB)
+        of each stage, and of the imports overall (``TOTAL``), over the
+        latest ``SAMPLE`` imports of the type."""
+        recent = {}
+        types = session.query(FileImportDB.type).distinct()
+        for (type,) in types:
+            imports = (
+                session.query(FileImportDB.id)
+                .filter(FileImportDB.type == type)
+                .order_by(FileImportDB.id.desc())
+                .limit(cls.SAMPLE)
+            )
+            recent.update({id: type for (id,) in imports})
+        if not recent:
+            return {}
+        data = (
+            session.query(ImportStageDB)
+            .filter(ImportStageDB.import_id.in_(list(recent)))
+            .all()
+        )
+        durations = {}
+        memory = {}
+        totals = {}
+        for db_item in data:
+            type = recent[db_item.import_id]
+            key = (type, db_item.name)
+            durations.setdefault(key, []).append(db_item.seconds)
+            if db_item.peak_memory is not None:
+                memory.setdefault(key, []).append(db_item.peak_memory)
+            total = totals.setdefault(db_item.import_id, [None, None])
+            total[0] = min(total[0] or db_item.started, db_item.started)
+            total[1] = max(total[1] or db_item.finished, db_item.finished)
+        for id, (started, finished) in totals.items():
+            key = (recent[id], cls.TOTAL)
+            durations.setdefault(key, []).append((finished - started).total_seconds())
+        results = {}
+        for (type, name), values in sorted(
+            durations.items(), key=lambda x: (x[0][0], cls._position(x[0][1]))
+        ):
+            peaks = memory.get((type, name), [])
+            results.setdefault(type, []).append(
+                {
+                    "stage": name,
+                    "count": len(values),
+                    "p50": round(cls._percentile(values, 50), 3),
+                    "p90": round(cls._percentile(values, 90), 3),
+                    "p95": round(cls._percentile(values, 95), 3),
+                    "max": round(max(values), 3),
+                    "peak_mb_p95": (
+                        round(cls._percentile(peaks, 95) / 1048576, 1)
+                        if peaks
+                        else None
+                    ),
+                }
+            )
+        return results
+
+    @classmethod
+    def _position(cls, name: str) -> int:
+        if name == cls.TOTAL:
+            return len(cls.ORDER) + 1
+        return cls.ORDER.index(name) if name in cls.ORDER else len(cls.ORDER)
+
+    @staticmethod
+    def _percentile(values: list[float], percent: float) -> float:
+        # Nearest rank.
+        ordered = sorted(values)
+        rank = max(int(-(-percent * len(ordered) // 100)), 1)
+        return ordered[rank - 1]
@@ -0,0 +1,48 @@
+import datetime
+import os
+import socket
+from uuid import uuid4
+
+
+def new_owner() -> str:
+    """Identifies a process claiming jobs: its host, its pid and a token
+    of its own, as pids are reused (e.g. pid 1 of a container that
+    restarted)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+def owner_gone(
+    owner: str | None,
+    heartbeat: datetime.datetime | None,
+    current: str,
+    cutoff: datetime.datetime,
+) -> bool:
+    """Whether the process that claimed a job has gone, from what this
+    process, ``current``, can tell: no owner or heartbeat, a heartbeat
+    older than ``cutoff``, an earlier process with this pid or a
+    process of this host no longer running."""
+    if owner == current:
+        return False
+    if owner is None or heartbeat is None or heartbeat < cutoff:
+        return True
+    host, pid, _ = owner.rsplit(":", 2)
+    current_host, current_pid, _ = current.rsplit(":", 2)
+    if host != current_host:
+        return False
+    if pid == current_pid:
+        # An earlier process with the pid of this one.
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+
+def stale_cutoff(stale_seconds: float) -> datetime.datetime:
+    """Heartbeats older than this are stale; naive UTC, as stored."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(
+        tzinfo=None
+    ) - datetime.timedelta(seconds=stale_seconds)
@@ -3,9 +3,10 @@ from typing import Optional
 
 from d4k_ms_base.logger import application_logger
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import or_, text
+from sqlalchemy import desc, func, or_, text
 from sqlalchemy.orm import Query, Session
 
+from app.database.database_tables import FileImport as FileImportDB
 from app.database.database_tables import Study as StudyDB
 from app.database.database_tables import Version as VersionDB
 from app.database.file_import import FileImport
@@ -109,8 +110,8 @@ class Study(StudyBase):
 
     @classmethod
     def summary(cls, id: int, session: Session) -> dict:
-        db_item = session.query(StudyDB).filter(StudyDB.id == id).first()
-        return cls._summary(db_item, session)
+        row = cls._summary_query(session).filter(StudyDB.id == id).first()
+        return cls._summary(row)
 
     @classmethod
     def page(
@@ -122,12 +123,12 @@ class Study(StudyBase):
         c_query = session.query(StudyDB).filter(StudyDB.user_id == user_id)
         c_query = cls._add_filters(c_query, filter)
         count = c_query.count()
-        d_query = session.query(StudyDB).filter(StudyDB.user_id == user_id)
+        d_query = cls._summary_query(session).filter(StudyDB.user_id == user_id)
         d_query = cls._add_filters(d_query, filter)
-        data = d_query.offset(skip).limit(size).all()
+        data = d_query.order_by(StudyDB.id).offset(skip).limit(size).all()
         results = []
-        for db_item in data:
-            results.append(cls._summary(db_item, session))
+        for row in data:
+            results.append(cls._summary(row))
         result = {
             "items": results,
             "page": page,
@@ -206,13 +207,41 @@ class Study(StudyBase):
         return sorted(results)
 
     @staticmethod
-    def _summary(item: StudyDB, session: Session) -> dict:
+    def _summary_query(session: Session) -> Query:
+        # The version count, latest version and its import type are
+        # correlated subqueries on the indexed version.study_id, so a page
+        # of studies is read in one statement rather than three more per
+        # study, and only for the rows inside the LIMIT.
+        versions = (
+            session.query(func.count(VersionDB.id))
+            .filter(VersionDB.study_id == StudyDB.id)
+            .scalar_subquery()
+        )
+        latest_version_id = (
+            session.query(VersionDB.id)
+            .filter(VersionDB.study_id == StudyDB.id)
+            .order_by(desc(VersionDB.version))
+            .limit(1)
+            .scalar_subquery()
+        )
+        import_type = (
+            session.query(FileImportDB.type)
+            .join(VersionDB, VersionDB.import_id == FileImportDB.id)
+            .filter(VersionDB.study_id == StudyDB.id)
+            .order_by(desc(VersionDB.version))
+            .limit(1)
+            .scalar_subquery()
+        )
+        return session.query(StudyDB, versions, latest_version_id, import_type)
+
+    @staticmethod
+    def _summary(row: tuple) -> dict:
+        item, versions, latest_version_id, import_type = row
         record = item.__dict__
         record.pop("_sa_instance_state")
-        record["versions"] = Version.version_count(item.id, session)
-        latest_version = Version.find_latest_version(item.id, session)
-        record["latest_version_id"] = latest_version.id
-        record["import_type"] = FileImport.find(latest_version.import_id, session).type
+        record["versions"] = versions
+        record["latest_version_id"] = latest_version_id
+        record["import_type"] = import_type
         return record
 
     @staticmethod
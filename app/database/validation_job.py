@@ -0,0 +1,195 @@
+import datetime
+from typing import ClassVar, Optional
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database.database_tables import ValidationJob as ValidationJobDB
+from app.database.job_owner import owner_gone, stale_cutoff
+
+
+class ValidationJobBase(BaseModel):
+    uuid: str
+    engine: str
+    filename: str
+    status: str
+
+
+class ValidationJob(ValidationJobBase):
+    QUEUED: ClassVar[str] = "Queued"
+    RUNNING: ClassVar[str] = "Running"
+    COMPLETE: ClassVar[str] = "Complete"
+    FAILED: ClassVar[str] = "Failed"
+
+    id: int
+    user_id: int
+    findings: Optional[int] = None
+    created: datetime.datetime
+    finished: Optional[datetime.datetime] = None
+    owner: Optional[str] = None
+    heartbeat: Optional[datetime.datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @property
+    def done(self) -> bool:
+        return self.status in [self.COMPLETE, self.FAILED]
+
+    @classmethod
+    def create(
+        cls,
+        uuid: str,
+        engine: str,
+        filename: str,
+        user_id: int,
+        session: Session,
+        owner: str = None,
+    ) -> "ValidationJob":
+        """The job is owned from the start by ``owner``, the process
+        that queues it."""
+        db_item = ValidationJobDB(
+            uuid=uuid,
+            engine=engine,
+            filename=filename,
+            status=cls.QUEUED,
+            user_id=user_id,
+            owner=owner,
+            heartbeat=func.now() if owner else None,
+        )
+        session.add(db_item)
+        session.commit()
+        session.refresh(db_item)
+        return cls(**db_item.__dict__)
+
+    @classmethod
+    def find(cls, id: int, session: Session) -> Optional["ValidationJob"]:
+        db_item = (
+            session.query(ValidationJobDB).filter(ValidationJobDB.id == id).first()
+        )
+        return cls(**db_item.__dict__) if db_item else None
+
+    @classmethod
+    def unfinished(cls, session: Session) -> list["ValidationJob"]:
+        """Jobs a previous process accepted but never finished, oldest
+        first."""
+        data = (
+            session.query(ValidationJobDB)
+            .filter(ValidationJobDB.status.in_([cls.QUEUED, cls.RUNNING]))
+            .order_by(ValidationJobDB.id)
+            .all()
+        )
+        return [cls(**x.__dict__) for x in data]
+
+    @classmethod
+    def renew(cls, owner: str, session: Session) -> int:
+        """Record that the jobs of ``owner`` are still queued or running."""
+        count = (
+            session.query(ValidationJobDB)
+            .filter(
+                ValidationJobDB.owner == owner,
+                ValidationJobDB.status.in_([cls.QUEUED, cls.RUNNING]),
+            )
+            .update({ValidationJobDB.heartbeat: func.now()}, synchronize_session=False)
+        )
+        session.commit()
+        return count
+
+    @classmethod
+    def recover(
+        cls, owner: str, stale_seconds: float, session: Session
+    ) -> list["ValidationJob"]:
+        """Take over, for ``owner``, the unfinished jobs of processes that
+        have gone and return them, queued, to be run again. Jobs of live
+        processes, this one or others, are left be, and each orphan is
+        taken over by one process only, however many recover at once."""
+        cutoff = stale_cutoff(stale_seconds)
+        results = []
+        for job in cls.unfinished(session):
+            if owner_gone(job.owner, job.heartbeat, owner, cutoff) and cls._claim(
+                job.id, job.owner, owner, session
+            ):
+                results.append(cls.find(job.id, session))
+        return results
+
+    @classmethod
+    def page(cls, page: int, size: int, user_id: int, session: Session) -> list[dict]:
+        page = max(page, 1)
+        size = size if size > 0 else 10
+        skip = (page - 1) * size
+        count = (
+            session.query(ValidationJobDB)
+            .filter(ValidationJobDB.user_id == user_id)
+            .count()
+        )
+        data = (
+            session.query(ValidationJobDB)
+            .filter(ValidationJobDB.user_id == user_id)
+            .order_by(ValidationJobDB.id.desc())
+            .offset(skip)
+            .limit(size)
+            .all()
+        )
+        results = []
+        for db_item in data:
+            results.append(db_item.__dict__)
+        result = {
+            "items": results,
+            "page": page,
+            "size": size,
+            "filter": "",
+            "count": count,
+        }
+        return result
+
+    @classmethod
+    def debug(cls, session: Session) -> list[dict]:
+        count = session.query(ValidationJobDB).count()
+        data = session.query(ValidationJobDB).all()
+        results = []
+        for db_item in data:
+            results.append(db_item.__dict__)
+            for key in ["created", "finished", "heartbeat"]:
+                if results[-1][key]:
+                    results[-1][key] = results[-1][key].isoformat()
+            results[-1].pop("_sa_instance_state")
+        result = {"items": results, "count": count}
+        return result
+
+    @classmethod
+    def _claim(
+        cls, id: int, previous: str | None, owner: str, session: Session
+    ) -> bool:
+        claimed = (
+            session.query(ValidationJobDB)
+            .filter(
+                ValidationJobDB.id == id,
+                ValidationJobDB.status.in_([cls.QUEUED, cls.RUNNING]),
+                ValidationJobDB.owner.is_not_distinct_from(previous),
+            )
+            .update(
+                {
+                    ValidationJobDB.status: cls.QUEUED,
+                    ValidationJobDB.owner: owner,
+                    ValidationJobDB.heartbeat: func.now(),
+                },
+                synchronize_session=False,
+            )
+        )
+        session.commit()
+        return claimed == 1
+
+    def update_status(
+        self, status: str, session: Session, findings: int = None
+    ) -> "ValidationJob":
+        db_item = (
+            session.query(ValidationJobDB).filter(ValidationJobDB.id == self.id).first()
+        )
+        db_item.status = status
+        if findings is not None:
+            db_item.findings = findings
+        if status in [self.COMPLETE, self.FAILED]:
+            db_item.finished = func.now()
+        session.commit()
+        session.refresh(db_item)
+        return self.__class__(**db_item.__dict__)
@@ -3,6 +3,7 @@ from pathlib import Path
 
 from d4k_ms_base.logger import application_logger
 from fastapi.templating import Jinja2Templates
+from jinja2 import Template
 
 from app.dependencies.fhir_version import (
     fhir_version_description,
@@ -11,6 +12,7 @@ from app.dependencies.fhir_version import (
     fhir_version_transmit,
 )
 from app.imports.import_manager import ImportManager
+from app.utility.request_timing import request_timing
 from app.utility.template_methods import (
     convert_to_json,
     ellipsize,
@@ -18,9 +20,17 @@ from app.utility.template_methods import (
     single_multiple,
 )
 
+
+class TimedTemplate(Template):
+    def render(self, *args, **kwargs) -> str:
+        with request_timing.stage("template"):
+            return super().render(*args, **kwargs)
+
+
 full_path = os.path.realpath(__file__)
 templates_path = f"{Path(full_path).parents[1]!s}/templates"
 templates = Jinja2Templates(directory=templates_path)
+templates.env.template_class = TimedTemplate
 application_logger.info(f"Template dir set to '{templates_path}'")
 
 templates.env.filters["ellipsize"] = ellipsize
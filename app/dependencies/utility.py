@@ -1,6 +1,12 @@
-from fastapi import Request
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
 
 from app.database.user import User
+from app.model.export_cache import export_stats
 
 
 def user_details(request: Request, db):
@@ -19,3 +25,40 @@ def transmit_role_enabled(request: Request):
     user_info = request.session["userinfo"]
     role = next((x for x in user_info["roles"] if x["name"] == "Transmit"), None)
     return True if role else False
+
+
+def download_response(
+    request: Request, full_path: str, filename: str, media_type: str
+) -> Response:
+    """Serve a generated or stored export file with a strong ETag and
+    Last-Modified, answering a conditional request for an unchanged file
+    with 304 Not Modified. Export files are replaced, never rewritten in
+    place, so the modification time and size identify the contents."""
+    stat = os.stat(full_path)
+    signature = f"{full_path}:{stat.st_mtime_ns}:{stat.st_size}"
+    headers = {
+        "ETag": f'"{hashlib.sha256(signature.encode()).hexdigest()[:32]}"',
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, headers["ETag"], stat.st_mtime):
+        export_stats.unchanged()
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        path=full_path, filename=filename, media_type=media_type, headers=headers
+    )
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [x.strip().removeprefix("W/") for x in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
+    return False
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+
+from d4k_ms_base.logger import application_logger
+from fastapi import HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.orm import Session
+
+from app.configuration.configuration import application_configuration
+from app.database.database import SessionLocal
+from app.database.import_batch import ImportBatch
+from app.database.user import User
+from app.imports.import_manager import ImportManager
+from app.imports.import_queue import import_queue
+from app.model.file_handling.local_files import LocalFiles
+
+
+class BatchHandler:
+    """Queue many files, of mixed import types, as one batch.
+
+    Browser uploads name the import type as the form field of each file
+    (e.g. ``M11_DOCX``). Files posted as ``files``, and the files in a
+    local files dir (``source=os`` with a ``dir`` field), take their
+    type from their extension: ``EXTENSION_TYPES``, overridden by an
+    optional ``types`` field holding a JSON object such as
+    ``{".docx": "CPT_DOCX"}``. A ``types`` field that is not such an
+    object, with string values, fails the request with a 400.
+
+    Each accepted file is saved and queued as its own import job, so the
+    batch is spread over the import queue's bounded worker pool. Images
+    and multi-workbook Excel studies are not supported in a batch.
+    """
+
+    EXTENSION_TYPES = {
+        ".xlsx": ImportManager.USDM_EXCEL,
+        ".docx": ImportManager.M11_DOCX,
+        ".pdf": ImportManager.LEGACY_PDF,
+        ".json": ImportManager.USDM4_JSON,
+    }
+
+    PROGRESS_INTERVAL = 2.0
+
+    def __init__(self, source: str):
+        self.source = source
+        self.max_size_mb = application_configuration.upload_max_size_mb
+
+    async def process(self, request: Request, user: User, session: Session) -> dict:
+        form = await request.form()
+        types = self._types(form.get("types"))
+        batch = ImportBatch.create(user.id, session)
+        accepted = []
+        rejected = []
+        if self.source == "os":
+            try:
+                paths = LocalFiles().files(form.get("dir") or "")
+            except (OSError, ValueError) as e:
+                application_logger.exception("Exception listing batch import dir", e)
+                paths = []
+                rejected.append({"filename": form.get("dir"), "reason": str(e)})
+            for path in paths:
+                with open(path, "rb") as contents:
+                    self._queue(
+                        os.path.basename(path),
+                        None,
+                        os.path.getsize(path),
+                        contents,
+                        types,
+                        user,
+                        batch,
+                        accepted,
+                        rejected,
+                    )
+        else:
+            for field, value in form.multi_items():
+                if not hasattr(value, "filename"):
+                    continue
+                self._queue(
+                    value.filename,
+                    None if field == "files" else field,
+                    value.size,
+                    value.file,
+                    types,
+                    user,
+                    batch,
+                    accepted,
+                    rejected,
+                )
+        if rejected:
+            batch = batch.update_rejected(rejected, session)
+        application_logger.info(
+            f"Import batch '{batch.id}': {len(accepted)} files queued, {len(rejected)} rejected"
+        )
+        return {
+            "batch_id": batch.id,
+            "accepted": accepted,
+            "rejected": rejected,
+            "status_url": f"/import/batch/{batch.id}/status",
+        }
+
+    def _types(self, field: str | None) -> dict:
+        types = dict(self.EXTENSION_TYPES)
+        try:
+            overrides = json.loads(field or "{}")
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The 'types' field is not valid JSON, {e}",
+            )
+        if not isinstance(overrides, dict) or not all(
+            isinstance(x, str) for x in overrides.values()
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="The 'types' field must map file extensions to import types",
+            )
+        types.update({key.lower(): value for key, value in overrides.items()})
+        return types
+
+    def _queue(
+        self,
+        filename: str,
+        type: str | None,
+        size: int | None,
+        contents,
+        types: dict,
+        user: User,
+        batch: ImportBatch,
+        accepted: list,
+        rejected: list,
+    ) -> None:
+        extension = os.path.splitext(filename)[1].lower()
+        type = type or types.get(extension)
+        if not type:
+            rejected.append(
+                {"filename": filename, "reason": f"No import type for '{extension}'"}
+            )
+            return
+        try:
+            import_manager = ImportManager(user, type)
+        except KeyError:
+            rejected.append(
+                {"filename": filename, "reason": f"Unknown import type '{type}'"}
+            )
+            return
+        if extension != import_manager.main_file_ext:
+            rejected.append(
+                {
+                    "filename": filename,
+                    "reason": f"Not a '{import_manager.main_file_ext}' file for a {type} import",
+                }
+            )
+            return
+        if self.max_size_mb and size and size > self.max_size_mb * 1024 * 1024:
+            rejected.append(
+                {
+                    "filename": filename,
+                    "reason": f"Larger than the {self.max_size_mb} MB limit",
+                }
+            )
+            return
+        uuid = import_manager.save_files(
+            {"filename": filename, "contents": contents}, []
+        )
+        if not uuid:
+            rejected.append(
+                {
+                    "filename": filename,
+                    "reason": import_manager.save_error or "Failed to save the file",
+                }
+            )
+            return
+        job_id = import_queue.enqueue(import_manager, batch.id)
+        accepted.append({"job_id": job_id, "filename": filename, "type": type})
+
+
+async def batch_progress(websocket: WebSocket, id: int) -> None:
+    """Send the batch status as JSON every ``PROGRESS_INTERVAL`` seconds
+    until the batch finishes (the last message carries the summary),
+    then close. Only the user who submitted the batch is answered."""
+    await websocket.accept()
+    try:
+        while True:
+            session = SessionLocal()
+            try:
+                batch = ImportBatch.find(id, session)
+                user_info = websocket.session.get("userinfo")
+                user = User.check(user_info, session)[0] if user_info else None
+                if not batch or not user or batch.user_id != user.id:
+                    await websocket.close(code=1008)
+                    return
+                status = batch.status(session)
+            finally:
+                session.close()
+            await websocket.send_json(status)
+            if status["finished"]:
+                await websocket.close()
+                return
+            await asyncio.sleep(BatchHandler.PROGRESS_INTERVAL)
+    except WebSocketDisconnect:
+        pass
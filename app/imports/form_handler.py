@@ -5,16 +5,29 @@ from d4k_ms_base.logger import application_logger
 from fastapi import File, Request
 from starlette.datastructures import FormData
 
+from app.configuration.configuration import application_configuration
 from app.model.file_handling.local_files import LocalFiles
 from app.model.file_handling.pfda_files import PFDAFiles
 
 
 class FormHandler:
-    def __init__(self, request: Request, image_files: bool, ext: str, source: str):
+    def __init__(
+        self,
+        request: Request,
+        image_files: bool,
+        ext: str,
+        source: str,
+        stream: bool = False,
+    ):
         self.request = request
         self.image_files = image_files
         self.ext = ext if ext.startswith(".") else "." + ext
         self.source = source
+        # Streaming mode: browser uploads are returned as the file
+        # objects the multipart parser spooled them to, rather than read
+        # into bytes, so DataFiles can copy them to disk in chunks.
+        self.stream = stream
+        self.max_size_mb = application_configuration.upload_max_size_mb
         # Additional files sharing the main extension (beyond the first).
         # Used by the Excel import flow where a multi-design study is
         # uploaded as a main workbook plus one workbook per study design.
@@ -26,6 +39,15 @@ class FormHandler:
         }
 
     async def get_files(self):
+        # Refuse an oversize upload before the multipart body is parsed
+        # (and spooled to disk).
+        length = self.request.headers.get("content-length")
+        if length and length.isdigit() and self._too_large(int(length)):
+            return (
+                None,
+                [],
+                [f"Upload rejected, larger than the {self.max_size_mb} MB limit"],
+            )
         form = await self.request.form()
         return await self._files_method[self.source](form)
 
@@ -38,7 +60,12 @@ class FormHandler:
         for v in files:
             # print(f"XL FILES: {v}")
             filename = v.filename
-            contents = await v.read()
+            if self._too_large(v.size):
+                messages.append(
+                    f"File '{filename}' was ignored, larger than the {self.max_size_mb} MB limit"
+                )
+                continue
+            contents = v.file if self.stream else await v.read()
             file_root, file_extension = os.path.splitext(filename)
             main_file, image_files = self._handle_file(
                 file_extension,
@@ -93,12 +120,15 @@ class FormHandler:
             )
         return main_file, image_files, messages
 
+    def _too_large(self, size: int | None) -> bool:
+        return bool(self.max_size_mb and size and size > self.max_size_mb * 1024 * 1024)
+
     def _handle_file(
         self,
         file_extension: str,
         file_root: str,
         filename: str,
-        contents: bytes,
+        contents,
         messages: list,
         main_file: dict,
         image_files: list,
@@ -1,9 +1,9 @@
-import asyncio
-import threading
+import hashlib
+from importlib import metadata
 
 from d4k_ms_base.logger import application_logger
-from usdm4_excel import USDM4Excel
 
+from app.configuration.configuration import application_configuration
 from app.database.database import SessionLocal
 from app.database.file_import import FileImport
 from app.database.study import Study
@@ -18,8 +18,13 @@ from app.imports.import_processors import (
     ImportProcessorBase,
     ImportUSDM4,
 )
+from app.imports.import_timing import ImportTiming
+from app.model.compare_digest import CompareDigest
 from app.model.connection_manager import connection_manager
 from app.model.file_handling.data_files import DataFiles
+from app.utility.lazy_import import LazyImport
+
+USDM4Excel = LazyImport("usdm4_excel", "USDM4Excel")
 
 
 class ImportManager:
@@ -34,8 +39,12 @@ class ImportManager:
     # imported historically still render (source pill, errors file).
     USDM3_JSON = "USDM3_JSON"
     USDM4_JSON = "USDM4_JSON"
+    # The results of an import taken by a reuse of it, and the libraries
+    # whose versions they depend on.
+    REUSED = ["usdm", "extra", "errors", "m11_validation"]
+    LIBRARIES = ["usdm4", "usdm4_excel", "usdm4_protocol", "usdm4_fhir"]
 
-    def __init__(self, user: User, type: str) -> None:
+    def __init__(self, user: User, type: str, reuse: bool = None) -> None:
         self.mapping = {
             self.USDM_EXCEL: {
                 "processor": ImportExcel,
@@ -91,6 +100,20 @@ class ImportManager:
         self.original_filename = None
         self.main_full_path = None
         self.save_error = None
+        self.reuse = application_configuration.import_reuse if reuse is None else reuse
+
+    @classmethod
+    def restore(
+        cls, user: User, type: str, uuid: str, full_path: str, filename: str
+    ) -> "ImportManager":
+        """Rebuild a manager for files already saved by ``save_files``,
+        as recorded on a queued import job."""
+        manager = cls(user, type)
+        manager.files = DataFiles(uuid)
+        manager.uuid = uuid
+        manager.main_full_path = full_path
+        manager.original_filename = filename
+        return manager
 
     @classmethod
     def imports_with_errors(cls) -> list[str]:
@@ -196,10 +219,12 @@ class ImportManager:
         return mains[0] if len(mains) == 1 else None
 
     async def process(self) -> None:
+        timing = ImportTiming()
         try:
             session = SessionLocal()
             file_import = None
             full_path, filename = self.main_full_path, self.original_filename
+            source_digest = self._source_digest()
             file_import = FileImport.create(
                 full_path,
                 self.original_filename,
@@ -208,28 +233,40 @@ class ImportManager:
                 self.uuid,
                 self.user.id,
                 session,
+                source_digest,
             )
             processor: ImportProcessorBase = self.processor(
-                self.type, self.uuid, full_path
+                self.type, self.uuid, full_path, timing
             )
-            result = await processor.process()
+            prior = self._reusable(source_digest, session) if self.reuse else None
+            reused = self._reuse(prior, processor, timing) if prior else False
+            result = True if reused else await processor.process()
             if processor.errors:
                 self.files.save("errors", processor.errors)
             if result:
                 file_import.update_status("Saving", session)
-                self.files.save("usdm", processor.usdm)
-                self.files.save("extra", processor.extra)
+                if reused:
+                    file_import.set_reused_from(prior.id, session)
+                else:
+                    with timing.stage("save"):
+                        self._save_usdm(processor.usdm)
+                        self.files.save("extra", processor.extra)
                 file_import.update_status("Create", session)
-                Study.study_and_version(
-                    processor.study_parameters, self.user, file_import, session
-                )
+                with timing.stage("study"):
+                    Study.study_and_version(
+                        processor.study_parameters, self.user, file_import, session
+                    )
+                with timing.stage("digest"):
+                    self._save_compare_digest()
                 file_import.update_status("Success", session)
+                timing.save(file_import.id, session)
                 session.close()
                 await connection_manager.success(
                     f"Import of '{filename}' completed sucessfully", str(self.user.id)
                 )
             else:
                 file_import.update_status("Failed", session)
+                timing.save(file_import.id, session)
                 session.close()
                 await connection_manager.error(
                     f"Error encountered importing '{filename}', {processor.fatal_error}",
@@ -238,18 +275,90 @@ class ImportManager:
         except Exception as e:
             if file_import:
                 file_import.update_status("Exception", session)
+                timing.save(file_import.id, session)
             application_logger.exception("Exception raised processing import", e)
             session.close()
             await connection_manager.error(
                 f"Exception encountered importing '{filename}'", str(self.user.id)
             )
 
+    def _save_usdm(self, usdm: str) -> None:
+        # The upload of a USDM import is its USDM, linked from the blob
+        # store. Saving it again unchanged would replace it with a copy
+        # and leave the blob unreferenced.
+        if self.main_file_type == "usdm" and usdm == self.files.read("usdm"):
+            return
+        self.files.save("usdm", usdm)
+
+    def _source_digest(self) -> str | None:
+        """Identifies what is imported: the import type, the name and
+        SHA-256 of each file uploaded and the versions of the import
+        libraries. None if the uploads were not recorded."""
+        sources = self.files.sources()
+        if not sources:
+            return None
+        sha = hashlib.sha256(self.type.encode())
+        for library in self.LIBRARIES:
+            sha.update(f"\n{library}={self._library_version(library)}".encode())
+        for name, digest in sorted(sources.items()):
+            sha.update(f"\n{name}:{digest['sha256']}".encode())
+        return sha.hexdigest()
+
+    def _reusable(self, source_digest: str | None, session) -> FileImport | None:
+        # The latest import of the same files whose results are still there.
+        if not source_digest:
+            return None
+        for prior in FileImport.find_reusable(source_digest, session):
+            if prior.uuid != self.uuid and DataFiles(prior.uuid).exists("usdm"):
+                return prior
+        return None
+
+    def _reuse(
+        self, prior: FileImport, processor: ImportProcessorBase, timing: ImportTiming
+    ) -> bool:
+        """Copy the results of the earlier import instead of running the
+        import again. False to run it after all."""
+        try:
+            with timing.stage("reuse"):
+                previous = DataFiles(prior.uuid)
+                for type in self.REUSED:
+                    # The uploaded USDM of a USDM import is already here.
+                    if type == self.main_file_type or not previous.exists(type):
+                        continue
+                    if not self.files.copy(previous, type):
+                        return False
+                usdm = self.files.read("usdm")
+            if usdm is None or not processor.reuse(usdm):
+                return False
+            application_logger.info(
+                f"Import '{self.uuid}' reused the results of import '{prior.uuid}'"
+            )
+            return True
+        except Exception as e:
+            application_logger.exception(
+                f"Exception reusing import '{prior.uuid}' for '{self.uuid}'", e
+            )
+            return False
+
+    @staticmethod
+    def _library_version(name: str) -> str:
+        try:
+            return metadata.version(name)
+        except metadata.PackageNotFoundError:
+            return "unknown"
+
+    def _save_compare_digest(self) -> None:
+        # Saves building it when the study is first compared; a failure
+        # here leaves that to happen instead, so never fails the import.
+        try:
+            digest = CompareDigest(self.files)
+            digest.save(digest.build(digest.wrapper(), self.type))
+        except Exception as e:
+            application_logger.exception(
+                f"Exception building the compare digest for '{self.uuid}'", e
+            )
+
     def _save_file(self, file_details: dict, file_type: str) -> tuple[str, str]:
         filename = file_details["filename"]
         contents = file_details["contents"]
         return self.files.save(file_type, contents, filename)
-
-
-def execute_import(import_manager: ImportManager) -> None:
-    t = threading.Thread(target=asyncio.run, args=(import_manager.process(),))
-    t.start()
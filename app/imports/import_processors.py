@@ -3,22 +3,25 @@ import json
 import simple_error_log as sel
 from d4k_ms_base.logger import application_logger
 from simple_error_log import Errors as M11Errors
-from usdm4 import USDM4, RulesValidationResults
-from usdm4.api.identifier import StudyIdentifier
-from usdm4.api.study_version import StudyVersion
-from usdm4.api.wrapper import Wrapper
-from usdm4_excel import USDM4Excel
-
-# from usdm4_legacy import USDM4Legacy
-from usdm4_fhir import M11
-from usdm4_protocol.cpt import USDM4CPT
-from usdm4_protocol.m11 import USDM4M11
-from usdm4_protocol.validation.m11 import M11Validator
 
 from app.configuration.configuration import application_configuration
+from app.imports.import_timing import ImportTiming
 from app.model.file_handling.data_files import DataFiles
 from app.model.object_path import ObjectPath
 from app.utility.finding_projections import project_m11_result
+from app.utility.lazy_import import LazyImport
+
+USDM4 = LazyImport("usdm4", "USDM4")
+RulesValidationResults = LazyImport("usdm4", "RulesValidationResults")
+StudyIdentifier = LazyImport("usdm4.api.identifier", "StudyIdentifier")
+StudyVersion = LazyImport("usdm4.api.study_version", "StudyVersion")
+Wrapper = LazyImport("usdm4.api.wrapper", "Wrapper")
+USDM4Excel = LazyImport("usdm4_excel", "USDM4Excel")
+# USDM4Legacy = LazyImport("usdm4_legacy", "USDM4Legacy")
+M11 = LazyImport("usdm4_fhir", "M11")
+USDM4CPT = LazyImport("usdm4_protocol.cpt", "USDM4CPT")
+USDM4M11 = LazyImport("usdm4_protocol.m11", "USDM4M11")
+M11Validator = LazyImport("usdm4_protocol.validation.m11", "M11Validator")
 
 
 def _usdm4() -> USDM4:
@@ -33,7 +36,9 @@ def _usdm4() -> USDM4:
 
 
 class ImportProcessorBase:
-    def __init__(self, type: str, uuid: str, full_path: str) -> None:
+    def __init__(
+        self, type: str, uuid: str, full_path: str, timing: ImportTiming = None
+    ) -> None:
         self.usdm = None
         self.errors = None
         self.study_parameters = None
@@ -43,11 +48,24 @@ class ImportProcessorBase:
         self.type = type
         self.uuid = uuid
         self.full_path = full_path
+        self.timing = timing or ImportTiming()
 
     async def process(self) -> bool:
         return False
 
+    def reuse(self, usdm: str) -> bool:
+        """Take the USDM of an earlier import of the same files instead
+        of processing them. False if the study parameters cannot be
+        found in it, to process them after all."""
+        self.usdm = usdm
+        self.study_parameters = self._study_parameters()
+        return self.study_parameters is not None
+
     def _study_parameters(self) -> dict | None:
+        with self.timing.stage("parameters"):
+            return self._extract_study_parameters()
+
+    def _extract_study_parameters(self) -> dict | None:
         try:
             data = json.loads(self.usdm)
             db = _usdm4()
@@ -133,7 +151,8 @@ class ImportProcessorBase:
 class ImportExcel(ImportProcessorBase):
     async def process(self) -> bool:
         importer = USDM4Excel()
-        wrapper: Wrapper = importer.from_excel(self.full_path)
+        with self.timing.stage("convert"):
+            wrapper: Wrapper = importer.from_excel(self.full_path)
         errors = importer.errors()
         application_logger.info(errors.dump(sel.Errors.DEBUG))
         if wrapper:
@@ -160,7 +179,8 @@ class ImportM11(ImportProcessorBase):
         self.m11_validation: list[dict] = []
         try:
             validator_errors = M11Errors()
-            results = M11Validator(self.full_path, validator_errors).validate()
+            with self.timing.stage("validate"):
+                results = M11Validator(self.full_path, validator_errors).validate()
             self.m11_validation = project_m11_result(results)
             DataFiles(self.uuid).save("m11_validation", json.dumps(self.m11_validation))
         except Exception as e:
@@ -169,7 +189,8 @@ class ImportM11(ImportProcessorBase):
             )
 
         importer = USDM4M11()
-        wrapper: Wrapper = importer.from_docx(self.full_path, use_ai=True)
+        with self.timing.stage("convert"):
+            wrapper: Wrapper = importer.from_docx(self.full_path, use_ai=True)
         application_logger.info(importer.errors.dump(sel.Errors.DEBUG))
         if wrapper:
             self.usdm = wrapper.to_json()
@@ -182,7 +203,8 @@ class ImportM11(ImportProcessorBase):
 class ImportCPT(ImportProcessorBase):
     async def process(self) -> bool:
         importer = USDM4CPT()
-        wrapper: Wrapper = importer.from_docx(self.full_path)
+        with self.timing.stage("convert"):
+            wrapper: Wrapper = importer.from_docx(self.full_path)
         application_logger.info(importer.errors.dump(sel.Errors.DEBUG))
         if wrapper:
             self.usdm = wrapper.to_json()
@@ -209,7 +231,8 @@ class ImportLegacy(ImportProcessorBase):
 class ImportFhirPRISM2(ImportProcessorBase):
     async def process(self) -> bool:
         importer = M11()
-        wrapper: Wrapper = await importer.from_message(self.full_path, M11.PRISM2)
+        with self.timing.stage("convert"):
+            wrapper: Wrapper = await importer.from_message(self.full_path, M11.PRISM2)
         application_logger.info(importer.errors.dump(sel.Errors.DEBUG))
         if wrapper:
             self.usdm = wrapper.to_json()
@@ -228,7 +251,8 @@ class ImportFhirPRISM2(ImportProcessorBase):
 class ImportFhirPRISM3(ImportProcessorBase):
     async def process(self) -> bool:
         importer = M11()
-        wrapper: Wrapper = await importer.from_message(self.full_path, M11.PRISM3)
+        with self.timing.stage("convert"):
+            wrapper: Wrapper = await importer.from_message(self.full_path, M11.PRISM3)
         application_logger.info(importer.errors.dump(sel.Errors.DEBUG))
         if wrapper:
             self.usdm = wrapper.to_json()
@@ -260,7 +284,8 @@ class ImportUSDM4(ImportProcessorBase):
         full_path, filename, exists = data_files.path("usdm")
         self.usdm = data_files.read("usdm")
         usdm4 = _usdm4()
-        results: RulesValidationResults = usdm4.validate(full_path)
+        with self.timing.stage("validate"):
+            results: RulesValidationResults = usdm4.validate(full_path)
         self.errors = results.to_dict()
         # Best-effort parameter extraction; if the file is malformed
         # enough that the wrapper can't surface a sponsor / title /
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import threading
+
+from d4k_ms_base.logger import application_logger
+
+from app.configuration.configuration import application_configuration
+from app.database.database import SessionLocal
+from app.database.import_job import ImportJob
+from app.database.job_owner import new_owner
+from app.database.user import User
+from app.imports.import_manager import ImportManager
+
+
+class ImportQueue:
+    """Bounded, persistent worker pool for imports.
+
+    Each upload is recorded as an ``ImportJob`` row and then picked up by
+    a worker thread once fewer than the configured number of imports of
+    that type are running. Jobs live in SQLite, so a restart loses
+    nothing: ``recover`` puts jobs orphaned by the previous process back
+    on the queue. Outcome notifications still come from
+    ``ImportManager.process`` via the connection manager.
+
+    Several processes can share the queue. Each claims a job atomically
+    and records itself as the job's owner, renewing a heartbeat every
+    ``HEARTBEAT_SECONDS`` while it runs. A job is only recovered when
+    its owner has gone: an earlier process with this pid, a process of
+    this host no longer running, or any owner whose heartbeat is older
+    than ``STALE_SECONDS``. Recovery runs at startup and with each
+    heartbeat, so jobs of a process that died are picked up by another.
+    """
+
+    WAIT_SAMPLE = 100
+    HEARTBEAT_SECONDS = 15
+    STALE_SECONDS = 90
+
+    def __init__(self, workers: int, workers_by_type: dict[str, int]):
+        self.workers = workers
+        self.workers_by_type = workers_by_type
+        self.completed = 0
+        self._running: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._owner = None
+        self._owner_pid = None
+        self._heartbeat = None
+        self._stop = threading.Event()
+
+    @property
+    def owner(self) -> str:
+        # Per process, including one forked after this was created.
+        if self._owner_pid != os.getpid():
+            self._owner_pid = os.getpid()
+            self._owner = new_owner()
+        return self._owner
+
+    def limit(self, type: str) -> int:
+        return max(self.workers_by_type.get(type, self.workers), 1)
+
+    def enqueue(self, import_manager: ImportManager, batch_id: int = None) -> int:
+        session = SessionLocal()
+        try:
+            job = ImportJob.create(
+                import_manager.uuid,
+                import_manager.type,
+                import_manager.main_full_path,
+                import_manager.original_filename,
+                import_manager.user.id,
+                session,
+                batch_id,
+            )
+        finally:
+            session.close()
+        application_logger.info(
+            f"Import job '{job.id}' queued for '{job.filename}' ({job.type})"
+        )
+        self.dispatch()
+        return job.id
+
+    def recover(self) -> int:
+        jobs = self._recover()
+        self._start_heartbeat()
+        self.dispatch()
+        return len(jobs)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def dispatch(self) -> None:
+        session = SessionLocal()
+        try:
+            with self._lock:
+                for type in ImportJob.queued_counts(session):
+                    while self._running.get(type, 0) < self.limit(type):
+                        job = ImportJob.claim_next(type, session, self.owner)
+                        if not job:
+                            break
+                        self._running[type] = self._running.get(type, 0) + 1
+                        t = threading.Thread(target=self._run, args=(job,), daemon=True)
+                        t.start()
+        except Exception as e:
+            application_logger.exception("Exception dispatching import jobs", e)
+        finally:
+            session.close()
+
+    def metrics(self) -> dict:
+        session = SessionLocal()
+        try:
+            queued = ImportJob.queued_counts(session)
+            waits = ImportJob.wait_times(self.WAIT_SAMPLE, session)
+        finally:
+            session.close()
+        with self._lock:
+            running = {k: v for k, v in self._running.items() if v}
+        types = sorted(set(queued) | set(running) | set(self.workers_by_type))
+        return {
+            "workers": {type: self.limit(type) for type in types},
+            "default_workers": self.workers,
+            "queued": queued,
+            "queue_depth": sum(queued.values()),
+            "running": running,
+            "completed": self.completed,
+            "wait_seconds": {
+                "sample": len(waits),
+                "mean": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "max": round(max(waits), 3) if waits else 0.0,
+            },
+        }
+
+    def _recover(self) -> list[ImportJob]:
+        session = SessionLocal()
+        try:
+            jobs = ImportJob.recover(self.owner, self.STALE_SECONDS, session)
+        finally:
+            session.close()
+        for job in jobs:
+            application_logger.info(
+                f"Import job '{job.id}' for '{job.filename}' requeued, "
+                "the process running it has gone"
+            )
+        return jobs
+
+    def _start_heartbeat(self) -> None:
+        with self._lock:
+            if self._heartbeat:
+                return
+            self._heartbeat = threading.Thread(
+                target=self._beat, name="import-heartbeat", daemon=True
+            )
+            self._heartbeat.start()
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.HEARTBEAT_SECONDS):
+            try:
+                session = SessionLocal()
+                try:
+                    ImportJob.renew(self.owner, session)
+                finally:
+                    session.close()
+                if self._recover():
+                    self.dispatch()
+            except Exception as e:
+                application_logger.exception("Exception in the import heartbeat", e)
+
+    def _run(self, job: ImportJob) -> None:
+        session = SessionLocal()
+        try:
+            user = User.find(job.user_id, session)
+            import_manager = ImportManager.restore(
+                user, job.type, job.uuid, job.filepath, job.filename
+            )
+            asyncio.run(import_manager.process())
+        except Exception as e:
+            application_logger.exception(
+                f"Exception running import job '{job.id}' for '{job.filename}'", e
+            )
+        finally:
+            try:
+                job.update_status(ImportJob.COMPLETE, session)
+            except Exception as e:
+                application_logger.exception(
+                    f"Exception completing import job '{job.id}'", e
+                )
+            session.close()
+            with self._lock:
+                self._running[job.type] -= 1
+                self.completed += 1
+        self.dispatch()
+
+
+import_queue = ImportQueue(
+    application_configuration.import_workers,
+    application_configuration.import_workers_by_type,
+)
@@ -0,0 +1,102 @@
+import datetime
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from d4k_ms_base.logger import application_logger
+from sqlalchemy.orm import Session
+
+from app.database.import_stage import ImportStage
+
+
+class MemorySampler:
+    """Samples the resident memory of the process on a thread of its own
+    until stopped, keeping the peak.
+
+    The memory is the whole process's, so imports running at the same
+    time share their peaks. ``peak`` is None where the resident size
+    cannot be read (anywhere without ``/proc``)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.peak = self.rss()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self.peak is None:
+            return
+        self._thread = threading.Thread(
+            target=self._sample, name="import-memory", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> int | None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._update()
+        return self.peak
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._update()
+
+    def _update(self) -> None:
+        rss = self.rss()
+        if rss is not None:
+            self.peak = max(self.peak, rss)
+
+    @staticmethod
+    def rss() -> int | None:
+        try:
+            with open("/proc/self/statm") as f:
+                pages = int(f.read().split()[1])
+            return pages * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+
+class ImportTiming:
+    """Start, finish, duration and peak memory of the stages of one
+    import, saved against its ``FileImport`` as ``ImportStage`` rows.
+
+    The import manager and the import processors mark their stages with
+    ``with timing.stage(name):``. A stage that raises is still
+    recorded."""
+
+    SAMPLE_SECONDS = 0.05
+
+    def __init__(self):
+        self.stages: list[dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        sampler = MemorySampler(self.SAMPLE_SECONDS)
+        sampler.start()
+        started = datetime.datetime.now(datetime.timezone.utc)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stages.append(
+                {
+                    "name": name,
+                    "started": started,
+                    "finished": datetime.datetime.now(datetime.timezone.utc),
+                    "seconds": seconds,
+                    "peak_memory": sampler.stop(),
+                }
+            )
+
+    def save(self, import_id: int, session: Session) -> None:
+        # The timings are for information, so never fail the import.
+        try:
+            ImportStage.create(import_id, self.stages, session)
+        except Exception as e:
+            session.rollback()
+            application_logger.exception(
+                f"Exception saving the stage timings of import '{import_id}'", e
+            )
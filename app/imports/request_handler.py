@@ -2,7 +2,8 @@ from d4k_ms_base.logger import application_logger
 from fastapi import Request
 
 from app.imports.form_handler import FormHandler
-from app.imports.import_manager import ImportManager, execute_import
+from app.imports.import_manager import ImportManager
+from app.imports.import_queue import import_queue
 
 
 class RequestHandler:
@@ -18,13 +19,14 @@ class RequestHandler:
                 import_manager.images,
                 import_manager.main_file_ext,
                 self.source,
+                stream=True,
             )
             main_file, image_files, messages = await form_handler.get_files()
             uuid = import_manager.save_files(
                 main_file, image_files, form_handler.extra_files
             )
             if uuid:
-                execute_import(import_manager)
+                import_queue.enqueue(import_manager)
                 return templates.TemplateResponse(
                     request,
                     "import/partials/upload_success.html",
@@ -43,7 +45,7 @@ class RequestHandler:
                     request,
                     "import/partials/upload_fail.html",
                     {
-                        "filename": main_file["filename"],
+                        "filename": main_file["filename"] if main_file else "",
                         "messages": messages,
                         "type": self.type,
                     },
@@ -1,21 +1,23 @@
 import json
 import os
 import traceback
+from contextlib import asynccontextmanager
 
 from d4k_ms_base.logger import application_logger
+from d4k_ms_ui.pagination import Pagination
 from fastapi import (
     Depends,
     FastAPI,
     Form,
+    Query,
     Request,
     WebSocket,
     WebSocketDisconnect,
     status,
 )
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
-from usdm4.data_store.data_store import DataStore
 
 from app import SYSTEM_NAME, VERSION
 from app.configuration.configuration import application_configuration
@@ -23,9 +25,12 @@ from app.database.database import get_db
 from app.database.database_manager import DatabaseManager as DBM
 from app.database.endpoint import Endpoint
 from app.database.file_import import FileImport
+from app.database.import_batch import ImportBatch
+from app.database.import_job import ImportJob
 from app.database.study import Study
 from app.database.user import User
 from app.database.user_endpoint import UserEndpoint
+from app.database.validation_job import ValidationJob
 from app.database.version import Version
 from app.dependencies.dependency import (
     protect_endpoint,
@@ -33,7 +38,11 @@ from app.dependencies.dependency import (
 )
 from app.dependencies.fhir_version import check_fhir_version
 from app.dependencies.templates import templates
-from app.dependencies.utility import admin_role_enabled, user_details
+from app.dependencies.utility import (
+    admin_role_enabled,
+    download_response,
+    user_details,
+)
 from app.model.connection_manager import connection_manager
 from app.model.email_auth import (
     generate_code,
@@ -41,11 +50,18 @@ from app.model.email_auth import (
     send_registration_notification,
     verify_code,
 )
+from app.imports.batch_handler import batch_progress
+from app.imports.import_queue import import_queue
 from app.model.exceptions import FindException
+from app.model.export_cache import export_stats
+from app.model.file_handling.blob_store import blob_store
 from app.model.file_handling.data_files import DataFiles
 from app.model.file_handling.local_files import LocalFiles
 from app.model.file_handling.pfda_files import PFDAFiles
-from app.model.unified_diff.unified_diff import UnifiedDiff
+from app.model.startup import startup
+from app.model.usdm_cache import usdm_cache
+from app.model.usdm_diff import USDMDiff
+from app.model.usdm_explorer import USDMExplorer
 from app.model.usdm_json import USDMJson
 from app.routers import (
     help,
@@ -59,18 +75,53 @@ from app.routers import (
     versions,
 )
 from app.utility.fhir_transmit import run_fhir_m11_transmit
+from app.utility.outbound_http import outbound_http
+from app.utility.render_pool import render_pool
+from app.utility.request_timing import request_timing
+from app.validation.validation_cache import validation_cache
+from app.validation.validation_queue import validation_queue
+
+
+def _check_files() -> None:
+    DataFiles.clean_and_tidy()
+    DataFiles.check()
+    LocalFiles.check()
+
+
+def _check_database() -> None:
+    database_manager = DBM()
+    try:
+        database_manager.check()
+        database_manager.migrate()
+    finally:
+        database_manager.session.close()
+
+
+def _recover_jobs() -> None:
+    import_queue.recover()
+    validation_queue.recover()
+
+
+startup.step("files", _check_files)
+startup.step("database", _check_database)
+startup.step("recover", _recover_jobs)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.start()
+    yield
+    import_queue.stop()
+    validation_queue.stop()
+    await outbound_http.close()
+    await connection_manager.close()
 
-DataFiles.clean_and_tidy()
-DataFiles.check()
-LocalFiles.check()
-database_manager = DBM()
-database_manager.check()
-database_manager.migrate()
 
 app = FastAPI(
     title=SYSTEM_NAME,
     description="d4k Study Definitions Workbench. The Swiss Army Knife for DDF / USDM Study Definitions",
     version=VERSION,
+    lifespan=lifespan,
 )
 
 application_logger.set_level(application_logger.DEBUG)
@@ -132,6 +183,36 @@ async def exception_callback_find(
     )
 
 
+@app.middleware("http")
+async def wait_for_startup(request: Request, call_next):
+    # Hold requests until the database is migrated; the readiness check
+    # and static files are answered straight away.
+    if not request.url.path.startswith(("/ready", "/metrics", "/static")):
+        if not await startup.wait():
+            return JSONResponse(startup.status(), status_code=503)
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def time_request(request: Request, call_next):
+    if not request_timing.enabled:
+        return await call_next(request)
+    timer = request_timing.begin()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        header = request_timing.end(
+            timer,
+            request.method,
+            request_timing.route(request.scope),
+            status_code,
+        )
+    response.headers["Server-Timing"] = header
+    return response
+
+
 dir_path = os.path.dirname(os.path.realpath(__file__))
 static_path = os.path.join(dir_path, "static")
 app.mount("/static", StaticFiles(directory=static_path), name="static")
@@ -148,6 +229,25 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):  # pragma: no
         connection_manager.disconnect(user_id, websocket)
 
 
+@app.websocket("/import/batch/{id}/progress")
+async def import_batch_websocket(websocket: WebSocket, id: int):  # pragma: no cover
+    await batch_progress(websocket, id)
+
+
+@app.get("/ready")
+def ready():
+    return JSONResponse(startup.status(), status_code=200 if startup.ready else 503)
+
+
+@app.get("/metrics")
+def metrics():
+    if not request_timing.enabled:
+        return PlainTextResponse("Request timing is disabled", status_code=404)
+    return PlainTextResponse(
+        request_timing.prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/")
 def home(request: Request):
     response = templates.TemplateResponse(
@@ -304,8 +404,12 @@ async def get_version_usdm_view(
     request: Request, id: int, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
-    data = {"version": usdm.study_version(), "version_id": id, "json": usdm._get_raw()}
+    usdm = await render_pool.run(USDMJson, id, session)
+    data = {
+        "version": usdm.study_version(),
+        "version_id": id,
+        "json": await render_pool.run(usdm._get_raw),
+    }
     return templates.TemplateResponse(
         request, "study_versions/usdm.html", {"user": user, "data": data}
     )
@@ -316,41 +420,109 @@ async def get_version_usdm_explore(
     request: Request, id: int, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
-    version = Version.find(id, session)
-    file_import = FileImport.find(version.import_id, session)
-    files = DataFiles(file_import.uuid)
-    fullpath, filename, exists = files.path("usdm")
-    datastore = DataStore(fullpath)
-    datastore.decompose()
-    datastore._klasses.pop("Wrapper")
-    raw_json = json.dumps(datastore._klasses)
-    data = {"version": usdm.study_version(), "version_id": id, "json": raw_json}
+    usdm = await render_pool.run(USDMJson, id, session)
+    data = {"version": usdm.study_version(), "version_id": id}
     return templates.TemplateResponse(
         request, "study_versions/usdm_explore.html", {"user": user, "data": data}
     )
 
 
+@app.get("/versions/{id}/usdmExplore/classes", dependencies=[Depends(protect_endpoint)])
+async def get_version_usdm_explore_classes(
+    request: Request, id: int, session: Session = Depends(get_db)
+):
+    explorer = await render_pool.run(_usdm_explorer, id, session)
+    return await render_pool.run(explorer.classes)
+
+
+@app.get(
+    "/versions/{id}/usdmExplore/classes/{klass}",
+    dependencies=[Depends(protect_endpoint)],
+)
+async def get_version_usdm_explore_class(
+    request: Request,
+    id: int,
+    klass: str,
+    page: int = 1,
+    size: int = 100,
+    filter: str = "",
+    session: Session = Depends(get_db),
+):
+    explorer = await render_pool.run(_usdm_explorer, id, session)
+    data = await render_pool.run(explorer.instances, klass, page, size, filter)
+    if data is None:
+        return JSONResponse({"error": f"Class '{klass}' not found"}, status_code=404)
+    return data
+
+
+@app.get(
+    "/versions/{id}/usdmExplore/instances", dependencies=[Depends(protect_endpoint)]
+)
+async def get_version_usdm_explore_instances(
+    request: Request,
+    id: int,
+    ids: list[str] = Query(default=[]),
+    session: Session = Depends(get_db),
+):
+    explorer = await render_pool.run(_usdm_explorer, id, session)
+    return {"items": await render_pool.run(explorer.lookup, ids)}
+
+
 @app.get("/versions/{id}/usdmDiff", dependencies=[Depends(protect_endpoint)])
 async def get_version_usdm_diff(
     request: Request, id: int, previous: int, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    curr_usdm = USDMJson(id, session)
-    prev_usdm = USDMJson(previous, session)
-    curr_lines = curr_usdm._get_raw().split("\n")
-    prev_lines = prev_usdm._get_raw().split("\n")
-    diff = UnifiedDiff(prev_lines, curr_lines)
+    curr_usdm, diff = await render_pool.run(_usdm_diff, id, previous, session)
     data = {
         "version": curr_usdm.study_version(),
         "version_id": id,
-        "diff": diff.to_html(),
+        "previous": previous,
+        "entities": diff["entities"],
+        "totals": diff["totals"],
+        "summary": diff["summary"],
+        "page": 1,
+        "size": 20,
+        "filter": "",
     }
     return templates.TemplateResponse(
         request, "study_versions/diff.html", {"user": user, "data": data}
     )
 
 
+@app.get("/versions/{id}/usdmDiff/data", dependencies=[Depends(protect_endpoint)])
+async def get_version_usdm_diff_data(
+    request: Request,
+    id: int,
+    previous: int,
+    page: int,
+    size: int,
+    filter: str = "",
+    session: Session = Depends(get_db),
+):
+    user, present_in_db = user_details(request, session)
+    _, diff = await render_pool.run(_usdm_diff, id, previous, session)
+    data = USDMDiff.page(diff, page, size, filter)
+    pagination = Pagination(
+        data, f"/versions/{id}/usdmDiff/data", params={"previous": previous}
+    )
+    return templates.TemplateResponse(
+        request,
+        "study_versions/partials/diff.html",
+        {"user": user, "pagination": pagination, "data": data},
+    )
+
+
+def _usdm_explorer(id: int, session: Session) -> USDMExplorer:
+    return USDMJson(id, session).explorer()
+
+
+def _usdm_diff(id: int, previous: int, session: Session) -> tuple[USDMJson, dict]:
+    curr_usdm = USDMJson(id, session)
+    prev_usdm = USDMJson(previous, session)
+    return curr_usdm, curr_usdm.diff(prev_usdm)
+
+
 @app.get(
     "/versions/{version_id}/studyDesigns/{study_design_id}/summary",
     dependencies=[Depends(protect_endpoint)],
@@ -362,7 +534,7 @@ async def get_study_design_summary(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = {"id": version_id, "study_design_id": study_design_id, "m11": usdm.m11}
     return templates.TemplateResponse(
         request, "study_designs/summary.html", {"user": user, "data": data}
@@ -380,7 +552,7 @@ async def get_study_design_o_parameters(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.study_design_overall_parameters(study_design_id)
     # print(f"OVERALL SUMMARY DATA: {data}")
     return templates.TemplateResponse(
@@ -401,7 +573,7 @@ async def get_study_design_d_parameters(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.study_design_design_parameters(study_design_id)
     # print(f"DESIGN PARAMETERS DATA: {data}")
     return templates.TemplateResponse(
@@ -422,7 +594,7 @@ async def get_study_design_schema(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.study_design_schema(study_design_id)
     # print(f"SCHEMA DATA: {data}")
     return templates.TemplateResponse(
@@ -441,7 +613,7 @@ async def get_study_design_interventions(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.study_design_interventions(study_design_id)
     # print(f"INTERVENTION DATA: {data}")
     return templates.TemplateResponse(
@@ -462,7 +634,7 @@ async def get_study_design_estimands(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.study_design_estimands(study_design_id)
     # print(f"ESTIMAND DATA: {data}")
     return templates.TemplateResponse(
@@ -475,7 +647,7 @@ async def get_version_safety(
     request: Request, id: int, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     data = {
         "version": usdm.study_version(),
         "endpoints": User.endpoints_page(1, 100, user.id, session),
@@ -497,7 +669,7 @@ async def get_study_design_safety(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = {"id": version_id, "study_design_id": study_design_id, "m11": usdm.m11}
     return templates.TemplateResponse(
         request, "study_designs/safety.html", {"user": user, "data": data}
@@ -515,7 +687,7 @@ async def get_study_design_ae_special_interest(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.adverse_events_special_interest(study_design_id)
     # print(f"AE SPECIAL INTEREST DATA: {data}")
     return templates.TemplateResponse(
@@ -536,7 +708,7 @@ async def get_study_design_safety_assessments(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.safety_assessments(study_design_id)
     # print(f"SAFETY ASSESSMENT DATA: {data}")
     return templates.TemplateResponse(
@@ -551,7 +723,7 @@ async def get_version_statistics(
     request: Request, id: int, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     data = {
         "version": usdm.study_version(),
         "endpoints": User.endpoints_page(1, 100, user.id, session),
@@ -573,7 +745,7 @@ async def get_study_design_statistics(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = {"id": version_id, "study_design_id": study_design_id, "m11": usdm.m11}
     return templates.TemplateResponse(
         request, "study_designs/statistics.html", {"user": user, "data": data}
@@ -591,7 +763,7 @@ async def get_study_design_sample_size(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.sample_size(study_design_id)
     # print(f"SAMPLE SIZE DATA: {data}")
     return templates.TemplateResponse(
@@ -610,7 +782,7 @@ async def get_study_design_analysis_sets(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.analysis_sets(study_design_id)
     # print(f"ANALYSIS SETS DATA: {data}")
     return templates.TemplateResponse(
@@ -631,7 +803,7 @@ async def get_study_design_analysis_obj(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     data = usdm.analysis_objectives(study_design_id)
     # print(f"ANALYSIS OBJECTIVES DATA: {data}")
     return templates.TemplateResponse(
@@ -646,15 +818,13 @@ async def export_fhir(
     request: Request, id: int, version: str, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     valid, description = check_fhir_version(version)
     application_logger.info(f"FHIR export requested, version '{version}'")
     if valid:
-        full_path, filename, media_type = usdm.fhir(version)
+        full_path, filename, media_type = await render_pool.run(usdm.fhir, version)
         if full_path:
-            return FileResponse(
-                path=full_path, filename=filename, media_type=media_type
-            )
+            return download_response(request, full_path, filename, media_type)
         else:
             return templates.TemplateResponse(
                 request,
@@ -714,14 +884,10 @@ async def version_transmit(
 async def export_json(request: Request, id: int, session: Session = Depends(get_db)):
     user, present_in_db = user_details(request, session)
     application_logger.info("EXPORT JSON")
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     full_path, filename, media_type = usdm.json()
     if full_path:
-        response = FileResponse(
-            path=full_path, filename=filename, media_type=media_type
-        )
-        response.headers["Cache-Control"] = "no-store"
-        return response
+        return download_response(request, full_path, filename, media_type)
     else:
         return templates.TemplateResponse(
             request,
@@ -771,6 +937,23 @@ async def database_debug(request: Request, session: Session = Depends(get_db)):
         data["imports"] = json.dumps(FileImport.debug(session), indent=2)
         data["endpoints"] = json.dumps(Endpoint.debug(session), indent=2)
         data["user_endpoints"] = json.dumps(UserEndpoint.debug(session), indent=2)
+        data["usdm_cache"] = json.dumps(usdm_cache.stats(), indent=2)
+        data["import_queue"] = json.dumps(import_queue.metrics(), indent=2)
+        data["import_jobs"] = json.dumps(ImportJob.debug(session), indent=2)
+        data["import_batches"] = json.dumps(ImportBatch.debug(session), indent=2)
+        data["validation_jobs"] = json.dumps(ValidationJob.debug(session), indent=2)
+        data["validation_cache"] = json.dumps(validation_cache.stats(), indent=2)
+        data["render_pool"] = json.dumps(render_pool.metrics(), indent=2)
+        data["export_cache"] = json.dumps(export_stats.stats(), indent=2)
+        data["outbound_http"] = json.dumps(outbound_http.metrics(), indent=2)
+        data["import_reuse"] = json.dumps(
+            {
+                "imports": FileImport.reuse_report(session),
+                "blobs": blob_store.report(application_configuration.data_file_path),
+            },
+            indent=2,
+        )
+        data["notifications"] = json.dumps(connection_manager.stats(), indent=2)
         response = templates.TemplateResponse(
             request, "database/debug.html", {"user": user, "data": data}
         )
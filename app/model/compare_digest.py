@@ -0,0 +1,151 @@
+import hashlib
+import json
+from importlib.metadata import PackageNotFoundError, version
+
+from d4k_ms_base.logger import application_logger
+from simple_error_log import Errors
+
+from app import VERSION
+from app.model.file_handling.data_files import DataFiles
+from app.utility.lazy_import import LazyImport
+
+USDM4 = LazyImport("usdm4", "USDM4")
+DataView = LazyImport("usdm4_protocol.m11.views.data_view", "DataView")
+
+
+class CompareDigest:
+    """The parts of a version shown by the multi-study compare view.
+
+    Comparing studies needs, per study, the M11 title page, the
+    inclusion and exclusion criteria of each design, the M11 section
+    list, the sponsor identifier and the import type. Building those
+    means loading the full USDM wrapper and the M11 data view, so they
+    are worked out once, when the version is imported, and saved as a
+    small JSON file in the version's data file dir. Versions imported
+    before the digest existed get one the first time they are compared.
+
+    The file name carries a hash of ``ENGINE``, the ``usdm4`` and
+    ``usdm4_protocol`` versions and the application version, so an
+    upgrade of any of them builds the digest afresh.
+    """
+
+    ENGINE = "1"
+    PREFIX = "compare-digest-"
+
+    def __init__(self, files: DataFiles):
+        self._files = files
+
+    def get(self, import_type: str) -> dict:
+        digest = self._read()
+        if digest is None:
+            digest = self.build(self.wrapper(), import_type)
+            self.save(digest)
+        return digest
+
+    def save(self, digest: dict) -> None:
+        filename = self._filename()
+        full_path, _ = self._files.save(
+            "compare-digest", json.dumps(digest, default=str), filename
+        )
+        if full_path:
+            self._files.delete_files(self.PREFIX, keep=filename)
+
+    @classmethod
+    def build(cls, wrapper, import_type: str) -> dict:
+        study_version = wrapper.first_version()
+        ie_map = study_version.eligibility_critieria_item_map()
+        return {
+            "engine": cls.ENGINE,
+            "import_type": import_type,
+            "sponsor_id": study_version.sponsor_identifier_text(),
+            "title_page": DataView(wrapper, Errors()).title_page(),
+            "inclusion": [
+                {
+                    "design": sd.label or sd.name,
+                    "criteria": cls._criteria(sd.inclusion_criteria(ie_map)),
+                }
+                for sd in study_version.studyDesigns
+            ],
+            "exclusion": [
+                {
+                    "design": sd.label or sd.name,
+                    "criteria": cls._criteria(sd.exclusion_criteria(ie_map)),
+                }
+                for sd in study_version.studyDesigns
+            ],
+            "sections": cls.sections(wrapper.study_document_version("M11")),
+        }
+
+    @staticmethod
+    def sections(sddv) -> list[dict]:
+        """Number, title and level of each section of an M11 document
+        version, in document order, without the title page (section
+        "0") and sections lacking a number. None gives none."""
+        result = []
+        if not sddv:
+            return result
+        for nc in sddv.narrative_content_in_order():
+            number = (nc.sectionNumber or "").strip()
+            if not number or number == "0":
+                continue
+            result.append(
+                {"number": number, "title": nc.sectionTitle or "", "level": nc.level()}
+            )
+        return result
+
+    @classmethod
+    def _criteria(cls, criteria: list) -> list[dict]:
+        # Only what the compare view shows of each criterion.
+        return [
+            {
+                "identifier": cls._value(x, "identifier"),
+                "criterionItem": {
+                    "text": cls._value(cls._value(x, "criterionItem"), "text")
+                },
+            }
+            for x in criteria
+        ]
+
+    @staticmethod
+    def _value(item, name: str):
+        if isinstance(item, dict):
+            return item.get(name)
+        return getattr(item, name, None)
+
+    def wrapper(self):
+        """The version's USDM loaded from its file."""
+        data = json.loads(self._files.read("usdm"))
+        return USDM4().loadd(data, Errors())
+
+    def _read(self) -> dict | None:
+        filename = self._filename()
+        try:
+            full_path, exists = self._files.named_path(filename)
+            if not exists:
+                return None
+            with open(full_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            application_logger.exception(
+                f"Exception reading compare digest '{filename}'", e
+            )
+            return None
+
+    @classmethod
+    def _filename(cls) -> str:
+        key = ":".join(
+            [
+                cls.ENGINE,
+                f"usdm4-{cls._package_version('usdm4')}",
+                f"usdm4_protocol-{cls._package_version('usdm4_protocol')}",
+                f"app-{VERSION}",
+            ]
+        )
+        return f"{cls.PREFIX}{hashlib.sha256(key.encode()).hexdigest()[:16]}.json"
+
+    @staticmethod
+    def _package_version(name: str) -> str:
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            return "unknown"
@@ -1,69 +1,277 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
 from d4k_ms_base.logger import application_logger
 from fastapi import WebSocket
 
+from app.configuration.configuration import application_configuration
+
+
+class NotificationBroker:
+    """SQLite table carrying notifications between worker processes.
+
+    Every worker process publishes the notifications raised in it to
+    the table and reads back, in id order, those published by any
+    worker since it last looked, so a notification reaches the user's
+    sockets whichever worker they are connected to. Rows are kept for
+    ``RETAIN_SECONDS``.
+    """
+
+    RETAIN_SECONDS = 60
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS notification (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created REAL NOT NULL,
+                    user_id TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    message TEXT NOT NULL
+                )
+                """
+            )
+
+    def publish(self, user_id: str, level: str, message: str) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO notification (created, user_id, level, message) VALUES (?, ?, ?, ?)",
+                (time.time(), user_id, level, message),
+            )
+
+    def last_id(self) -> int:
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT MAX(id) FROM notification").fetchone()
+            return row[0] or 0
+
+    def read(self, after: int, limit: int = 500) -> list[tuple]:
+        """(id, user id, level, message) of the notifications after
+        ``after``, oldest first."""
+        with closing(self._connect()) as connection:
+            return connection.execute(
+                "SELECT id, user_id, level, message FROM notification WHERE id > ? ORDER BY id LIMIT ?",
+                (after, limit),
+            ).fetchall()
+
+    def prune(self) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM notification WHERE created < ?",
+                (time.time() - self.RETAIN_SECONDS,),
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections = {}
+    """Notification hub for the alert sockets of the users.
+
+    A user may have any number of sockets open, one per tab, and each
+    gets every notification for the user. The notifications may be
+    raised on any thread and event loop, those of the import, validation
+    and transmission workers included; they are handed over to the loop
+    the sockets were accepted on before being sent.
+
+    With a broker (``NOTIFICATION_BROKER_PATH``) notifications go through
+    it, so they reach the user's sockets in every worker process, each
+    worker polling it every ``poll_seconds``. Without one they are
+    delivered in process, which suits a single worker.
+
+    Bursts are coalesced: the first notification for a user is sent at
+    once, those following within ``COALESCE_SECONDS`` are sent together
+    at the end of that time, repeats shown once with a count and at most
+    ``MAX_ALERTS`` of them.
+    """
+
+    ALL = "*"
+    COALESCE_SECONDS = 0.25
+    MAX_ALERTS = 5
+    SEND_TIMEOUT = 5.0
+    PRUNE_POLLS = 240
+    LEVELS = {
+        "success": ("Success:", "success"),
+        "warning": ("Warning:", "warning"),
+        "error": ("Error:", "danger"),
+    }
+
+    def __init__(self, broker_path: str = "", poll_seconds: float = 0.25):
+        self.active_connections: dict[str, set[WebSocket]] = {}
+        self.poll_seconds = poll_seconds
+        self._broker = NotificationBroker(broker_path) if broker_path else None
+        self._loop = None
+        self._listener = None
+        self._last_id = 0
+        self._pending: dict[str, list[tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        self._counts = {"published": 0, "sent": 0, "coalesced": 0, "dropped": 0}
 
     async def connect(self, user_id: str, websocket: WebSocket):
         await websocket.accept()
-        existing = self.active_connections.get(user_id)
-        if existing is not None and existing is not websocket:
-            try:
-                await existing.close()
-            except Exception:
-                pass
-        self.active_connections[user_id] = websocket
+        self._loop = asyncio.get_running_loop()
+        self.active_connections.setdefault(user_id, set()).add(websocket)
+        if self._broker and self._listener is None:
+            self._last_id = await asyncio.to_thread(self._broker.last_id)
+            self._listener = asyncio.create_task(self._listen())
 
     def disconnect(self, user_id: str, websocket: WebSocket = None):
-        current = self.active_connections.get(user_id)
-        if current is not None and (websocket is None or current is websocket):
+        sockets = self.active_connections.get(user_id)
+        if sockets is None:
+            return
+        if websocket is None:
+            sockets.clear()
+        else:
+            sockets.discard(websocket)
+        if not sockets:
             self.active_connections.pop(user_id)
 
     async def success(self, message: str, user_id: str):
-        websocket = self._get_connection(user_id)
-        if websocket:
-            await websocket.send_text(
-                self._to_html(user_id, "Success:", "success", message)
-            )
+        await self._publish(user_id, "success", message)
 
     async def warning(self, message: str, user_id: str):
-        websocket = self._get_connection(user_id)
-        if websocket:
-            await websocket.send_text(
-                self._to_html(user_id, "Warning:", "warning", message)
-            )
+        await self._publish(user_id, "warning", message)
 
     async def error(self, message: str, user_id: str):
-        websocket = self._get_connection(user_id)
-        if websocket:
-            await websocket.send_text(
-                self._to_html(user_id, "Error:", "danger", message)
-            )
+        await self._publish(user_id, "error", message)
 
     async def broadcast(self, message: str):
-        for user, connection in self.active_connections.items():
-            await self.warning(message, user)
+        await self._publish(self.ALL, "warning", message)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            "users": len(self.active_connections),
+            "sockets": sum(len(x) for x in self.active_connections.values()),
+            "broker": self._broker.path if self._broker else None,
+            **counts,
+        }
 
-    def _get_connection(self, user_id: str) -> WebSocket:
-        if user_id in self.active_connections:
-            return self.active_connections[user_id]
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _publish(self, user_id: str, level: str, message: str):
+        self._count("published")
+        if self._broker:
+            await asyncio.to_thread(self._broker.publish, user_id, level, message)
+            return
+        loop = self._loop
+        if loop is None:
+            self._no_connection(user_id)
+        elif asyncio.get_running_loop() is loop:
+            self._queue(user_id, level, message)
         else:
-            application_logger.error(
-                f"No websocket found for user with id '{user_id}'\nActive websockets: {self.active_connections}"
+            loop.call_soon_threadsafe(self._queue, user_id, level, message)
+
+    async def _listen(self):
+        polls = 0
+        while True:
+            try:
+                rows = await asyncio.to_thread(self._broker.read, self._last_id)
+                for id, user_id, level, message in rows:
+                    self._last_id = id
+                    self._queue(user_id, level, message)
+                polls += 1
+                if polls % self.PRUNE_POLLS == 0:
+                    await asyncio.to_thread(self._broker.prune)
+            except sqlite3.Error as e:
+                application_logger.exception("Exception reading notifications", e)
+            await asyncio.sleep(self.poll_seconds)
+
+    def _queue(self, user_id: str, level: str, message: str):
+        # On the sockets' loop.
+        users = list(self.active_connections) if user_id == self.ALL else [user_id]
+        for user in users:
+            if user not in self.active_connections:
+                if not self._broker:
+                    self._no_connection(user)
+                continue
+            pending = self._pending.get(user)
+            if pending is not None:
+                pending.append((level, message))
+                self._count("coalesced")
+                continue
+            self._pending[user] = []
+            asyncio.get_running_loop().create_task(
+                self._send_user(user, [(level, message)])
+            )
+            asyncio.get_running_loop().call_later(
+                self.COALESCE_SECONDS, self._window_end, user
             )
-            return None
 
-    def _to_html(self, user_id: str, prefix: str, status: str, message: str):
+    def _window_end(self, user_id: str):
+        pending = self._pending.pop(user_id, None)
+        if pending:
+            self._pending[user_id] = []
+            asyncio.get_running_loop().create_task(self._send_user(user_id, pending))
+            asyncio.get_running_loop().call_later(
+                self.COALESCE_SECONDS, self._window_end, user_id
+            )
+
+    async def _send_user(self, user_id: str, alerts: list[tuple[str, str]]):
+        sockets = list(self.active_connections.get(user_id, []))
+        html = self._to_html(user_id, alerts)
+        results = await asyncio.gather(*[self._send(x, html) for x in sockets])
+        for websocket, sent in zip(sockets, results):
+            if sent:
+                self._count("sent")
+            else:
+                self._count("dropped")
+                self.disconnect(user_id, websocket)
+
+    async def _send(self, websocket: WebSocket, html: str) -> bool:
+        try:
+            await asyncio.wait_for(websocket.send_text(html), self.SEND_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    def _no_connection(self, user_id: str):
+        application_logger.error(
+            f"No websocket found for user with id '{user_id}'\nActive websockets: {self.active_connections}"
+        )
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _to_html(self, user_id: str, alerts: list[tuple[str, str]]):
+        counted = {}
+        for alert in alerts:
+            counted[alert] = counted.get(alert, 0) + 1
+        items = list(counted.items())
+        hidden = len(items) - self.MAX_ALERTS
+        html = "".join(
+            self._alert_html(level, message, count)
+            for (level, message), count in items[-self.MAX_ALERTS :]
+        )
+        if hidden > 0:
+            html += f"""
+        <div class="small text-muted">{hidden} earlier notifications not shown</div>"""
+        return f"""
+      <div id="alert_ws_div" hx-ext="ws" ws-connect="/alerts/{user_id}" hx-swap-oob="true">{html}
+      </div>
+    """
+
+    def _alert_html(self, level: str, message: str, count: int) -> str:
+        prefix, status = self.LEVELS[level]
+        repeat = f" (&times;{count})" if count > 1 else ""
         return f"""
-      <div id="alert_ws_div" hx-ext="ws" ws-connect="/alerts/{user_id}" hx-swap-oob="true">
         <div class="alert alert-dismissible alert-{status} mt-3">
           <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
-          <strong>{prefix}</strong>&nbsp;{message}
-        </div>
-      </div> 
-    """
+          <strong>{prefix}</strong>&nbsp;{message}{repeat}
+        </div>"""
 
 
-connection_manager = ConnectionManager()
+connection_manager = ConnectionManager(
+    application_configuration.notification_broker_path,
+    application_configuration.notification_poll_seconds,
+)
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections.abc import Callable
+from importlib.metadata import PackageNotFoundError, version
+from uuid import uuid4
+
+from d4k_ms_base.logger import application_logger
+
+from app import VERSION
+from app.model.file_handling.data_files import DataFiles
+
+
+class ExportStats:
+    """Process-wide counts of export downloads and the time spent
+    generating them, by kind, for the debug page."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds: dict[str, dict] = {}
+        self.not_modified = 0
+
+    def hit(self, kind: str) -> None:
+        with self._lock:
+            self._kind(kind)["hits"] += 1
+
+    def generated(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            counts = self._kind(kind)
+            counts["generated"] += 1
+            counts["seconds"] = round(counts["seconds"] + seconds, 3)
+            counts["max_seconds"] = round(max(counts["max_seconds"], seconds), 3)
+            counts["last_seconds"] = round(seconds, 3)
+
+    def unchanged(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kinds": {k: dict(v) for k, v in self._kinds.items()},
+                "not_modified": self.not_modified,
+            }
+
+    def _kind(self, kind: str) -> dict:
+        return self._kinds.setdefault(
+            kind,
+            {
+                "hits": 0,
+                "generated": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "last_seconds": 0.0,
+            },
+        )
+
+
+class ExportCache:
+    """Generated export files persisted beside a version's USDM.
+
+    The FHIR M11 message, the FHIR SoA message of a timeline and the
+    Excel workbook are all generated from the version's USDM, which
+    does not change after import, yet were generated afresh for every
+    download. Each is now saved in the version's data file dir the
+    first time it is asked for, as
+
+        export-{kind}-{variant}-{key}.{extension}
+
+    where the variant is, for example, the FHIR version or the timeline
+    and the key is a hash of the kind, the variant, the version of the
+    generating package and the application version, so an upgrade of
+    either generates afresh. The file is written to a temporary name
+    and renamed into place, and superseded files for the same kind and
+    variant are removed.
+    """
+
+    PREFIX = "export-"
+
+    def __init__(self, files: DataFiles):
+        self._files = files
+
+    def get(
+        self,
+        kind: str,
+        variant: str,
+        package: str,
+        extension: str,
+        generate: Callable[[str], None],
+    ) -> str:
+        """Full path of the export, calling ``generate`` with the path
+        to write it to if it has not been generated yet."""
+        prefix = f"{self.PREFIX}{kind}-{self._name(variant)}-"
+        filename = f"{prefix}{self._key(kind, variant, package)}.{extension}"
+        full_path, exists = self._files.named_path(filename)
+        if exists:
+            export_stats.hit(kind)
+            return full_path
+        start = time.perf_counter()
+        temp_path = f"{full_path}.{uuid4().hex}.tmp"
+        try:
+            generate(temp_path)
+            os.replace(temp_path, full_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        seconds = time.perf_counter() - start
+        export_stats.generated(kind, seconds)
+        application_logger.info(
+            f"Generated '{filename}' for '{self._files.uuid}' in {seconds:.3f}s"
+        )
+        self._files.delete_files(prefix, keep=filename)
+        return full_path
+
+    @staticmethod
+    def _name(variant: str) -> str:
+        return re.sub(r"[^a-z0-9_]+", "_", variant.lower())
+
+    @classmethod
+    def _key(cls, kind: str, variant: str, package: str) -> str:
+        generator = (
+            f"{kind}:{variant}:{package}-{cls._package_version(package)}:app-{VERSION}"
+        )
+        return hashlib.sha256(generator.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _package_version(name: str) -> str:
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            return "unknown"
+
+
+export_stats = ExportStats()
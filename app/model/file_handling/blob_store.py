@@ -0,0 +1,87 @@
+import os
+from uuid import uuid4
+
+from d4k_ms_base.logger import application_logger
+
+
+class BlobStore:
+    """Uploaded files stored once by content.
+
+    Each file uploaded into a study dir is hard linked, under its
+    SHA-256, into ``blobs/<first two>/<sha256>`` in the data file dir.
+    When the same bytes were uploaded before, the new copy is replaced
+    by a link to the stored blob, so identical uploads take the space of
+    one while every study dir still holds its files under their own
+    names, as the import libraries expect.
+
+    A link is only safe because files in a study dir are never written
+    in place once saved: they are replaced (renamed over, or removed and
+    written again), which leaves the blob and the other links as they
+    were. A blob is removed when the last study dir linking it goes.
+    Where the volume cannot hard link, the copies are kept as they are.
+    """
+
+    DIR = "blobs"
+
+    def share(self, root: str, full_path: str, sha256: str) -> int:
+        """Store the file, whose content has the SHA-256 given, in the
+        blob store under ``root``, or link it to the blob stored before.
+        Returns the bytes saved, zero when it is new."""
+        blob = self.path(root, sha256)
+        try:
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                try:
+                    os.link(full_path, blob)
+                    return 0
+                except FileExistsError:
+                    # Stored by a concurrent upload of the same bytes.
+                    pass
+            if os.path.samefile(blob, full_path):
+                return 0
+            temp_path = f"{full_path}.{uuid4().hex}.tmp"
+            os.link(blob, temp_path)
+            os.replace(temp_path, full_path)
+            return os.path.getsize(blob)
+        except OSError as e:
+            application_logger.info(
+                f"Keeping a copy of '{full_path}', could not link it to the blob store, {e}"
+            )
+            return 0
+
+    def release(self, root: str, sha256: str) -> bool:
+        """Remove the blob if no study dir links it any more."""
+        blob = self.path(root, sha256)
+        try:
+            if os.stat(blob).st_nlink > 1:
+                return False
+            os.remove(blob)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            application_logger.exception(f"Exception releasing blob '{blob}'", e)
+            return False
+
+    def report(self, root: str) -> dict:
+        """The blobs stored, the links to them from study dirs and the
+        bytes those links save over a copy each."""
+        result = {"blobs": 0, "links": 0, "bytes_stored": 0, "bytes_saved": 0}
+        dir = os.path.join(root, self.DIR)
+        if not os.path.isdir(dir):
+            return result
+        for prefix in os.listdir(dir):
+            for entry in os.scandir(os.path.join(dir, prefix)):
+                stat = entry.stat()
+                links = stat.st_nlink - 1
+                result["blobs"] += 1
+                result["links"] += links
+                result["bytes_stored"] += stat.st_size
+                result["bytes_saved"] += stat.st_size * max(links - 1, 0)
+        return result
+
+    def path(self, root: str, sha256: str) -> str:
+        return os.path.join(root, self.DIR, sha256[:2], sha256)
+
+
+blob_store = BlobStore()
@@ -0,0 +1,79 @@
+import gzip
+import io
+
+from d4k_ms_base.logger import application_logger
+
+from app.configuration.configuration import application_configuration
+from app.utility.lazy_import import LazyImport
+
+zstandard = LazyImport("zstandard")
+
+
+class Compression:
+    """The compression of stored data files, named by the file suffix
+    (``usdm.json.gz``, ``usdm.json.zst``), so files written with any
+    setting can be read whatever the current one."""
+
+    GZIP = "gzip"
+    ZSTD = "zstd"
+    EXTENSIONS = {GZIP: ".gz", ZSTD: ".zst"}
+    GZIP_LEVEL = 6
+    ZSTD_LEVEL = 3
+
+    @classmethod
+    def configured(cls) -> str | None:
+        """The compression new files are written with, None for none."""
+        value = application_configuration.datafile_compression
+        if not value:
+            return None
+        if value == cls.ZSTD and not cls.zstd_available():
+            application_logger.error(
+                "DATAFILE_COMPRESSION is 'zstd' but zstandard is not installed, using gzip"
+            )
+            return cls.GZIP
+        if value not in cls.EXTENSIONS:
+            application_logger.error(
+                f"Unknown DATAFILE_COMPRESSION '{value}', storing uncompressed"
+            )
+            return None
+        return value
+
+    @classmethod
+    def of(cls, path: str) -> str | None:
+        """The compression of a stored file, from its suffix."""
+        for name, extension in cls.EXTENSIONS.items():
+            if path.endswith(extension):
+                return name
+        return None
+
+    @classmethod
+    def suffix(cls, compression: str | None) -> str:
+        return cls.EXTENSIONS[compression] if compression else ""
+
+    @classmethod
+    def open(cls, path: str, mode: str, compression: str | None = None):
+        """Open a file as ``open`` does, through the compression given or,
+        when reading, that of the file."""
+        if compression is None and "r" in mode:
+            compression = cls.of(path)
+        if compression is None:
+            if "b" in mode:
+                return open(path, mode)
+            return open(path, mode, encoding="utf-8")
+        raw = f"{mode.replace('t', '').replace('b', '')}b"
+        if compression == cls.GZIP:
+            stream = gzip.open(path, raw, compresslevel=cls.GZIP_LEVEL)
+        elif "r" in raw:
+            stream = zstandard.open(path, raw)
+        else:
+            stream = zstandard.open(
+                path, raw, cctx=zstandard.ZstdCompressor(level=cls.ZSTD_LEVEL)
+            )
+        return stream if "b" in mode else io.TextIOWrapper(stream, encoding="utf-8")
+
+    @staticmethod
+    def zstd_available() -> bool:
+        try:
+            return zstandard.ZstdCompressor is not None
+        except ImportError:
+            return False
@@ -1,19 +1,47 @@
 import csv
+import datetime
+import hashlib
 import json
 import os
 import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 from uuid import uuid4
 
 import yaml
 from d4k_ms_base.logger import application_logger
 
 from app.configuration.configuration import application_configuration
+from app.model.file_handling.blob_store import blob_store
+from app.model.file_handling.compression import Compression
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
 
 
 class DataFiles:
     class LogicError(Exception):
         pass
 
+    CHUNK_SIZE = 1024 * 1024
+    # Types stored with the configured compression. The others are
+    # opened by path elsewhere, so are always stored plain.
+    COMPRESSED = ["usdm", "validation"]
+    # Uncompressed copies of compressed files, for consumers needing a
+    # path, one dir per study. Kept off the data volume.
+    EXPANDED_DIR = os.path.join(tempfile.gettempdir(), "sdw-expanded")
+    # Index of the files saved in a study dir, by media type, so that
+    # finding them needs no directory scans or stats. See ``manifest``.
+    MANIFEST = ".manifest"
+    # Held, by the instances of every process, while the manifest is
+    # read, changed and written back.
+    MANIFEST_LOCK = ".manifest.lock"
+    _manifest_lock = threading.Lock()
+    _source_lock = threading.Lock()
+
     def __init__(self, uuid=None):
         self.media_type = {
             "xlsx": {
@@ -100,6 +128,12 @@ class DataFiles:
                 "filename": "m11_validation",
                 "extension": "json",
             },
+            "validation": {
+                "method": self._save_json_file,
+                "use_original": False,
+                "filename": "validation",
+                "extension": "json",
+            },
             "cpt-protocol": {
                 "method": self._save_html_file,
                 "use_original": False,
@@ -112,6 +146,36 @@ class DataFiles:
                 "filename": "other-protocol",
                 "extension": "html",
             },
+            "rendered-protocol": {
+                "method": self._save_rendered_file,
+                "use_original": True,
+                "filename": "",
+                "extension": "html",
+            },
+            "rendered-annotation": {
+                "method": self._save_rendered_file,
+                "use_original": True,
+                "filename": "",
+                "extension": "json",
+            },
+            "usdm-diff": {
+                "method": self._save_rendered_file,
+                "use_original": True,
+                "filename": "",
+                "extension": "json",
+            },
+            "usdm-explore": {
+                "method": self._save_rendered_file,
+                "use_original": True,
+                "filename": "",
+                "extension": "json",
+            },
+            "compare-digest": {
+                "method": self._save_rendered_file,
+                "use_original": True,
+                "filename": "",
+                "extension": "json",
+            },
             "image": {
                 "method": self._save_image_file,
                 "use_original": True,
@@ -136,9 +200,20 @@ class DataFiles:
                 "filename": "activities",
                 "extension": "yaml",
             },
+            "source": {
+                "method": self._save_json_file,
+                "use_original": False,
+                "filename": "source",
+                "extension": "json",
+            },
         }
         self.uuid = uuid
         self.dir = application_configuration.data_file_path
+        # SHA-256 and size of each binary or uploaded file saved through
+        # this instance, keyed by filename, computed while writing.
+        self.digests: dict[str, dict] = {}
+        self._manifest = None
+        self._manifest_read = False
 
     @classmethod
     def clean_and_tidy(cls):
@@ -238,6 +313,8 @@ class DataFiles:
         self.uuid = str(uuid4())
         if not self._create_dir():
             self.uuid = None
+        else:
+            self._save_manifest({})
         return self.uuid
 
     def save(
@@ -250,26 +327,148 @@ class DataFiles:
                 else self._form_filename(type)
             )
             filename = filename if filename else self._form_filename(type)
+            # Any digest left is from an earlier save of the name.
+            self.digests.pop(filename, None)
             full_path = self.media_type[type]["method"](contents, filename)
+            if full_path:
+                digest = self.digests.get(filename)
+                if digest and os.path.basename(full_path) == filename:
+                    self._share(filename, full_path, digest)
+                self._record(type, filename, full_path)
             return full_path, filename
         except Exception:  # pragma: no cover
             return None, None
 
-    def exists(self, type) -> bool:  # pragma: no cover
-        return os.path.exists(self._file_path(self._form_filename(type)))
+    def exists(self, type) -> bool:
+        if self._entry(type):
+            return True
+        if self.manifest() is not None:
+            return False
+        return os.path.exists(self.stored_path(type))
 
     def read(self, type) -> str | None:
         try:
-            full_path = self._file_path(self._form_filename(type))
-            with open(full_path, "r") as stream:
+            full_path = self.stored_path(type)
+            with Compression.open(full_path, "r") as stream:
                 return stream.read()
         except Exception:  # pragma: no cover
             return None
 
+    def stored_path(self, type) -> str:
+        """The path of the file as stored, compressed or not. Use
+        ``read`` or ``path`` to get at the contents."""
+        entry = self._entry(type)
+        if entry:
+            return self._file_path(entry["filename"])
+        full_path = self._file_path(self._form_filename(type))
+        if self.manifest() is not None:
+            return full_path
+        return self._stored_path(full_path)
+
+    def sources(self) -> dict:
+        """Filename -> the ``sha256`` and ``size`` of each file uploaded
+        to the study dir, as saved. Empty for dirs created before."""
+        contents = self.read("source")
+        return json.loads(contents) if contents else {}
+
+    def copy(self, source: "DataFiles", type) -> bool:
+        """Copy the file of the type, as stored, from another study."""
+        stored_path = source.stored_path(type)
+        full_path = self._file_path(os.path.basename(stored_path))
+        temp_path = f"{full_path}.{uuid4().hex}.tmp"
+        try:
+            try:
+                shutil.copyfile(stored_path, temp_path)
+                os.replace(temp_path, full_path)
+            finally:
+                self._remove_if_present(temp_path)
+            filename = self._form_filename(type)
+            self._remove_variants(filename, full_path)
+            self._record(type, filename, full_path)
+            return True
+        except Exception as e:
+            application_logger.exception(
+                f"Exception copying '{stored_path}' to '{self.uuid}'", e
+            )
+            return False
+
+    def manifest(self) -> dict | None:
+        """Media type -> the ``filename``, ``size``, ``sha256`` and
+        ``created`` time of the file last saved as the type, for the
+        types with one file per study (the others are found by name).
+
+        Kept in the study dir, written with the dir by ``new`` and
+        updated by ``save``, so it lists every file saved since. Dirs
+        created before it have none, and are scanned and stat'ed as
+        before, until ``rebuild_manifest`` is run on them. Read once per
+        instance."""
+        if not self._manifest_read:
+            self._manifest = self._read_manifest()
+            self._manifest_read = True
+        return self._manifest
+
+    def rebuild_manifest(self) -> dict:
+        """Write the manifest of the dir from the files in it.
+
+        Originals whose extension generated files also have (the FHIR
+        messages) cannot be told apart, so are left out and found by a
+        scan, as without a manifest."""
+        names = self._dir_files()
+        shared = [
+            x["extension"]
+            for x in self.media_type.values()
+            if not x["use_original"] or not x["filename"]
+        ]
+        files = {}
+        for type, details in self.media_type.items():
+            if not details["filename"]:
+                continue
+            if details["use_original"]:
+                if details["extension"] in shared:
+                    continue
+                found = [x for x in names if self._extension(x) == details["extension"]]
+                if len(found) != 1:
+                    continue
+                filename = found[0]
+            else:
+                full_path = self._stored_path(
+                    self._file_path(self._form_filename(type))
+                )
+                filename = os.path.basename(full_path)
+                if filename not in names:
+                    continue
+            full_path = self._file_path(filename)
+            files[type] = self._describe(
+                full_path, self._hash(full_path), os.path.getmtime(full_path)
+            )
+        with self._locked_manifest():
+            self._save_manifest(files)
+        return files
+
+    def discard(self, type) -> bool:
+        """Delete the file of the type, as stored and any expanded copy."""
+        full_path = self.stored_path(type)
+        try:
+            os.remove(full_path)
+            self._remove_if_present(self._expanded_path(self._form_filename(type)))
+            self._forget([os.path.basename(full_path)])
+            digest = self.sources().get(os.path.basename(full_path))
+            if digest:
+                blob_store.release(self.dir, digest["sha256"])
+            return True
+        except Exception as e:
+            application_logger.exception(f"Exception deleting '{full_path}'", e)
+            return False
+
     def path(self, type):
         exists = True
+        entry = self._entry(type)
         if self.media_type[type]["use_original"]:
-            files = self._dir_files_by_extension(self.media_type[type]["extension"])
+            files = (
+                [entry["filename"]]
+                if entry
+                else self._dir_files_by_extension(self.media_type[type]["extension"])
+            )
             # print(f"FILES: {files}")
             if len(files) == 1:
                 filename = files[0]
@@ -282,16 +481,59 @@ class DataFiles:
         else:
             filename = self._form_filename(type)
             full_path = self._file_path(filename)
-            if not os.path.exists(full_path):
+            if entry:
+                if entry["filename"] != filename:
+                    full_path = self._expand(
+                        self._file_path(entry["filename"]), filename
+                    )
+            elif self.manifest() is not None:
                 exists = False
+            elif not os.path.exists(full_path):
+                stored_path = self._stored_path(full_path)
+                if stored_path != full_path:
+                    full_path = self._expand(stored_path, filename)
+                else:
+                    exists = False
         return full_path, filename, exists
 
     def generic_path(self, type):
         filename = self._form_filename(type)
         full_path = self._file_path(filename)
-        exists = os.path.exists(full_path)
+        entry = self._entry(type)
+        if entry and entry["filename"] == filename:
+            exists = True
+        elif not entry and self.manifest() is not None:
+            exists = False
+        else:
+            exists = os.path.exists(full_path)
         return full_path, filename, exists
 
+    def named_path(self, filename: str) -> tuple[str, bool]:
+        full_path = self._file_path(filename)
+        return full_path, os.path.exists(full_path)
+
+    def delete_files(self, prefix: str, keep: str | set[str] = "") -> int:
+        """Delete the files in the study dir whose names start with
+        ``prefix``, other than ``keep`` (a name or a set of names) and
+        files still being written. Returns the number deleted."""
+        keep = {keep} if isinstance(keep, str) else keep
+        deleted = []
+        try:
+            for filename in self._dir_files():
+                if (
+                    filename.startswith(prefix)
+                    and filename not in keep
+                    and not filename.endswith(".tmp")
+                ):
+                    os.unlink(self._file_path(filename))
+                    deleted.append(filename)
+        except Exception as e:
+            application_logger.exception(
+                f"Exception deleting '{prefix}' files from '{self.uuid}'", e
+            )
+        self._forget(deleted)
+        return len(deleted)
+
     def delete_all(self):
         try:
             for root, dirs, files in os.walk(self.dir):
@@ -310,7 +552,12 @@ class DataFiles:
     def delete(self):
         path = self._dir_path()
         try:
+            sources = self.sources()
             shutil.rmtree(path)
+            if os.path.isdir(self._expanded_dir()):
+                shutil.rmtree(self._expanded_dir())
+            for digest in sources.values():
+                blob_store.release(self.dir, digest["sha256"])
             application_logger.info(f"Deleted study dir '{path}'")
             return True
         except Exception as e:
@@ -326,8 +573,7 @@ class DataFiles:
     def _save_binary_file(self, contents, filename):
         try:
             full_path = self._file_path(filename)
-            with open(full_path, "wb") as f:
-                f.write(contents)
+            self._write_binary(contents, full_path, filename)
             return full_path
         except Exception as e:
             application_logger.exception("Exception saving source file", e)
@@ -335,17 +581,43 @@ class DataFiles:
     def _save_image_file(self, contents, filename):
         try:
             full_path = self._file_path(filename)
-            with open(full_path, "wb") as f:
-                f.write(contents)
+            self._write_binary(contents, full_path, filename)
             return full_path
         except Exception as e:  # pragma: no cover
             application_logger.exception("Exception saving source file", e)
 
     def _save_json_file(self, contents, filename):
+        # Written as given: a dict or list is serialised straight to the
+        # file, in one pass. JSON text, bytes or an upload are copied as
+        # they are but still parsed, text and bytes before the write and
+        # an upload from the copy, so invalid JSON fails the save. Through
+        # a temporary file renamed into place, so readers never see a
+        # partial file.
         try:
-            full_path = self._file_path(filename)
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(json.dumps(json.loads(contents), indent=2))
+            compression = self._compression(filename)
+            full_path = self._file_path(filename) + Compression.suffix(compression)
+            temp_path = f"{full_path}.{uuid4().hex}.tmp"
+            try:
+                if isinstance(contents, (dict, list)):
+                    with Compression.open(temp_path, "w", compression) as f:
+                        json.dump(contents, f)
+                elif isinstance(contents, str):
+                    json.loads(contents)
+                    with Compression.open(temp_path, "w", compression) as f:
+                        f.write(contents)
+                elif self._is_stream(contents):
+                    with Compression.open(temp_path, "wb", compression) as f:
+                        self._copy_binary(contents, f, filename)
+                    with Compression.open(temp_path, "r", compression) as f:
+                        json.load(f)
+                else:
+                    json.loads(contents)
+                    with Compression.open(temp_path, "wb", compression) as f:
+                        self._copy_binary(contents, f, filename)
+                os.replace(temp_path, full_path)
+            finally:
+                self._remove_if_present(temp_path)
+            self._remove_variants(filename, full_path)
             return full_path
         except Exception as e:
             application_logger.exception("Exception saving results file", e)
@@ -363,8 +635,7 @@ class DataFiles:
     def _save_pdf_file(self, contents, filename):
         try:
             full_path = self._file_path(filename)
-            with open(full_path, "w+b") as f:
-                f.write(contents)
+            self._write_binary(contents, full_path, filename)
             return full_path
         except Exception as e:
             application_logger.exception("Exception saving PDF file", e)
@@ -378,6 +649,19 @@ class DataFiles:
         except Exception as e:
             application_logger.exception("Exception saving timeline file", e)
 
+    def _save_rendered_file(self, contents, filename):
+        # Rendered views are read by concurrent requests, so write to a
+        # temporary file and rename it into place.
+        try:
+            full_path = self._file_path(filename)
+            temp_path = f"{full_path}.{uuid4().hex}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(contents)
+            os.replace(temp_path, full_path)
+            return full_path
+        except Exception as e:
+            application_logger.exception("Exception saving rendered file", e)
+
     def _save_csv_file(self, contents, filename):
         if not contents:
             contents = [{"message": "No errors"}]
@@ -391,6 +675,221 @@ class DataFiles:
         except Exception as e:
             application_logger.exception("Exception saving error file", e)
 
+    def _write_binary(self, contents, full_path: str, filename: str) -> None:
+        """Write bytes, or copy a readable binary file object in chunks,
+        hashing as it goes. Any file of the name is removed first rather
+        than overwritten, as it may be linked from the blob store."""
+        self._remove_if_present(full_path)
+        with open(full_path, "wb") as f:
+            self._copy_binary(contents, f, filename)
+
+    def _copy_binary(self, contents, f, filename: str) -> None:
+        sha = hashlib.sha256()
+        size = 0
+        if self._is_stream(contents):
+            for chunk in iter(lambda: contents.read(self.CHUNK_SIZE), b""):
+                sha.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        else:
+            sha.update(contents)
+            size = len(contents)
+            f.write(contents)
+        self.digests[filename] = {"sha256": sha.hexdigest(), "size": size}
+        application_logger.info(
+            f"Saved '{filename}', {size} bytes, sha256 {self.digests[filename]['sha256']}"
+        )
+
+    @staticmethod
+    def _is_stream(contents) -> bool:
+        return hasattr(contents, "read")
+
+    def _share(self, filename: str, full_path: str, digest: dict) -> None:
+        # Uploads, the only files saved with a digest: stored once in the
+        # blob store and listed in the source record.
+        blob_store.share(self.dir, full_path, digest["sha256"])
+        try:
+            with self._source_lock:
+                sources = self.sources()
+                previous = sources.get(filename)
+                sources[filename] = digest
+                self.save("source", sources)
+            if previous and previous["sha256"] != digest["sha256"]:
+                blob_store.release(self.dir, previous["sha256"])
+        except Exception as e:
+            application_logger.exception(
+                f"Exception recording the source '{filename}' of '{self.uuid}'", e
+            )
+
+    def _entry(self, type) -> dict | None:
+        manifest = self.manifest()
+        return manifest.get(type) if manifest else None
+
+    def _record(self, type, filename: str, full_path: str) -> None:
+        # Only dirs with a manifest, which then lists every file saved.
+        if not self.media_type[type]["filename"] or self.manifest() is None:
+            return
+        try:
+            stored = os.path.basename(full_path)
+            digest = self.digests.get(filename) if stored == filename else None
+            sha256 = digest["sha256"] if digest else self._hash(full_path)
+            entry = self._describe(full_path, sha256)
+            with self._locked_manifest():
+                # Merge with the saves of other instances.
+                files = self._read_manifest()
+                if files is not None:
+                    files[type] = entry
+                    self._save_manifest(files)
+        except Exception as e:
+            application_logger.exception(
+                f"Exception recording '{filename}' in the manifest of '{self.uuid}'", e
+            )
+
+    def _forget(self, filenames: list[str]) -> None:
+        if not filenames or not self.manifest():
+            return
+        try:
+            with self._locked_manifest():
+                files = self._read_manifest()
+                if files is None:
+                    return
+                types = [k for k, v in files.items() if v["filename"] in filenames]
+                if types:
+                    for type in types:
+                        files.pop(type)
+                    self._save_manifest(files)
+        except Exception as e:
+            application_logger.exception(
+                f"Exception updating the manifest of '{self.uuid}'", e
+            )
+
+    def _read_manifest(self) -> dict | None:
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                return json.load(f)["files"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            application_logger.exception(
+                f"Exception reading the manifest of '{self.uuid}'", e
+            )
+            return None
+
+    def _save_manifest(self, files: dict) -> None:
+        try:
+            full_path = self._manifest_path()
+            temp_path = f"{full_path}.{uuid4().hex}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"version": 1, "files": files}, f)
+                os.replace(temp_path, full_path)
+            finally:
+                self._remove_if_present(temp_path)
+            self._manifest = files
+            self._manifest_read = True
+        except Exception as e:
+            application_logger.exception(
+                f"Exception saving the manifest of '{self.uuid}'", e
+            )
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.dir, self.uuid, self.MANIFEST)
+
+    @contextmanager
+    def _locked_manifest(self):
+        # The thread lock orders the instances of this process, the file
+        # lock those of the other worker processes sharing the dir.
+        with self._manifest_lock:
+            if fcntl is None:  # pragma: no cover
+                yield
+                return
+            lock_path = os.path.join(self.dir, self.uuid, self.MANIFEST_LOCK)
+            with open(lock_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _describe(full_path: str, sha256: str, created: float | None = None) -> dict:
+        created = (
+            datetime.datetime.fromtimestamp(created, datetime.timezone.utc)
+            if created
+            else datetime.datetime.now(datetime.timezone.utc)
+        )
+        return {
+            "filename": os.path.basename(full_path),
+            "size": os.path.getsize(full_path),
+            "sha256": sha256,
+            "created": created.isoformat(),
+        }
+
+    def _hash(self, full_path: str) -> str:
+        sha = hashlib.sha256()
+        with open(full_path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def _compression(self, filename: str) -> str | None:
+        if filename not in [self._form_filename(x) for x in self.COMPRESSED]:
+            return None
+        return Compression.configured()
+
+    def _stored_path(self, full_path: str) -> str:
+        # The file as written under any compression setting, plain first.
+        if os.path.exists(full_path):
+            return full_path
+        for extension in Compression.EXTENSIONS.values():
+            if os.path.exists(full_path + extension):
+                return full_path + extension
+        return full_path
+
+    def _remove_variants(self, filename: str, keep: str) -> None:
+        # Left by saves under an earlier compression setting.
+        full_path = self._file_path(filename)
+        for path in [full_path] + [
+            full_path + x for x in Compression.EXTENSIONS.values()
+        ]:
+            if path != keep:
+                self._remove_if_present(path)
+        self._remove_if_present(self._expanded_path(filename))
+
+    def _expand(self, stored_path: str, filename: str) -> str:
+        # Decompress to the temp dir for consumers that need a path,
+        # reusing the copy until the stored file is replaced.
+        expanded_path = self._expanded_path(filename)
+        if os.path.exists(expanded_path) and os.path.getmtime(
+            expanded_path
+        ) >= os.path.getmtime(stored_path):
+            return expanded_path
+        os.makedirs(self._expanded_dir(), exist_ok=True)
+        temp_path = f"{expanded_path}.{uuid4().hex}.tmp"
+        try:
+            with (
+                Compression.open(stored_path, "rb") as source,
+                open(temp_path, "wb") as f,
+            ):
+                shutil.copyfileobj(source, f, self.CHUNK_SIZE)
+            os.replace(temp_path, expanded_path)
+        finally:
+            self._remove_if_present(temp_path)
+        return expanded_path
+
+    def _expanded_dir(self) -> str:
+        return os.path.join(self.EXPANDED_DIR, self.uuid)
+
+    def _expanded_path(self, filename: str) -> str:
+        return os.path.join(self._expanded_dir(), filename)
+
+    @staticmethod
+    def _remove_if_present(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
     def _create_dir(self):
         try:
             os.mkdir(os.path.join(self.dir, self.uuid))
@@ -411,12 +910,19 @@ class DataFiles:
         )
 
     def _dir_files_by_extension(self, extension):
+        # Not the source record, a JSON file beside any uploaded one.
         dir = self._dir_files()
-        return [f for f in dir if self._extension(f) == extension]
+        source = self._form_filename("source")
+        return [f for f in dir if self._extension(f) == extension and f != source]
 
     def _dir_files(self):
         path = self._dir_path()
-        return [f for f in os.listdir(path) if os.path.isfile(os.path.join(path, f))]
+        return [
+            f
+            for f in os.listdir(path)
+            if f not in [self.MANIFEST, self.MANIFEST_LOCK]
+            and os.path.isfile(os.path.join(path, f))
+        ]
 
     def _stem_and_extension(self, filename):
         result = os.path.splitext(filename)
@@ -88,6 +88,22 @@ class LocalFiles:
             )
             return False, {}, f"Exception '{e}' listing local files dir '{path}'"
 
+    def files(self, path: str) -> list[str]:
+        """Full paths of the files directly within ``path``, a dir under
+        the local files root (absolute or relative to it), sorted by
+        name. Raises ValueError for a path outside the root."""
+        root = os.path.realpath(self.root)
+        full_path = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, full_path]) != root:
+            raise ValueError(f"Path '{path}' is outside the local files dir")
+        start_strings = [".", "~$"]
+        return sorted(
+            item.path
+            for item in os.scandir(full_path)
+            if item.is_file()
+            and not any(item.name.startswith(x) for x in start_strings)
+        )
+
     def download(self, path: str):
         application_logger.info(f"Local file download: {path}")
         file_root, file_extension, contents = self._read(path)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import re
+from collections.abc import Callable
+from importlib.metadata import PackageNotFoundError, version
+
+from d4k_ms_base.logger import application_logger
+
+from app import VERSION
+from app.model.file_handling.data_files import DataFiles
+from app.utility.m11_annotate import AnnotatedDocument
+from app.utility.request_timing import request_timing
+
+
+class RenderedProtocol:
+    """Rendered protocol views persisted beside a version's USDM.
+
+    The USDM for a version does not change after import, so the M11,
+    CPT and template protocol HTML, and the M11 HTML annotated with the
+    import's validation findings, only need rendering once. Each is
+    saved in the version's data file dir under a name formed from the
+    template and a hash of the renderer package and application
+    versions, so an upgrade of either renders afresh. Superseded
+    renders of the same template are removed when the new one is
+    saved.
+
+    Loading a YAML file against the version (costs, activities) may
+    change the rendering inputs, so ``invalidate`` removes everything.
+    """
+
+    PREFIX = "rendered-"
+
+    def __init__(self, files: DataFiles):
+        self._files = files
+
+    def html(self, template: str, render: Callable[[], str]) -> str:
+        prefix = f"{self.PREFIX}protocol-{self._name(template)}-"
+        filename = f"{prefix}{self._renderer_key(template)}.html"
+        html = self._read(filename)
+        if html is None:
+            with request_timing.stage("render"):
+                html = render()
+            self._save("rendered-protocol", html, filename, prefix)
+        return html
+
+    def annotated(
+        self,
+        findings: list[dict],
+        render_html: Callable[[], str],
+        annotate: Callable[[str, list[dict]], AnnotatedDocument],
+    ) -> AnnotatedDocument:
+        """The M11 protocol annotated with ``findings``. The stored
+        document records a digest of the findings it was built from and
+        is rebuilt if they differ."""
+        digest = hashlib.sha256(
+            json.dumps(findings, sort_keys=True).encode()
+        ).hexdigest()
+        prefix = f"{self.PREFIX}annotation-"
+        filename = f"{prefix}{self._renderer_key('M11')}.json"
+        stored = self._read(filename)
+        if stored is not None:
+            try:
+                data = json.loads(stored)
+                if data["findings"] == digest:
+                    return AnnotatedDocument(
+                        html=data["html"],
+                        unplaced=data["unplaced"],
+                        placed_count=data["placed_count"],
+                    )
+            except (ValueError, KeyError, TypeError):
+                pass
+        html = self.html("M11", render_html)
+        with request_timing.stage("render"):
+            document = annotate(html, findings)
+        contents = json.dumps(
+            {
+                "findings": digest,
+                "html": document.html,
+                "unplaced": document.unplaced,
+                "placed_count": document.placed_count,
+            }
+        )
+        self._save("rendered-annotation", contents, filename, prefix)
+        return document
+
+    def invalidate(self) -> int:
+        count = self._files.delete_files(self.PREFIX)
+        application_logger.info(
+            f"Removed {count} rendered protocol files for '{self._files.uuid}'"
+        )
+        return count
+
+    def _read(self, filename: str) -> str | None:
+        try:
+            full_path, exists = self._files.named_path(filename)
+            if not exists:
+                return None
+            with open(full_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError as e:
+            application_logger.exception(
+                f"Exception reading rendered protocol '{filename}'", e
+            )
+            return None
+
+    def _save(self, type: str, contents: str, filename: str, prefix: str) -> None:
+        full_path, _ = self._files.save(type, contents, filename)
+        if full_path:
+            self._files.delete_files(prefix, keep=filename)
+
+    @staticmethod
+    def _name(template: str) -> str:
+        return re.sub(r"[^a-z0-9_]+", "_", template.lower())
+
+    @classmethod
+    def _renderer_key(cls, template: str) -> str:
+        package = "usdm4_protocol" if template.upper() in ["M11", "CPT"] else "usdm4"
+        renderer = f"{package}-{cls._package_version(package)}:app-{VERSION}"
+        return hashlib.sha256(renderer.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _package_version(name: str) -> str:
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            return "unknown"
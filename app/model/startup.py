@@ -0,0 +1,82 @@
+import asyncio
+import time
+from collections.abc import Callable
+
+from d4k_ms_base.logger import application_logger
+
+
+class Startup:
+    """Housekeeping run once when the server starts.
+
+    Tidying the mount, checking the data file dirs, creating and
+    migrating the database and requeuing unfinished import and
+    validation jobs used to run when ``app.main`` was imported, so the
+    server could not accept a connection until all of it was done.
+    ``start`` now runs the steps in order as a background task, off the
+    event loop, once the server is up.
+
+    Requests arriving before the steps finish wait for them (``wait``),
+    up to ``WAIT_TIMEOUT`` seconds. ``status`` reports progress, the
+    time taken by each step and any failure for the ``/ready`` check.
+    """
+
+    WAIT_TIMEOUT = 60.0
+
+    def __init__(self):
+        self._steps: list[tuple[str, Callable[[], object]]] = []
+        self._task: asyncio.Task | None = None
+        self.timings: dict[str, float] = {}
+        self.error: str | None = None
+
+    def step(self, name: str, action: Callable[[], object]) -> None:
+        self._steps.append((name, action))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.started and self._task.done() and self.error is None
+
+    async def wait(self) -> bool:
+        """True once the steps have completed successfully. Returns
+        straight away if startup was never started (the app is being
+        driven without a lifespan, as in the tests)."""
+        if not self.started:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), self.WAIT_TIMEOUT)
+        except TimeoutError:
+            return False
+        return self.error is None
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "started": self.started,
+            "steps": {name: self.timings.get(name) for name, _ in self._steps},
+            "error": self.error,
+        }
+
+    async def _run(self) -> None:
+        start = time.perf_counter()
+        for name, action in self._steps:
+            step_start = time.perf_counter()
+            try:
+                await asyncio.to_thread(action)
+            except Exception as e:
+                self.error = f"Startup step '{name}' failed: {e}"
+                application_logger.exception(self.error, e)
+                return
+            self.timings[name] = round(time.perf_counter() - step_start, 3)
+        application_logger.info(
+            f"Startup complete in {time.perf_counter() - start:.3f}s: {self.timings}"
+        )
+
+
+startup = Startup()
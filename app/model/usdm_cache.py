@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from d4k_ms_base.logger import application_logger
+
+from app.configuration.configuration import application_configuration
+
+
+class USDMCacheEntry:
+    def __init__(self, signature: tuple, cost: int, data: dict, wrapper, extra: dict):
+        self.signature = signature
+        self.cost = cost
+        self.data = data
+        self.wrapper = wrapper
+        self.extra = extra
+        # Lookup tables over ``data``, built by the first USDMJson to
+        # use the entry (see USDMIndex).
+        self.index = None
+
+
+class USDMCache:
+    """Process-wide cache of parsed USDM, keyed by import uuid.
+
+    Every study view builds a ``USDMJson`` which, uncached, re-reads
+    ``usdm.json``, runs ``USDM4.loadd`` to build the pydantic
+    ``Wrapper`` and re-parses ``extra.yaml``. A version's files are
+    written once at import, so the parsed results are held here and
+    shared between requests.
+
+    Each entry records the (mtime, size) signature of the files it was
+    built from; a lookup whose signature no longer matches is treated
+    as a miss and rebuilt. Entries are evicted least-recently-used
+    first once the estimated memory held exceeds the budget. The cost
+    of an entry is estimated from the on-disk size of its files — the
+    parsed dict plus the pydantic object graph are several times
+    larger than the JSON text, hence ``INFLATION``.
+
+    Entries are shared, so callers must treat the cached dict, wrapper
+    and extra as read-only.
+    """
+
+    INFLATION = 10
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, USDMCacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(
+        self, uuid: str, paths: list[str], loader: Callable[[], tuple]
+    ) -> USDMCacheEntry:
+        """Return the entry for ``uuid``, calling ``loader`` to build it
+        on a miss. ``paths`` are the files the entry is derived from;
+        ``loader`` returns a ``(data, wrapper, extra)`` tuple."""
+        signature = self._signature(paths)
+        with self._lock:
+            entry = self._entries.get(uuid)
+            if entry and entry.signature == signature:
+                self._entries.move_to_end(uuid)
+                self.hits += 1
+                return entry
+            if entry:
+                self._remove(uuid)
+                self.invalidations += 1
+            self.misses += 1
+        # Parse outside the lock so a slow load doesn't serialise every
+        # other request. Two concurrent misses on the same uuid both
+        # load; the second insert simply replaces the first.
+        data, wrapper, extra = loader()
+        cost = sum(size for _, size in signature) * self.INFLATION
+        entry = USDMCacheEntry(signature, cost, data, wrapper, extra)
+        if self.enabled and cost <= self.max_bytes:
+            with self._lock:
+                if uuid in self._entries:
+                    self._remove(uuid)
+                self._entries[uuid] = entry
+                self._bytes += cost
+                self._evict()
+        return entry
+
+    def invalidate(self, uuid: str) -> None:
+        with self._lock:
+            if uuid in self._entries:
+                self._remove(uuid)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            uuid = next(iter(self._entries))
+            self._remove(uuid)
+            self.evictions += 1
+            application_logger.debug(f"USDM cache evicted '{uuid}'")
+
+    def _remove(self, uuid: str) -> None:
+        entry = self._entries.pop(uuid)
+        self._bytes -= entry.cost
+
+    @staticmethod
+    def _signature(paths: list[str]) -> tuple:
+        result = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                result.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                result.append((0, 0))
+        return tuple(result)
+
+
+usdm_cache = USDMCache(application_configuration.usdm_cache_size_mb * 1024 * 1024)
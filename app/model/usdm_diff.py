@@ -0,0 +1,181 @@
+import json
+
+from d4k_ms_base.logger import application_logger
+
+from app.model.file_handling.data_files import DataFiles
+
+
+class USDMDiff:
+    """Structural difference between the USDM of two study versions.
+
+    Every USDM object carries an ``id`` and an ``instanceType``, so the
+    two documents are each walked once into a map of id to entity and
+    the entities matched by id: those only in the new version were
+    added, those only in the old one removed, and those in both are
+    compared attribute by attribute. Child objects are compared as
+    entities in their own right, the parent only records their ids, and
+    lists of child objects are compared as sets, so reordering an
+    array is not reported as a change.
+
+    The result is saved in the new version's data file dir, named after
+    the old version's import and ``ENGINE``, as neither version's USDM
+    changes after import. ``page`` serves it a page of changes at a
+    time.
+    """
+
+    ENGINE = "1"
+    PREFIX = "usdm-diff-"
+    ROOT = "$root"
+    ACTIONS = ["added", "removed", "changed"]
+    LABEL_ATTRIBUTES = ["name", "label", "decode", "text"]
+    LABEL_LENGTH = 80
+
+    def __init__(self, files: DataFiles):
+        self._files = files
+
+    def get(self, old: dict, old_uuid: str, new: dict) -> dict:
+        filename = f"{self.PREFIX}{old_uuid}-{self.ENGINE}.json"
+        result = self._read(filename)
+        if result is None:
+            result = self.compare(old, new)
+            self._files.save("usdm-diff", json.dumps(result), filename)
+        return result
+
+    @classmethod
+    def compare(cls, old: dict, new: dict) -> dict:
+        old_entities = cls._entities(old)
+        new_entities = cls._entities(new)
+        changes = []
+        for id, entity in new_entities.items():
+            previous = old_entities.get(id)
+            action = "changed" if previous else "added"
+            attributes = cls._changed_attributes(
+                previous["attributes"] if previous else {}, entity["attributes"]
+            )
+            if attributes or not previous:
+                changes.append(cls._change(action, id, entity, attributes))
+        for id, entity in old_entities.items():
+            if id not in new_entities:
+                attributes = cls._changed_attributes(entity["attributes"], {})
+                changes.append(cls._change("removed", id, entity, attributes))
+        # Grouped by class, in document order within each class.
+        changes.sort(key=lambda x: x["class"])
+        summary = {}
+        for change in changes:
+            counts = summary.setdefault(
+                change["class"], {action: 0 for action in cls.ACTIONS}
+            )
+            counts[change["action"]] += 1
+        return {
+            "engine": cls.ENGINE,
+            "entities": {"old": len(old_entities), "new": len(new_entities)},
+            "totals": {
+                action: sum(x[action] for x in summary.values())
+                for action in cls.ACTIONS
+            },
+            "summary": dict(sorted(summary.items())),
+            "changes": changes,
+        }
+
+    @classmethod
+    def page(cls, diff: dict, page: int, size: int, filter: str = "") -> dict:
+        page = max(page, 1)
+        size = size if size > 0 else 10
+        changes = diff["changes"]
+        if filter:
+            text = filter.upper()
+            changes = [
+                x
+                for x in changes
+                if text in x["class"].upper()
+                or text in x["label"].upper()
+                or text in x["id"].upper()
+                or text == x["action"].upper()
+            ]
+        skip = (page - 1) * size
+        return {
+            "items": changes[skip : skip + size],
+            "page": page,
+            "size": size,
+            "filter": filter,
+            "count": len(changes),
+        }
+
+    @classmethod
+    def _entities(cls, data: dict) -> dict[str, dict]:
+        entities = {}
+        if isinstance(data, dict) and not cls._is_entity(data):
+            entities[cls.ROOT] = cls._entity(data, "Wrapper")
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if cls._is_entity(node):
+                    entities[node["id"]] = cls._entity(node, node["instanceType"])
+                stack.extend(reversed(node.values()))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+        return entities
+
+    @classmethod
+    def _entity(cls, node: dict, klass: str) -> dict:
+        attributes = {k: cls._value(v) for k, v in node.items() if k != "id"}
+        return {"class": klass, "label": cls._label(node), "attributes": attributes}
+
+    @classmethod
+    def _value(cls, value):
+        if isinstance(value, dict):
+            if cls._is_entity(value):
+                return value["id"]
+            return {k: cls._value(v) for k, v in value.items()}
+        if isinstance(value, list):
+            items = [cls._value(x) for x in value]
+            if any(isinstance(x, dict) and cls._is_entity(x) for x in value):
+                return sorted(items, key=str)
+            return items
+        return value
+
+    @staticmethod
+    def _is_entity(node: dict) -> bool:
+        return isinstance(node.get("id"), str) and "instanceType" in node
+
+    @classmethod
+    def _label(cls, node: dict) -> str:
+        for name in cls.LABEL_ATTRIBUTES:
+            value = node.get(name)
+            if isinstance(value, str) and value:
+                if len(value) > cls.LABEL_LENGTH:
+                    value = f"{value[: cls.LABEL_LENGTH]}..."
+                return value
+        return node.get("id", "")
+
+    @staticmethod
+    def _changed_attributes(old: dict, new: dict) -> list[dict]:
+        result = []
+        for name in {**old, **new}:
+            if old.get(name) != new.get(name):
+                result.append(
+                    {"name": name, "old": old.get(name), "new": new.get(name)}
+                )
+        return result
+
+    @staticmethod
+    def _change(action: str, id: str, entity: dict, attributes: list[dict]) -> dict:
+        return {
+            "id": id,
+            "class": entity["class"],
+            "label": entity["label"],
+            "action": action,
+            "attributes": attributes,
+        }
+
+    def _read(self, filename: str) -> dict | None:
+        try:
+            full_path, exists = self._files.named_path(filename)
+            if not exists:
+                return None
+            with open(full_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            application_logger.exception(f"Exception reading USDM diff '{filename}'", e)
+            return None
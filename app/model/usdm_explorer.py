@@ -0,0 +1,177 @@
+import json
+
+from d4k_ms_base.logger import application_logger
+
+from app.model.file_handling.data_files import DataFiles
+
+
+class USDMExplorer:
+    """Class and instance index of a version's USDM for the explorer.
+
+    The explorer page used to decompose the whole USDM into a map of
+    class to instances on every load and send all of it, as one JSON
+    string, to the browser. The index is now built once, on first use,
+    from a single walk of the document and saved in the version's data
+    file dir:
+
+    - ``usdm-explore-{ENGINE}-index.json``: the classes and their
+      instance counts,
+    - ``usdm-explore-{ENGINE}-ids.json``: the class of each instance id,
+    - ``usdm-explore-{ENGINE}-class-{n}.json``: the instances of the
+      n-th class, by id.
+
+    Each instance is held shallow: a child object is replaced by its
+    ``id`` and ``instanceType``, it being an instance in its own right.
+    The index file is written last, so its presence means the rest are
+    in place, and the files of a superseded index are only removed
+    after it, so concurrent first requests do not remove each other's. The explorer then reads the class list, a page of a
+    class's instance ids and the instances it draws through the JSON
+    API, so the page costs the same whatever the size of the study.
+    """
+
+    ENGINE = "1"
+    PREFIX = "usdm-explore-"
+
+    def __init__(self, files: DataFiles, data: dict):
+        self._files = files
+        self._data = data
+        self._index = None
+
+    def classes(self) -> dict:
+        index = self._get_index()
+        classes = [{"name": k, "count": v} for k, v in index["classes"].items()]
+        return {"classes": classes, "count": sum(x["count"] for x in classes)}
+
+    def instances(
+        self, klass: str, page: int, size: int, filter: str = ""
+    ) -> dict | None:
+        """A page of the instance ids of ``klass``, None if there are
+        no instances of the class."""
+        instances = self._class_instances(klass)
+        if instances is None:
+            return None
+        page = max(page, 1)
+        size = size if size > 0 else 100
+        ids = list(instances)
+        if filter:
+            text = filter.upper()
+            ids = [x for x in ids if text in x.upper()]
+        skip = (page - 1) * size
+        return {
+            "items": ids[skip : skip + size],
+            "page": page,
+            "size": size,
+            "filter": filter,
+            "count": len(ids),
+        }
+
+    def lookup(self, ids: list[str]) -> dict[str, dict]:
+        """The class and shallow instance of each of ``ids``, by id.
+        Ids not in the USDM are left out."""
+        classes = self._read(self._filename("ids"))
+        if classes is None:
+            self._get_index()
+            classes = self._read(self._filename("ids")) or {}
+        result = {}
+        loaded = {}
+        for id in ids:
+            klass = classes.get(id)
+            if klass and klass not in loaded:
+                loaded[klass] = self._class_instances(klass) or {}
+            if klass and id in loaded[klass]:
+                result[id] = {"class": klass, "data": loaded[klass][id]}
+        return result
+
+    @classmethod
+    def build(cls, data: dict) -> dict[str, dict[str, dict]]:
+        """Class name -> instance id -> shallow instance, classes and
+        ids sorted."""
+        klasses = {}
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if cls._is_instance(node):
+                    klasses.setdefault(node["instanceType"], {})[node["id"]] = (
+                        cls._shallow(node)
+                    )
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+        return {
+            klass: dict(sorted(instances.items()))
+            for klass, instances in sorted(klasses.items())
+        }
+
+    def _get_index(self) -> dict:
+        if self._index is None:
+            self._index = self._read(self._filename("index"))
+        if self._index is None:
+            self._index = self._save(self.build(self._data))
+        return self._index
+
+    def _class_instances(self, klass: str) -> dict | None:
+        index = self._get_index()
+        names = list(index["classes"])
+        if klass not in names:
+            return None
+        filename = self._filename(f"class-{names.index(klass)}")
+        instances = self._read(filename)
+        if instances is None:
+            # Removed from under the index, build it again.
+            self._index = self._save(self.build(self._data))
+            instances = self._read(filename)
+        return instances
+
+    def _save(self, klasses: dict[str, dict[str, dict]]) -> dict:
+        ids = {}
+        files = {}
+        for n, (klass, instances) in enumerate(klasses.items()):
+            ids.update({id: klass for id in instances})
+            files[self._filename(f"class-{n}")] = instances
+        files[self._filename("ids")] = ids
+        index = {
+            "engine": self.ENGINE,
+            "classes": {klass: len(instances) for klass, instances in klasses.items()},
+        }
+        files[self._filename("index")] = index
+        full_path = None
+        for filename, data in files.items():
+            full_path, _ = self._files.save("usdm-explore", json.dumps(data), filename)
+        if full_path:
+            self._files.delete_files(self.PREFIX, keep=set(files))
+        return index
+
+    def _filename(self, name: str) -> str:
+        return f"{self.PREFIX}{self.ENGINE}-{name}.json"
+
+    @classmethod
+    def _shallow(cls, node: dict) -> dict:
+        return {k: cls._value(v) for k, v in node.items()}
+
+    @classmethod
+    def _value(cls, value):
+        if isinstance(value, dict):
+            if cls._is_instance(value):
+                return {"id": value["id"], "instanceType": value["instanceType"]}
+            return {k: cls._value(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [cls._value(x) for x in value]
+        return value
+
+    @staticmethod
+    def _is_instance(node: dict) -> bool:
+        return isinstance(node.get("id"), str) and "instanceType" in node
+
+    def _read(self, filename: str) -> dict | None:
+        try:
+            full_path, exists = self._files.named_path(filename)
+            if not exists:
+                return None
+            with open(full_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            application_logger.exception(
+                f"Exception reading USDM explorer index '{filename}'", e
+            )
+            return None
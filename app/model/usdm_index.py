@@ -0,0 +1,72 @@
+class USDMIndex:
+    """Lookup tables over a parsed USDM dict, built in one pass.
+
+    ``USDMJson`` resolves study designs, interventions, narrative
+    content and narrative content items by id, and protocol sections by
+    number or title, many times per page. Without an index each lookup
+    is a scan of the study version or protocol document, and walking
+    the narrative linked list is quadratic in the number of sections.
+
+    The tables cover the first study version and the protocol document
+    it references. Where an id or section number repeats, the first
+    occurrence wins, as it did with the scans. The index is built from,
+    and shares, the cached dict, so like the dict it is read-only.
+    """
+
+    def __init__(self, data: dict):
+        self.version = None
+        self.document = None
+        self.study_designs = {}
+        self.interventions = {}
+        self.content_item_text = {}
+        self.contents = {}
+        self.first_content = None
+        self.section_numbers = {}
+        self.section_titles = []
+        try:
+            self.version = data["study"]["versions"][0]
+        except Exception:
+            return
+        self.document = self._find_document(data, self.version)
+        self.study_designs = self._by_id(self.version.get("studyDesigns", []))
+        self.interventions = self._by_id(self.version.get("studyInterventions", []))
+        for item in self.version.get("narrativeContentItems", []):
+            self.content_item_text.setdefault(item["id"], item["text"])
+        if self.document:
+            self._index_contents(self.document["contents"])
+
+    def _index_contents(self, contents: list[dict]) -> None:
+        for content in contents:
+            self.contents.setdefault(content["id"], content)
+            if (
+                self.first_content is None
+                and not content["previousId"]
+                and content["nextId"]
+            ):
+                self.first_content = content
+            if content["sectionNumber"] is not None:
+                self.section_numbers.setdefault(content["sectionNumber"], content)
+            if content["sectionTitle"] is not None:
+                self.section_titles.append((content["sectionTitle"].upper(), content))
+
+    @staticmethod
+    def _find_document(data: dict, version: dict) -> dict | None:
+        try:
+            id = version["documentVersionIds"][0]
+            return next(
+                (
+                    x
+                    for x in data["study"]["documentedBy"][0]["versions"]
+                    if x["id"] == id
+                ),
+                None,
+            )
+        except Exception:
+            return None
+
+    @staticmethod
+    def _by_id(items: list[dict]) -> dict:
+        result = {}
+        for item in items:
+            result.setdefault(item["id"], item)
+        return result
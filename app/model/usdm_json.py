@@ -3,34 +3,51 @@ import csv
 import json
 
 import yaml
+from d4k_ms_base.logger import application_logger
 from simple_error_log import Errors
 from sqlalchemy.orm import Session
-from usdm4 import USDM4
-from usdm4.api.study import Study
-from usdm4.api.study_definition_document import (
-    StudyDefinitionDocument,
-    StudyDefinitionDocumentVersion,
-)
-from usdm4.api.study_design import StudyDesign
-from usdm4.api.study_version import StudyVersion
-from usdm4.api.wrapper import Wrapper
-from usdm4_fhir import M11 as FHIRM11
-
-# from usdm4_fhir import SoA as FHIRSoA
-from usdm4_fhir.soa.export.export_soa import ExportSoA as FHIRSoA
-from usdm4_protocol.cpt.views.document_view import DocumentView as CPTDocumentView
-from usdm4_protocol.m11.views.document_view import DocumentView as M11DocumentView
-from usdm4_protocol.soa.soa_model import SoA
 
 from app.configuration.configuration import application_configuration
 from app.database.file_import import FileImport
 from app.database.version import Version
 from app.imports.import_manager import ImportManager
+from app.model.export_cache import ExportCache
 from app.model.file_handling.data_files import DataFiles
+from app.model.usdm_cache import usdm_cache
+from app.model.usdm_diff import USDMDiff
+from app.model.usdm_explorer import USDMExplorer
+from app.model.usdm_index import USDMIndex
+from app.utility.lazy_import import LazyImport
+from app.utility.request_timing import request_timing
 from app.utility.soup import get_soup
 
+# The USDM, FHIR and protocol libraries are imported on first use.
+USDM4 = LazyImport("usdm4", "USDM4")
+Study = LazyImport("usdm4.api.study", "Study")
+StudyDefinitionDocument = LazyImport(
+    "usdm4.api.study_definition_document", "StudyDefinitionDocument"
+)
+StudyDefinitionDocumentVersion = LazyImport(
+    "usdm4.api.study_definition_document", "StudyDefinitionDocumentVersion"
+)
+StudyDesign = LazyImport("usdm4.api.study_design", "StudyDesign")
+StudyVersion = LazyImport("usdm4.api.study_version", "StudyVersion")
+Wrapper = LazyImport("usdm4.api.wrapper", "Wrapper")
+FHIRM11 = LazyImport("usdm4_fhir", "M11")
+FHIRSoA = LazyImport("usdm4_fhir.soa.export.export_soa", "ExportSoA")
+CPTDocumentView = LazyImport("usdm4_protocol.cpt.views.document_view", "DocumentView")
+M11DocumentView = LazyImport("usdm4_protocol.m11.views.document_view", "DocumentView")
+SoA = LazyImport("usdm4_protocol.soa.soa_model", "SoA")
+
 
 class USDMJson:
+    # Import types whose USDM carries an M11 protocol document.
+    M11_IMPORTS = [
+        ImportManager.M11_DOCX,
+        ImportManager.FHIR_PRISM2_JSON,
+        ImportManager.FHIR_PRISM3_JSON,
+    ]
+
     def __init__(self, id: int, session: Session):  # pragma: no cover
         # Pass the CORE cache path through for uniformity — this class
         # only calls ``loadd`` today, but keeping the pattern consistent
@@ -43,45 +60,68 @@ class USDMJson:
         file_import = FileImport.find(version.import_id, session)
         self.uuid = file_import.uuid
         self.type = file_import.type
-        self.m11 = (
-            True
-            if self.type
-            in [
-                ImportManager.M11_DOCX,
-                ImportManager.FHIR_PRISM2_JSON,
-                ImportManager.FHIR_PRISM3_JSON,
-            ]
-            else False
-        )
+        self.m11 = True if self.type in self.M11_IMPORTS else False
         self._files = DataFiles(file_import.uuid)
-        self._data = self._get_usdm()
+        # The parsed dict, wrapper and extra are shared through the
+        # process-wide cache, so every HTMX partial for the same version
+        # doesn't re-parse the file. Treat them as read-only.
+        usdm_path = self._files.stored_path("usdm")
+        extra_path = self._files.stored_path("extra")
+        entry = usdm_cache.get(
+            self.uuid, [usdm_path, extra_path], lambda: self._load(usdm4)
+        )
+        self._data = entry.data
+        self._wrapper: Wrapper = entry.wrapper
+        self._extra = entry.extra
+        if entry.index is None:
+            entry.index = USDMIndex(entry.data)
+        self._index = entry.index
+
+    @request_timing.timed("usdm")
+    def _load(self, usdm4: USDM4) -> tuple[dict, Wrapper, dict]:  # pragma: no cover
+        data = self._get_usdm()
         errors = Errors()
-        self._wrapper: Wrapper = usdm4.loadd(self._data, errors)
-        # print(f"USDM JSON DATA: {self._data}")
-        self._extra = self._get_extra()
+        wrapper: Wrapper = usdm4.loadd(data, errors)
+        return data, wrapper, self._get_extra()
 
-    def fhir(self, version=FHIRM11.PRISM2):
+    def fhir(self, version=None):
         # print(f"VERSION FHIR: {version}")
-        data = self.fhir_data(version)
-        fullpath, filename = self._files.save(f"fhir_{version}", data)
-        return fullpath, filename, "text/plain"
-
-    def fhir_data(self, version=FHIRM11.PRISM2):
+        version = version or FHIRM11.PRISM2
+        fullpath = self._json_export("fhir", version, lambda: self.fhir_data(version))
+        if not fullpath:
+            return None, None, None
+        return fullpath, f"fhir_{version}.json", "text/plain"
+
+    @request_timing.timed("render")
+    def fhir_data(self, version=None):
+        version = version or FHIRM11.PRISM2
         study: Study = self._wrapper.study
         fhir = FHIRM11()
         data = fhir.to_message(study, self._extra, version)
         return data
 
     def fhir_soa(self, timeline_id: str):
-        data = self.fhir_soa_data(timeline_id)
-        fullpath, filename = self._files.save("fhir_soa", data)
-        return fullpath, filename, "application/json"
+        fullpath = self._json_export(
+            "fhir_soa", timeline_id, lambda: self.fhir_soa_data(timeline_id)
+        )
+        if not fullpath:
+            return None, None, None
+        return fullpath, "fhir_soa.json", "application/json"
 
+    @request_timing.timed("render")
     def fhir_soa_data(self, timeline_id: str):
         study: Study = self._wrapper.study
         fhir = FHIRSoA(study, timeline_id, self.uuid, self._extra)
         return fhir.to_message()
 
+    def diff(self, previous: "USDMJson") -> dict:
+        """Structural difference from ``previous`` to this version."""
+        return USDMDiff(self._files).get(previous._data, previous.uuid, self._data)
+
+    def explorer(self) -> USDMExplorer:
+        """Class and instance index for the USDM explorer."""
+        return USDMExplorer(self._files, self._data)
+
     def json(self):
         fullpath, filename, exists = self._files.path("usdm")
         return fullpath, filename, "application/json"
@@ -347,6 +387,9 @@ class USDMJson:
             return None
 
     def _find_intervention(self, version: dict, id: str) -> dict:
+        index = self._usdm_index()
+        if version is index.version:
+            return index.interventions.get(id)
         return next((x for x in version["studyInterventions"] if x["id"] == id), None)
 
     def study_design_estimands(self, id: str):
@@ -383,6 +426,7 @@ class USDMJson:
         else:
             return None
 
+    @request_timing.timed("render")
     def schedule_of_activities(self, id: str):
         errors = Errors()
         study: Study
@@ -417,6 +461,7 @@ class USDMJson:
             }
         return {"id": self.id, "study_id": design.id, "data": [], "document": []}
 
+    @request_timing.timed("render")
     def soa(self, study_id: str, id: str):
         wrapper = self.wrapper()
         version = wrapper.study.first_version()
@@ -497,7 +542,8 @@ class USDMJson:
         document = self._document()
         _ = self._data["study"]["versions"][0]
         if document:
-            narrative_content = self._find_narrative_content(document, id)
+            # Copy before decorating: the document is shared via the cache.
+            narrative_content = dict(self._find_narrative_content(document, id))
             narrative_content["heading"], narrative_content["level"] = (
                 self._format_heading(narrative_content)
             )
@@ -506,14 +552,8 @@ class USDMJson:
         return None
 
     def _section_item(self, narrative_content: dict) -> str:
-        version = self._data["study"]["versions"][0]
-        return next(
-            (
-                x["text"]
-                for x in version["narrativeContentItems"]
-                if x["id"] == narrative_content["contentItemId"]
-            ),
-            "",
+        return self._usdm_index().content_item_text.get(
+            narrative_content["contentItemId"], ""
         )
 
     def _section_response(self, id: str, number: str, title: str, default: str) -> dict:
@@ -557,9 +597,7 @@ class USDMJson:
         if section_number is None or section_number.lower().startswith("appendix"):
             result = 1
         else:
-            text = (
-                section_number.removesuffix(".")
-            )
+            text = section_number.removesuffix(".")
             result = len(text.split("."))
         return result
 
@@ -579,26 +617,24 @@ class USDMJson:
             return "", level
 
     def _first_narrative_content(self, document: dict) -> dict:
+        index = self._usdm_index()
+        if document is index.document:
+            return index.first_content
         return next(
             (x for x in document["contents"] if not x["previousId"] and x["nextId"]),
             None,
         )
 
     def _find_narrative_content(self, document: dict, id: str) -> dict:
+        index = self._usdm_index()
+        if document is index.document:
+            return index.contents.get(id)
         return next((x for x in document["contents"] if x["id"] == id), None)
 
     def _intervention(self, study_version: dict, intervention_ids: list) -> dict:
         if len(intervention_ids) == 0:
             return None
-        intervention_id = intervention_ids[0]
-        return next(
-            (
-                x
-                for x in study_version["studyInterventions"]
-                if x["id"] == intervention_id
-            ),
-            None,
-        )
+        return self._find_intervention(study_version, intervention_ids[0])
 
     def _objective_endpoint_from_estimand(
         self, study_design: dict, variable_of_interest_id: str
@@ -613,11 +649,7 @@ class USDMJson:
         return next((x for x in objective["endpoints"] if x["id"] == endpoint_id), None)
 
     def _arm_from_intervention(self, study_design: dict, intervention_id: str) -> dict:
-        version = self._data["study"]["versions"][0]
-        element = next(
-            (x for x in version["studyInterventions"] if x["id"] == intervention_id),
-            None,
-        )
+        element = self._usdm_index().interventions.get(intervention_id)
         if element:
             cell = next(
                 (
@@ -670,50 +702,27 @@ class USDMJson:
         return ""
 
     def _section_by_number(self, number) -> dict:
-        document = self._document()
-        if document:
-            return next(
-                (
-                    x
-                    for x in document["contents"]
-                    if x["sectionNumber"] is not None and x["sectionNumber"] == number
-                ),
-                None,
-            )
-        return None
+        return self._usdm_index().section_numbers.get(number)
 
     def _section_by_title_contains(self, title) -> dict:
-        document = self._document()
-        if document:
-            return next(
-                (
-                    x
-                    for x in document["contents"]
-                    if x["sectionTitle"] is not None
-                    and title.upper() in x["sectionTitle"].upper()
-                ),
-                None,
-            )
-        return None
+        title = title.upper()
+        return next(
+            (x for upper, x in self._usdm_index().section_titles if title in upper),
+            None,
+        )
 
     def _study_design(self, id: str) -> dict:
-        version = self._data["study"]["versions"][0]
-        return next((x for x in version["studyDesigns"] if x["id"] == id), None)
+        return self._usdm_index().study_designs.get(id)
 
     def _document(self) -> dict:
-        try:
-            version = self._data["study"]["versions"][0]
-            id = version["documentVersionIds"][0]
-            return next(
-                (
-                    x
-                    for x in self._data["study"]["documentedBy"][0]["versions"]
-                    if x["id"] == id
-                ),
-                None,
-            )
-        except Exception:
-            return None
+        return self._usdm_index().document
+
+    def _usdm_index(self) -> USDMIndex:
+        # Normally shared through the cache entry; built here for an
+        # instance that didn't come through __init__.
+        if getattr(self, "_index", None) is None:
+            self._index = USDMIndex(self._data)
+        return self._index
 
     # def _get_soup(self, text: str):
     #     try:
@@ -776,16 +785,38 @@ class USDMJson:
         return "0"
 
     def _get_usdm(self):
-        fullpath, filename, exists = self._files.path("usdm")
-        data = open(fullpath)
-        return json.load(data)
+        return json.loads(self._files.read("usdm"))
 
     def _get_raw(self):
-        fullpath, filename, exists = self._files.path("usdm")
-        f = open(fullpath)
-        return f.read()
+        return self._files.read("usdm")
 
     def _get_extra(self):
         fullpath, filename, exists = self._files.path("extra")
         data = open(fullpath)
         return yaml.load(data, Loader=yaml.FullLoader)
+
+    def _json_export(self, kind: str, variant: str, generate) -> str | None:
+        """Full path of the cached FHIR export, None when the message
+        could not be generated, in which case nothing is cached."""
+        try:
+            return ExportCache(self._files).get(
+                kind,
+                variant,
+                "usdm4_fhir",
+                "json",
+                lambda path: self._write_json(path, generate()),
+            )
+        except ValueError as e:
+            application_logger.exception(
+                f"Exception generating the '{kind}' export of '{self.uuid}'", e
+            )
+            return None
+
+    @staticmethod
+    def _write_json(path: str, data: str | None) -> None:
+        # Parsed before the file is opened, so a failure leaves no export.
+        if data is None:
+            raise ValueError("no message was generated")
+        message = json.loads(data)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(message, f, indent=2)
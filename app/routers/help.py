@@ -4,13 +4,15 @@ from d4k_ms_ui.markdown_page import MarkdownPage
 from d4k_ms_ui.release_notes import ReleaseNotes
 from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
-from usdm4.__info__ import __model_version__ as usdm_version
 
 from app import SYSTEM_NAME, VERSION
 from app.database.database import get_db
 from app.dependencies.dependency import protect_endpoint
 from app.dependencies.templates import templates, templates_path
 from app.dependencies.utility import user_details
+from app.utility.lazy_import import LazyImport
+
+usdm_info = LazyImport("usdm4.__info__")
 
 router = APIRouter(prefix="/help", tags=["help"])
 PARTIALS_PATH = os.path.join(templates_path, "help", "partials")
@@ -24,7 +26,7 @@ def about(request: Request, session: Session = Depends(get_db)):
         "release_notes": rn.notes(),
         "system": SYSTEM_NAME,
         "version": VERSION,
-        "usdm": usdm_version,
+        "usdm": usdm_info.__model_version__,
     }
     return templates.TemplateResponse(
         request, "help/about.html", {"user": user, "data": data}
@@ -3,21 +3,26 @@ import json
 from d4k_ms_base.logger import application_logger
 from d4k_ms_ui.pagination import Pagination
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from sqlalchemy.orm import Session
-from usdm4.__info__ import __model_version__ as usdm_version
 
 from app.configuration.configuration import application_configuration
 from app.database.database import get_db
 from app.database.file_import import FileImport
+from app.database.import_batch import ImportBatch
+from app.database.import_stage import ImportStage
 from app.dependencies.dependency import protect_endpoint
 from app.dependencies.fhir_version import check_fhir_version
 from app.dependencies.templates import templates
 from app.dependencies.utility import user_details
+from app.imports.batch_handler import BatchHandler
 from app.imports.import_manager import ImportManager
 from app.imports.request_handler import RequestHandler
 from app.model.file_handling.data_files import DataFiles
 from app.model.file_handling.local_files import LocalFiles
+from app.utility.lazy_import import LazyImport
+
+usdm_info = LazyImport("usdm4.__info__")
 
 router = APIRouter(
     prefix="/import", tags=["import"], dependencies=[Depends(protect_endpoint)]
@@ -33,7 +38,7 @@ def import_usdm(request: Request, session: Session = Depends(get_db)):
         False,
         "/import/usdm",
         "import/import_json.html",
-        {"version": usdm_version},
+        {"version": usdm_info.__model_version__},
     )
 
 
@@ -156,6 +161,28 @@ async def import_usdm_process(
     )
 
 
+@router.post("/batch", dependencies=[Depends(protect_endpoint)])
+async def import_batch_process(
+    request: Request, source: str = "browser", session: Session = Depends(get_db)
+):
+    """Queue many files, of mixed import types, in one request. See
+    :class:`BatchHandler` for how each file's type is chosen. Returns
+    the batch id, the files queued and those rejected with reasons."""
+    user, present_in_db = user_details(request, session)
+    return await BatchHandler(source).process(request, user, session)
+
+
+@router.get("/batch/{id}/status", dependencies=[Depends(protect_endpoint)])
+async def import_batch_status(
+    request: Request, id: int, session: Session = Depends(get_db)
+):
+    user, present_in_db = user_details(request, session)
+    batch = ImportBatch.find(id, session)
+    if not batch or batch.user_id != user.id:
+        return JSONResponse({"error": "Import batch not found"}, status_code=404)
+    return batch.status(session)
+
+
 @router.get("/status", dependencies=[Depends(protect_endpoint)])
 async def import_status(
     request: Request,
@@ -181,6 +208,9 @@ async def import_status_data(
 ):
     user, present_in_db = user_details(request, session)
     data = FileImport.page(page, size, user.id, session)
+    stages = ImportStage.for_imports([x["id"] for x in data["items"]], session)
+    for item in data["items"]:
+        item["stages"] = stages.get(item["id"], [])
     pagination = Pagination(data, "/import/status/data")
     # print(f"********** Data: {data}")
     return templates.TemplateResponse(
@@ -190,6 +220,17 @@ async def import_status_data(
     )
 
 
+@router.get("/status/timings", dependencies=[Depends(protect_endpoint)])
+async def import_status_timings(request: Request, session: Session = Depends(get_db)):
+    user, present_in_db = user_details(request, session)
+    data = {"types": ImportStage.percentiles(session), "sample": ImportStage.SAMPLE}
+    return templates.TemplateResponse(
+        request,
+        "import/partials/timings.html",
+        {"user": user, "data": data},
+    )
+
+
 @router.get("/{id}/errors", dependencies=[Depends(protect_endpoint)])
 async def import_errors(request: Request, id: str, session: Session = Depends(get_db)):
     user, present_in_db = user_details(request, session)
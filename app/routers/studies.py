@@ -1,12 +1,10 @@
+import asyncio
 import json
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Form, Request, status
 from fastapi.responses import RedirectResponse
-from simple_error_log import Errors
 from sqlalchemy.orm import Session
-from usdm4.api.wrapper import StudyVersion, Wrapper
-from usdm4_protocol.m11.views.data_view import DataView
 
 from app.database.database import get_db
 from app.database.file_import import FileImport
@@ -16,10 +14,16 @@ from app.dependencies.dependency import protect_endpoint
 from app.dependencies.fhir_version import fhir_versions
 from app.dependencies.templates import templates
 from app.dependencies.utility import transmit_role_enabled, user_details
+from app.model.compare_digest import CompareDigest
 from app.model.file_handling.data_files import DataFiles
 from app.model.usdm_json import USDMJson
+from app.utility.lazy_import import LazyImport
+from app.utility.render_pool import render_pool
 from app.utility.template_methods import restructure_study_list
 
+StudyVersion = LazyImport("usdm4.api.wrapper", "StudyVersion")
+Wrapper = LazyImport("usdm4.api.wrapper", "Wrapper")
+
 router = APIRouter(
     prefix="/studies", tags=["studies"], dependencies=[Depends(protect_endpoint)]
 )
@@ -70,7 +74,7 @@ def study_delete(
 
 
 @router.get("/list", dependencies=[Depends(protect_endpoint)])
-def study_list(
+async def study_list(
     request: Request, list_studies: str = None, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
@@ -99,56 +103,38 @@ def study_list(
         # TOC links so each hx-get carries the same set of studies.
         "list_studies": list_studies or "",
     }
-    # M11 document versions for the selected studies, collected so the
-    # section-compare TOC can be built from the union of their narrative
-    # content (see _section_toc). Non-M11 studies contribute nothing.
-    section_docs = []
+    # Each study's compare digest (see CompareDigest) and persisted M11
+    # findings are read on the render pool, all studies at once; only
+    # the import lookup uses the session.
+    imports = []
     for id in parts:
         version = Version.find_latest_version(id, session)
-        usdm = USDMJson(version.id, session)
-        wrapper: Wrapper = usdm.wrapper()
-        study_version: StudyVersion = wrapper.first_version()
-        errors = Errors()
-        m11 = DataView(wrapper, errors)
-        data["import_type"].append(FileImport.find(version.import_id, session).type)
-        data["sponsor_id"].append(study_version.sponsor_identifier_text())
-        data["m11_title_page"].append(m11.title_page())
-        section_docs.append(wrapper.study_document_version("M11"))
-        # M11 validation findings were captured during import and
-        # persisted as the ``m11_validation`` DataFiles media type (see
-        # ``ImportM11.process()``). The compare view just reads that
-        # file — it does NOT re-run the validator here. When the file
-        # is missing (legacy imports, non-M11 imports) the cell shows
-        # empty, which the template renders as "0 findings".
-        data["m11_validation"].append(_m11_validation_for_study(usdm))
+        file_import = FileImport.find(version.import_id, session)
+        imports.append((file_import.uuid, file_import.type))
+    columns = await asyncio.gather(
+        *[render_pool.run(_compare_column, uuid, type) for uuid, type in imports]
+    )
+    # M11 section lists for the selected studies, collected so the
+    # section-compare TOC can be built from their union (see
+    # _section_toc). Non-M11 studies contribute nothing.
+    section_lists = []
+    for digest, m11_validation in columns:
+        data["import_type"].append(digest["import_type"])
+        data["sponsor_id"].append(digest["sponsor_id"])
+        data["m11_title_page"].append(digest["title_page"])
+        section_lists.append(digest["sections"])
+        data["m11_validation"].append(m11_validation)
         # Criteria per design: one group per study design so multi-design
         # studies show all their criteria, labelled by design. The template
         # only prints the design label when a study has more than one.
-        ie_map = study_version.eligibility_critieria_item_map()
-        data["inclusion"].append(
-            [
-                {
-                    "design": sd.label or sd.name,
-                    "criteria": sd.inclusion_criteria(ie_map),
-                }
-                for sd in study_version.studyDesigns
-            ]
-        )
-        data["exclusion"].append(
-            [
-                {
-                    "design": sd.label or sd.name,
-                    "criteria": sd.exclusion_criteria(ie_map),
-                }
-                for sd in study_version.studyDesigns
-            ]
-        )
+        data["inclusion"].append(digest["inclusion"])
+        data["exclusion"].append(digest["exclusion"])
     data["m11_title_page"] = restructure_study_list(data["m11_title_page"])
     # Column count for the compare tables. Driven by the selection, not by
     # the M11 title-page rows, which are empty when no selected study is an
     # M11 import.
     data["study_count"] = len(parts)
-    data["sections"] = _section_toc(section_docs)
+    data["sections"] = _section_toc(section_lists)
     data["fhir"] = {
         "enabled": transmit_role_enabled(request),
         "versions": fhir_versions(),
@@ -158,6 +144,13 @@ def study_list(
     )
 
 
+def _compare_column(uuid: str, import_type: str) -> tuple[dict, dict]:
+    """The compare digest and M11 findings of one study. The digest is
+    built, and saved, here for versions imported before digests were."""
+    digest = CompareDigest(DataFiles(uuid)).get(import_type)
+    return digest, _m11_validation_for_study(uuid, import_type)
+
+
 def _section_sort_key(number: str) -> list:
     """Natural sort key for an M11 section number like ``1``, ``1.1``,
     ``1.10``, ``2``. Splits on dots and compares each part numerically
@@ -174,36 +167,24 @@ def _section_sort_key(number: str) -> list:
     return key
 
 
-def _section_toc(section_docs: list) -> list[dict]:
+def _section_toc(section_lists: list[list[dict]]) -> list[dict]:
     """Build the section-compare Table of Contents from the union of the
     selected studies' M11 narrative content.
 
-    Each study contributes its ordered narrative sections; we key on
-    ``sectionNumber`` (the assumption is M11 numbering — see
-    ``docs/next_steps.md``) so a section present in one protocol but
-    missing from another still appears in the menu exactly once. The
-    result is sorted by natural section number so the tree reads 1, 1.1,
-    1.1.1, 2, … regardless of which study supplied each entry.
+    Each study contributes its ordered narrative sections (see
+    ``CompareDigest.sections``); we key on ``number`` (the assumption is
+    M11 numbering — see ``docs/next_steps.md``) so a section present in
+    one protocol but missing from another still appears in the menu
+    exactly once. The result is sorted by natural section number so the
+    tree reads 1, 1.1, 1.1.1, 2, … regardless of which study supplied
+    each entry.
 
-    ``section_docs`` entries are ``StudyDefinitionDocumentVersion`` or
-    ``None`` (non-M11 studies); ``None`` entries contribute nothing.
+    Non-M11 studies contribute an empty list.
     """
     seen: dict[str, dict] = {}
-    for sddv in section_docs:
-        if not sddv:
-            continue
-        for nc in sddv.narrative_content_in_order():
-            number = (nc.sectionNumber or "").strip()
-            # Skip the title page (section "0", rendered as its own tab)
-            # and any content lacking a usable section number.
-            if not number or number == "0":
-                continue
-            if number not in seen:
-                seen[number] = {
-                    "number": number,
-                    "title": nc.sectionTitle or "",
-                    "level": nc.level(),
-                }
+    for sections in section_lists:
+        for section in sections:
+            seen.setdefault(section["number"], section)
     return sorted(seen.values(), key=lambda s: _section_sort_key(s["number"]))
 
 
@@ -249,7 +230,7 @@ def study_section(
     )
 
 
-def _m11_validation_for_study(usdm: USDMJson) -> dict[str, list[dict]]:
+def _m11_validation_for_study(uuid: str, import_type: str) -> dict[str, list[dict]]:
     """Return the persisted M11 validation findings for a study, grouped
     by element name.
 
@@ -268,10 +249,10 @@ def _m11_validation_for_study(usdm: USDMJson) -> dict[str, list[dict]]:
     Callers (the compare view) treat the empty dict as "0 findings" — see
     the namespace counters in ``studies/list.html``.
     """
-    if not getattr(usdm, "m11", False):
+    if import_type not in USDMJson.M11_IMPORTS:
         return {}
     try:
-        files = DataFiles(usdm.uuid)
+        files = DataFiles(uuid)
         full_path, _filename, exists = files.generic_path("m11_validation")
     except Exception:
         return {}
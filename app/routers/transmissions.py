@@ -1,12 +1,25 @@
+from typing import Annotated
+
 from d4k_ms_ui.pagination import Pagination
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Form, Request, status
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 
 from app.database.database import get_db
+from app.database.study import Study
 from app.database.transmission import Transmission
+from app.database.user import User
 from app.dependencies.dependency import protect_endpoint
+from app.dependencies.fhir_version import (
+    check_fhir_version,
+    fhir_version_description,
+    fhir_version_transmit,
+    fhir_versions,
+)
 from app.dependencies.templates import templates
 from app.dependencies.utility import transmit_role_enabled, user_details
+from app.utility.backbone_transmit import backbone_enabled
+from app.utility.bulk_transmit import MODES, run_bulk_transmit
 from app.utility.fhir_uuid import extract_uuid
 
 router = APIRouter(
@@ -73,3 +86,83 @@ async def import_status_data(
                 "data": {"error": "User is not authorised to transmit FHIR messages."},
             },
         )
+
+
+@router.get("/bulk")
+async def bulk_transmit(
+    request: Request,
+    list_studies: str = None,
+    session: Session = Depends(get_db),
+):
+    user, present_in_db = user_details(request, session)
+    if not transmit_role_enabled(request):
+        return _not_authorised(request, user)
+    data = {
+        "list_studies": list_studies or "",
+        "studies": [Study.summary(id, session) for id in _study_ids(list_studies)],
+        "endpoints": User.endpoints_page(1, 100, user.id, session),
+        "versions": [
+            {"version": x, "description": fhir_version_description(x)}
+            for x in fhir_versions()
+            if fhir_version_transmit(x)
+        ],
+        "modes": MODES,
+        "backbone": {"enabled": backbone_enabled()},
+    }
+    return templates.TemplateResponse(
+        request, "transmissions/bulk.html", {"user": user, "data": data}
+    )
+
+
+@router.post("/bulk")
+async def bulk_transmit_process(
+    request: Request,
+    list_studies: Annotated[str, Form()],
+    target: Annotated[str, Form()],
+    version: Annotated[str, Form()] = "",
+    mode: Annotated[str, Form()] = "single",
+    session: Session = Depends(get_db),
+):
+    user, present_in_db = user_details(request, session)
+    if not transmit_role_enabled(request):
+        return _not_authorised(request, user)
+    study_ids = _study_ids(list_studies)
+    if target == "backbone":
+        if not backbone_enabled():
+            return _error(
+                request,
+                user,
+                "No backbone has been configured (BACKBONE_URL is not set).",
+            )
+        run_bulk_transmit(study_ids, None, "", "single", user)
+    else:
+        endpoints = User.endpoints_page(1, 100, user.id, session)
+        ids = [str(x["id"]) for x in endpoints["items"]]
+        valid, _ = check_fhir_version(version)
+        if target not in ids:
+            return _error(request, user, f"Unknown endpoint '{target}' requested.")
+        if not valid or not fhir_version_transmit(version):
+            return _error(
+                request,
+                user,
+                f"Invalid FHIR M11 message version transmission requested. Version requested was '{version}'.",
+            )
+        run_bulk_transmit(study_ids, int(target), version, mode, user)
+    return RedirectResponse(
+        "/transmissions/status?page=1&size=10", status_code=status.HTTP_303_SEE_OTHER
+    )
+
+
+def _study_ids(list_studies: str | None) -> list[int]:
+    parts = list_studies.split(",") if list_studies else []
+    return [int(x) for x in parts if x.strip().isdigit()]
+
+
+def _not_authorised(request: Request, user: User):
+    return _error(request, user, "User is not authorised to transmit FHIR messages.")
+
+
+def _error(request: Request, user: User, error: str):
+    return templates.TemplateResponse(
+        request, "errors/error.html", {"user": user, "data": {"error": error}}
+    )
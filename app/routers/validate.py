@@ -1,30 +1,19 @@
 import json
 
+from d4k_ms_ui.pagination import Pagination
 from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import Response, StreamingResponse
-from simple_error_log import Errors as M11Errors
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from usdm4 import USDM4
-from usdm4.__info__ import __model_version__ as usdm_version
-from usdm4_protocol.validation.m11 import M11Validator
 
 from app.configuration.configuration import application_configuration
 from app.database.database import get_db
 from app.database.user import User
+from app.database.validation_job import ValidationJob
 from app.dependencies.dependency import protect_endpoint
 from app.dependencies.templates import templates
 from app.dependencies.utility import user_details
 from app.imports.form_handler import FormHandler
-from app.model.file_handling.data_files import DataFiles
 from app.model.file_handling.local_files import LocalFiles
-from app.utility.finding_projections import (
-    project_m11_result,
-    project_m11_summary,
-    project_usdm_cdisc_result,
-    project_usdm_cdisc_summary,
-    project_usdm_d4k_result,
-    project_usdm_d4k_summary,
-)
 from app.utility.findings_export import (
     default_filename,
     sanitise_filename,
@@ -41,6 +30,11 @@ from app.utility.findings_export import (
 from app.utility.findings_export import (
     to_xlsx as findings_to_xlsx,
 )
+from app.utility.lazy_import import LazyImport
+from app.validation.validation_manager import ValidationManager
+from app.validation.validation_queue import validation_queue
+
+usdm_info = LazyImport("usdm4.__info__")
 
 router = APIRouter(
     prefix="/validate", tags=["validate"], dependencies=[Depends(protect_endpoint)]
@@ -62,7 +56,7 @@ def validate_usdm(request: Request, session: Session = Depends(get_db)):
         False,
         "/validate/usdm",
         "validate/partials/validate_json.html",
-        {"version": usdm_version, "engine": "CDISC"},
+        {"version": usdm_info.__model_version__, "engine": "CDISC"},
     )
 
 
@@ -70,13 +64,11 @@ def validate_usdm(request: Request, session: Session = Depends(get_db)):
 async def validate_usdm_process(
     request: Request, source: str = "browser", session: Session = Depends(get_db)
 ):
-    """POST companion to the default ``/validate/usdm`` picker. Defers
-    to the shared ``_process_usdm_engine`` helper with the CDISC
-    engine — keeps the default route's results page identical to
-    ``/validate/usdm/cdisc`` rather than the bare-bones output of
-    ``_process``."""
+    """POST companion to the default ``/validate/usdm`` picker. Submits
+    a CDISC engine job via the shared ``_submit`` helper — keeps the
+    default route's behaviour identical to ``/validate/usdm/cdisc``."""
     user, present_in_db = user_details(request, session)
-    return await _process_usdm_engine(request, user, source, engine="cdisc")
+    return await _submit(request, user, source, ValidationManager.CDISC, session)
 
 
 @router.get("/usdm/d4k", dependencies=[Depends(protect_endpoint)])
@@ -91,7 +83,7 @@ def validate_usdm_d4k(request: Request, session: Session = Depends(get_db)):
         False,
         "/validate/usdm/d4k",
         "validate/partials/validate_json.html",
-        {"version": usdm_version, "engine": "d4k"},
+        {"version": usdm_info.__model_version__, "engine": "d4k"},
     )
 
 
@@ -100,7 +92,7 @@ async def validate_usdm_d4k_process(
     request: Request, source: str = "browser", session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    return await _process_usdm_engine(request, user, source, engine="d4k")
+    return await _submit(request, user, source, ValidationManager.D4K, session)
 
 
 @router.get("/usdm/cdisc", dependencies=[Depends(protect_endpoint)])
@@ -117,7 +109,7 @@ def validate_usdm_cdisc(request: Request, session: Session = Depends(get_db)):
         False,
         "/validate/usdm/cdisc",
         "validate/partials/validate_json.html",
-        {"version": usdm_version, "engine": "CDISC"},
+        {"version": usdm_info.__model_version__, "engine": "CDISC"},
     )
 
 
@@ -126,7 +118,7 @@ async def validate_usdm_cdisc_process(
     request: Request, source: str = "browser", session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    return await _process_usdm_engine(request, user, source, engine="cdisc")
+    return await _submit(request, user, source, ValidationManager.CDISC, session)
 
 
 @router.get("/m11-docx", dependencies=[Depends(protect_endpoint)])
@@ -149,7 +141,7 @@ async def validate_m11_docx_process(
     request: Request, source: str = "browser", session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    return await _process_m11_docx(request, user, source)
+    return await _submit(request, user, source, ValidationManager.M11, session)
 
 
 @staticmethod
@@ -179,105 +171,71 @@ def _strip_accepted_messages(messages: list[str]) -> list[str]:
 
     The banner makes sense on background imports (where the user wants
     a "we got your file" signal while the import runs asynchronously),
-    but is just noise on the foreground validation flows — the user is
-    already watching the findings table appear, so confirming the
-    upload landed is redundant. Operational warnings ("File 'X' was
+    but is just noise on the validation flows — the submitted page
+    already names the job and the file, so confirming the upload
+    landed is redundant. Operational warnings ("File 'X' was
     ignored ...", "Failed to process the validation file") remain.
     """
     return [m for m in messages if not m.endswith(" accepted")]
 
 
 @staticmethod
-async def _process_usdm_engine(request: Request, user: User, source: str, engine: str):
-    """Shared handler for the two USDM v4 validation flows.
-
-    ``engine`` is ``"d4k"`` (the d4k / usdm4 Python rule library,
-    :meth:`USDM4.validate`) or ``"cdisc"`` (CDISC CORE JSONata engine,
-    :meth:`USDM4.validate_core` — CORE is the only CDISC engine, so the
-    workbench labels it just ``cdisc``). Both return engine-native
-    result objects that we project into the shared UI row shape via
-    :mod:`app.utility.finding_projections` before rendering the common
-    ``validate/partials/results.html`` template. The header card uses
-    the same ``"d4k"`` / ``"cdisc"`` discriminator on
-    ``summary['engine']`` to pick its title and per-engine subtitle
-    extras, so the dispatch hint and the template tag stay in sync.
-
-    The CORE run can take several minutes on a cold cache — today this
-    call is synchronous which means the HTMX swap blocks until the
-    engine returns. Background execution is tracked as an SDW roadmap
-    item (see ``docs/next_steps.md``); wiring it in changes the route
-    shape, not this helper.
+async def _submit(
+    request: Request, user: User, source: str, engine: str, session: Session
+):
+    """Shared handler for the three validation POSTs.
+
+    ``engine`` is ``"d4k"`` (the usdm4 Python rule library,
+    :meth:`USDM4.validate`), ``"cdisc"`` (CDISC CORE,
+    :meth:`USDM4.validate_core` — the only CDISC engine, so the
+    workbench labels it just ``cdisc``) or ``"m11"`` (the standalone
+    :class:`M11Validator`). The upload is saved and submitted to
+    ``validation_queue``; the engine runs on a worker thread, so the
+    response — the job id and links to the results page — comes back
+    straight away even for a CORE run on a cold cache, which can take
+    several minutes. The user is told via the alerts websocket when
+    the job finishes. A file the engine has already validated is served
+    from the validation cache at submission and its findings are
+    rendered directly.
     """
-    form_handler = FormHandler(request, False, ".json", source)
+    manager = ValidationManager(user, engine)
+    form_handler = FormHandler(request, False, manager.file_ext, source, stream=True)
     main_file, image_files, messages = await form_handler.get_files()
-    findings: list[dict] = []
-    summary: dict = {}
-    if main_file:
-        files = DataFiles()
-        _ = files.new()
-        files.save("usdm", main_file["contents"], main_file["filename"])
-        full_path, filename, exists = files.path("usdm")
-        # Pass the configured CORE cache path (empty string falls through
-        # to the USDM4 platform default). This keeps the downloaded
-        # JSONata files, XSD schemas, rules, and CT packages on the
-        # mounted volume so they survive container restarts — a cold
-        # cache run can take several minutes.
-        usdm = USDM4(cache_dir=application_configuration.cdisc_core_cache_path or None)
-        if engine == "cdisc":
-            results = usdm.validate_core(full_path)
-            findings = project_usdm_cdisc_result(results)
-            # CDISC's CORE engine returns a rich run-level context
-            # (rules executed / skipped, execution errors, CT packages
-            # loaded, …) that the d4k engine has no equivalent for.
-            # Surface it via the results-page header card.
-            # ``project_usdm_cdisc_summary`` returns ``{}`` for non-CDISC
-            # / None inputs so the template can use a single
-            # ``{% if summary %}`` guard.
-            summary = project_usdm_cdisc_summary(results)
-            download_kind = "usdm-cdisc-findings"
-            download_title = "USDM v4 CDISC Findings"
-            download_sheet = "USDM CDISC Findings"
-        else:
-            # ``d4k`` is the default — ``engine`` values other than
-            # ``"cdisc"`` fall through here so a typo doesn't silently
-            # swap engines.
-            results = usdm.validate(full_path)
-            findings = project_usdm_d4k_result(results)
-            # Mirror the CDISC flow: feed the run-level outcome
-            # breakdown (rules executed / failures / exceptions / not-
-            # implemented) into the header card so the d4k results
-            # page reads as a sibling of the CDISC one.
-            summary = project_usdm_d4k_summary(results)
-            # Stamp the validated USDM version onto the summary —
-            # ``RulesValidationResults`` doesn't carry one of its own
-            # (the version belongs to the file, not the engine), and
-            # for the d4k engine the workbench currently only ships
-            # validation against the active ``usdm_version``.
-            summary["version"] = usdm_version
-            download_kind = "usdm-d4k-findings"
-            download_title = "USDM v4 d4k Findings"
-            download_sheet = "USDM d4k Findings"
-        files.delete()
+    job = None
+    if manager.save_file(main_file):
+        job = ValidationJob.find(validation_queue.submit(manager), session)
     else:
         messages.append("Failed to process the validation file")
-        download_kind = (
-            "usdm-cdisc-findings" if engine == "cdisc" else "usdm-d4k-findings"
-        )
-        download_title = (
-            "USDM v4 CDISC Findings" if engine == "cdisc" else "USDM v4 d4k Findings"
-        )
-        download_sheet = (
-            "USDM CDISC Findings" if engine == "cdisc" else "USDM d4k Findings"
-        )
     # HTMX retarget: the picker (``import/partials/browser_file_select.html``)
     # wraps its form in an outer ``#picker_card`` with title /
-    # subtitle.  Once results are rendered the result page already
-    # carries that identity in its own header card, so we tell HTMX to
+    # subtitle.  The response carries its own card, so we tell HTMX to
     # replace the *whole* picker card (``HX-Retarget: #picker_card``,
     # ``HX-Reswap: outerHTML``) rather than swapping into the form
     # ``#form_div`` inside it.  Result: the file-picker chrome
     # disappears in one swap — no OOB fragments, no order-of-operations
     # surprises — and we reuse the picker page's outer column layout.
+    headers = {"HX-Retarget": "#picker_card", "HX-Reswap": "outerHTML"}
+    results = {"findings": [], "summary": {}, "messages": []}
+    if job:
+        headers["X-Validation-Job"] = str(job.id)
+    if job and job.status == ValidationJob.COMPLETE:
+        # Served from the validation cache at submission — render the
+        # findings straight away.
+        results = manager.results() or results
+    elif job:
+        return templates.TemplateResponse(
+            request,
+            "validate/partials/submitted.html",
+            {
+                "user": user,
+                "data": {
+                    "job": job,
+                    "label": manager.label(),
+                    "messages": _strip_accepted_messages(messages),
+                },
+            },
+            headers=headers,
+        )
     return templates.TemplateResponse(
         request,
         "validate/partials/results.html",
@@ -285,100 +243,107 @@ async def _process_usdm_engine(request: Request, user: User, source: str, engine
             "user": user,
             "data": {
                 "filename": main_file,
-                "messages": _strip_accepted_messages(messages),
-                "findings": findings,
-                "summary": summary,
-                "download_kind": download_kind,
-                "download_title": download_title,
-                "download_sheet": download_sheet,
-            },
-        },
-        headers={
-            "HX-Retarget": "#picker_card",
-            "HX-Reswap": "outerHTML",
+                "messages": _strip_accepted_messages(messages) + results["messages"],
+                "findings": results["findings"],
+                "summary": results["summary"],
+            }
+            | manager.download(),
         },
+        headers=headers,
     )
 
 
-@staticmethod
-async def _process_m11_docx(request: Request, user: User, source: str):
-    """Process an uploaded M11 ``.docx`` through the standalone M11
-    validator and render the unified findings template.
-
-    Mirrors ``_process_usdm_engine`` for USDM JSON. Differences:
-    ``.docx`` extension and the :class:`M11Validator` entry point
-    (DOCX-layer, no translator). Renders the same
-    ``validate/partials/results.html`` partial as the CDISC and d4k
-    flows so the three validation result pages share one layout — the
-    template branches on ``summary['engine']`` to pick the M11 title
-    and skip USDM-only header extras.
-
-    The annotated-protocol view has been removed from this standalone
-    flow (task #36). It will be rehomed under the study view's
-    validation panel in task #40, where a rendered protocol already
-    exists to hang markers on.
-    """
-    form_handler = FormHandler(
+# --- Validation jobs ---------------------------------------------------
+#
+# Listing of the user's validation jobs plus the persisted results page
+# each completion alert links to. ``/jobs/data`` is declared before
+# ``/jobs/{id}`` so it isn't read as a job id.
+
+
+@router.get("/jobs", dependencies=[Depends(protect_endpoint)])
+async def validation_jobs(
+    request: Request,
+    page: int = 1,
+    size: int = 10,
+    filter: str = "",
+    session: Session = Depends(get_db),
+):
+    user, present_in_db = user_details(request, session)
+    data = {"page": page, "size": size, "filter": filter}
+    return templates.TemplateResponse(
+        request, "validate/jobs.html", {"user": user, "data": data}
+    )
+
+
+@router.get("/jobs/data", dependencies=[Depends(protect_endpoint)])
+async def validation_jobs_data(
+    request: Request,
+    page: int,
+    size: int,
+    filter: str = "",
+    session: Session = Depends(get_db),
+):
+    user, present_in_db = user_details(request, session)
+    data = ValidationJob.page(page, size, user.id, session)
+    pagination = Pagination(data, "/validate/jobs/data")
+    return templates.TemplateResponse(
         request,
-        False,
-        ".docx",
-        source,
+        "validate/partials/jobs.html",
+        {"user": user, "pagination": pagination, "data": data},
     )
-    main_file, image_files, messages = await form_handler.get_files()
-    findings: list[dict] = []
-    summary: dict = {}
-    if main_file:
-        files = DataFiles()
-        _ = files.new()
-        # Reuse the existing "docx" media type; "m11" isn't registered in
-        # DataFiles.media_type and shouldn't be added just for validation.
-        files.save("docx", main_file["contents"], main_file["filename"])
-        full_path, filename, exists = files.path("docx")
-        # Standalone validator — runs against the DOCX directly without
-        # going through the USDM4 translator.  See
-        # usdm4_protocol/docs/m11_validator_v2_plan.md for the design.
-        validator_errors = M11Errors()
-        results = M11Validator(full_path, validator_errors).validate()
-        # Project the M11 engine's Results object into the shared UI row
-        # shape and summary dict consumed by
-        # ``validate/partials/results.html``.
-        findings = project_m11_result(results)
-        summary = project_m11_summary(results, findings)
-        if results.count() == 0 and validator_errors.count() > 0:
-            # Reader or runner failed before any rule could run —
-            # surface the operational problem rather than claim
-            # success.
-            messages.append("Validation could not be completed (extraction failed).")
-        files.delete()
-    else:
-        messages.append("Failed to process the validation file")
-    # HTMX retarget mirrors the USDM v4 flows: replace the whole
-    # ``#picker_card`` with the rendered results card in one swap so
-    # the picker chrome (title / subtitle / border) disappears
-    # cleanly.  The unified template carries its own header card with
-    # the M11 identity, so no out-of-band fragments are needed.
+
+
+@router.get("/jobs/{id}/status", dependencies=[Depends(protect_endpoint)])
+async def validation_job_status(
+    request: Request, id: int, session: Session = Depends(get_db)
+):
+    user, present_in_db = user_details(request, session)
+    job = ValidationJob.find(id, session)
+    if not job or job.user_id != user.id:
+        return JSONResponse({"error": "Validation job not found"}, status_code=404)
+    return {
+        "id": job.id,
+        "engine": job.engine,
+        "filename": job.filename,
+        "status": job.status,
+        "findings": job.findings,
+    }
+
+
+@router.get("/jobs/{id}", dependencies=[Depends(protect_endpoint)])
+async def validation_job(request: Request, id: int, session: Session = Depends(get_db)):
+    """Render a job's persisted findings with the shared results
+    partial, or the job's status while it is still queued / running."""
+    user, present_in_db = user_details(request, session)
+    job = ValidationJob.find(id, session)
+    if not job or job.user_id != user.id:
+        return templates.TemplateResponse(
+            request,
+            "errors/error.html",
+            {"user": user, "data": {"error": "Validation job not found"}},
+        )
+    manager = ValidationManager.restore(user, job.engine, job.uuid, job.filename)
+    results = manager.results() if job.status == ValidationJob.COMPLETE else None
+    messages = []
+    if job.status == ValidationJob.FAILED:
+        messages.append("Validation failed, see logs for more information")
+    elif job.status == ValidationJob.COMPLETE and results is None:
+        messages.append("Validation results could not be read — they may be corrupted.")
+    results = results or {"findings": [], "summary": {}, "messages": []}
     return templates.TemplateResponse(
         request,
-        "validate/partials/results.html",
+        "validate/job.html",
         {
             "user": user,
             "data": {
-                "filename": main_file,
-                "messages": _strip_accepted_messages(messages),
-                "findings": findings,
-                "summary": summary,
-                # Download metadata shared with the USDM v4 flows — the
-                # results template passes these through to the
-                # hidden-input form so /validate/download/{csv,json,md,
-                # xlsx} produces filenames and headings tagged for M11.
-                "download_kind": "m11-findings",
-                "download_title": "M11 Validation Findings",
-                "download_sheet": "M11 Findings",
-            },
-        },
-        headers={
-            "HX-Retarget": "#picker_card",
-            "HX-Reswap": "outerHTML",
+                "job": job,
+                "label": manager.label(),
+                "filename": {"filename": job.filename},
+                "findings": results["findings"],
+                "summary": results["summary"],
+                "messages": results["messages"] + messages,
+            }
+            | manager.download(),
         },
     )
 
@@ -2,15 +2,22 @@ from fastapi import APIRouter, Depends, Request
 from fastapi.responses import FileResponse, RedirectResponse
 from simple_error_log import Errors
 from sqlalchemy.orm import Session
-from usdm4_pj import USDM4PJ
 
 from app.database.database import get_db
 from app.database.user import User
 from app.dependencies.dependency import protect_endpoint
 from app.dependencies.templates import templates
-from app.dependencies.utility import transmit_role_enabled, user_details
+from app.dependencies.utility import (
+    download_response,
+    transmit_role_enabled,
+    user_details,
+)
 from app.model.usdm_json import USDMJson
 from app.utility.fhir_transmit import run_fhir_soa_transmit
+from app.utility.lazy_import import LazyImport
+from app.utility.render_pool import render_pool
+
+USDM4PJ = LazyImport("usdm4_pj", "USDM4PJ")
 
 router = APIRouter(
     prefix="/versions",
@@ -30,8 +37,8 @@ async def get_study_design_timelines(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
-    data = usdm.schedule_of_activities(study_design_id)
+    usdm = await render_pool.run(USDMJson, version_id, session)
+    data = await render_pool.run(usdm.schedule_of_activities, study_design_id)
     # print(f"DATA: {data}")
     return templates.TemplateResponse(
         request, "study_designs/partials/timelines.html", {"user": user, "data": data}
@@ -50,8 +57,8 @@ async def get_study_design_timeline_soa(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
-    data = usdm.soa(study_design_id, timeline_id)
+    usdm = await render_pool.run(USDMJson, version_id, session)
+    data = await render_pool.run(usdm.soa, study_design_id, timeline_id)
     data["fhir"] = {"enabled": transmit_role_enabled(request)}
     data["endpoints"] = User.endpoints_page(1, 100, user.id, session)
     # print(f"DATA: {data}")
@@ -72,7 +79,7 @@ async def display_patient_journey(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     df = usdm._files
     full_path, filename, media_type = df.path("usdm")
     if full_path:
@@ -84,7 +91,7 @@ async def display_patient_journey(
             "timeline": {"id": timeline_id},
             "fhir": {"enabled": transmit_role_enabled(request)},
             "endpoints": User.endpoints_page(1, 100, user.id, session),
-            "json": pj.simple_view(full_path, study_design_id),
+            "json": await render_pool.run(pj.simple_view, full_path, study_design_id),
         }
         # print(f"DATA: {data}\n\n{errors.dump(0)}")
         return templates.TemplateResponse(
@@ -112,7 +119,7 @@ async def display_expansion(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     df = usdm._files
     usdm_full_path, _, _ = df.path("usdm")
     if usdm_full_path:
@@ -131,7 +138,8 @@ async def display_expansion(
             "timeline": {"id": timeline_id},
             "fhir": {"enabled": transmit_role_enabled(request)},
             "endpoints": User.endpoints_page(1, 100, user.id, session),
-            "json": pj.expanded_view(
+            "json": await render_pool.run(
+                pj.expanded_view,
                 usdm_full_path,
                 study_design_id,
                 costs_file_path=costs_full_path,
@@ -164,10 +172,10 @@ async def get_study_design_timeline_export_fhir(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
-    full_path, filename, media_type = usdm.fhir_soa(timeline_id)
+    usdm = await render_pool.run(USDMJson, version_id, session)
+    full_path, filename, media_type = await render_pool.run(usdm.fhir_soa, timeline_id)
     if full_path:
-        return FileResponse(path=full_path, filename=filename, media_type=media_type)
+        return download_response(request, full_path, filename, media_type)
     else:
         return templates.TemplateResponse(
             request,
@@ -193,7 +201,7 @@ async def export_expansion(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     df = usdm._files
     full_path, filename, media_type = df.path("usdm")
     if full_path:
@@ -207,7 +215,8 @@ async def export_expansion(
         pj = USDM4PJ(errors)
         filepath, filename = df.save(
             "expansion",
-            pj.expanded_view(
+            await render_pool.run(
+                pj.expanded_view,
                 full_path,
                 study_design_id,
                 costs_file_path=costs_full_path,
@@ -237,13 +246,15 @@ async def export_patient_journey(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(version_id, session)
+    usdm = await render_pool.run(USDMJson, version_id, session)
     df = usdm._files
     full_path, filename, media_type = df.path("usdm")
     if full_path:
         errors = Errors()
         pj = USDM4PJ(errors)
-        filepath, filename = df.save("pj", pj.simple_view(full_path, study_design_id))
+        filepath, filename = df.save(
+            "pj", await render_pool.run(pj.simple_view, full_path, study_design_id)
+        )
         return FileResponse(path=filepath, filename=filename, media_type="text/plain")
     else:
         return templates.TemplateResponse(
@@ -6,9 +6,6 @@ from d4k_ms_ui.pagination import Pagination
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import FileResponse, RedirectResponse
 from sqlalchemy.orm import Session
-from usdm4.api import Wrapper
-from usdm4_protocol.cpt import USDM4CPT
-from usdm4_protocol.m11 import USDM4M11
 
 from app.configuration.configuration import application_configuration
 from app.database.database import get_db
@@ -18,14 +15,25 @@ from app.database.version import Version
 from app.dependencies.dependency import protect_endpoint
 from app.dependencies.fhir_version import fhir_versions
 from app.dependencies.templates import templates
-from app.dependencies.utility import transmit_role_enabled, user_details
+from app.dependencies.utility import (
+    download_response,
+    transmit_role_enabled,
+    user_details,
+)
 from app.imports.form_handler import FormHandler
 from app.model.file_handling.data_files import DataFiles
 from app.model.file_handling.local_files import LocalFiles
+from app.model.rendered_protocol import RenderedProtocol
 from app.model.usdm_json import USDMJson
 from app.usdm_database.usdm_database import USDMDatabase
 from app.utility.backbone_transmit import backbone_enabled, run_backbone_transmit
+from app.utility.lazy_import import LazyImport
 from app.utility.m11_annotate import annotate as m11_annotate
+from app.utility.render_pool import render_pool
+
+Wrapper = LazyImport("usdm4.api", "Wrapper")
+USDM4CPT = LazyImport("usdm4_protocol.cpt", "USDM4CPT")
+USDM4M11 = LazyImport("usdm4_protocol.m11", "USDM4M11")
 
 router = APIRouter(
     prefix="/versions", tags=["versions"], dependencies=[Depends(protect_endpoint)]
@@ -37,7 +45,7 @@ async def get_version_summary(
     request: Request, id: int, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     data = {
         "version": usdm.study_version(),
         "templates": usdm.templates(),
@@ -80,7 +88,7 @@ async def import_yaml_process(
     session: Session = Depends(get_db),
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     form_handler = FormHandler(
         request,
         False,
@@ -93,6 +101,7 @@ async def import_yaml_process(
     contents = yaml.safe_load(main_file["contents"].decode())
     full_path, _ = df.save(load_type, contents, filename)
     if full_path:
+        RenderedProtocol(df).invalidate()
         return templates.TemplateResponse(
             request,
             "import/partials/upload_success.html",
@@ -157,7 +166,7 @@ async def get_version_history(
     request: Request, id: int, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     data = {
         "version": usdm.study_version(),
         "version_id": id,
@@ -183,14 +192,15 @@ async def get_version_validation(
     imported USDM and overlays anchored markers via
     :func:`app.utility.m11_annotate.annotate`. The DOCX itself is *not*
     re-validated here — the findings were captured at import time so
-    this view is deterministic and cheap to re-render.
+    this view is deterministic. The annotated document is saved on first
+    view by :class:`RenderedProtocol` and served from the file after.
 
     Non-M11 studies, or M11 studies without a persisted findings file,
     render the same template with ``available=False`` so the user sees
     an explanatory empty state rather than a 404.
     """
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     is_m11 = getattr(usdm, "m11", False)
     df = DataFiles(usdm.uuid)
     findings: list[dict] = []
@@ -214,8 +224,12 @@ async def get_version_validation(
     if available:
         try:
             usdm_path, _, _ = usdm.json()
-            rendered = USDM4M11().to_html(usdm_path)
-            annotated = m11_annotate(rendered, findings)
+            annotated = await render_pool.run(
+                RenderedProtocol(df).annotated,
+                findings,
+                lambda: USDM4M11().to_html(usdm_path),
+                m11_annotate,
+            )
             annotated_html = annotated.html
             unplaced = annotated.unplaced
             placed_count = annotated.placed_count
@@ -267,9 +281,9 @@ async def get_version_history_data(
 async def export_excel(request: Request, id: int, session: Session = Depends(get_db)):
     user, present_in_db = user_details(request, session)
     usdm_db = USDMDatabase(id, session)
-    full_path, filename, media_type = usdm_db.excel()
+    full_path, filename, media_type = await render_pool.run(usdm_db.excel)
     if full_path:
-        return FileResponse(path=full_path, filename=filename, media_type=media_type)
+        return download_response(request, full_path, filename, media_type)
     else:
         return templates.TemplateResponse(
             request,
@@ -286,10 +300,10 @@ async def protocol(
     request: Request, id: int, template: str, session: Session = Depends(get_db)
 ):
     user, present_in_db = user_details(request, session)
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     full_path, _, _ = usdm.json()
     if full_path:
-        _, html = _generate_protocol(template, full_path, usdm)
+        _, html = await render_pool.run(_generate_protocol, template, full_path, usdm)
         data = {
             "version": usdm.study_version(),
             "document": html,
@@ -315,9 +329,11 @@ async def export_protocol(
 ):
     user, present_in_db = user_details(request, session)
     application_logger.info("PROTOCOL EXPORT")
-    usdm = USDMJson(id, session)
+    usdm = await render_pool.run(USDMJson, id, session)
     full_path, _, _ = usdm.json()
-    file_type, html = _generate_protocol(template, full_path, usdm, export=True)
+    file_type, html = await render_pool.run(
+        _generate_protocol, template, full_path, usdm, export=True
+    )
     protocol_path, filename = usdm._files.save(file_type, html)
     if protocol_path:
         return FileResponse(
@@ -341,19 +357,18 @@ def _generate_protocol(
 ) -> tuple[str, str]:
     html = ""
     file_type = ""
+    rendered = RenderedProtocol(usdm._files)
     if template.upper() == "M11":
+        html = rendered.html(template, lambda: USDM4M11().to_html(full_path))
         if export:
-            body = USDM4M11().to_html(full_path)
             t = templates.get_template("study_versions/m11_protocol_export.html")
-            html = t.render({"content": body})
-        else:
-            html = USDM4M11().to_html(full_path)
+            html = t.render({"content": html})
         file_type = "m11-protocol"
     elif template.upper() == "CPT":
-        html = USDM4CPT().to_html(full_path)
+        html = rendered.html(template, lambda: USDM4CPT().to_html(full_path))
         file_type = "cpt-protocol"
     else:
         wrapper: Wrapper = usdm.wrapper()
-        html = wrapper.to_html(template)
+        html = rendered.html(template, lambda: wrapper.to_html(template))
         file_type = "other-protocol"
     return file_type, html
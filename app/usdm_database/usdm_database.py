@@ -3,11 +3,13 @@
 from sqlalchemy.orm import Session
 
 # from app.imports.import_manager import ImportManager
-from usdm4_excel import USDM4Excel
-
 from app.database.file_import import FileImport
 from app.database.version import Version
+from app.model.export_cache import ExportCache
 from app.model.file_handling.data_files import DataFiles
+from app.utility.lazy_import import LazyImport
+
+USDM4Excel = LazyImport("usdm4_excel", "USDM4Excel")
 
 
 class USDMDatabase:
@@ -21,8 +23,13 @@ class USDMDatabase:
 
     def excel(self):
         usdm_fullpath, _, _ = self._files.path("usdm")
-        excel_fullpath, excel_filename, _ = self._files.generic_path("xlsx")
-        ue = USDM4Excel()
+        _, excel_filename, _ = self._files.generic_path("xlsx")
         # Use the old CDISC single-workbook format for the while
-        ue.to_excel(usdm_fullpath, excel_fullpath, format="legacy")
+        excel_fullpath = ExportCache(self._files).get(
+            "excel",
+            "legacy",
+            "usdm4_excel",
+            "xlsx",
+            lambda path: USDM4Excel().to_excel(usdm_fullpath, path, format="legacy"),
+        )
         return excel_fullpath, excel_filename, "application/vnd.ms-excel"
@@ -3,7 +3,8 @@
 Mirrors the FHIR transmit pattern (``fhir_transmit.py``): the HTTP call
 runs on a background thread, progress is recorded in the Transmission
 audit table, and the outcome is pushed to the user over the WebSocket
-connection manager.
+connection manager. The request goes through the shared outbound HTTP
+client (``outbound_http.py``).
 
 The backbone endpoint is ``POST {BACKBONE_URL}/v1/studies`` taking a
 multipart upload with a single ``file`` field carrying the USDM v4 JSON
@@ -29,6 +30,7 @@ from app.database.transmission import Transmission
 from app.database.user import User
 from app.model.connection_manager import connection_manager
 from app.model.usdm_json import USDMJson
+from app.utility.outbound_http import outbound_http
 
 TIMEOUT = 120.0
 ERROR_LEN = 200
@@ -77,14 +79,8 @@ async def backbone_transmit(version_id: int, user: User) -> None:
         )
         with open(full_path, "rb") as fh:
             contents = fh.read()
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                files={"file": (filename, contents, "application/json")},
-                headers=backbone_headers(),
-                timeout=TIMEOUT,
-            )
-        success, message = _outcome_message(response)
+        response = await backbone_send(filename, contents)
+        success, message = backbone_outcome_message(response)
         tx.update_status(status=message, session=session)
         application_logger.info(message)
         session.close()
@@ -104,7 +100,16 @@ async def backbone_transmit(version_id: int, user: User) -> None:
         )
 
 
-def _outcome_message(response: httpx.Response) -> tuple[bool, str]:
+async def backbone_send(filename: str, contents: bytes) -> httpx.Response:
+    """Post one USDM v4 JSON file to the backbone's load endpoint."""
+    return await outbound_http.client(timeout=TIMEOUT).post(
+        backbone_load_url(),
+        files={"file": (filename, contents, "application/json")},
+        headers=backbone_headers(),
+    )
+
+
+def backbone_outcome_message(response: httpx.Response) -> tuple[bool, str]:
     """Map a backbone load response to a (success, user message) pair."""
     if response.status_code in [200, 201]:
         body = response.json()
@@ -0,0 +1,307 @@
+"""Send the latest version of many studies to a FHIR endpoint or the
+backbone in one operation.
+
+The studies come from the home page selection. Each version's message
+is generated on a small thread pool (``BULK_TRANSMIT_WORKERS``), the
+FHIR M11 message through the export cache so it is generated once, and
+sent through the shared outbound HTTP client, which bounds the requests
+in flight per endpoint. FHIR messages are sent one per request (a PUT,
+as for a single transmission) or gathered into ``batch`` or
+``transaction`` Bundles of ``BATCH_SIZE`` messages POSTed to the server
+base. Every version gets a row in the Transmission table, and the user
+is sent a single summary with the throughput when all are done.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from d4k_ms_base.logger import application_logger
+from sqlalchemy.orm import Session
+
+from app.configuration.configuration import application_configuration
+from app.database.database import SessionLocal
+from app.database.endpoint import Endpoint
+from app.database.study import Study
+from app.database.transmission import Transmission
+from app.database.user import User
+from app.model.connection_manager import connection_manager
+from app.model.usdm_json import USDMJson
+from app.utility.backbone_transmit import backbone_outcome_message, backbone_send
+from app.utility.fhir_service import FHIRService
+from app.utility.fhir_transmit import fhir_failure_message, fhir_outcome_message
+
+BATCH_SIZE = 20
+TIMEOUT = 60.0
+MODES = ["single", "batch", "transaction"]
+
+
+def run_bulk_transmit(
+    study_ids: list[int],
+    endpoint_id: int | None,
+    version: str,
+    mode: str,
+    user: User,
+) -> None:
+    t = threading.Thread(
+        target=asyncio.run,
+        args=(BulkTransmit(study_ids, endpoint_id, version, mode, user).process(),),
+    )
+    t.start()
+
+
+class BulkTransmit:
+    """One bulk transmission. ``endpoint_id`` None sends to the
+    backbone, otherwise the FHIR M11 message of ``version`` is sent to
+    the endpoint in the given mode."""
+
+    def __init__(
+        self,
+        study_ids: list[int],
+        endpoint_id: int | None,
+        version: str,
+        mode: str,
+        user: User,
+    ):
+        self.study_ids = study_ids
+        self.endpoint_id = endpoint_id
+        self.version = version
+        self.mode = mode if mode in MODES else "single"
+        self.user = user
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes = 0
+
+    @property
+    def target(self) -> str:
+        return "the backbone" if self.endpoint_id is None else "FHIR"
+
+    async def process(self) -> dict:
+        session = SessionLocal()
+        start = time.perf_counter()
+        try:
+            versions = self._versions(session)
+            application_logger.info(
+                f"Bulk transmission of {len(versions)} versions to {self.target}, mode '{self.mode}'"
+            )
+            with ThreadPoolExecutor(
+                max_workers=max(application_configuration.bulk_transmit_workers, 1),
+                thread_name_prefix="bulk",
+            ) as executor:
+                if self.endpoint_id is None:
+                    await self._backbone(versions, executor, session)
+                else:
+                    server = FHIRService(
+                        Endpoint.find(self.endpoint_id, session).endpoint
+                    )
+                    if self.mode == "single":
+                        await self._fhir_single(versions, executor, server, session)
+                    else:
+                        await self._fhir_bundles(versions, executor, server, session)
+            summary = self._summary(time.perf_counter() - start)
+            session.close()
+            application_logger.info(summary["message"])
+            if self.failed:
+                await connection_manager.error(summary["message"], str(self.user.id))
+            else:
+                await connection_manager.success(summary["message"], str(self.user.id))
+            return summary
+        except Exception as e:
+            application_logger.exception(
+                f"Exception in bulk transmission to {self.target}", e
+            )
+            session.close()
+            await connection_manager.error(
+                f"Error encountered in the bulk transmission to {self.target}",
+                str(self.user.id),
+            )
+            return self._summary(time.perf_counter() - start)
+
+    def _versions(self, session: Session) -> list[tuple[int, str]]:
+        result = []
+        for id in self.study_ids:
+            summary = Study.summary(id, session)
+            if summary["latest_version_id"]:
+                result.append((summary["latest_version_id"], summary["name"]))
+        return result
+
+    async def _backbone(
+        self, versions: list, executor: ThreadPoolExecutor, session: Session
+    ) -> None:
+        async def send(version_id: int, name: str) -> None:
+            prepared = await self._prepare(executor, version_id, name)
+            if not prepared["data"]:
+                self._record(prepared, False, prepared["error"], session)
+                return
+            response = await backbone_send(prepared["filename"], prepared["data"])
+            success, message = backbone_outcome_message(response)
+            self._record(prepared, success, message, session)
+
+        await asyncio.gather(*[self._guard(send, *x, session) for x in versions])
+
+    async def _fhir_single(
+        self,
+        versions: list,
+        executor: ThreadPoolExecutor,
+        server: FHIRService,
+        session: Session,
+    ) -> None:
+        async def send(version_id: int, name: str) -> None:
+            prepared = await self._prepare(executor, version_id, name)
+            if not prepared["data"]:
+                self._record(prepared, False, prepared["error"], session)
+                return
+            response = await server.put("Bundle", prepared["data"], TIMEOUT)
+            self._record(
+                prepared,
+                response["success"],
+                fhir_outcome_message("M11", response),
+                session,
+            )
+
+        await asyncio.gather(*[self._guard(send, *x, session) for x in versions])
+
+    async def _fhir_bundles(
+        self,
+        versions: list,
+        executor: ThreadPoolExecutor,
+        server: FHIRService,
+        session: Session,
+    ) -> None:
+        prepared = await asyncio.gather(
+            *[self._prepare(executor, *x) for x in versions]
+        )
+        ready = []
+        for item in prepared:
+            if item["data"]:
+                ready.append(item)
+            else:
+                self._record(item, False, item["error"], session)
+        chunks = [ready[i : i + BATCH_SIZE] for i in range(0, len(ready), BATCH_SIZE)]
+        responses = await asyncio.gather(
+            *[server.batch(self.bundle(self.mode, x), TIMEOUT) for x in chunks]
+        )
+        for chunk, response in zip(chunks, responses):
+            for item, (success, message) in zip(chunk, self.outcomes(chunk, response)):
+                self._record(item, success, message, session)
+
+    @staticmethod
+    def bundle(mode: str, items: list[dict]) -> str:
+        """A ``batch`` or ``transaction`` Bundle creating each message."""
+        return json.dumps(
+            {
+                "resourceType": "Bundle",
+                "type": mode,
+                "entry": [
+                    {
+                        "resource": json.loads(x["data"]),
+                        "request": {"method": "POST", "url": "Bundle"},
+                    }
+                    for x in items
+                ],
+            }
+        )
+
+    @staticmethod
+    def outcomes(items: list[dict], response: dict) -> list[tuple[bool, str]]:
+        """The outcome of each message of a batch or transaction from
+        the server's response Bundle, whose entries follow the request's."""
+        if not response["success"]:
+            return [(False, fhir_failure_message("M11", response["message"]))] * len(
+                items
+            )
+        entries = response["data"].get("entry", [])
+        result = []
+        for index in range(len(items)):
+            entry = entries[index] if index < len(entries) else {}
+            status = str(entry.get("response", {}).get("status", ""))
+            if status.startswith("2"):
+                id = entry.get("resource", {}).get("id") or entry["response"].get(
+                    "location", ""
+                )
+                result.append(
+                    (True, f"Succesful transmission of FHIR M11 message: {id}")
+                )
+            else:
+                outcome = json.dumps(entry.get("response", {}).get("outcome", status))
+                result.append((False, fhir_failure_message("M11", outcome)))
+        return result
+
+    async def _prepare(
+        self, executor: ThreadPoolExecutor, version_id: int, name: str
+    ) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self._generate, version_id, name)
+
+    def _generate(self, version_id: int, name: str) -> dict:
+        # Runs on the executor, so with a session of its own.
+        result = {"version_id": version_id, "study": name, "data": None, "error": ""}
+        session = SessionLocal()
+        try:
+            usdm = USDMJson(version_id, session)
+            result["study"] = usdm.study_version()["titles"].get("C207616") or name
+            if self.endpoint_id is None:
+                full_path, result["filename"], _ = usdm.json()
+                with open(full_path, "rb") as f:
+                    result["data"] = f.read()
+            else:
+                full_path, _, _ = usdm.fhir(self.version)
+                with open(full_path, "r", encoding="utf-8") as f:
+                    result["data"] = f.read()
+        except Exception as e:
+            application_logger.exception(
+                f"Exception preparing version '{version_id}' for bulk transmission", e
+            )
+            result["error"] = (
+                f"Error encountered preparing version '{version_id}' for transmission"
+            )
+        finally:
+            session.close()
+        return result
+
+    async def _guard(self, send, version_id: int, name: str, session: Session):
+        try:
+            await send(version_id, name)
+        except Exception as e:
+            application_logger.exception(
+                f"Exception transmitting version '{version_id}' to {self.target}", e
+            )
+            self._record(
+                {"version_id": version_id, "study": name, "data": None},
+                False,
+                f"Error encountered transmitting version '{version_id}' to {self.target}",
+                session,
+            )
+
+    def _record(self, item: dict, success: bool, message: str, session: Session):
+        Transmission.create(
+            version=item["version_id"],
+            study=item["study"],
+            status=message,
+            user_id=self.user.id,
+            session=session,
+        )
+        if success:
+            self.succeeded += 1
+            self.bytes += len(item["data"])
+        else:
+            self.failed += 1
+
+    def _summary(self, seconds: float) -> dict:
+        count = self.succeeded + self.failed
+        rate = count / seconds if seconds > 0 else 0.0
+        return {
+            "count": count,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "seconds": round(seconds, 3),
+            "per_second": round(rate, 2),
+            "message": (
+                f"Bulk transmission to {self.target}: {self.succeeded} of {count} "
+                f"versions sent in {seconds:.1f}s ({rate:.2f} per second), "
+                f"{self.failed} failed"
+            ),
+        }
@@ -21,12 +21,20 @@ class FHIRService(Service):
         return super().post(url, data, timeout)
 
     async def put(self, url, data={}, timeout=None):
+        return await self._authorised("PUT", url, data, timeout)
+
+    async def batch(self, data="", timeout=None):
+        """POST a batch or transaction Bundle to the server base."""
+        return await self._authorised("POST", "", data, timeout)
+
+    async def _authorised(self, operation, url, data, timeout):
         try:
             username = self._se.get("ENDPOINT_USERNAME")
             password = self._se.get("ENDPOINT_PASSWORD")
             headers = {"Content-Type": "application/json"}
             timeout = timeout if timeout else self.DEFAULT_TIMEOUT
-            response = await self._client.put(
+            send = getattr(self._client, operation.lower())
+            response = await send(
                 self._full_url(url),
                 data=data,
                 timeout=timeout,
@@ -36,7 +44,7 @@ class FHIRService(Service):
             return (
                 self._success(response)
                 if response.status_code in [200, 201]
-                else self._failure("PUT", response)
+                else self._failure(operation, response)
             )
         except httpx.HTTPError as e:
-            return self._exception("PUT", e)
+            return self._exception(operation, e)
@@ -12,6 +12,8 @@ from app.model.connection_manager import connection_manager
 from app.model.usdm_json import USDMJson
 from app.utility.fhir_service import FHIRService
 
+ERROR_LEN = 100
+
 
 def run_fhir_m11_transmit(
     version_id: int, endpoint_id: int, version: str, user: User
@@ -63,7 +65,6 @@ async def fhir_transmit(
     user: User,
     session: Session,
 ) -> None:
-    ERROR_LEN = 100
     try:
         application_logger.info(
             f"Sending FHIR message from version id '{version_id}' to endpoint id '{endpoint_id}'"
@@ -79,15 +80,7 @@ async def fhir_transmit(
         application_logger.info(f"Sending FHIR message, endpoint '{endpoint}'")
         server = FHIRService(endpoint.endpoint)
         response = await server.put("Bundle", data, 60.0)
-        if response["success"]:
-            message = f"Succesful transmission of FHIR {type} message: {response['data']['id']}"
-        else:
-            error_text = (
-                f"{response['message'][0:ERROR_LEN]} ..."
-                if len(response["message"]) > ERROR_LEN
-                else response["message"]
-            )
-            message = f"Unsuccesful transmission of FHIR {type} message: {error_text}"
+        message = fhir_outcome_message(type, response)
         tx.update_status(status=message, session=session)
         application_logger.info(message)
         session.close()
@@ -105,3 +98,17 @@ async def fhir_transmit(
             f"Error encountered transmititng FHIR {type} message from version '{version_id}' to endpoint: '{endpoint_id}'",
             str(user.id),
         )
+
+
+def fhir_outcome_message(type: str, response: dict) -> str:
+    """Map a FHIR service response to the transmission status message."""
+    if response["success"]:
+        return (
+            f"Succesful transmission of FHIR {type} message: {response['data']['id']}"
+        )
+    return fhir_failure_message(type, response["message"])
+
+
+def fhir_failure_message(type: str, error: str) -> str:
+    error_text = f"{error[0:ERROR_LEN]} ..." if len(error) > ERROR_LEN else error
+    return f"Unsuccesful transmission of FHIR {type} message: {error_text}"
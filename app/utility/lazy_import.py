@@ -0,0 +1,60 @@
+import importlib
+import threading
+from typing import Any
+
+
+class LazyImport:
+    """Module level stand-in for ``from module import name`` that does
+    the import on first use.
+
+    The USDM, FHIR, protocol and Excel libraries take most of the time
+    spent importing the application, yet a request only needs the one
+    it is rendering with. Declaring them as, for example,
+
+        USDM4M11 = LazyImport("usdm4_protocol.m11", "USDM4M11")
+
+    leaves them unloaded until the name is first called or one of its
+    attributes read, after which the proxy forwards to the real object.
+    With no ``name`` the proxy stands for the module itself. The names
+    stay module attributes, so tests can patch them as before.
+
+    Only calls and attribute reads are forwarded. Use the proxy for
+    classes that are instantiated or whose constants are read, not as a
+    base class, in ``isinstance`` or as a default argument value (which
+    would load it at import).
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, module: str, name: str | None = None):
+        self._module = module
+        self._name = name
+        self._target = None
+
+    def _load(self) -> Any:
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    target = importlib.import_module(self._module)
+                    if self._name:
+                        target = getattr(target, self._name)
+                    self._target = target
+        return self._target
+
+    @property
+    def loaded(self) -> bool:
+        return self._target is not None
+
+    def __getattr__(self, attribute: str) -> Any:
+        if attribute in ["_module", "_name", "_target"]:
+            # Not yet set, e.g. while copying; never trigger the import.
+            raise AttributeError(attribute)
+        return getattr(self._load(), attribute)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        target = f"{self._module}.{self._name}" if self._name else self._module
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyImport {target} ({state})>"
@@ -0,0 +1,230 @@
+import asyncio
+import importlib.util
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import httpx
+from d4k_ms_base.logger import application_logger
+
+from app.configuration.configuration import application_configuration
+
+
+class OutboundEndpoint:
+    """The connection pool, concurrency limit and counts of one
+    endpoint, an endpoint being a scheme, host and port."""
+
+    LATENCY_SAMPLE = 100
+
+    def __init__(self, origin: str, client: httpx.AsyncClient, concurrency: int):
+        self.origin = origin
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.last_status = None
+        self.latencies: deque[float] = deque(maxlen=self.LATENCY_SAMPLE)
+
+    def metrics(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "in_flight": self.in_flight,
+            "last_status": self.last_status,
+            "latency_seconds": {
+                "sample": len(latencies),
+                "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                "max": round(max(latencies), 3) if latencies else 0.0,
+            },
+        }
+
+
+class OutboundClient:
+    """Request methods of the outbound manager with a default timeout,
+    in place of an ``httpx.AsyncClient``."""
+
+    def __init__(self, manager: "OutboundHTTP", timeout: float | None = None):
+        self._manager = manager
+        self._timeout = timeout
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if self._timeout is not None:
+            kwargs.setdefault("timeout", self._timeout)
+        return await self._manager.request(method, url, **kwargs)
+
+
+class OutboundHTTP:
+    """Process-wide, long-lived HTTP client for the FHIR and backbone
+    transmissions.
+
+    Each transmission used to build its own ``httpx.AsyncClient`` inside
+    the ``asyncio.run`` of its own thread, so no connection was ever
+    reused and any number of sends could hit an endpoint at once. The
+    manager keeps one client, and with it one connection pool, per
+    endpoint, with at most ``connections`` connections and
+    ``concurrency`` requests in flight. HTTP/2 is used when the ``h2``
+    package is installed.
+
+    An ``httpx.AsyncClient`` belongs to the event loop it was first
+    used on, so the clients live on an event loop of the manager's own,
+    run on a thread started on first use. ``request`` may be awaited
+    from any loop and hands the request over to it.
+
+    Idempotent requests are retried, ``retries`` times at most, after a
+    transport error or a 429, 502, 503 or 504 response, waiting
+    ``backoff`` seconds and doubling the wait each time.
+    """
+
+    RETRY_METHODS = ["GET", "HEAD", "PUT", "DELETE"]
+    RETRY_STATUS = [429, 502, 503, 504]
+
+    def __init__(
+        self,
+        connections: int,
+        concurrency: int,
+        timeout: float,
+        retries: int,
+        backoff: float,
+    ):
+        self.connections = max(connections, 1)
+        self.concurrency = max(concurrency, 1)
+        self.timeout = timeout
+        self.retries = max(retries, 0)
+        self.backoff = backoff
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self._endpoints: dict[str, OutboundEndpoint] = {}
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def client(self, timeout: float | None = None) -> OutboundClient:
+        return OutboundClient(self, timeout)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        loop = self._start()
+        send = self._send(method.upper(), url, **kwargs)
+        if asyncio.get_running_loop() is loop:
+            return await send
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(send, loop))
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "connections": self.connections,
+                "concurrency": self.concurrency,
+                "http2": self.http2,
+                "endpoints": {k: v.metrics() for k, v in self._endpoints.items()},
+            }
+
+    async def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        if loop is None:
+            return
+        await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self._close_clients(), loop)
+        )
+        loop.call_soon_threadsafe(loop.stop)
+        await asyncio.to_thread(thread.join)
+        loop.close()
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="outbound", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        endpoint = self._endpoint(url)
+        attempts = 1 + (self.retries if method in self.RETRY_METHODS else 0)
+        for attempt in range(1, attempts + 1):
+            if attempt > 1:
+                with self._lock:
+                    endpoint.retries += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 2))
+            async with endpoint.semaphore:
+                with self._lock:
+                    endpoint.in_flight += 1
+                start = time.perf_counter()
+                try:
+                    response = await endpoint.client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    self._record(endpoint, start, None)
+                    if attempt == attempts:
+                        raise
+                    application_logger.warning(
+                        f"Retrying {method} '{url}' after {e.__class__.__name__}"
+                    )
+                    continue
+                self._record(endpoint, start, response.status_code)
+            if response.status_code not in self.RETRY_STATUS or attempt == attempts:
+                return response
+            application_logger.warning(
+                f"Retrying {method} '{url}' after HTTP {response.status_code}"
+            )
+
+    def _record(self, endpoint: OutboundEndpoint, start: float, status: int | None):
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.requests += 1
+            endpoint.last_status = status
+            endpoint.latencies.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                endpoint.errors += 1
+
+    def _endpoint(self, url: str) -> OutboundEndpoint:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if origin not in self._endpoints:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.connections,
+                        max_keepalive_connections=self.connections,
+                    ),
+                    timeout=self.timeout,
+                    http2=self.http2,
+                )
+                self._endpoints[origin] = OutboundEndpoint(
+                    origin, client, self.concurrency
+                )
+            return self._endpoints[origin]
+
+    async def _close_clients(self) -> None:
+        with self._lock:
+            endpoints = list(self._endpoints.values())
+            self._endpoints = {}
+        for endpoint in endpoints:
+            await endpoint.client.aclose()
+
+
+outbound_http = OutboundHTTP(
+    application_configuration.outbound_connections,
+    application_configuration.outbound_concurrency,
+    application_configuration.outbound_timeout,
+    application_configuration.outbound_retries,
+    application_configuration.outbound_backoff,
+)
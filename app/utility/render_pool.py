@@ -0,0 +1,79 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from app.configuration.configuration import application_configuration
+
+
+class RenderPool:
+    """Thread pool for the blocking USDM work done by the web routes.
+
+    Loading a study's USDM, building the views and the SoA, rendering
+    protocols and producing exports are all synchronous and can take
+    seconds for a large study. Run directly in an ``async`` route they
+    hold up the event loop, and every other request with it. Routes
+    ``await render_pool.run(...)`` instead, which runs the call on one
+    of a fixed number of threads and leaves the loop free.
+
+    Threads rather than processes: the work reads the database session
+    and the in-process USDM cache, and much of it is spent in file and
+    XML I/O that releases the GIL.
+    """
+
+    WAIT_SAMPLE = 100
+
+    def __init__(self, workers: int):
+        self.workers = max(workers, 1)
+        self.completed = 0
+        self._running = 0
+        self._queued = 0
+        self._waits: deque[float] = deque(maxlen=self.WAIT_SAMPLE)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="render"
+        )
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        queued = time.monotonic()
+        with self._lock:
+            self._queued += 1
+        # Run in the caller's context so the request timing follows it.
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, self._call, queued, func, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                "workers": self.workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self.completed,
+                "wait_seconds": {
+                    "sample": len(waits),
+                    "mean": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    "max": round(max(waits), 3) if waits else 0.0,
+                },
+            }
+
+    def _call(self, queued: float, func: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._waits.append(time.monotonic() - queued)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+
+
+render_pool = RenderPool(application_configuration.render_workers)
@@ -0,0 +1,250 @@
+import functools
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.configuration.configuration import application_configuration
+
+
+class RequestTimer:
+    """Time spent in each named stage of one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        # Stages may run on the render pool threads, several at once.
+        with self._lock:
+            stage = self.stages.setdefault(name, [0.0, 0])
+            stage[0] += seconds
+            stage[1] += 1
+
+    def totals(self) -> list[tuple[str, float, int]]:
+        """(name, seconds, count) of each stage."""
+        with self._lock:
+            return [(k, v[0], v[1]) for k, v in self.stages.items()]
+
+    def server_timing(self, total: float) -> str:
+        """The ``Server-Timing`` header value, durations in ms."""
+        items = [
+            f'{name};dur={seconds * 1000:.1f};desc="{count}"'
+            for name, seconds, count in self.totals()
+        ]
+        items.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(items)
+
+
+class Stage:
+    __slots__ = ("name", "start", "timer")
+
+    def __init__(self, timer: RequestTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+
+
+class Histogram:
+    """Counts of the observations at or below each bucket bound."""
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, buckets: tuple[float, ...], value: float) -> None:
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class RequestTiming:
+    """Where the time of each request goes.
+
+    The ``time_request`` middleware starts a ``RequestTimer`` for each
+    request and keeps it in a context variable, which follows the
+    request into the threads it uses (the render pool and the sync
+    routes' thread pool). Code marks out a stage with
+    ``request_timing.stage(name)`` or the ``timed(name)`` decorator:
+
+    - ``db``: SQL statements, timed by SQLAlchemy events on the engine,
+    - ``usdm``: reading and loading a version's USDM,
+    - ``render``: the protocol, SoA and FHIR library calls,
+    - ``template``: rendering the Jinja page.
+
+    The stages and the total are returned in a ``Server-Timing`` header,
+    shown in the browser's developer tools, and added to histograms per
+    method and route template, exposed on ``/metrics`` in the Prometheus
+    text format.
+
+    Outside a request, or when disabled (``REQUEST_TIMING``), ``stage``
+    returns a shared no-op context manager and no engine events are
+    registered.
+    """
+
+    PREFIX = "workbench"
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    UNMATCHED = "unmatched"
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._current: ContextVar[RequestTimer | None] = ContextVar(
+            "request_timer", default=None
+        )
+        self._null = nullcontext()
+        self._requests: dict[tuple, Histogram] = {}
+        self._stages: dict[tuple, Histogram] = {}
+        self._responses: dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def begin(self) -> RequestTimer:
+        timer = RequestTimer()
+        self._current.set(timer)
+        return timer
+
+    def end(
+        self, timer: RequestTimer, method: str, route: str, status_code: int
+    ) -> str:
+        """Record the request and return its ``Server-Timing`` header."""
+        total = time.perf_counter() - timer.start
+        stages = timer.totals()
+        with self._lock:
+            self._observe(self._requests, (method, route), total)
+            for name, seconds, _ in stages:
+                self._observe(self._stages, (method, route, name), seconds)
+            key = (method, route, str(status_code))
+            self._responses[key] = self._responses.get(key, 0) + 1
+        return timer.server_timing(total)
+
+    def stage(self, name: str):
+        timer = self._current.get()
+        if timer is None:
+            return self._null
+        return Stage(timer, name)
+
+    def timed(self, name: str):
+        """Decorator timing each call of a function as stage ``name``."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def instrument(self, engine: Engine) -> None:
+        """Time the SQL statements run on ``engine`` as stage ``db``."""
+        if not self.enabled:
+            return
+
+        # The start is kept on the statement's execution context, which
+        # goes away with the statement, as "after_cursor_execute" does not
+        # run for a statement that fails; "handle_error" does instead.
+        @event.listens_for(engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context.request_timing_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            self._add_statement(context)
+
+        @event.listens_for(engine, "handle_error")
+        def error(exception_context):
+            self._add_statement(exception_context.execution_context)
+
+    def _add_statement(self, context) -> None:
+        start = getattr(context, "request_timing_start", None)
+        if start is None:
+            return
+        context.request_timing_start = None
+        timer = self._current.get()
+        if timer is not None:
+            timer.add("db", time.perf_counter() - start)
+
+    @staticmethod
+    def route(scope: dict) -> str:
+        """The route template matched, e.g. ``/versions/{id}/summary``."""
+        route = scope.get("route")
+        return getattr(route, "path", None) or RequestTiming.UNMATCHED
+
+    def prometheus(self) -> str:
+        """The histograms in the Prometheus text exposition format."""
+        with self._lock:
+            requests = {k: self._copy(v) for k, v in self._requests.items()}
+            stages = {k: self._copy(v) for k, v in self._stages.items()}
+            responses = dict(self._responses)
+        lines = []
+        name = f"{self.PREFIX}_request_duration_seconds"
+        lines.append(f"# HELP {name} Time taken to answer requests, by route.")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route), histogram in sorted(requests.items()):
+            labels = f'method="{method}",route="{self._escape(route)}"'
+            lines += self._histogram_lines(name, labels, histogram)
+        name = f"{self.PREFIX}_request_stage_seconds"
+        lines.append(
+            f"# HELP {name} Time spent in each stage of the requests, by route."
+        )
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route, stage), histogram in sorted(stages.items()):
+            labels = f'method="{method}",route="{self._escape(route)}",stage="{stage}"'
+            lines += self._histogram_lines(name, labels, histogram)
+        name = f"{self.PREFIX}_responses_total"
+        lines.append(f"# HELP {name} Responses sent, by route and status code.")
+        lines.append(f"# TYPE {name} counter")
+        for (method, route, status), count in sorted(responses.items()):
+            lines.append(
+                f'{name}{{method="{method}",route="{self._escape(route)}",status="{status}"}} {count}'
+            )
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests = {}
+            self._stages = {}
+            self._responses = {}
+
+    def _observe(self, histograms: dict, key: tuple, value: float) -> None:
+        if key not in histograms:
+            histograms[key] = Histogram(len(self.BUCKETS))
+        histograms[key].observe(self.BUCKETS, value)
+
+    def _histogram_lines(self, name: str, labels: str, histogram: Histogram):
+        lines = []
+        for bound, count in zip(self.BUCKETS, histogram.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return lines
+
+    @staticmethod
+    def _copy(histogram: Histogram) -> Histogram:
+        result = Histogram(0)
+        result.counts = list(histogram.counts)
+        result.count = histogram.count
+        result.sum = histogram.sum
+        return result
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+request_timing = RequestTiming(application_configuration.request_timing)
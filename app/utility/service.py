@@ -3,13 +3,15 @@ import json
 import httpx
 from d4k_ms_base.logger import application_logger
 
+from app.utility.outbound_http import outbound_http
+
 
 class Service:
     DEFAULT_TIMEOUT = 5.0
 
     def __init__(self, base_url):
         self.base_url = base_url.removesuffix("/")
-        self._client = httpx.AsyncClient(timeout=self.DEFAULT_TIMEOUT)
+        self._client = outbound_http.client(timeout=self.DEFAULT_TIMEOUT)
 
     async def status(self):
         return await self.get(self.base_url)
@@ -1,8 +1,11 @@
 import warnings
 
-from bs4 import BeautifulSoup
 from d4k_ms_base.errors_and_logging import application_logger
 
+from app.utility.lazy_import import LazyImport
+
+BeautifulSoup = LazyImport("bs4", "BeautifulSoup")
+
 
 def get_soup(text: str):
     try:
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from importlib.metadata import PackageNotFoundError, version
+
+from d4k_ms_base.logger import application_logger
+
+from app.configuration.configuration import application_configuration
+from app.utility.lazy_import import LazyImport
+
+CoreCacheManager = LazyImport("usdm4.core.core_cache_manager", "CoreCacheManager")
+
+
+class ValidationCache:
+    """On-disk cache of validation results, keyed by content.
+
+    The key is the SHA-256 of the validated file's bytes combined with
+    the engine name and the version of the rules it ran: the installed
+    ``usdm4`` (d4k) or ``usdm4_protocol`` (M11) package and, for CDISC
+    CORE, a fingerprint of the CORE cache directory so new rules or CT
+    packages produce a new key. Re-validating the same file with the
+    same engine therefore returns the stored findings and summary
+    without running any rules.
+
+    Each entry is one JSON file named by its key. A hit touches the
+    file, and once the entries exceed the size budget the least
+    recently used files are removed first.
+    """
+
+    # A cached CORE fingerprint is recomputed at least this often, to
+    # catch files rewritten in place or changed in deeper subdirs.
+    FINGERPRINT_SECONDS = 60
+
+    # CORE cache dir -> (the mtimes of it and its subdirs, when computed,
+    # fingerprint)
+    _core_fingerprints: dict[str, tuple[tuple, float, str]] = {}
+
+    def __init__(self, dir: str, max_bytes: int):
+        self.dir = dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, digest: str, engine: str) -> str:
+        """Cache key for a file with SHA-256 ``digest`` validated by
+        ``engine``."""
+        rules = self._rules_version(engine)
+        return hashlib.sha256(f"{engine}:{rules}:{digest}".encode()).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                results = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return results
+
+    def put(self, key: str, results: dict) -> None:
+        if not self.enabled:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(results, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            application_logger.exception("Exception saving validation cache entry", e)
+            return
+        with self._lock:
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for path, size, mtime in self._entries():
+                self._remove(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._entries()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    @staticmethod
+    def digest(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, mtime in sorted(entries, key=lambda x: x[2]):
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                total -= size
+                self.evictions += 1
+                application_logger.debug(f"Validation cache evicted '{path}'")
+
+    def _entries(self) -> list[tuple[str, int, int]]:
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return []
+        results = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.dir, name)
+            try:
+                stat = os.stat(path)
+                results.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                continue
+        return results
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, f"{key}.json")
+
+    def _rules_version(self, engine: str) -> str:
+        if engine == "m11":
+            return f"usdm4_protocol-{self._package_version('usdm4_protocol')}"
+        result = f"usdm4-{self._package_version('usdm4')}"
+        if engine == "cdisc":
+            result = f"{result}:core-{self._core_fingerprint()}"
+        return result
+
+    @staticmethod
+    def _package_version(name: str) -> str:
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            return "unknown"
+
+    @classmethod
+    def _core_fingerprint(cls) -> str:
+        """Hash of the names, sizes and modification times of the files
+        in the CDISC CORE cache (rules, CT packages, schemas). CORE
+        downloads into it as needed, so a change there may change the
+        findings. The hash is kept until the modification time of the
+        dir or of one of its subdirs changes, as it does when CORE adds
+        or replaces a file, or for FINGERPRINT_SECONDS at most, so most
+        submissions only stat a few dirs."""
+        root = CoreCacheManager(
+            application_configuration.cdisc_core_cache_path or None
+        ).cache_dir
+        mtimes = cls._core_mtimes(root)
+        now = time.monotonic()
+        cached = cls._core_fingerprints.get(root)
+        if cached and cached[0] == mtimes and now - cached[1] < cls.FINGERPRINT_SECONDS:
+            return cached[2]
+        sha = hashlib.sha256()
+        for dir, dirs, files in sorted(os.walk(root)):
+            for name in sorted(files):
+                path = os.path.join(dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                sha.update(
+                    f"{os.path.relpath(path, root)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode()
+                )
+        cls._core_fingerprints[root] = (mtimes, now, sha.hexdigest())
+        return sha.hexdigest()
+
+    @staticmethod
+    def _core_mtimes(root: str) -> tuple:
+        try:
+            result = [("", os.stat(root).st_mtime_ns)]
+            for entry in os.scandir(root):
+                if entry.is_dir():
+                    result.append((entry.name, entry.stat().st_mtime_ns))
+        except OSError:
+            return ()
+        return tuple(sorted(result))
+
+
+validation_cache = ValidationCache(
+    os.path.join(application_configuration.data_file_path or "", "validation_cache"),
+    application_configuration.validation_cache_size_mb * 1024 * 1024,
+)
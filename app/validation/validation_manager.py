@@ -0,0 +1,222 @@
+import json
+
+from d4k_ms_base.logger import application_logger
+from simple_error_log import Errors as M11Errors
+from sqlalchemy.orm import Session
+
+from app.configuration.configuration import application_configuration
+from app.database.database import SessionLocal
+from app.database.user import User
+from app.database.validation_job import ValidationJob
+from app.model.connection_manager import connection_manager
+from app.model.file_handling.data_files import DataFiles
+from app.utility.finding_projections import (
+    project_m11_result,
+    project_m11_summary,
+    project_usdm_cdisc_result,
+    project_usdm_cdisc_summary,
+    project_usdm_d4k_result,
+    project_usdm_d4k_summary,
+)
+from app.utility.lazy_import import LazyImport
+from app.validation.validation_cache import validation_cache
+
+USDM4 = LazyImport("usdm4", "USDM4")
+usdm_info = LazyImport("usdm4.__info__")
+M11Validator = LazyImport("usdm4_protocol.validation.m11", "M11Validator")
+
+
+class ValidationManager:
+    """Runs one validation job: the uploaded file is saved into its own
+    ``DataFiles`` directory at submission, the engine runs later on a
+    ``ValidationQueue`` worker, and the projected findings plus the
+    run summary are persisted as the ``validation`` media type so the
+    results page can be rendered at any time afterwards."""
+
+    D4K = "d4k"
+    CDISC = "cdisc"
+    M11 = "m11"
+
+    def __init__(self, user: User, engine: str) -> None:
+        self.mapping = {
+            self.D4K: {
+                "file_type": "usdm",
+                "file_ext": ".json",
+                "label": "USDM v4 d4k",
+                "download_kind": "usdm-d4k-findings",
+                "download_title": "USDM v4 d4k Findings",
+                "download_sheet": "USDM d4k Findings",
+            },
+            self.CDISC: {
+                "file_type": "usdm",
+                "file_ext": ".json",
+                "label": "USDM v4 CDISC",
+                "download_kind": "usdm-cdisc-findings",
+                "download_title": "USDM v4 CDISC Findings",
+                "download_sheet": "USDM CDISC Findings",
+            },
+            self.M11: {
+                # Reuse the existing "docx" media type; "m11" isn't
+                # registered in DataFiles.media_type and shouldn't be
+                # added just for validation.
+                "file_type": "docx",
+                "file_ext": ".docx",
+                "label": "ICH M11",
+                "download_kind": "m11-findings",
+                "download_title": "M11 Validation Findings",
+                "download_sheet": "M11 Findings",
+            },
+        }
+        self.user = user
+        # ``d4k`` is the default — engine values other than ``cdisc`` /
+        # ``m11`` fall through to it so a typo doesn't silently swap to
+        # the slow CORE engine.
+        self.engine = engine if engine in self.mapping else self.D4K
+        self.file_type = self.mapping[self.engine]["file_type"]
+        self.file_ext = self.mapping[self.engine]["file_ext"]
+        self.files = None
+        self.uuid = None
+        self.original_filename = None
+        self.digest = None
+
+    @classmethod
+    def restore(
+        cls, user: User, engine: str, uuid: str, filename: str
+    ) -> "ValidationManager":
+        """Rebuild a manager for a file already saved by ``save_file``,
+        as recorded on a validation job."""
+        manager = cls(user, engine)
+        manager.files = DataFiles(uuid)
+        manager.uuid = uuid
+        manager.original_filename = filename
+        return manager
+
+    def label(self) -> str:
+        return self.mapping[self.engine]["label"]
+
+    def download(self) -> dict:
+        """Metadata the results template passes through to the
+        /validate/download/{csv,json,md,xlsx} form."""
+        return {
+            key: self.mapping[self.engine][key]
+            for key in ["download_kind", "download_title", "download_sheet"]
+        }
+
+    def save_file(self, main_file: dict) -> str:
+        if main_file:
+            self.files = DataFiles()
+            self.uuid = self.files.new()
+            if self.uuid:
+                self.original_filename = main_file["filename"]
+                self.files.save(
+                    self.file_type, main_file["contents"], main_file["filename"]
+                )
+        return self.uuid
+
+    def validate(self) -> dict:
+        """Run the engine against the saved file and return the
+        projected ``findings``, the run-level ``summary`` and any
+        operational ``messages``."""
+        full_path, filename, exists = self.files.path(self.file_type)
+        messages = []
+        if self.engine == self.M11:
+            # Standalone validator — runs against the DOCX directly
+            # without going through the USDM4 translator. See
+            # usdm4_protocol/docs/m11_validator_v2_plan.md for the design.
+            validator_errors = M11Errors()
+            results = M11Validator(full_path, validator_errors).validate()
+            findings = project_m11_result(results)
+            summary = project_m11_summary(results, findings)
+            if results.count() == 0 and validator_errors.count() > 0:
+                # Reader or runner failed before any rule could run —
+                # surface the operational problem rather than claim
+                # success.
+                messages.append(
+                    "Validation could not be completed (extraction failed)."
+                )
+        else:
+            # Pass the configured CORE cache path (empty string falls
+            # through to the USDM4 platform default). This keeps the
+            # downloaded JSONata files, XSD schemas, rules, and CT
+            # packages on the mounted volume so they survive container
+            # restarts — a cold cache run can take several minutes.
+            usdm = USDM4(
+                cache_dir=application_configuration.cdisc_core_cache_path or None
+            )
+            if self.engine == self.CDISC:
+                results = usdm.validate_core(full_path)
+                findings = project_usdm_cdisc_result(results)
+                # CORE returns a rich run-level context (rules executed /
+                # skipped, execution errors, CT packages loaded, …) that
+                # the d4k engine has no equivalent for. Surfaced via the
+                # results-page header card.
+                summary = project_usdm_cdisc_summary(results)
+            else:
+                results = usdm.validate(full_path)
+                findings = project_usdm_d4k_result(results)
+                summary = project_usdm_d4k_summary(results)
+                # ``RulesValidationResults`` doesn't carry a USDM version
+                # of its own (the version belongs to the file, not the
+                # engine), and the d4k engine only validates against the
+                # active USDM model version.
+                summary["version"] = usdm_info.__model_version__
+        return {"findings": findings, "summary": summary, "messages": messages}
+
+    def results(self) -> dict | None:
+        raw = self.files.read("validation")
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def cached(self) -> dict | None:
+        """Results of an earlier run of this engine over identical
+        content, or None."""
+        return validation_cache.get(self._cache_key())
+
+    def complete(
+        self, job: ValidationJob, results: dict, session: Session
+    ) -> ValidationJob:
+        self.files.save("validation", results)
+        self._delete_source()
+        return job.update_status(
+            ValidationJob.COMPLETE, session, len(results["findings"])
+        )
+
+    async def process(self, job: ValidationJob) -> None:
+        session = SessionLocal()
+        filename = self.original_filename
+        try:
+            job = job.update_status(ValidationJob.RUNNING, session)
+            results = self.cached()
+            if results is None:
+                results = self.validate()
+                # Keyed after the run: CORE may have downloaded rules or
+                # CT packages into its cache while validating.
+                validation_cache.put(self._cache_key(), results)
+            job = self.complete(job, results, session)
+            session.close()
+            await connection_manager.success(
+                f"{self.label()} validation of '{filename}' completed, "
+                f"<a href='/validate/jobs/{job.id}'>view the results</a>",
+                str(self.user.id),
+            )
+        except Exception as e:
+            application_logger.exception("Exception raised processing validation", e)
+            job.update_status(ValidationJob.FAILED, session)
+            session.close()
+            await connection_manager.error(
+                f"Exception encountered validating '{filename}'", str(self.user.id)
+            )
+
+    def _cache_key(self) -> str:
+        if not self.digest:
+            full_path, filename, exists = self.files.path(self.file_type)
+            self.digest = validation_cache.digest(full_path)
+        return validation_cache.key(self.digest, self.engine)
+
+    def _delete_source(self) -> None:
+        # Only the findings are kept; the uploaded file can be large.
+        self.files.discard(self.file_type)
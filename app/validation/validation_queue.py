@@ -0,0 +1,147 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from d4k_ms_base.logger import application_logger
+
+from app.configuration.configuration import application_configuration
+from app.database.database import SessionLocal
+from app.database.job_owner import new_owner
+from app.database.user import User
+from app.database.validation_job import ValidationJob
+from app.validation.validation_manager import ValidationManager
+
+
+class ValidationQueue:
+    """Thread pool that runs validation jobs off the event loop.
+
+    A submitted job is recorded as a ``ValidationJob`` row before it is
+    handed to the pool, so the POST can return the job id straight
+    away and a job accepted by a process that then stops is picked up
+    again by ``recover``.
+
+    As with the import queue, several processes can share the jobs. The
+    process that queues a job records itself as its owner and renews a
+    heartbeat every ``HEARTBEAT_SECONDS`` until the job finishes. Only
+    the jobs of an owner that has gone are taken over and run again, at
+    startup and with each heartbeat, so a restarted worker does not
+    rerun validations still running in another.
+    """
+
+    HEARTBEAT_SECONDS = 15
+    STALE_SECONDS = 90
+
+    def __init__(self, workers: int):
+        self.workers = max(workers, 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="validation"
+        )
+        self._lock = threading.Lock()
+        self._owner = None
+        self._owner_pid = None
+        self._heartbeat = None
+        self._stop = threading.Event()
+
+    @property
+    def owner(self) -> str:
+        # Per process, including one forked after this was created.
+        if self._owner_pid != os.getpid():
+            self._owner_pid = os.getpid()
+            self._owner = new_owner()
+        return self._owner
+
+    def submit(self, manager: ValidationManager) -> int:
+        session = SessionLocal()
+        try:
+            job = ValidationJob.create(
+                manager.uuid,
+                manager.engine,
+                manager.original_filename,
+                manager.user.id,
+                session,
+                self.owner,
+            )
+            # A file this engine has already validated needs no rules
+            # run, so complete it now rather than queue it behind
+            # other jobs.
+            results = manager.cached()
+            if results is not None:
+                job = manager.complete(job, results, session)
+                application_logger.info(
+                    f"Validation job '{job.id}' for '{job.filename}' served from cache"
+                )
+                return job.id
+        finally:
+            session.close()
+        application_logger.info(
+            f"Validation job '{job.id}' queued for '{job.filename}' ({job.engine})"
+        )
+        self._executor.submit(self._run, manager, job)
+        return job.id
+
+    def recover(self) -> int:
+        count = self._recover()
+        self._start_heartbeat()
+        return count
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _recover(self) -> int:
+        session = SessionLocal()
+        try:
+            jobs = ValidationJob.recover(self.owner, self.STALE_SECONDS, session)
+            count = 0
+            for job in jobs:
+                try:
+                    user = User.find(job.user_id, session)
+                    manager = ValidationManager.restore(
+                        user, job.engine, job.uuid, job.filename
+                    )
+                    self._executor.submit(self._run, manager, job)
+                    count += 1
+                except Exception as e:
+                    application_logger.exception(
+                        f"Exception recovering validation job '{job.id}'", e
+                    )
+                    job.update_status(ValidationJob.FAILED, session)
+        finally:
+            session.close()
+        if count:
+            application_logger.info(
+                f"Requeued {count} validation job(s), the process running them has gone"
+            )
+        return count
+
+    def _start_heartbeat(self) -> None:
+        with self._lock:
+            if self._heartbeat:
+                return
+            self._heartbeat = threading.Thread(
+                target=self._beat, name="validation-heartbeat", daemon=True
+            )
+            self._heartbeat.start()
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.HEARTBEAT_SECONDS):
+            try:
+                session = SessionLocal()
+                try:
+                    ValidationJob.renew(self.owner, session)
+                finally:
+                    session.close()
+                self._recover()
+            except Exception as e:
+                application_logger.exception("Exception in the validation heartbeat", e)
+
+    def _run(self, manager: ValidationManager, job: ValidationJob) -> None:
+        try:
+            asyncio.run(manager.process(job))
+        except Exception as e:
+            application_logger.exception(
+                f"Exception running validation job '{job.id}'", e
+            )
+
+
+validation_queue = ValidationQueue(application_configuration.validation_workers)
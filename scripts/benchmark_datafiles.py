@@ -0,0 +1,139 @@
+"""Benchmark the DataFiles lookups with and without the manifest.
+
+Creates ``--studies`` study dirs under ``--dir``, each with the files of
+an Excel import (the workbook, USDM, extra and errors) and a few
+rendered views, half written with a manifest and half as dirs created
+before manifests were. Then, with a new ``DataFiles`` per study as a
+request has, it times the lookups a version's pages make (the USDM and
+extra paths for the USDM cache, the M11 validation, errors, costs and
+activities files, the workbook) and counts the filesystem calls they
+make (``stat``, ``listdir``, ``open``).
+
+Each filesystem call costs a round trip on a network mounted volume, so
+run with ``--dir`` on the volume itself to measure it; ``--latency-ms``
+adds a delay to each call to simulate one elsewhere.
+
+Usage (from the repo root, with the right PYTHON_ENVIRONMENT set):
+
+    python -m scripts.benchmark_datafiles
+    python -m scripts.benchmark_datafiles --dir /mnt/datafiles/bench --latency-ms 1
+"""
+
+import argparse
+import builtins
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from app.model.file_handling.data_files import DataFiles
+
+LOOKUPS = [
+    ("stored_path", "usdm"),
+    ("stored_path", "extra"),
+    ("path", "usdm"),
+    ("generic_path", "m11_validation"),
+    ("path", "errors"),
+    ("exists", "costs"),
+    ("exists", "activities"),
+    ("path", "xlsx"),
+]
+
+
+class Counter:
+    """Counts, and optionally delays, the filesystem calls made."""
+
+    CALLS = [(os, "stat"), (os, "listdir"), (builtins, "open")]
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.count = 0
+        self._originals = {}
+
+    def __enter__(self):
+        for module, name in self.CALLS:
+            original = getattr(module, name)
+            self._originals[(module, name)] = original
+            setattr(module, name, self._wrap(original))
+        return self
+
+    def __exit__(self, *args):
+        for (module, name), original in self._originals.items():
+            setattr(module, name, original)
+
+    def _wrap(self, original):
+        def call(*args, **kwargs):
+            self.count += 1
+            if self.latency:
+                time.sleep(self.latency)
+            return original(*args, **kwargs)
+
+        return call
+
+
+def create(dir: str, uuid: str, manifest: bool) -> None:
+    files = DataFiles(uuid)
+    files.dir = dir
+    os.mkdir(os.path.join(dir, uuid))
+    if manifest:
+        files._save_manifest({})
+    files.save("xlsx", os.urandom(200_000), "study.xlsx")
+    files.save("usdm", '{"study": {"versions": []}}')
+    files.save("extra", {"title_page": {}})
+    files.save("errors", [])
+    for index in range(5):
+        files.save("rendered-protocol", "<p/>", f"rendered-protocol-m11-{index}.html")
+
+
+def lookup(dir: str, uuid: str) -> None:
+    files = DataFiles(uuid)
+    files.dir = dir
+    for method, type in LOOKUPS:
+        getattr(files, method)(type)
+
+
+def measure(dir: str, uuids: list[str], repeat: int, latency: float) -> tuple:
+    times = []
+    with Counter(latency) as counter:
+        for _ in range(repeat):
+            for uuid in uuids:
+                start = time.perf_counter()
+                lookup(dir, uuid)
+                times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), max(times), counter.count / len(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark DataFiles lookups.")
+    parser.add_argument("--dir", help="Dir to create the studies in, default temp")
+    parser.add_argument("--studies", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    dir = tempfile.mkdtemp(prefix="sdw-datafiles-", dir=args.dir)
+    try:
+        legacy = [f"legacy-{x}" for x in range(args.studies // 2)]
+        indexed = [f"manifest-{x}" for x in range(args.studies - len(legacy))]
+        for uuid in legacy:
+            create(dir, uuid, False)
+        for uuid in indexed:
+            create(dir, uuid, True)
+        print(
+            f"{args.studies} studies in '{dir}', {len(LOOKUPS)} lookups per page, "
+            f"{args.latency_ms} ms added per filesystem call"
+        )
+        print(f"{'':<12}{'median ms':>12}{'max ms':>12}{'fs calls':>12}")
+        results = {}
+        for label, uuids in [("scan", legacy), ("manifest", indexed)]:
+            results[label] = measure(dir, uuids, args.repeat, args.latency_ms / 1000)
+            median, slowest, calls = results[label]
+            print(f"{label:<12}{median:>12.3f}{slowest:>12.3f}{calls:>12.1f}")
+        print(f"speedup {results['scan'][0] / results['manifest'][0]:.1f}x")
+    finally:
+        shutil.rmtree(dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Load test the notification hub across worker processes.
+
+Starts ``--workers`` uvicorn servers, each a worker process with its
+own ``ConnectionManager`` on a shared SQLite broker and the
+``/alerts/{user_id}`` socket of the application, and opens ``--sockets``
+sockets spread over ``--users`` users and over the workers, so every
+user has sockets on more than one worker as with several tabs behind a
+load balancer. ``--bursts`` bursts of ``--burst`` notifications per user
+are then published to the broker from this process, as an import or
+transmission thread would, and the test reports the time taken to open
+the sockets, the delivery latency (from publishing the last
+notification of a burst to each socket receiving it) and how many
+notifications went in each message sent.
+
+The run fails, exit status 1, when a socket misses a notification or
+the 95th percentile latency is over ``--budget`` milliseconds.
+
+Usage (from the repo root):
+
+    python -m scripts.benchmark_notifications
+    python -m scripts.benchmark_notifications --sockets 500 --workers 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+import websockets
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(port: int, broker_path: str) -> None:
+    """A worker process: the alert socket endpoint of the application
+    on ``port``."""
+    os.environ.setdefault("PYTHON_ENVIRONMENT", "development")
+    os.chdir(REPO_ROOT)
+    import uvicorn
+    from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+    from app.model.connection_manager import ConnectionManager
+
+    app = FastAPI()
+    manager = ConnectionManager(broker_path, 0.05)
+
+    @app.websocket("/alerts/{user_id}")
+    async def websocket_endpoint(websocket: WebSocket, user_id: str):
+        await manager.connect(user_id, websocket)
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            manager.disconnect(user_id, websocket)
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_server(port: int, seconds: float = 30.0) -> None:
+    end = time.monotonic() + seconds
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > end:
+                raise
+            await asyncio.sleep(0.1)
+
+
+class Client:
+    """One socket, recording when each notification arrived."""
+
+    def __init__(self, user_id: str, port: int):
+        self.user_id = user_id
+        self.port = port
+        self.received: dict[str, float] = {}
+        self.frames = 0
+        self.socket = None
+
+    async def connect(self) -> None:
+        self.socket = await websockets.connect(
+            f"ws://127.0.0.1:{self.port}/alerts/{self.user_id}"
+        )
+
+    async def receive(self) -> None:
+        async for frame in self.socket:
+            now = time.perf_counter()
+            self.frames += 1
+            for token in frame.split("[")[1:]:
+                self.received.setdefault(token.split("]")[0], now)
+
+
+async def run(args, ports: list[int], broker_path: str) -> dict:
+    from app.model.connection_manager import NotificationBroker
+
+    broker = NotificationBroker(broker_path)
+    clients = [
+        Client(str(index % args.users), ports[(index // args.users) % len(ports)])
+        for index in range(args.sockets)
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*[x.connect() for x in clients])
+    connect_seconds = time.perf_counter() - start
+    readers = [asyncio.create_task(x.receive()) for x in clients]
+    # Each worker starts reading the broker on its first socket.
+    await asyncio.sleep(0.5)
+
+    published = {}
+    for burst in range(args.bursts):
+        for user in range(args.users):
+            for index in range(args.burst):
+                token = f"{burst}.{user}.{index}"
+                await asyncio.to_thread(
+                    broker.publish, str(user), "success", f"Imported [{token}]"
+                )
+                published[token] = time.perf_counter()
+        await asyncio.sleep(args.interval)
+    await asyncio.sleep(2.0)
+
+    latencies = []
+    missed = 0
+    for client in clients:
+        for burst in range(args.bursts):
+            for index in range(args.burst):
+                token = f"{burst}.{client.user_id}.{index}"
+                if token not in client.received:
+                    missed += 1
+                elif index == args.burst - 1:
+                    latencies.append(client.received[token] - published[token])
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*[x.socket.close() for x in clients])
+    frames = sum(x.frames for x in clients)
+    return {
+        "connect_seconds": connect_seconds,
+        "latencies": sorted(latencies),
+        "missed": missed,
+        "notifications": args.sockets * args.bursts * args.burst,
+        "frames": frames,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--sockets", type=int, default=300)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--bursts", type=int, default=3)
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=5,
+        help="Notifications per user per burst, at most the 5 shown at once",
+    )
+    parser.add_argument(
+        "--interval", type=float, default=1.0, help="Seconds between bursts"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=1000,
+        help="95th percentile delivery latency budget in ms (default: 1000)",
+    )
+    args = parser.parse_args(argv)
+    args.burst = min(max(args.burst, 1), 5)
+    args.users = min(max(args.users, 1), args.sockets)
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        broker_path = os.path.join(directory, "notifications.db")
+        ports = [free_port() for _ in range(max(args.workers, 1))]
+        workers = [
+            context.Process(target=serve, args=(x, broker_path), daemon=True)
+            for x in ports
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+
+            async def start_and_run():
+                await asyncio.gather(*[wait_for_server(x) for x in ports])
+                return await run(args, ports, broker_path)
+
+            result = asyncio.run(start_and_run())
+        finally:
+            for worker in workers:
+                worker.terminate()
+                worker.join()
+
+    latencies = result["latencies"]
+    p50 = statistics.median(latencies) * 1000 if latencies else 0.0
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0
+    print(
+        f"{args.sockets} sockets, {args.users} users, {len(ports)} workers: "
+        f"connected in {result['connect_seconds'] * 1000:.0f} ms"
+    )
+    print(
+        f"latency p50 {p50:.0f} ms, p95 {p95:.0f} ms, "
+        f"max {max(latencies, default=0.0) * 1000:.0f} ms, budget {args.budget:.0f} ms"
+    )
+    ratio = result["notifications"] / result["frames"] if result["frames"] else 0.0
+    print(
+        f"{result['notifications']} notifications in {result['frames']} messages "
+        f"({ratio:.1f} per message)"
+    )
+    failed = False
+    if result["missed"]:
+        print(f"FAILED: {result['missed']} notifications not delivered")
+        failed = True
+    if p95 > args.budget:
+        print(f"FAILED: p95 latency {p95 - args.budget:.0f} ms over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
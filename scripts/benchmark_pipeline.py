@@ -0,0 +1,524 @@
+"""Benchmark the workbench end to end over the bundled test files.
+
+Each case, a file under ``tests/test_files`` and the import type it is
+loaded as, runs in a worker process of its own with a throwaway
+database and data file dir, which times these steps:
+
+- ``import``: ``ImportManager.process``, i.e. the import processor,
+  saving the USDM, creating the study and building the compare digest,
+- ``usdm_json``: building the ``USDMJson`` of the imported version,
+- ``protocol``: rendering the protocol of each of its templates,
+- ``soa``: the schedule of activities of each study design and the SoA
+  of each timeline,
+- ``validate``: the d4k rules validation of the USDM,
+- ``fhir``: the FHIR M11 export, in each version offered for export,
+- ``excel``: the Excel export.
+
+Each step is timed cold and warm. Cold is with the step's caches
+emptied first (the USDM cache, rendered protocols, exports, validation
+results) or, for a step with no cache of its own (``import``, ``soa``),
+the first run in the worker, so including loading the libraries it
+uses. Warm is the run that follows, with the caches filled. Cached
+steps are timed ``--repeat`` times each way, the others once cold and
+``--repeat`` times warm.
+
+For each step the median, fastest and slowest wall time, the CPU time
+(all the threads of the worker) and the peak resident memory, sampled
+as for the import timings, are reported. The import also reports its
+stages. The results and the environment (commit, Python and package
+versions) are written as JSON to ``--output``. Given ``--baseline``, the
+results file of an earlier run, a step whose median wall time or peak
+memory is more than ``--tolerance`` above the baseline (and more than
+``--min-seconds`` or ``--min-mb``) is a regression. The run fails, exit
+status 1, when there is a regression or a step fails.
+
+The M11 DOCX import runs the AI assisted extraction (``use_ai=True``),
+so needs its credentials and its times depend on the service;
+``--exclude M11_DOCX`` leaves it out. There are no bundled CPT DOCX or
+legacy PDF files, and the legacy import is disabled, so those import
+processors are not covered. Cases whose files are missing are skipped.
+
+Usage (from the repo root):
+
+    python -m scripts.benchmark_pipeline
+    python -m scripts.benchmark_pipeline --only WA42380 --repeat 5
+    python -m scripts.benchmark_pipeline --output after.json --baseline before.json
+    python -m scripts.benchmark_pipeline --compare after.json --baseline before.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import PackageNotFoundError, version
+
+from app import VERSION
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_FILES = os.path.join(REPO_ROOT, "tests", "test_files")
+MB = 1024 * 1024
+SAMPLE_SECONDS = 0.01
+
+# Name, import type and files, relative to tests/test_files, the main
+# file first.
+CASES = [
+    ("WA42380", "M11_DOCX", ["m11/WA42380/WA42380.docx"]),
+    ("LZZT", "M11_DOCX", ["m11/LZZT/LZZT.docx"]),
+    ("ASP8062", "M11_DOCX", ["m11/ASP8062/ASP8062.docx"]),
+    ("RadVax", "M11_DOCX", ["m11/RadVax/RadVax.docx"]),
+    ("pilot", "USDM_EXCEL", ["excel/pilot.xlsx"]),
+    (
+        "pilot_multi",
+        "USDM_EXCEL",
+        [
+            "excel/multi/pilot_multi.xlsx",
+            "excel/multi/pilot_multi_Study_Design_1.xlsx",
+        ],
+    ),
+    ("ASP8062", "FHIR_PRISM2_JSON", ["fhir_v1/from/ASP8062_fhir_m11.json"]),
+    ("WA42380", "FHIR_PRISM2_JSON", ["fhir_v1/from/WA42380_fhir_m11.json"]),
+    ("WA42380", "FHIR_PRISM3_JSON", ["fhir_v3/from/WA42380_fhir_m11.json"]),
+    ("DEUCRALIP", "FHIR_PRISM3_JSON", ["fhir_v3/from/DEUCRALIP_fhir_m11.json"]),
+    ("no_errors", "USDM4_JSON", ["usdm4/no_errors.json"]),
+    ("WA42380", "USDM4_JSON", ["m11/WA42380/WA42380_usdm.json"]),
+    ("LZZT", "USDM4_JSON", ["m11/LZZT/LZZT_usdm.json"]),
+]
+
+# Recorded with the results, as a change in any of them may explain a
+# change in the times.
+PACKAGES = [
+    "usdm4",
+    "usdm4_excel",
+    "usdm4_fhir",
+    "usdm4_protocol",
+    "simple_error_log",
+    "sqlalchemy",
+]
+
+
+def worker_environment(dir: str) -> dict[str, str]:
+    """The configuration of a worker: its own database and data files
+    in ``dir``. No ``.{PYTHON_ENVIRONMENT}_env`` file is read."""
+    return {
+        "PYTHON_ENVIRONMENT": "benchmark",
+        "SINGLE_USER": "True",
+        "FILE_PICKER": "browser",
+        "MNT_PATH": dir,
+        "DATABASE_PATH": dir,
+        "DATABASE_NAME": "benchmark.db",
+        "DATAFILE_PATH": os.path.join(dir, "datafiles"),
+        "LOCALFILE_PATH": os.path.join(dir, "localfiles"),
+        "NOTIFICATION_BROKER_PATH": "",
+        "REQUEST_TIMING": "False",
+    }
+
+
+def run_case(import_type: str, paths: list[str], repeat: int) -> list[dict]:
+    """A worker process: import ``paths`` as ``import_type`` and time
+    the steps. The application is configured, so imported, here."""
+    with tempfile.TemporaryDirectory() as dir:
+        os.environ.update(worker_environment(dir))
+        os.mkdir(os.path.join(dir, "datafiles"))
+        os.mkdir(os.path.join(dir, "localfiles"))
+        os.chdir(REPO_ROOT)
+        return time_steps(import_type, paths, repeat)
+
+
+def time_steps(import_type: str, paths: list[str], repeat: int) -> list[dict]:
+    from app.database import database_tables
+    from app.database.database import SessionLocal, engine
+    from app.database.database_tables import Version as VersionDB
+    from app.database.file_import import FileImport
+    from app.database.import_stage import ImportStage
+    from app.database.user import User
+    from app.dependencies.fhir_version import fhir_version_export, fhir_versions
+    from app.imports.import_manager import ImportManager
+    from app.model.export_cache import ExportCache
+    from app.model.file_handling.data_files import DataFiles
+    from app.model.rendered_protocol import RenderedProtocol
+    from app.model.usdm_cache import usdm_cache
+    from app.model.usdm_json import USDMJson
+    from app.routers.versions import _generate_protocol
+    from app.usdm_database.usdm_database import USDMDatabase
+    from app.validation.validation_cache import validation_cache
+    from app.validation.validation_manager import ValidationManager
+
+    database_tables.Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    user, _ = User.create("benchmark", "benchmark@example.com", "Benchmark", session)
+    uploads = [{"filename": os.path.basename(x), "contents": read(x)} for x in paths]
+    results = []
+    imports = []
+
+    def time_step(step: str, once: Callable[[], dict], clear=None) -> bool:
+        cold = []
+        warm = []
+        try:
+            if clear:
+                for _ in range(repeat):
+                    clear()
+                    cold.append(once())
+                    warm.append(once())
+            else:
+                cold.append(once())
+                warm += [once() for _ in range(repeat)]
+        except Exception as e:
+            results.append({"step": step, "error": f"{type(e).__name__}: {e}"})
+            return False
+        results.append(summary(step, "cold", cold))
+        results.append(summary(step, "warm", warm))
+        return True
+
+    def import_once() -> dict:
+        manager = ImportManager(user, import_type)
+        manager.save_files(uploads[0], [], uploads[1:])
+        run = measure(lambda: asyncio.run(manager.process()))
+        with SessionLocal() as lookup:
+            file_import = FileImport.find_by_uuid(manager.uuid, lookup)
+            stages = ImportStage.for_imports([file_import.id], lookup)
+        if file_import.status != "Success":
+            raise RuntimeError(f"import status '{file_import.status}'")
+        run["stages"] = {x.name: x.seconds for x in stages.get(file_import.id, [])}
+        imports.append(file_import)
+        return run
+
+    if not time_step("import", import_once):
+        session.close()
+        return results
+
+    # The steps that follow use the version of the first import.
+    file_import = imports[0]
+    session.commit()
+    version_id = (
+        session.query(VersionDB.id)
+        .filter(VersionDB.import_id == file_import.id)
+        .scalar()
+    )
+    files = DataFiles(file_import.uuid)
+    time_step(
+        "usdm_json",
+        lambda: measure(lambda: USDMJson(version_id, session)),
+        lambda: usdm_cache.invalidate(file_import.uuid),
+    )
+    usdm = USDMJson(version_id, session)
+    usdm_path, _, _ = usdm.json()
+
+    def protocol():
+        for template in usdm.templates():
+            _generate_protocol(template, usdm_path, usdm)
+
+    def soa():
+        study_version = usdm.wrapper().study.first_version()
+        for design in study_version.studyDesigns:
+            usdm.schedule_of_activities(design.id)
+            for timeline in design.scheduleTimelines:
+                usdm.soa(design.id, timeline.id)
+
+    validation = ValidationManager(user, ValidationManager.D4K)
+    validation.save_file({"filename": "usdm.json", "contents": read(usdm_path)})
+    source, _, _ = validation.files.path(validation.file_type)
+    key = validation_cache.key(validation_cache.digest(source), validation.engine)
+
+    def validate():
+        # As a validation job: the cached results, else a run.
+        if validation_cache.get(key) is None:
+            validation_cache.put(key, validation.validate())
+
+    exports = [x for x in fhir_versions() if fhir_version_export(x)]
+
+    def fhir():
+        for fhir_version in exports:
+            usdm.fhir(fhir_version)
+
+    time_step(
+        "protocol",
+        lambda: measure(protocol),
+        lambda: RenderedProtocol(files).invalidate(),
+    )
+    time_step("soa", lambda: measure(soa))
+    time_step("validate", lambda: measure(validate), validation_cache.clear)
+    time_step(
+        "fhir",
+        lambda: measure(fhir),
+        lambda: files.delete_files(f"{ExportCache.PREFIX}fhir-"),
+    )
+    time_step(
+        "excel",
+        lambda: measure(lambda: USDMDatabase(version_id, session).excel()),
+        lambda: files.delete_files(f"{ExportCache.PREFIX}excel-"),
+    )
+    session.close()
+    return results
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def measure(call: Callable[[], object]) -> dict:
+    """Wall and CPU seconds and peak resident memory (MB) of ``call``."""
+    from app.imports.import_timing import MemorySampler
+
+    sampler = MemorySampler(SAMPLE_SECONDS)
+    sampler.start()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        call()
+    finally:
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        peak = sampler.stop()
+    return {
+        "wall": wall,
+        "cpu": cpu,
+        "peak_rss_mb": round(peak / MB, 1) if peak else None,
+    }
+
+
+def summary(step: str, variant: str, runs: list[dict]) -> dict:
+    result = {"step": step, "variant": variant, "runs": len(runs)}
+    for name in ["wall", "cpu"]:
+        values = [x[name] for x in runs]
+        result[name] = {
+            "median": round(statistics.median(values), 4),
+            "min": round(min(values), 4),
+            "max": round(max(values), 4),
+        }
+    peaks = [x["peak_rss_mb"] for x in runs if x["peak_rss_mb"] is not None]
+    result["peak_rss_mb"] = max(peaks) if peaks else None
+    stages = [x["stages"] for x in runs if "stages" in x]
+    if stages:
+        names = dict.fromkeys(name for x in stages for name in x)
+        result["stages"] = {
+            name: round(statistics.median(x[name] for x in stages if name in x), 4)
+            for name in names
+        }
+    return result
+
+
+def selected(only: list[str], exclude: list[str]) -> list[tuple]:
+    """The cases whose ``TYPE/NAME`` contains one of ``only``, if given,
+    and none of ``exclude``."""
+
+    def matches(case: str, patterns: list[str]) -> bool:
+        return any(x.upper() in case.upper() for x in patterns)
+
+    return [
+        x
+        for x in CASES
+        if (not only or matches(f"{x[1]}/{x[0]}", only))
+        and not matches(f"{x[1]}/{x[0]}", exclude)
+    ]
+
+
+def run(args) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name, import_type, files in selected(args.only, args.exclude):
+        case = f"{import_type}/{name}"
+        missing = [x for x in files if not os.path.exists(os.path.join(TEST_FILES, x))]
+        if missing:
+            print(f"{case}: skipped, {', '.join(missing)} not found")
+            continue
+        print(f"{case} ...", flush=True)
+        paths = [os.path.join(TEST_FILES, x) for x in files]
+        # A new worker for each case, so every cold import is a first.
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            try:
+                steps = pool.submit(run_case, import_type, paths, args.repeat).result()
+            except Exception as e:
+                steps = [{"step": "worker", "error": f"{type(e).__name__}: {e}"}]
+        results += [{"case": case} | x for x in steps]
+    return {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": environment(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "app": VERSION,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": {x: package_version(x) for x in PACKAGES},
+    }
+
+
+def package_version(name: str) -> str:
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def report(results: dict) -> None:
+    print(
+        f"\n{'case':<28}{'step':<11}{'variant':<8}{'runs':>5}"
+        f"{'wall s':>10}{'cpu s':>10}{'peak MB':>10}"
+    )
+    for item in results["results"]:
+        if "error" in item:
+            print(f"{item['case']:<28}{item['step']:<11}FAILED: {item['error']}")
+            continue
+        peak = item["peak_rss_mb"]
+        print(
+            f"{item['case']:<28}{item['step']:<11}{item['variant']:<8}"
+            f"{item['runs']:>5}{item['wall']['median']:>10.3f}"
+            f"{item['cpu']['median']:>10.3f}"
+            f"{peak if peak is not None else '-':>10}"
+        )
+        for name, seconds in item.get("stages", {}).items():
+            print(f"{'':<28}{'  ' + name:<19}{'':>5}{seconds:>10.3f}")
+
+
+def differences(results: dict, baseline: dict) -> list[str]:
+    """The ways the environment of ``results`` differs from the
+    baseline's."""
+    now = results["environment"]
+    before = baseline["environment"]
+    notes = []
+    for name in ["app", "commit", "python", "platform", "cpus"]:
+        if now.get(name) != before.get(name):
+            notes.append(f"{name} {before.get(name)} -> {now.get(name)}")
+    for name, value in now["packages"].items():
+        if before["packages"].get(name) != value:
+            notes.append(f"{name} {before['packages'].get(name)} -> {value}")
+    return notes
+
+
+def regressions(
+    results: dict,
+    baseline: dict,
+    tolerance: float,
+    min_seconds: float,
+    min_mb: float,
+) -> list[str]:
+    """The steps slower, or using more memory, than in the baseline,
+    or failing where the baseline ran."""
+    before = {
+        (x["case"], x["step"], x["variant"]): x
+        for x in baseline["results"]
+        if "error" not in x
+    }
+    ran = {(x[0], x[1]) for x in before}
+    found = []
+    for item in results["results"]:
+        if "error" in item:
+            if (item["case"], item["step"]) in ran:
+                found.append(f"{item['case']} {item['step']}: failed")
+            continue
+        key = (item["case"], item["step"], item["variant"])
+        if key not in before:
+            continue
+        label = " ".join(key)
+        old = before[key]["wall"]["median"]
+        new = item["wall"]["median"]
+        if new > max(old * (1 + tolerance), old + min_seconds):
+            found.append(f"{label}: wall {old:.3f}s -> {new:.3f}s")
+        old = before[key]["peak_rss_mb"]
+        new = item["peak_rss_mb"]
+        if (
+            old is not None
+            and new is not None
+            and new > max(old * (1 + tolerance), old + min_mb)
+        ):
+            found.append(f"{label}: peak memory {old:.0f} MB -> {new:.0f} MB")
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--only",
+        action="append",
+        default=[],
+        help="Run the cases whose TYPE/NAME contains this, may be repeated",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Leave out the cases whose TYPE/NAME contains this, may be repeated",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--output",
+        default="benchmark_results.json",
+        help="Results file to write (default: benchmark_results.json)",
+    )
+    parser.add_argument(
+        "--compare", help="Report this results file rather than running"
+    )
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Fraction above the baseline that is a regression (default: 0.2)",
+    )
+    parser.add_argument("--min-seconds", type=float, default=0.05)
+    parser.add_argument("--min-mb", type=float, default=25)
+    args = parser.parse_args(argv)
+    args.repeat = max(args.repeat, 1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            results = json.load(f)
+    else:
+        results = run(args)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to '{args.output}'")
+    report(results)
+
+    failed = False
+    errors = [x for x in results["results"] if "error" in x]
+    if errors:
+        print(f"\nFAILED: {len(errors)} steps failed")
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nBaseline '{args.baseline}' of {baseline['created']}")
+        for note in differences(results, baseline):
+            print(f"  environment: {note}")
+        found = regressions(
+            results, baseline, args.tolerance, args.min_seconds, args.min_mb
+        )
+        for regression in found:
+            print(f"REGRESSION: {regression}")
+        if found:
+            failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
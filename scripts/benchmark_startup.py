@@ -0,0 +1,108 @@
+"""Benchmark the time taken to import the application.
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh
+interpreter ``--runs`` times and reports the cumulative import time of
+``app.main`` (best of the runs) with the packages that took longest,
+by their own import time summed over their modules. This is the import
+part of the first-request latency after a scale-to-zero start; the
+startup housekeeping (database migration, job recovery) runs after the
+server is up and is reported on ``/ready``.
+
+The run fails, exit status 1, when:
+
+- the import takes longer than ``--budget`` milliseconds, or
+- one of the heavy libraries that should load on first use (``HEAVY``)
+  is imported by ``app.main``.
+
+The configuration is read as it is by the server, from
+``.{PYTHON_ENVIRONMENT}_env`` in the repo root (``.development_env``
+unless ``PYTHON_ENVIRONMENT`` is set).
+
+Usage (from the repo root):
+
+    python -m scripts.benchmark_startup
+    python -m scripts.benchmark_startup --budget 1500 --runs 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = [
+    "usdm4",
+    "usdm4_fhir",
+    "usdm4_protocol",
+    "usdm4_excel",
+    "usdm4_pj",
+    "openpyxl",
+    "bs4",
+]
+
+
+def import_times() -> dict[str, tuple[int, int]]:
+    """Module name -> (self, cumulative) import time in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:") :].split("|")
+        times[module.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=2000,
+        help="Import time budget for app.main in ms (default: 2000)",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [import_times() for _ in range(max(args.runs, 1))]
+    best = min(runs, key=lambda x: x["app.main"][1])
+    packages = defaultdict(int)
+    for module, (own, _) in best.items():
+        packages[module.split(".")[0]] += own
+    print(f"{'package':<30}{'ms':>10}")
+    for name, own in sorted(packages.items(), key=lambda x: -x[1])[: args.top]:
+        print(f"{name:<30}{own / 1000:>10.1f}")
+
+    total_ms = best["app.main"][1] / 1000
+    all_ms = ", ".join(f"{x['app.main'][1] / 1000:.0f}" for x in runs)
+    print(
+        f"\nimport app.main: {total_ms:.0f} ms (runs: {all_ms}), budget {args.budget:.0f} ms"
+    )
+    failed = False
+    loaded = [x for x in HEAVY if x in best]
+    if loaded:
+        print(
+            f"FAILED: imported at startup, should load on first use: {', '.join(loaded)}"
+        )
+        failed = True
+    if total_ms > args.budget:
+        print(f"FAILED: {total_ms - args.budget:.0f} ms over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
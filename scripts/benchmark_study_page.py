@@ -0,0 +1,170 @@
+"""Benchmark the home page study listing (``Study.page``).
+
+Seeds a throwaway SQLite database with one user and ``--studies``
+studies (one to three versions each, every version with its own import
+row) and then times ``Study.page`` for the first, a middle and the last
+page, counting the SQL statements each call issues.
+
+``--per-row`` also times the previous per-study summary (a version
+count, the latest version and its import looked up separately for every
+row) over the same pages, for comparison.
+
+Usage (from the repo root):
+
+    python -m scripts.benchmark_study_page
+    python -m scripts.benchmark_study_page --studies 10000 --size 50 --per-row
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import database_tables
+from app.database.database_tables import FileImport as FileImportDB
+from app.database.database_tables import Study as StudyDB
+from app.database.database_tables import User as UserDB
+from app.database.database_tables import Version as VersionDB
+from app.database.file_import import FileImport
+from app.database.study import Study
+from app.database.version import Version
+
+
+def seed(session, studies: int) -> int:
+    user = UserDB(identifier="bench", email="bench@example.com", display_name="Bench")
+    session.add(user)
+    session.commit()
+    imports = []
+    versions = []
+    for index in range(studies):
+        for version in range(index % 3 + 1):
+            imports.append(
+                {
+                    "id": len(imports) + 1,
+                    "uuid": f"uuid-{index}-{version}",
+                    "type": "USDM3_JSON" if version % 2 else "M11_DOCX",
+                    "filepath": f"path/file{index}-{version}",
+                    "filename": f"file{index}-{version}",
+                    "status": "Successful",
+                    "user_id": user.id,
+                }
+            )
+            versions.append(
+                {
+                    "version": version + 1,
+                    "study_id": index + 1,
+                    "import_id": len(imports),
+                }
+            )
+    session.bulk_insert_mappings(
+        StudyDB,
+        [
+            {
+                "id": index + 1,
+                "name": f"STUDY {index}",
+                "title": f"Study Title {index}",
+                "phase": f"Phase {index % 4 + 1}",
+                "sponsor": f"SPONSOR {index % 7}",
+                "sponsor_identifier": f"sponsor_{index}",
+                "nct_identifier": f"NCT{index:08d}",
+                "user_id": user.id,
+            }
+            for index in range(studies)
+        ],
+    )
+    session.bulk_insert_mappings(FileImportDB, imports)
+    session.bulk_insert_mappings(VersionDB, versions)
+    session.commit()
+    return user.id
+
+
+def per_row_page(page: int, size: int, user_id: int, session) -> list[dict]:
+    data = (
+        session.query(StudyDB)
+        .filter(StudyDB.user_id == user_id)
+        .order_by(StudyDB.id)
+        .offset((page - 1) * size)
+        .limit(size)
+        .all()
+    )
+    results = []
+    for item in data:
+        record = dict(item.__dict__)
+        record.pop("_sa_instance_state")
+        record["versions"] = Version.version_count(item.id, session)
+        latest_version = Version.find_latest_version(item.id, session)
+        record["latest_version_id"] = latest_version.id
+        record["import_type"] = FileImport.find(latest_version.import_id, session).type
+        results.append(record)
+    return results
+
+
+def measure(label: str, call, engine, repeat: int) -> None:
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    timings = []
+    for _ in range(repeat):
+        statements.clear()
+        event.listen(engine, "before_cursor_execute", count)
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+        event.remove(engine, "before_cursor_execute", count)
+    print(
+        f"{label:<28} statements: {len(statements):>4}  "
+        f"median: {statistics.median(timings):8.2f} ms  "
+        f"max: {max(timings):8.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Study.page.")
+    parser.add_argument("--studies", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=50, help="Page size")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--per-row", action="store_true", help="Also time the per-study summary"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dir:
+        engine = create_engine(f"sqlite:///{os.path.join(dir, 'benchmark.db')}")
+        database_tables.Base.metadata.create_all(bind=engine)
+        session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        start = time.perf_counter()
+        user_id = seed(session, args.studies)
+        print(f"Seeded {args.studies} studies in {time.perf_counter() - start:.1f}s")
+        last = (args.studies + args.size - 1) // args.size
+        for page in sorted({1, max(last // 2, 1), last}):
+            measure(
+                f"Study.page page {page}",
+                lambda: Study.page(page, args.size, user_id, {}, session),
+                engine,
+                args.repeat,
+            )
+            if args.per_row:
+                measure(
+                    f"per-row page {page}",
+                    lambda: per_row_page(page, args.size, user_id, session),
+                    engine,
+                    args.repeat,
+                )
+        measure(
+            "Study.page phase filter",
+            lambda: Study.page(1, args.size, user_id, {"phase": ["Phase 2"]}, session),
+            engine,
+            args.repeat,
+        )
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark the memory used to receive and save a browser upload.
+
+Builds a multipart request for a synthetic Excel import (one workbook of
+``--size`` MB of random bytes plus two images) and feeds it to
+``FormHandler`` chunk by chunk, as the ASGI server would, then saves the
+files with ``DataFiles`` the way ``ImportManager.save_files`` does. The
+Python heap peak is measured with tracemalloc for the buffered mode
+(files read into bytes) and the streaming mode (spooled files copied to
+disk in chunks).
+
+Usage (from the repo root):
+
+    python -m scripts.benchmark_upload_memory
+    python -m scripts.benchmark_upload_memory --size 200 --size 50
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from starlette.requests import Request
+
+from app.configuration.configuration import application_configuration
+from app.imports.form_handler import FormHandler
+from app.model.file_handling.data_files import DataFiles
+
+BOUNDARY = "benchmarkboundary"
+CHUNK_SIZE = 64 * 1024
+
+
+def make_file(dir: str, name: str, size: int) -> str:
+    path = os.path.join(dir, name)
+    with open(path, "wb") as f:
+        for _ in range(size // CHUNK_SIZE):
+            f.write(os.urandom(CHUNK_SIZE))
+        f.write(os.urandom(size % CHUNK_SIZE))
+    return path
+
+
+def body(paths: list[str]):
+    for path in paths:
+        yield (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="files"; '
+            f'filename="{os.path.basename(path)}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                yield chunk
+        yield b"\r\n"
+    yield f"--{BOUNDARY}--\r\n".encode()
+
+
+def request(paths: list[str]) -> Request:
+    chunks = body(paths)
+
+    async def receive():
+        chunk = next(chunks, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/import/xl",
+        "headers": [
+            (
+                b"content-type",
+                f"multipart/form-data; boundary={BOUNDARY}".encode(),
+            )
+        ],
+    }
+    return Request(scope, receive)
+
+
+async def upload(paths: list[str], stream: bool) -> None:
+    form_handler = FormHandler(request(paths), True, ".xlsx", "browser", stream)
+    main_file, image_files, messages = await form_handler.get_files()
+    files = DataFiles()
+    files.new()
+    files.save("xlsx", main_file["contents"], main_file["filename"])
+    for image_file in image_files:
+        files.save("image", image_file["contents"], image_file["filename"])
+    await form_handler.request.close()
+    files.delete()
+
+
+def measure(paths: list[str], stream: bool) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    asyncio.run(upload(paths, stream))
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024), elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark upload memory.")
+    parser.add_argument(
+        "--size",
+        type=int,
+        action="append",
+        help="Workbook size in MB, may be repeated (default 50 and 200)",
+    )
+    args = parser.parse_args()
+    application_configuration.upload_max_size_mb = 0
+
+    with tempfile.TemporaryDirectory() as dir:
+        application_configuration.data_file_path = os.path.join(dir, "datafiles")
+        os.mkdir(application_configuration.data_file_path)
+        for size in args.size or [50, 200]:
+            paths = [
+                make_file(dir, "study.xlsx", size * 1024 * 1024),
+                make_file(dir, "image1.png", 1024 * 1024),
+                make_file(dir, "image2.png", 1024 * 1024),
+            ]
+            for stream in [False, True]:
+                peak, elapsed = measure(paths, stream)
+                mode = "streaming" if stream else "buffered"
+                print(
+                    f"{size:>5} MB workbook {mode:<10} "
+                    f"peak heap: {peak:8.1f} MB  time: {elapsed:6.2f}s"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Micro-benchmark of the USDMJson protocol section lookups.
+
+Builds a synthetic study whose protocol document has ``--sections``
+narrative content entries (a linked list, as produced by the M11 and
+CPT imports) and times, with and without ``USDMIndex``:
+
+- walking every section (``protocol_sections``),
+- rendering every section (``section``, which also resolves the
+  narrative content item text),
+- looking up sections by number and by title.
+
+The unindexed figures use the linear scans the index replaced. The
+``USDMJson`` instance is built around the synthetic dict directly, as
+``__init__`` needs an import in the database.
+
+Usage (from the repo root):
+
+    python -m scripts.benchmark_usdm_lookups
+    python -m scripts.benchmark_usdm_lookups --sections 5000
+"""
+
+import argparse
+import time
+
+from app.model.usdm_index import USDMIndex
+from app.model.usdm_json import USDMJson
+
+
+def build(sections: int) -> dict:
+    contents = []
+    items = []
+    for index in range(sections):
+        number = f"{index // 100 + 1}.{index // 10 % 10 + 1}.{index % 10 + 1}"
+        contents.append(
+            {
+                "id": f"nc-{index}",
+                "sectionNumber": number,
+                "sectionTitle": f"Section {number} Title",
+                "contentItemId": f"nci-{index}",
+                "previousId": f"nc-{index - 1}" if index else None,
+                "nextId": f"nc-{index + 1}" if index < sections - 1 else None,
+            }
+        )
+        items.append({"id": f"nci-{index}", "text": f"<p>Content {index}</p>"})
+    return {
+        "study": {
+            "versions": [
+                {
+                    "studyDesigns": [{"id": "design-1"}],
+                    "studyInterventions": [{"id": "int-1"}],
+                    "narrativeContentItems": items,
+                    "documentVersionIds": ["docver-1"],
+                }
+            ],
+            "documentedBy": [{"versions": [{"id": "docver-1", "contents": contents}]}],
+        }
+    }
+
+
+class ScanUSDMJson(USDMJson):
+    """The linear scans replaced by USDMIndex."""
+
+    def _first_narrative_content(self, document: dict) -> dict:
+        return next(
+            (x for x in document["contents"] if not x["previousId"] and x["nextId"]),
+            None,
+        )
+
+    def _find_narrative_content(self, document: dict, id: str) -> dict:
+        return next((x for x in document["contents"] if x["id"] == id), None)
+
+    def _section_item(self, narrative_content: dict) -> str:
+        version = self._data["study"]["versions"][0]
+        return next(
+            (
+                x["text"]
+                for x in version["narrativeContentItems"]
+                if x["id"] == narrative_content["contentItemId"]
+            ),
+            "",
+        )
+
+    def _section_by_number(self, number) -> dict:
+        return next(
+            (x for x in self._document()["contents"] if x["sectionNumber"] == number),
+            None,
+        )
+
+    def _section_by_title_contains(self, title) -> dict:
+        return next(
+            (
+                x
+                for x in self._document()["contents"]
+                if title.upper() in x["sectionTitle"].upper()
+            ),
+            None,
+        )
+
+    def _document(self) -> dict:
+        return self._data["study"]["documentedBy"][0]["versions"][0]
+
+
+def instance(cls, data: dict) -> USDMJson:
+    usdm = object.__new__(cls)
+    usdm.id = 1
+    usdm.m11 = True
+    usdm._data = data
+    return usdm
+
+
+def timed(call) -> float:
+    start = time.perf_counter()
+    call()
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark USDMJson lookups.")
+    parser.add_argument("--sections", type=int, default=2000)
+    args = parser.parse_args()
+
+    data = build(args.sections)
+    contents = data["study"]["documentedBy"][0]["versions"][0]["contents"]
+    numbers = [x["sectionNumber"] for x in contents]
+    titles = [x["sectionTitle"].lower() for x in contents[-50:]]
+    indexed = instance(USDMJson, data)
+    build_ms = timed(indexed._usdm_index)
+    print(f"{args.sections} sections, index built in {build_ms:.2f} ms")
+    print(f"{'operation':<34}{'scan ms':>12}{'indexed ms':>12}{'speedup':>10}")
+    cases = [
+        ("protocol_sections", lambda usdm: usdm.protocol_sections()),
+        ("section, every id", lambda usdm: [usdm.section(x["id"]) for x in contents]),
+        (
+            "section by number, every number",
+            lambda usdm: [usdm._section_by_number(x) for x in numbers],
+        ),
+        (
+            "section by title, last 50",
+            lambda usdm: [usdm._section_by_title_contains(x) for x in titles],
+        ),
+    ]
+    scan = instance(ScanUSDMJson, data)
+    for label, case in cases:
+        scan_ms = timed(lambda: case(scan))
+        indexed_ms = timed(lambda: case(indexed))
+        print(
+            f"{label:<34}{scan_ms:>12.2f}{indexed_ms:>12.2f}"
+            f"{scan_ms / indexed_ms:>9.0f}x"
+        )
+    assert [x["id"] for x in scan.protocol_sections()] == [
+        x["id"] for x in indexed.protocol_sections()
+    ]
+    assert isinstance(indexed._usdm_index(), USDMIndex)
+
+
+if __name__ == "__main__":
+    main()
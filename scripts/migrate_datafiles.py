@@ -0,0 +1,131 @@
+"""Rewrite the stored JSON data files compactly and in the configured
+compression, and report the disk space saved.
+
+Files written before ``DATAFILE_COMPRESSION`` were pretty-printed and
+uncompressed. They are still read as they are, so migrating is only to
+reclaim the space. For each study dir under ``DATAFILE_PATH`` the JSON
+files the workbench generates (the USDM, validation findings, patient
+journey, ...) are parsed and saved again through ``DataFiles``: without
+the indentation and, for the types stored compressed, in the
+compression given by ``--format`` (default the configured one, ``none``
+for uncompressed). Each file is replaced atomically, so the migration
+can run alongside the application and be stopped and rerun at any
+time. Uploaded originals (FHIR messages) are left alone.
+
+With ``--dry-run`` nothing is written; the sizes after are those the
+files would have.
+
+Usage (from the repo root, with the right PYTHON_ENVIRONMENT set):
+
+    python -m scripts.migrate_datafiles --dry-run
+    python -m scripts.migrate_datafiles --format gzip
+"""
+
+import argparse
+import gzip
+import json
+import os
+
+from app.configuration.configuration import application_configuration
+from app.model.file_handling.compression import Compression, zstandard
+from app.model.file_handling.data_files import DataFiles
+from scripts.rebuild_manifests import study_dirs
+
+MB = 1024 * 1024
+
+
+def json_types(files: DataFiles) -> list[str]:
+    """The JSON types the workbench names and writes itself."""
+    return [
+        type
+        for type, details in files.media_type.items()
+        if details["method"] == files._save_json_file and not details["use_original"]
+    ]
+
+
+def compressed_size(text: str, compression: str | None) -> int:
+    data = text.encode("utf-8")
+    if compression == Compression.GZIP:
+        return len(gzip.compress(data, compresslevel=Compression.GZIP_LEVEL))
+    if compression == Compression.ZSTD:
+        compressor = zstandard.ZstdCompressor(level=Compression.ZSTD_LEVEL)
+        return len(compressor.compress(data))
+    return len(data)
+
+
+def migrate_study(uuid: str, dry_run: bool, totals: dict) -> None:
+    files = DataFiles(uuid)
+    for type in json_types(files):
+        stored_path = files.stored_path(type)
+        if not os.path.isfile(stored_path):
+            continue
+        before = os.path.getsize(stored_path)
+        try:
+            data = json.loads(files.read(type))
+            if dry_run:
+                filename = files._form_filename(type)
+                after = compressed_size(json.dumps(data), files._compression(filename))
+            else:
+                full_path, _ = files.save(type, data)
+                if full_path is None:
+                    raise ValueError("not saved")
+                after = os.path.getsize(full_path)
+        except Exception as e:
+            print(f"  {uuid}/{os.path.basename(stored_path)}: failed, {e}")
+            totals["failed"] += 1
+            continue
+        total = totals["types"].setdefault(type, [0, 0, 0])
+        total[0] += 1
+        total[1] += before
+        total[2] += after
+
+
+def report(totals: dict) -> None:
+    print(f"{'type':<16}{'files':>8}{'before MB':>12}{'after MB':>12}{'saved':>8}")
+    files, before, after = 0, 0, 0
+    for type, (count, type_before, type_after) in sorted(totals["types"].items()):
+        print(row(type, count, type_before, type_after))
+        files += count
+        before += type_before
+        after += type_after
+    print(row("total", files, before, after))
+    if totals["failed"]:
+        print(f"{totals['failed']} file(s) could not be migrated, left as they were")
+
+
+def row(name: str, count: int, before: int, after: int) -> str:
+    saved = f"{(before - after) / before:.0%}" if before else "-"
+    return f"{name:<16}{count:>8}{before / MB:>12.1f}{after / MB:>12.1f}{saved:>8}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Rewrite the stored JSON data files compactly and compressed."
+    )
+    parser.add_argument(
+        "--format",
+        choices=["none", Compression.GZIP, Compression.ZSTD],
+        help="Compression to store in, default DATAFILE_COMPRESSION.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report the savings without changing any file.",
+    )
+    args = parser.parse_args()
+    if args.format:
+        # Only for this process; the application reads its own setting.
+        application_configuration.datafile_compression = (
+            "" if args.format == "none" else args.format
+        )
+    compression = Compression.configured() or "none"
+    dir = application_configuration.data_file_path
+    print(f"Migrating '{dir}' to '{compression}'{' (dry run)' if args.dry_run else ''}")
+    totals = {"types": {}, "failed": 0}
+    for uuid in study_dirs(dir):
+        migrate_study(uuid, args.dry_run, totals)
+    report(totals)
+
+
+if __name__ == "__main__":
+    main()
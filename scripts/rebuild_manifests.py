@@ -0,0 +1,61 @@
+"""Write the manifest of the study dirs created before manifests.
+
+``DataFiles`` finds the files of a study through the manifest in its
+dir, written when the dir is created and updated by each save. Dirs
+without one are scanned and stat'ed on every lookup, as before. This
+builds the manifests of those dirs from the files in them, or of all
+the study dirs with ``--all`` (e.g. after files were copied in by
+hand). It can run alongside the application.
+
+Usage (from the repo root, with the right PYTHON_ENVIRONMENT set):
+
+    python -m scripts.rebuild_manifests
+    python -m scripts.rebuild_manifests --all
+"""
+
+import argparse
+import os
+from uuid import UUID
+
+from app.configuration.configuration import application_configuration
+from app.model.file_handling.data_files import DataFiles
+
+
+def study_dirs(dir: str) -> list[str]:
+    """The study dirs, named by their UUID; not e.g. the validation cache."""
+    results = []
+    for name in sorted(os.listdir(dir)):
+        try:
+            UUID(name)
+        except ValueError:
+            continue
+        if os.path.isdir(os.path.join(dir, name)):
+            results.append(name)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the study dir manifests.")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Rebuild the manifests that exist too.",
+    )
+    args = parser.parse_args()
+    dir = application_configuration.data_file_path
+    rebuilt, skipped, files = 0, 0, 0
+    for uuid in study_dirs(dir):
+        data_files = DataFiles(uuid)
+        if data_files.manifest() is not None and not args.all:
+            skipped += 1
+            continue
+        files += len(data_files.rebuild_manifest())
+        rebuilt += 1
+    print(
+        f"Rebuilt {rebuilt} manifest(s) listing {files} file(s) in '{dir}', "
+        f"{skipped} left as they were"
+    )
+
+
+if __name__ == "__main__":
+    main()
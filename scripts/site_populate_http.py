@@ -1,36 +1,32 @@
 #!/usr/bin/env python3
 """Populate a running single-user Study Definitions Workbench via HTTP.
 
-No browser, no Playwright. Each file is POSTed straight to its import
-endpoint (the same multipart ``files`` field the web form submits), then
-the script polls ``/import/status/data`` until the background import
-finishes.
+No browser, no Playwright. All the files are POSTed in one request to
+the batch import endpoint, ``/import/batch``, each under a form field
+naming its import type, then the script polls the batch status,
+``/import/batch/{id}/status``, until every import has finished.
 
-Why poll: ``execute_import`` runs the actual parse in a background thread
-(see ``app/imports/import_manager.py``), so the POST returns "upload
-successful" the instant the file is saved — not when the import
-completes. The DB status flips to ``Success`` / ``Failed`` / ``Exception``
-when the thread is done; that's what we wait on.
+Why poll: each file is queued as an import job and the actual parse runs
+on the import queue's worker pool (see ``app/imports/import_queue.py``),
+so the POST returns as soon as the files are saved — not when the
+imports complete. The status endpoint reports per-file progress and,
+once the batch has finished, a summary of successes and failures.
 
 Single-user only: ``protect_endpoint`` auto-provisions the session when
 ``SINGLE_USER`` is set, so no login is needed. Against a multi-user
 server every request redirects to /login and the uploads are rejected.
 
-Assumes a fresh/empty import history (an "init"): completion is matched
-by filename, so a pre-existing row for the same filename would be read
-as this run's result.
-
 Usage (from the repo root):
 
     python -m scripts.site_populate_http
     python -m scripts.site_populate_http --url http://localhost:8000
-    python -m scripts.site_populate_http --timeout 240
+    python -m scripts.site_populate_http --timeout 600
 """
 
 import argparse
+import json
 import mimetypes
 import os
-import re
 import sys
 import time
 import urllib.error
@@ -39,102 +35,83 @@ import uuid
 
 REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# (POST endpoint, file path relative to repo root), in load order.
+# (import type, file path relative to repo root), in load order.
 FILES = [
-    ("/import/m11", "tests/test_files/m11/WA42380/WA42380.docx"),
-    ("/import/m11", "tests/test_files/m11/ASP8062/ASP8062.docx"),
-    ("/import/m11", "tests/test_files/m11/RadVax/RadVax.docx"),
-    ("/import/m11", "tests/test_files/m11/LZZT/LZZT.docx"),
-    ("/import/fhir?version=prism3", "tests/test_files/fhir_v3/from/IGBJ_fhir_m11.json"),
-    (
-        "/import/fhir?version=prism3",
-        "tests/test_files/fhir_v3/from/WA42380_fhir_m11.json",
-    ),
-    (
-        "/import/fhir?version=prism3",
-        "tests/test_files/fhir_v3/from/ASP8062_fhir_m11.json",
-    ),
-    (
-        "/import/fhir?version=prism3",
-        "tests/test_files/fhir_v3/from/DEUCRALIP_fhir_m11.json",
-    ),
-    ("/import/xl", "tests/test_files/excel/pilot.xlsx"),
+    ("M11_DOCX", "tests/test_files/m11/WA42380/WA42380.docx"),
+    ("M11_DOCX", "tests/test_files/m11/ASP8062/ASP8062.docx"),
+    ("M11_DOCX", "tests/test_files/m11/RadVax/RadVax.docx"),
+    ("M11_DOCX", "tests/test_files/m11/LZZT/LZZT.docx"),
+    ("FHIR_PRISM3_JSON", "tests/test_files/fhir_v3/from/IGBJ_fhir_m11.json"),
+    ("FHIR_PRISM3_JSON", "tests/test_files/fhir_v3/from/WA42380_fhir_m11.json"),
+    ("FHIR_PRISM3_JSON", "tests/test_files/fhir_v3/from/ASP8062_fhir_m11.json"),
+    ("FHIR_PRISM3_JSON", "tests/test_files/fhir_v3/from/DEUCRALIP_fhir_m11.json"),
+    ("USDM_EXCEL", "tests/test_files/excel/pilot.xlsx"),
 ]
 
-TERMINAL_OK = "Success"
-TERMINAL = {"Success", "Failed", "Exception"}
-
-_ROW_RE = re.compile(r"<tr>(.*?)</tr>", re.DOTALL)
-# Only matches <td> cells with plain text (no nested tags): the first four
-# columns are Type, Imported At, File Name, Status. The Errors / Validation
-# columns hold anchors and are skipped.
-_CELL_RE = re.compile(r"<td>([^<]*)</td>")
-
 
-def _multipart_body(filename, content):
+def _multipart_body(parts):
+    """``parts`` is a list of (field name, file path)."""
     boundary = uuid.uuid4().hex
-    ctype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
-    body = b"".join(
-        [
-            b"--",
-            boundary.encode(),
-            b"\r\n",
-            b'Content-Disposition: form-data; name="files"; filename="',
-            filename.encode(),
-            b'"\r\n',
-            b"Content-Type: ",
-            ctype.encode(),
-            b"\r\n\r\n",
+    chunks = []
+    for field, path in parts:
+        filename = os.path.basename(path)
+        ctype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        with open(path, "rb") as handle:
+            content = handle.read()
+        chunks += [
+            f"--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="{field}"; '
+            f'filename="{filename}"\r\n'.encode(),
+            f"Content-Type: {ctype}\r\n\r\n".encode(),
             content,
             b"\r\n",
-            b"--",
-            boundary.encode(),
-            b"--\r\n",
         ]
-    )
-    return boundary, body
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return boundary, b"".join(chunks)
 
 
-def post_file(base_url, endpoint, filepath):
-    """POST one file. Returns on acceptance, raises on rejection."""
-    filename = os.path.basename(filepath)
-    with open(filepath, "rb") as handle:
-        content = handle.read()
-    boundary, body = _multipart_body(filename, content)
+def _get_json(url, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        body = resp.read().decode("utf-8", "replace")
+    try:
+        return json.loads(body)
+    except ValueError:
+        hint = ""
+        if "login" in body.lower() or "register" in body.lower():
+            hint = " (server looks like it's NOT in single-user mode — uploads need SINGLE_USER set)"
+        raise RuntimeError(f"unexpected response{hint}") from None
+
+
+def post_batch(base_url, parts):
+    """POST the files as one batch. Returns the batch response."""
+    boundary, body = _multipart_body(parts)
     req = urllib.request.Request(
-        base_url + endpoint,
+        base_url + "/import/batch",
         data=body,
         method="POST",
         headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
     )
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        html = resp.read().decode("utf-8", "replace")
-    if "alert-success" not in html:
-        hint = ""
-        if "login" in html.lower() or "register" in html.lower():
-            hint = " (server looks like it's NOT in single-user mode — uploads need SINGLE_USER set)"
-        raise RuntimeError(f"upload rejected{hint}")
-    return filename
-
-
-def latest_status(base_url, filename):
-    """Status of the most recent import row for ``filename`` (or None)."""
-    url = base_url + "/import/status/data?page=1&size=500"
-    with urllib.request.urlopen(url, timeout=30) as resp:
-        html = resp.read().decode("utf-8", "replace")
-    status = None
-    for row in _ROW_RE.findall(html):
-        cells = _CELL_RE.findall(row)  # [type, created, filename, status]
-        if len(cells) >= 4 and cells[2].strip() == filename:
-            status = cells[3].strip()  # rows are ascending; keep the last match
-    return status
-
-
-def wait_for_completion(base_url, filename, timeout, poll=2.0):
+    with urllib.request.urlopen(req, timeout=300) as resp:
+        text = resp.read().decode("utf-8", "replace")
+    try:
+        return json.loads(text)
+    except ValueError:
+        raise RuntimeError(
+            "upload rejected (server looks like it's NOT in single-user mode"
+            " — uploads need SINGLE_USER set)"
+        ) from None
+
+
+def wait_for_batch(base_url, status_url, timeout, poll=2.0):
     deadline = time.time() + timeout
+    reported = {}
     while time.time() < deadline:
-        status = latest_status(base_url, filename)
-        if status in TERMINAL:
+        status = _get_json(base_url + status_url)
+        for item in status["files"]:
+            if item["job_status"] == "Complete" and item["job_id"] not in reported:
+                reported[item["job_id"]] = item["status"]
+                print(f"  {item['status']:<9} {item['filename']} ({item['seconds']}s)")
+        if status["finished"]:
             return status
         time.sleep(poll)
     return None
@@ -150,44 +127,46 @@ def main(argv=None):
     parser.add_argument(
         "--timeout",
         type=int,
-        default=180,
-        help="Per-file import timeout in seconds (default: 180)",
+        default=600,
+        help="Timeout for the whole batch in seconds (default: 600)",
     )
     args = parser.parse_args(argv)
     base = args.url.rstrip("/")
 
     print(f"Populating {base} ({len(FILES)} files)\n")
     failures = []
-    for endpoint, rel in FILES:
+    parts = []
+    for type, rel in FILES:
         path = os.path.join(REPO_ROOT, rel)
-        name = os.path.basename(path)
-        if not os.path.exists(path):
-            print(f"  SKIP   {name} — file not found ({rel})")
-            failures.append(name)
-            continue
-        print(f"  POST   {name} -> {endpoint} ... ", end="", flush=True)
-        try:
-            post_file(base, endpoint, path)
-        except urllib.error.URLError as exc:
-            print(f"FAILED ({exc.reason}); is the server up at {base}?")
-            failures.append(name)
-            continue
-        except Exception as exc:  # noqa: BLE001 - report and keep going
-            print(f"FAILED ({exc})")
-            failures.append(name)
-            continue
-
-        status = wait_for_completion(base, name, args.timeout)
-        if status == TERMINAL_OK:
-            print("Success")
-        elif status is None:
-            print(f"TIMEOUT after {args.timeout}s")
-            failures.append(name)
+        if os.path.exists(path):
+            parts.append((type, path))
         else:
-            print(status)
-            failures.append(name)
+            print(f"  SKIP      {os.path.basename(path)} — file not found ({rel})")
+            failures.append(os.path.basename(path))
+    try:
+        batch = post_batch(base, parts)
+    except urllib.error.URLError as exc:
+        print(f"FAILED ({exc.reason}); is the server up at {base}?")
+        return 1
+    except Exception as exc:  # noqa: BLE001 - report and stop
+        print(f"FAILED ({exc})")
+        return 1
+    print(f"  Batch {batch['batch_id']}: {len(batch['accepted'])} files queued")
+    for item in batch["rejected"]:
+        print(f"  REJECTED  {item['filename']} — {item['reason']}")
+        failures.append(item["filename"])
 
+    status = wait_for_batch(base, batch["status_url"], args.timeout)
     print()
+    if status is None:
+        print(f"TIMEOUT after {args.timeout}s")
+        return 1
+    progress = status["progress"]
+    print(
+        f"Batch finished in {progress['elapsed_seconds']}s"
+        f" ({progress['files_per_minute']} files/minute)"
+    )
+    failures += [x["filename"] for x in status["summary"]["failed"]]
     if failures:
         print(f"Finished with {len(failures)} problem(s): {', '.join(failures)}")
         return 1
@@ -134,8 +134,198 @@ def test_email_config_set(mocker, monkeypatch):
     assert config.registration_notify_email == "admin@example.com"
 
 
+def test_usdm_cache_size(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().usdm_cache_size_mb == 256
+    env = _base_env()
+    env.update({"USDM_CACHE_SIZE_MB": "0"})
+    mock_se_get(mocker, env)
+    assert Configuration().usdm_cache_size_mb == 0
+
+
 def mock_se_get(mocker, mapping):
     """Name-based mock so the test is robust to new config reads."""
     mock = mocker.patch("d4k_ms_base.service_environment.ServiceEnvironment.get")
     mock.side_effect = lambda name: mapping.get(name)
     return mock
+
+
+def test_import_workers(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    config = Configuration()
+    assert config.import_workers == 2
+    assert config.import_workers_by_type == {"M11_DOCX": 1}
+    env = _base_env()
+    env.update(
+        {
+            "IMPORT_WORKERS": "3",
+            "IMPORT_WORKERS_BY_TYPE": "m11_docx=2, USDM_EXCEL=4,bad,CPT_DOCX=x",
+        }
+    )
+    mock_se_get(mocker, env)
+    config = Configuration()
+    assert config.import_workers == 3
+    assert config.import_workers_by_type == {"M11_DOCX": 2, "USDM_EXCEL": 4}
+
+
+def test_validation_workers(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().validation_workers == 1
+    env = _base_env()
+    env["VALIDATION_WORKERS"] = "3"
+    mock_se_get(mocker, env)
+    assert Configuration().validation_workers == 3
+
+
+def test_render_workers(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().render_workers == 4
+    env = _base_env()
+    env["RENDER_WORKERS"] = "2"
+    mock_se_get(mocker, env)
+    assert Configuration().render_workers == 2
+
+
+def test_validation_cache_size(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().validation_cache_size_mb == 64
+    env = _base_env()
+    env["VALIDATION_CACHE_SIZE_MB"] = "0"
+    mock_se_get(mocker, env)
+    assert Configuration().validation_cache_size_mb == 0
+
+
+def test_database_pragmas(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    config = Configuration()
+    assert config.database_pragmas == {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": "30000",
+        "cache_size": "-65536",
+        "mmap_size": "268435456",
+        "temp_store": "MEMORY",
+    }
+    assert config.database_pool_size == 10
+    assert config.database_pool_overflow == 20
+    env = _base_env()
+    env.update(
+        {
+            "DATABASE_PRAGMAS": "Synchronous=FULL, cache_size=-8000,bad,x=1;drop,foreign_keys=ON",
+            "DATABASE_POOL_SIZE": "4",
+            "DATABASE_POOL_OVERFLOW": "0",
+        }
+    )
+    mock_se_get(mocker, env)
+    config = Configuration()
+    assert config.database_pragmas["synchronous"] == "FULL"
+    assert config.database_pragmas["cache_size"] == "-8000"
+    assert config.database_pragmas["foreign_keys"] == "ON"
+    assert config.database_pragmas["journal_mode"] == "WAL"
+    assert "x" not in config.database_pragmas
+    assert "bad" not in config.database_pragmas
+    assert config.database_pool_size == 4
+    assert config.database_pool_overflow == 0
+
+
+def test_database_pragmas_busy_timeout(mocker, monkeypatch):
+    env = _base_env()
+    env["DATABASE_PRAGMAS"] = "busy_timeout=1000"
+    mock_se_get(mocker, env)
+    assert Configuration().database_pragmas["busy_timeout"] == "1000"
+    logger = mocker.patch("app.configuration.configuration.application_logger")
+    for value in ["abc", "-5"]:
+        env["DATABASE_PRAGMAS"] = f"busy_timeout={value}"
+        mock_se_get(mocker, env)
+        assert Configuration().database_pragmas["busy_timeout"] == "30000"
+    assert logger.warning.call_count == 2
+
+
+def test_upload_max_size(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().upload_max_size_mb == 500
+    env = _base_env()
+    env["UPLOAD_MAX_SIZE_MB"] = "0"
+    mock_se_get(mocker, env)
+    assert Configuration().upload_max_size_mb == 0
+
+
+def test_datafile_compression(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().datafile_compression == ""
+    env = _base_env()
+    env["DATAFILE_COMPRESSION"] = "GZIP"
+    mock_se_get(mocker, env)
+    assert Configuration().datafile_compression == "gzip"
+
+
+def test_import_reuse(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().import_reuse is False
+    env = _base_env()
+    env["IMPORT_REUSE"] = "true"
+    mock_se_get(mocker, env)
+    assert Configuration().import_reuse is True
+
+
+def test_outbound(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    config = Configuration()
+    assert config.outbound_connections == 10
+    assert config.outbound_concurrency == 4
+    assert config.outbound_timeout == 30.0
+    assert config.outbound_retries == 2
+    assert config.outbound_backoff == 0.5
+    env = _base_env()
+    env.update(
+        {
+            "OUTBOUND_CONNECTIONS": "2",
+            "OUTBOUND_CONCURRENCY": "1",
+            "OUTBOUND_TIMEOUT": "7.5",
+            "OUTBOUND_RETRIES": "0",
+            "OUTBOUND_BACKOFF": "0.1",
+        }
+    )
+    mock_se_get(mocker, env)
+    config = Configuration()
+    assert config.outbound_connections == 2
+    assert config.outbound_concurrency == 1
+    assert config.outbound_timeout == 7.5
+    assert config.outbound_retries == 0
+    assert config.outbound_backoff == 0.1
+
+
+def test_bulk_transmit_workers(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().bulk_transmit_workers == 2
+    env = _base_env()
+    env["BULK_TRANSMIT_WORKERS"] = "4"
+    mock_se_get(mocker, env)
+    assert Configuration().bulk_transmit_workers == 4
+
+
+def test_notification_broker(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    config = Configuration()
+    assert config.notification_broker_path == ""
+    assert config.notification_poll_seconds == 0.25
+    env = _base_env()
+    env.update(
+        {
+            "NOTIFICATION_BROKER_PATH": "/mount/notifications.db",
+            "NOTIFICATION_POLL_SECONDS": "0.5",
+        }
+    )
+    mock_se_get(mocker, env)
+    config = Configuration()
+    assert config.notification_broker_path == "/mount/notifications.db"
+    assert config.notification_poll_seconds == 0.5
+
+
+def test_request_timing(mocker, monkeypatch):
+    mock_se_get(mocker, _base_env())
+    assert Configuration().request_timing is True
+    env = _base_env()
+    env["REQUEST_TIMING"] = "false"
+    mock_se_get(mocker, env)
+    assert Configuration().request_timing is False
@@ -0,0 +1,116 @@
+import threading
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import database_tables
+from app.database.database import create_database_engine
+from app.database.database_tables import User as UserDB
+from app.database.file_import import FileImport
+from app.database.study import Study
+
+
+def _engine(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path}/stress.db")
+    database_tables.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def test_pragmas(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.connect() as connection:
+        cursor = connection.connection.cursor()
+
+        def pragma(name):
+            return cursor.execute(f"PRAGMA {name}").fetchone()[0]
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1
+        assert pragma("busy_timeout") == 30000
+        assert pragma("cache_size") == -65536
+        assert pragma("temp_store") == 2
+    engine.dispose()
+
+
+def test_pool(tmp_path):
+    engine = _engine(tmp_path)
+    assert engine.pool.size() == 10
+    assert engine.pool._max_overflow == 20
+    engine.dispose()
+
+
+def test_concurrent_imports_and_page_loads(tmp_path):
+    """Imports writing status updates while the home page list is read
+    from other threads, as happens with background import workers.
+    Nothing may fail with 'database is locked'."""
+    engine = _engine(tmp_path)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    user = UserDB(identifier="stress", email="stress@example.com", display_name="S")
+    session.add(user)
+    session.commit()
+    user_id = user.id
+    session.close()
+    errors = []
+    pages = []
+    writers_done = threading.Event()
+
+    def importer(index):
+        session = Session()
+        try:
+            for item in range(10):
+                file_import = FileImport.create(
+                    f"path/{index}-{item}",
+                    f"file{index}-{item}.json",
+                    "Created",
+                    "USDM3_JSON",
+                    f"uuid-{index}-{item}",
+                    user_id,
+                    session,
+                )
+                for status in ["Saving", "Processing", "Saving", "Successful"]:
+                    file_import = file_import.update_status(status, session)
+                Study.study_and_version(
+                    {
+                        "name": f"STUDY {index}",
+                        "full_title": f"Study {index}",
+                        "phase": "Phase 1",
+                        "sponsor": "SPONSOR",
+                        "sponsor_identifier": f"sponsor-{index}",
+                        "nct_identifier": f"NCT{index}",
+                    },
+                    user,
+                    file_import,
+                    session,
+                )
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    def reader():
+        session = Session()
+        try:
+            while not writers_done.is_set():
+                pages.append(Study.page(1, 50, user_id, {}, session)["count"])
+                session.rollback()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    writers = [threading.Thread(target=importer, args=(x,)) for x in range(4)]
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writers_done.set()
+    for thread in readers:
+        thread.join()
+    assert errors == []
+    assert pages
+    session = Session()
+    assert Study.page(1, 50, user_id, {}, session)["count"] == 4
+    assert Study.summary(1, session)["versions"] == 10
+    session.close()
+    engine.dispose()
@@ -7,6 +7,12 @@ from app.database.database_tables import (
 from app.database.database_tables import (
     FileImport as FileImportDB,
 )
+from app.database.database_tables import (
+    ImportBatch as ImportBatchDB,
+)
+from app.database.database_tables import (
+    ImportJob as ImportJobDB,
+)
 from app.database.database_tables import (
     Study as StudyDB,
 )
@@ -19,6 +25,9 @@ from app.database.database_tables import (
 from app.database.database_tables import (
     UserEndpoint as UserEndpointDB,
 )
+from app.database.database_tables import (
+    ValidationJob as ValidationJobDB,
+)
 from app.database.database_tables import (
     Version as VersionDB,
 )
@@ -120,6 +129,9 @@ def test_clear_all(db):
         assert db.query(EndpointDB).count() == 0
         assert db.query(UserEndpointDB).count() == 0
         assert db.query(TransmissionDB).count() == 0
+        assert db.query(ImportJobDB).count() == 0
+        assert db.query(ImportBatchDB).count() == 0
+        assert db.query(ValidationJobDB).count() == 0
 
         # The user table MUST be preserved — it is the login allow-list
         # and holds roles. clear_all must never touch it.
@@ -164,7 +176,7 @@ def test_migrate_below_31(db):
     manager.migrate()
     # A single migrate() call applies every pending step up to the latest.
     version = manager._get_version()
-    assert version == 33
+    assert version == 39
     cursor = db.connection().connection.cursor()
     cols = [row[1] for row in cursor.execute("pragma table_info(user)")]
     assert "roles" in cols
@@ -178,32 +190,124 @@ def test_migrate_at_31(db):
     db.commit()
     manager.migrate()
     version = manager._get_version()
-    assert version == 33
+    assert version == 39
 
 
 def test_migrate_at_32(db):
-    """Test migration when version == 32 (adds roles column, -> 33)."""
+    """Test migration when version == 32 (adds roles column, -> 33 -> 39)."""
     manager = DatabaseManager(session=db)
     cursor = db.connection().connection.cursor()
     cursor.execute("pragma user_version = 32")
     db.commit()
     manager.migrate()
     version = manager._get_version()
-    assert version == 33
+    assert version == 39
     # The user table must have a roles column after this migration.
     cols = [row[1] for row in cursor.execute("pragma table_info(user)")]
     assert "roles" in cols
 
 
-def test_migrate_above_32(db):
-    """Test migration when version > 32 (no migration needed)."""
+def test_migrate_at_33(db):
+    """Test migration when version == 33 (indexes the study list keys, -> 39)."""
     manager = DatabaseManager(session=db)
     cursor = db.connection().connection.cursor()
+    cursor.execute("DROP INDEX IF EXISTS ix_version_study_id")
     cursor.execute("pragma user_version = 33")
     db.commit()
     manager.migrate()
+    assert manager._get_version() == 39
+    cursor = db.connection().connection.cursor()
+    indexes = [row[1] for row in cursor.execute("pragma index_list(version)")]
+    assert "ix_version_study_id" in indexes
+    assert "ix_version_import_id" in indexes
+    indexes = [row[1] for row in cursor.execute("pragma index_list(study)")]
+    assert "ix_study_user_id" in indexes
+
+
+def test_migrate_at_34(db):
+    """Test migration when version == 34 (import job batch id, -> 39)."""
+    manager = DatabaseManager(session=db)
+    cursor = db.connection().connection.cursor()
+    cursor.execute("DROP INDEX IF EXISTS ix_import_job_batch_id")
+    cursor.execute("pragma user_version = 34")
+    db.commit()
+    manager.migrate()
+    assert manager._get_version() == 39
+    cursor = db.connection().connection.cursor()
+    cols = [row[1] for row in cursor.execute("pragma table_info(import_job)")]
+    assert "batch_id" in cols
+    indexes = [row[1] for row in cursor.execute("pragma index_list(import_job)")]
+    assert "ix_import_job_batch_id" in indexes
+
+
+def test_migrate_at_35(db):
+    """Test migration when version == 35 (import source digest, -> 39)."""
+    manager = DatabaseManager(session=db)
+    cursor = db.connection().connection.cursor()
+    cursor.execute("DROP INDEX IF EXISTS ix_import_source_digest")
+    cursor.execute("pragma user_version = 35")
+    db.commit()
+    manager.migrate()
+    assert manager._get_version() == 39
+    cursor = db.connection().connection.cursor()
+    cols = [row[1] for row in cursor.execute("pragma table_info(import)")]
+    assert "source_digest" in cols
+    assert "reused_from" in cols
+    indexes = [row[1] for row in cursor.execute("pragma index_list(import)")]
+    assert "ix_import_source_digest" in indexes
+
+
+def test_migrate_at_36(db):
+    """Test migration when version == 36 (import job owner, -> 39)."""
+    manager = DatabaseManager(session=db)
+    cursor = db.connection().connection.cursor()
+    cursor.execute("pragma user_version = 36")
+    db.commit()
+    manager.migrate()
+    assert manager._get_version() == 39
+    cursor = db.connection().connection.cursor()
+    cols = [row[1] for row in cursor.execute("pragma table_info(import_job)")]
+    assert "owner" in cols
+    assert "heartbeat" in cols
+
+
+def test_migrate_at_37(db):
+    """Test migration when version == 37 (validation job owner, -> 39)."""
+    manager = DatabaseManager(session=db)
+    cursor = db.connection().connection.cursor()
+    cursor.execute("pragma user_version = 37")
+    db.commit()
+    manager.migrate()
+    assert manager._get_version() == 39
+    cursor = db.connection().connection.cursor()
+    cols = [row[1] for row in cursor.execute("pragma table_info(validation_job)")]
+    assert "owner" in cols
+    assert "heartbeat" in cols
+
+
+def test_migrate_at_38(db):
+    """Test migration when version == 38 (import type index, -> 39)."""
+    manager = DatabaseManager(session=db)
+    cursor = db.connection().connection.cursor()
+    cursor.execute("DROP INDEX IF EXISTS ix_import_type")
+    cursor.execute("pragma user_version = 38")
+    db.commit()
+    manager.migrate()
+    assert manager._get_version() == 39
+    cursor = db.connection().connection.cursor()
+    indexes = [row[1] for row in cursor.execute("pragma index_list(import)")]
+    assert "ix_import_type" in indexes
+
+
+def test_migrate_above_38(db):
+    """Test migration when version > 38 (no migration needed)."""
+    manager = DatabaseManager(session=db)
+    cursor = db.connection().connection.cursor()
+    cursor.execute("pragma user_version = 39")
+    db.commit()
+    manager.migrate()
     version = manager._get_version()
-    assert version == 33
+    assert version == 39
 
 
 def test_get_version(db):
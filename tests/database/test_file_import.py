@@ -1,15 +1,23 @@
+import datetime
+
 from sqlalchemy.orm import Session
 
 from app.database.database_tables import (
     FileImport as FileImportDB,
 )
+from app.database.database_tables import (
+    ImportStage as ImportStageDB,
+)
 from app.database.database_tables import (
     User as UserDB,
 )
 from app.database.file_import import FileImport
 
+START = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
 
 def _clean(db: Session):
+    db.query(ImportStageDB).delete()
     db.query(FileImportDB).delete()
     db.query(UserDB).delete()
     db.commit()
@@ -176,3 +184,47 @@ def test_update_status(db):
     assert fi.status == "success"
     updated = fi.update_status("completed", db)
     assert updated.status == "completed"
+
+
+def _add_stage(db: Session, import_id: int, seconds: float):
+    db.add(
+        ImportStageDB(
+            import_id=import_id,
+            name="convert",
+            started=START,
+            finished=START + datetime.timedelta(seconds=seconds),
+            seconds=seconds,
+        )
+    )
+    db.commit()
+
+
+def test_find_reusable(db):
+    _clean(db)
+    user = _setup_user(db)
+    first = FileImport.create(
+        "path/a.xlsx", "a.xlsx", "Success", "USDM_EXCEL", "r1", user.id, db, "abc"
+    )
+    FileImport.create(
+        "path/b.xlsx", "b.xlsx", "Failed", "USDM_EXCEL", "r2", user.id, db, "abc"
+    )
+    last = FileImport.create(
+        "path/c.xlsx", "c.xlsx", "Success", "USDM_EXCEL", "r3", user.id, db, "abc"
+    )
+    _create_import(db, user, uuid="r4")
+    assert [x.id for x in FileImport.find_reusable("abc", db)] == [last.id, first.id]
+    assert FileImport.find_reusable("xyz", db) == []
+    assert last.source_digest == "abc"
+
+
+def test_reuse_report(db):
+    _clean(db)
+    user = _setup_user(db)
+    assert FileImport.reuse_report(db) == {"reused": 0, "seconds_saved": 0}
+    prior = _create_import(db, user, uuid="p1")
+    reuse = _create_import(db, user, index=2, uuid="p2")
+    updated = reuse.set_reused_from(prior.id, db)
+    assert updated.reused_from == prior.id
+    _add_stage(db, prior.id, 60.0)
+    _add_stage(db, reuse.id, 1.5)
+    assert FileImport.reuse_report(db) == {"reused": 1, "seconds_saved": 58.5}
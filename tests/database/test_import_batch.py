@@ -0,0 +1,176 @@
+import datetime
+
+from sqlalchemy.orm import Session
+
+from app.database.database_tables import (
+    FileImport as FileImportDB,
+)
+from app.database.database_tables import (
+    ImportBatch as ImportBatchDB,
+)
+from app.database.database_tables import (
+    ImportJob as ImportJobDB,
+)
+from app.database.database_tables import (
+    User as UserDB,
+)
+from app.database.import_batch import ImportBatch
+from app.database.import_job import ImportJob
+
+
+def _clean(db: Session):
+    db.query(ImportJobDB).delete()
+    db.query(ImportBatchDB).delete()
+    db.query(FileImportDB).delete()
+    db.query(UserDB).delete()
+    db.commit()
+
+
+def _setup_user(db: Session):
+    user = UserDB(identifier="user_ib", email="ib@example.com", display_name="IB User")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def _create_job(db: Session, user, batch, index):
+    return ImportJob.create(
+        uuid=f"uuid-{index}",
+        type="M11_DOCX",
+        fullpath=f"path/to/file{index}.docx",
+        filename=f"file{index}.docx",
+        user_id=user.id,
+        session=db,
+        batch_id=batch.id,
+    )
+
+
+def _set_import_status(db: Session, user, index, status):
+    file_import = (
+        db.query(FileImportDB).filter(FileImportDB.uuid == f"uuid-{index}").first()
+    )
+    if not file_import:
+        file_import = FileImportDB(
+            filepath=f"path/to/file{index}.docx",
+            filename=f"file{index}.docx",
+            type="M11_DOCX",
+            uuid=f"uuid-{index}",
+            user_id=user.id,
+        )
+        db.add(file_import)
+    file_import.status = status
+    db.commit()
+
+
+def _finish(db: Session, job: ImportJob, seconds: int):
+    db_item = db.query(ImportJobDB).filter(ImportJobDB.id == job.id).first()
+    db_item.started = db_item.created
+    db_item.finished = db_item.created + datetime.timedelta(seconds=seconds)
+    db_item.status = ImportJob.COMPLETE
+    db.commit()
+
+
+def test_create_and_find(db):
+    _clean(db)
+    user = _setup_user(db)
+    batch = ImportBatch.create(user.id, db)
+    assert batch.id is not None
+    assert batch.rejected == []
+    assert ImportBatch.find(batch.id, db).user_id == user.id
+    assert ImportBatch.find(99999, db) is None
+
+
+def test_update_rejected(db):
+    _clean(db)
+    user = _setup_user(db)
+    batch = ImportBatch.create(user.id, db)
+    rejected = [{"filename": "a.txt", "reason": "No import type for '.txt'"}]
+    assert batch.update_rejected(rejected, db).rejected == rejected
+    assert ImportBatch.find(batch.id, db).rejected == rejected
+
+
+def test_status_in_progress(db):
+    _clean(db)
+    user = _setup_user(db)
+    batch = ImportBatch.create(user.id, db)
+    jobs = [_create_job(db, user, batch, index) for index in range(1, 5)]
+    ImportJob.claim_next("M11_DOCX", db)
+    _set_import_status(db, user, 1, "Processing")
+    ImportJob.claim_next("M11_DOCX", db)
+    _finish(db, jobs[2], 3)
+    _set_import_status(db, user, 3, "Success")
+    status = batch.status(db)
+    assert status["finished"] is False
+    assert status["summary"] is None
+    assert status["progress"]["total"] == 4
+    assert status["progress"]["queued"] == 1
+    assert status["progress"]["running"] == 2
+    assert status["progress"]["complete"] == 1
+    assert status["progress"]["succeeded"] == 1
+    assert status["progress"]["percent"] == 25
+    assert [x["status"] for x in status["files"]] == [
+        "Processing",
+        "Running",
+        "Success",
+        "Queued",
+    ]
+    assert status["files"][2]["seconds"] == 3.0
+    assert status["files"][0]["seconds"] is None
+
+
+def test_status_finished(db):
+    _clean(db)
+    user = _setup_user(db)
+    batch = ImportBatch.create(user.id, db)
+    batch = batch.update_rejected([{"filename": "x.txt", "reason": "r"}], db)
+    jobs = [_create_job(db, user, batch, index) for index in range(1, 4)]
+    for job, status in zip(jobs, ["Success", "Failed", None]):
+        _finish(db, job, 2)
+        if status:
+            _set_import_status(db, user, jobs.index(job) + 1, status)
+    status = batch.status(db)
+    assert status["finished"] is True
+    assert status["progress"]["complete"] == 3
+    assert status["progress"]["succeeded"] == 1
+    assert status["progress"]["failed"] == 2
+    assert status["progress"]["rejected"] == 1
+    assert status["progress"]["percent"] == 100
+    assert status["progress"]["files_per_minute"] > 0
+    assert status["summary"] == {
+        "succeeded": ["file1.docx"],
+        "failed": [
+            {"filename": "file2.docx", "status": "Failed"},
+            {"filename": "file3.docx", "status": "Failed"},
+        ],
+        "rejected": [{"filename": "x.txt", "reason": "r"}],
+    }
+
+
+def test_status_other_batch_excluded(db):
+    _clean(db)
+    user = _setup_user(db)
+    batch = ImportBatch.create(user.id, db)
+    other = ImportBatch.create(user.id, db)
+    _create_job(db, user, batch, 1)
+    _create_job(db, user, other, 2)
+    assert [x["filename"] for x in batch.status(db)["files"]] == ["file1.docx"]
+
+
+def test_status_empty(db):
+    _clean(db)
+    user = _setup_user(db)
+    batch = ImportBatch.create(user.id, db)
+    status = batch.status(db)
+    assert status["finished"] is True
+    assert status["progress"]["total"] == 0
+    assert status["progress"]["percent"] == 100
+
+
+def test_debug(db):
+    _clean(db)
+    user = _setup_user(db)
+    ImportBatch.create(user.id, db)
+    result = ImportBatch.debug(db)
+    assert result["count"] == 1
+    assert result["items"][0]["rejected"] == "[]"
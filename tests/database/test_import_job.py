@@ -0,0 +1,217 @@
+import json
+
+from sqlalchemy.orm import Session
+
+from app.database.database_tables import (
+    FileImport as FileImportDB,
+)
+from app.database.database_tables import (
+    ImportJob as ImportJobDB,
+)
+from app.database.database_tables import (
+    User as UserDB,
+)
+from app.database.database_tables import (
+    Version as VersionDB,
+)
+from app.database.import_job import ImportJob
+
+OWNER = "host:1:aaaa"
+CURRENT = "host:2:bbbb"
+
+
+def _clean(db: Session):
+    db.query(ImportJobDB).delete()
+    db.query(VersionDB).delete()
+    db.query(FileImportDB).delete()
+    db.query(UserDB).delete()
+    db.commit()
+
+
+def _setup_user(db: Session):
+    user = UserDB(identifier="user_ij", email="ij@example.com", display_name="IJ User")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def _create_job(db: Session, user, index=1, type="USDM_EXCEL"):
+    return ImportJob.create(
+        uuid=f"uuid-{index}",
+        type=type,
+        fullpath=f"path/to/file{index}.xlsx",
+        filename=f"file{index}.xlsx",
+        user_id=user.id,
+        session=db,
+    )
+
+
+def _create_file_import(db: Session, user, uuid: str):
+    file_import = FileImportDB(
+        filepath="path/to/file.xlsx",
+        filename="file.xlsx",
+        type="USDM_EXCEL",
+        status="Create",
+        uuid=uuid,
+        user_id=user.id,
+    )
+    db.add(file_import)
+    db.commit()
+    db.refresh(file_import)
+    return file_import
+
+
+def test_create(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user)
+    assert job.id is not None
+    assert job.status == ImportJob.QUEUED
+    assert job.filename == "file1.xlsx"
+    assert job.created is not None
+    assert job.started is None
+
+
+def test_find(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user)
+    assert ImportJob.find(job.id, db).uuid == "uuid-1"
+    assert ImportJob.find(99999, db) is None
+
+
+def test_claim_next_oldest_first(db):
+    _clean(db)
+    user = _setup_user(db)
+    first = _create_job(db, user, 1)
+    second = _create_job(db, user, 2)
+    _create_job(db, user, 3, type="M11_DOCX")
+    claimed = ImportJob.claim_next("USDM_EXCEL", db)
+    assert claimed.id == first.id
+    assert claimed.status == ImportJob.RUNNING
+    assert claimed.started is not None
+    assert ImportJob.claim_next("USDM_EXCEL", db).id == second.id
+    assert ImportJob.claim_next("USDM_EXCEL", db) is None
+
+
+def test_queued_counts(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user, 1)
+    _create_job(db, user, 2)
+    _create_job(db, user, 3, type="M11_DOCX")
+    ImportJob.claim_next("M11_DOCX", db)
+    assert ImportJob.queued_counts(db) == {"USDM_EXCEL": 2}
+
+
+def test_update_status(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user)
+    job = job.update_status(ImportJob.COMPLETE, db)
+    assert job.status == ImportJob.COMPLETE
+    assert job.finished is not None
+
+
+def test_claim_once(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user)
+    assert ImportJob._claim(job.id, OWNER, db) is True
+    assert ImportJob._claim(job.id, CURRENT, db) is False
+    claimed = ImportJob.find(job.id, db)
+    assert claimed.owner == OWNER
+    assert claimed.heartbeat is not None
+
+
+def test_renew(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user, 1)
+    _create_job(db, user, 2)
+    ImportJob.claim_next("USDM_EXCEL", db, OWNER)
+    assert ImportJob.renew(OWNER, db) == 1
+    assert ImportJob.renew(CURRENT, db) == 0
+
+
+def test_recover_requeues_orphan(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user)
+    ImportJob.claim_next("USDM_EXCEL", db)
+    _create_file_import(db, user, "uuid-1")
+    jobs = ImportJob.recover(CURRENT, 90, db)
+    assert len(jobs) == 1
+    assert jobs[0].status == ImportJob.QUEUED
+    assert jobs[0].started is None
+    assert jobs[0].owner is None
+    assert db.query(FileImportDB).count() == 0
+
+
+def test_recover_leaves_live_owners(db):
+    """Jobs of this process, and of others still beating, are kept."""
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user, 1)
+    _create_job(db, user, 2)
+    ImportJob.claim_next("USDM_EXCEL", db, CURRENT)
+    ImportJob.claim_next("USDM_EXCEL", db, "elsewhere:1:cccc")
+    assert ImportJob.recover(CURRENT, 90, db) == []
+    assert ImportJob.queued_counts(db) == {}
+    jobs = ImportJob.recover(CURRENT, -1, db)
+    assert [x.uuid for x in jobs] == ["uuid-2"]
+
+
+def test_recover_completes_finished_import(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user)
+    ImportJob.claim_next("USDM_EXCEL", db)
+    file_import = _create_file_import(db, user, "uuid-1")
+    db.add(VersionDB(version=1, study_id=1, import_id=file_import.id))
+    db.commit()
+    assert ImportJob.recover(CURRENT, 90, db) == []
+    assert ImportJob.find(job.id, db).status == ImportJob.COMPLETE
+    assert db.query(FileImportDB).first().status == "Success"
+
+
+def test_recover_ignores_queued_and_complete(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user, 1)
+    job = _create_job(db, user, 2)
+    job.update_status(ImportJob.COMPLETE, db)
+    assert ImportJob.recover(CURRENT, 90, db) == []
+    assert ImportJob.queued_counts(db) == {"USDM_EXCEL": 1}
+
+
+def test_wait_times(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user, 1)
+    _create_job(db, user, 2)
+    ImportJob.claim_next("USDM_EXCEL", db)
+    waits = ImportJob.wait_times(10, db)
+    assert len(waits) == 1
+    assert waits[0] >= 0
+
+
+def test_debug(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user)
+    result = ImportJob.debug(db)
+    assert result["count"] == 1
+    assert isinstance(result["items"][0]["created"], str)
+    assert result["items"][0]["started"] is None
+
+
+def test_debug_running(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user)
+    ImportJob.claim_next("USDM_EXCEL", db, OWNER)
+    result = ImportJob.debug(db)
+    assert isinstance(result["items"][0]["heartbeat"], str)
+    assert json.loads(json.dumps(result))["count"] == 1
@@ -0,0 +1,156 @@
+import datetime
+
+from sqlalchemy.orm import Session
+
+from app.database.database_tables import (
+    FileImport as FileImportDB,
+)
+from app.database.database_tables import (
+    ImportStage as ImportStageDB,
+)
+from app.database.database_tables import (
+    User as UserDB,
+)
+from app.database.import_stage import ImportStage
+
+START = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _clean(db: Session):
+    db.query(ImportStageDB).delete()
+    db.query(FileImportDB).delete()
+    db.query(UserDB).delete()
+    db.commit()
+
+
+def _setup_user(db: Session):
+    user = UserDB(identifier="user_is", email="is@example.com", display_name="IS User")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def _create_file_import(db: Session, user, index: int, type: str = "M11_DOCX"):
+    file_import = FileImportDB(
+        filepath=f"path/to/file{index}.docx",
+        filename=f"file{index}.docx",
+        type=type,
+        status="Success",
+        uuid=f"uuid-{index}",
+        user_id=user.id,
+    )
+    db.add(file_import)
+    db.commit()
+    db.refresh(file_import)
+    return file_import
+
+
+def _stage(name: str, offset: float, seconds: float, peak_memory: int = None):
+    started = START + datetime.timedelta(seconds=offset)
+    return {
+        "name": name,
+        "started": started,
+        "finished": started + datetime.timedelta(seconds=seconds),
+        "seconds": seconds,
+        "peak_memory": peak_memory,
+    }
+
+
+def test_create(db):
+    _clean(db)
+    user = _setup_user(db)
+    file_import = _create_file_import(db, user, 1)
+    stages = ImportStage.create(
+        file_import.id,
+        [_stage("convert", 0, 2.5, 1048576), _stage("study", 2.5, 0.5)],
+        db,
+    )
+    assert [x.name for x in stages] == ["convert", "study"]
+    assert stages[0].import_id == file_import.id
+    assert stages[0].seconds == 2.5
+    assert stages[0].peak_memory == 1048576
+    assert stages[1].peak_memory is None
+    _clean(db)
+
+
+def test_for_imports(db):
+    _clean(db)
+    user = _setup_user(db)
+    first = _create_file_import(db, user, 1)
+    second = _create_file_import(db, user, 2)
+    ImportStage.create(first.id, [_stage("convert", 0, 1), _stage("study", 1, 1)], db)
+    ImportStage.create(second.id, [_stage("convert", 0, 3)], db)
+    result = ImportStage.for_imports([first.id, second.id], db)
+    assert [x.name for x in result[first.id]] == ["convert", "study"]
+    assert [x.seconds for x in result[second.id]] == [3]
+    assert ImportStage.for_imports([], db) == {}
+    _clean(db)
+
+
+def test_deleted_with_import(db):
+    _clean(db)
+    user = _setup_user(db)
+    file_import = _create_file_import(db, user, 1)
+    ImportStage.create(file_import.id, [_stage("convert", 0, 1)], db)
+    db.delete(db.query(FileImportDB).filter(FileImportDB.id == file_import.id).first())
+    db.commit()
+    assert db.query(ImportStageDB).count() == 0
+    _clean(db)
+
+
+def test_percentiles(db):
+    _clean(db)
+    user = _setup_user(db)
+    for index in range(1, 11):
+        file_import = _create_file_import(db, user, index)
+        ImportStage.create(
+            file_import.id,
+            [
+                _stage("study", index, 1),
+                _stage("convert", 0, index, index * 1048576),
+            ],
+            db,
+        )
+    file_import = _create_file_import(db, user, 11, "USDM4_JSON")
+    ImportStage.create(file_import.id, [_stage("validate", 0, 4)], db)
+    result = ImportStage.percentiles(db)
+    m11 = {x["stage"]: x for x in result["M11_DOCX"]}
+    assert [x["stage"] for x in result["M11_DOCX"]] == ["convert", "study", "total"]
+    assert m11["convert"]["count"] == 10
+    assert m11["convert"]["p50"] == 5
+    assert m11["convert"]["p90"] == 9
+    assert m11["convert"]["p95"] == 10
+    assert m11["convert"]["max"] == 10
+    assert m11["convert"]["peak_mb_p95"] == 10.0
+    assert m11["study"]["peak_mb_p95"] is None
+    assert m11["total"]["max"] == 11
+    assert result["USDM4_JSON"][0]["stage"] == "validate"
+    _clean(db)
+
+
+def test_percentiles_sample(db, monkeypatch):
+    _clean(db)
+    user = _setup_user(db)
+    monkeypatch.setattr(ImportStage, "SAMPLE", 2)
+    for index in range(1, 7):
+        type = "M11_DOCX" if index % 2 else "USDM4_JSON"
+        file_import = _create_file_import(db, user, index, type)
+        ImportStage.create(file_import.id, [_stage("convert", 0, index)], db)
+    result = ImportStage.percentiles(db)
+    assert result["M11_DOCX"][0]["count"] == 2
+    assert result["M11_DOCX"][0]["p50"] == 3
+    assert result["USDM4_JSON"][0]["count"] == 2
+    assert result["USDM4_JSON"][0]["p50"] == 4
+    _clean(db)
+
+
+def test_percentiles_empty(db):
+    _clean(db)
+    assert ImportStage.percentiles(db) == {}
+
+
+def test_percentile():
+    assert ImportStage._percentile([3, 1, 2], 50) == 2
+    assert ImportStage._percentile([1], 95) == 1
+    assert ImportStage._percentile(list(range(1, 101)), 95) == 95
@@ -0,0 +1,34 @@
+import datetime
+import os
+import socket
+
+from app.database.job_owner import new_owner, owner_gone, stale_cutoff
+
+
+def test_new_owner():
+    host, pid, token = new_owner().rsplit(":", 2)
+    assert host == socket.gethostname()
+    assert pid == str(os.getpid())
+    assert len(token) == 8
+    assert new_owner() != new_owner()
+
+
+def test_owner_gone():
+    now = datetime.datetime(2026, 1, 1, 12, 0, 0)
+    cutoff = now - datetime.timedelta(seconds=90)
+    pid = os.getpid()
+    current = f"host:{pid}:bbbb"
+    assert owner_gone(current, now, current, cutoff) is False
+    assert owner_gone(None, None, current, cutoff) is True
+    assert owner_gone("elsewhere:1:a", cutoff, current, now) is True
+    assert owner_gone("elsewhere:1:a", now, current, cutoff) is False
+    assert owner_gone(f"host:{pid}:aaaa", now, current, cutoff) is True
+    assert owner_gone(f"host:{os.getppid()}:a", now, current, cutoff) is False
+    assert owner_gone("host:999999999:a", now, current, cutoff) is True
+
+
+def test_stale_cutoff():
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    cutoff = stale_cutoff(90)
+    assert cutoff.tzinfo is None
+    assert abs((now - cutoff).total_seconds() - 90) < 5
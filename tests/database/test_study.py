@@ -1,3 +1,4 @@
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from app.database.database_tables import (
@@ -180,6 +181,59 @@ def test_summary(db):
     assert "import_type" in result
 
 
+def test_summary_latest_version(db):
+    _clean(db)
+    user = _base_setup(db)
+    u = User(**user.__dict__)
+    fi = FileImportDB(
+        filepath="path/v2.docx",
+        filename="v2.docx",
+        status="ok",
+        type="M11_DOCX",
+        uuid="uuid-v2",
+        user_id=user.id,
+    )
+    db.add(fi)
+    db.commit()
+    db.refresh(fi)
+    params = {
+        "name": "STUDY 2",
+        "full_title": "Study Title 2",
+        "phase": "Phase 1",
+        "sponsor": "SPONSOR A",
+        "sponsor_identifier": "sp_a",
+        "nct_identifier": "nct_a",
+    }
+    study, present = Study.study_and_version(params, u, FileImport(**fi.__dict__), db)
+    latest = db.query(VersionDB).filter(VersionDB.import_id == fi.id).first()
+    result = Study.summary(study.id, db)
+    assert result["name"] == "STUDY 2"
+    assert result["versions"] == 2
+    assert result["latest_version_id"] == latest.id
+    assert result["import_type"] == "M11_DOCX"
+    items = Study.page(1, 10, user.id, {"name": "STUDY 2"}, db)["items"]
+    assert items == [result]
+
+
+def test_page_statement_count(db):
+    _clean(db)
+    user = _base_setup(db)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", count)
+    try:
+        results = Study.page(1, 20, user.id, {}, db)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", count)
+    assert len(results["items"]) == 17
+    assert all(x["versions"] == 1 for x in results["items"])
+    assert all(x["import_type"] == "type" for x in results["items"])
+    assert len(statements) == 2
+
+
 def test_delete_success(db):
     _clean(db)
     _base_setup(db)
@@ -0,0 +1,153 @@
+from sqlalchemy.orm import Session
+
+from app.database.database_tables import (
+    User as UserDB,
+)
+from app.database.database_tables import (
+    ValidationJob as ValidationJobDB,
+)
+from app.database.validation_job import ValidationJob
+
+OWNER = "host:1:aaaa"
+CURRENT = "host:2:bbbb"
+
+
+def _clean(db: Session):
+    db.query(ValidationJobDB).delete()
+    db.query(UserDB).delete()
+    db.commit()
+
+
+def _setup_user(db: Session):
+    user = UserDB(identifier="user_vj", email="vj@example.com", display_name="VJ User")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def _create_job(db: Session, user, index=1, engine="d4k", owner=None):
+    return ValidationJob.create(
+        uuid=f"uuid-{index}",
+        engine=engine,
+        filename=f"file{index}.json",
+        user_id=user.id,
+        session=db,
+        owner=owner,
+    )
+
+
+def test_create(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user)
+    assert job.id is not None
+    assert job.status == ValidationJob.QUEUED
+    assert job.engine == "d4k"
+    assert job.findings is None
+    assert not job.done
+
+
+def test_find(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user)
+    assert ValidationJob.find(job.id, db).uuid == "uuid-1"
+    assert ValidationJob.find(99999, db) is None
+
+
+def test_update_status(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user)
+    job = job.update_status(ValidationJob.RUNNING, db)
+    assert job.status == ValidationJob.RUNNING
+    assert job.finished is None
+    job = job.update_status(ValidationJob.COMPLETE, db, 5)
+    assert job.status == ValidationJob.COMPLETE
+    assert job.findings == 5
+    assert job.finished is not None
+    assert job.done
+
+
+def test_unfinished(db):
+    _clean(db)
+    user = _setup_user(db)
+    first = _create_job(db, user, 1)
+    second = _create_job(db, user, 2)
+    third = _create_job(db, user, 3)
+    second.update_status(ValidationJob.RUNNING, db)
+    third.update_status(ValidationJob.FAILED, db)
+    assert [x.id for x in ValidationJob.unfinished(db)] == [first.id, second.id]
+
+
+def test_create_owned(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user, owner=OWNER)
+    assert job.owner == OWNER
+    assert job.heartbeat is not None
+    assert _create_job(db, user, 2).heartbeat is None
+
+
+def test_renew(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user, 1, owner=OWNER)
+    _create_job(db, user, 2, owner=OWNER).update_status(ValidationJob.RUNNING, db)
+    _create_job(db, user, 3, owner=OWNER).update_status(ValidationJob.COMPLETE, db)
+    _create_job(db, user, 4, owner=CURRENT)
+    assert ValidationJob.renew(OWNER, db) == 2
+
+
+def test_recover(db):
+    """Jobs without an owner, or whose owner stopped beating, are taken
+    over, queued again; those of live owners are left be."""
+    _clean(db)
+    user = _setup_user(db)
+    orphan = _create_job(db, user, 1)
+    running = _create_job(db, user, 2, owner="elsewhere:1:cccc")
+    running.update_status(ValidationJob.RUNNING, db)
+    _create_job(db, user, 3, owner=CURRENT)
+    _create_job(db, user, 4).update_status(ValidationJob.FAILED, db)
+    jobs = ValidationJob.recover(CURRENT, 90, db)
+    assert [x.id for x in jobs] == [orphan.id]
+    assert jobs[0].owner == CURRENT
+    assert ValidationJob.recover(CURRENT, 90, db) == []
+    jobs = ValidationJob.recover(CURRENT, -1, db)
+    assert [x.id for x in jobs] == [running.id]
+    assert jobs[0].status == ValidationJob.QUEUED
+
+
+def test_claim_once(db):
+    _clean(db)
+    user = _setup_user(db)
+    job = _create_job(db, user, owner=OWNER)
+    assert ValidationJob._claim(job.id, OWNER, CURRENT, db) is True
+    assert ValidationJob._claim(job.id, OWNER, "host:3:dddd", db) is False
+    assert ValidationJob.find(job.id, db).owner == CURRENT
+
+
+def test_page(db):
+    _clean(db)
+    user = _setup_user(db)
+    for index in range(15):
+        _create_job(db, user, index)
+    result = ValidationJob.page(1, 10, user.id, db)
+    assert result["count"] == 15
+    assert len(result["items"]) == 10
+    assert result["items"][0]["filename"] == "file14.json"
+    result = ValidationJob.page(2, 10, user.id, db)
+    assert len(result["items"]) == 5
+    result = ValidationJob.page(1, 10, user.id + 1, db)
+    assert result["count"] == 0
+
+
+def test_debug(db):
+    _clean(db)
+    user = _setup_user(db)
+    _create_job(db, user)
+    result = ValidationJob.debug(db)
+    assert result["count"] == 1
+    assert isinstance(result["items"][0]["created"], str)
+    assert result["items"][0]["finished"] is None
@@ -1,7 +1,14 @@
+import os
+from email.utils import formatdate
+
 from starlette.datastructures import Headers
 from starlette.requests import Request
 
-from app.dependencies.utility import admin_role_enabled, transmit_role_enabled
+from app.dependencies.utility import (
+    admin_role_enabled,
+    download_response,
+    transmit_role_enabled,
+)
 
 headers = Headers()
 scope = {"method": "GET", "type": "http", "headers": headers, "session": {}}
@@ -29,3 +36,64 @@ def test_is_not_fhir_tx():
     request = Request(scope)
     request.session["userinfo"] = {"roles": []}
     assert not transmit_role_enabled(request)
+
+
+def download_request(headers: dict | None = None) -> Request:
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"method": "GET", "type": "http", "headers": raw})
+
+
+def download_file(tmp_path) -> str:
+    path = tmp_path / "export.json"
+    path.write_text("{}")
+    return str(path)
+
+
+def test_download_response(tmp_path):
+    path = download_file(tmp_path)
+    response = download_response(download_request(), path, "x.json", "text/plain")
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["last-modified"]
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert 'filename="x.json"' in response.headers["content-disposition"]
+
+
+def test_download_response_etag_stable(tmp_path):
+    path = download_file(tmp_path)
+    first = download_response(download_request(), path, "x.json", "text/plain")
+    second = download_response(download_request(), path, "x.json", "text/plain")
+    assert first.headers["etag"] == second.headers["etag"]
+
+
+def test_download_response_if_none_match(tmp_path):
+    path = download_file(tmp_path)
+    etag = download_response(download_request(), path, "x", "text/plain").headers[
+        "etag"
+    ]
+    for value in [etag, f'"other", W/{etag}', "*"]:
+        request = download_request({"If-None-Match": value})
+        response = download_response(request, path, "x", "text/plain")
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+    request = download_request({"If-None-Match": '"other"'})
+    assert download_response(request, path, "x", "text/plain").status_code == 200
+
+
+def test_download_response_if_modified_since(tmp_path):
+    path = download_file(tmp_path)
+    later = formatdate(os.path.getmtime(path) + 60, usegmt=True)
+    earlier = formatdate(os.path.getmtime(path) - 60, usegmt=True)
+    request = download_request({"If-Modified-Since": later})
+    assert download_response(request, path, "x", "text/plain").status_code == 304
+    request = download_request({"If-Modified-Since": earlier})
+    assert download_response(request, path, "x", "text/plain").status_code == 200
+    request = download_request({"If-Modified-Since": "not a date"})
+    assert download_response(request, path, "x", "text/plain").status_code == 200
+
+
+def test_download_response_if_none_match_wins(tmp_path):
+    path = download_file(tmp_path)
+    later = formatdate(os.path.getmtime(path) + 60, usegmt=True)
+    request = download_request({"If-None-Match": '"other"', "If-Modified-Since": later})
+    assert download_response(request, path, "x", "text/plain").status_code == 200
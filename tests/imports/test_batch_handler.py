@@ -0,0 +1,269 @@
+import io
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException, WebSocketDisconnect
+from starlette.datastructures import FormData, UploadFile
+
+from app.database.database_tables import (
+    ImportBatch as ImportBatchDB,
+)
+from app.database.database_tables import (
+    ImportJob as ImportJobDB,
+)
+from app.database.database_tables import (
+    User as UserDB,
+)
+from app.database.import_batch import ImportBatch
+from app.imports.batch_handler import BatchHandler, batch_progress
+
+
+@pytest.fixture
+def session(db):
+    db.query(ImportJobDB).delete()
+    db.query(ImportBatchDB).delete()
+    db.query(UserDB).delete()
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def user(session):
+    user = UserDB(identifier="user_bh", email="bh@example.com", display_name="BH")
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
+
+@pytest.fixture
+def mock_queue():
+    with patch("app.imports.batch_handler.import_queue") as mock:
+        mock.enqueue.side_effect = range(1, 100)
+        yield mock
+
+
+@pytest.fixture
+def mock_save():
+    with patch(
+        "app.imports.batch_handler.ImportManager.save_files", return_value="uuid"
+    ) as mock:
+        yield mock
+
+
+def _upload(filename: str, contents: bytes = b"data") -> UploadFile:
+    return UploadFile(io.BytesIO(contents), size=len(contents), filename=filename)
+
+
+def _request(items: list[tuple]) -> MagicMock:
+    request = MagicMock()
+    request.form = AsyncMock(return_value=FormData(items))
+    return request
+
+
+@pytest.mark.asyncio
+async def test_browser_mixed_types(session, user, mock_queue, mock_save):
+    request = _request(
+        [
+            ("M11_DOCX", _upload("a.docx")),
+            ("CPT_DOCX", _upload("b.docx")),
+            ("files", _upload("c.xlsx")),
+            ("files", _upload("d.json")),
+            ("FHIR_PRISM3_JSON", _upload("e.json")),
+        ]
+    )
+    result = await BatchHandler("browser").process(request, user, session)
+    assert [(x["filename"], x["type"]) for x in result["accepted"]] == [
+        ("a.docx", "M11_DOCX"),
+        ("b.docx", "CPT_DOCX"),
+        ("c.xlsx", "USDM_EXCEL"),
+        ("d.json", "USDM4_JSON"),
+        ("e.json", "FHIR_PRISM3_JSON"),
+    ]
+    assert [x["job_id"] for x in result["accepted"]] == [1, 2, 3, 4, 5]
+    assert result["rejected"] == []
+    assert result["status_url"] == f"/import/batch/{result['batch_id']}/status"
+    assert all(
+        x.args[1] == result["batch_id"] for x in mock_queue.enqueue.call_args_list
+    )
+    assert mock_save.call_args_list[0].args[0]["filename"] == "a.docx"
+
+
+@pytest.mark.asyncio
+async def test_browser_type_overrides(session, user, mock_queue, mock_save):
+    request = _request(
+        [
+            ("types", json.dumps({".docx": "CPT_DOCX"})),
+            ("files", _upload("a.docx")),
+        ]
+    )
+    result = await BatchHandler("browser").process(request, user, session)
+    assert result["accepted"][0]["type"] == "CPT_DOCX"
+
+
+@pytest.mark.asyncio
+async def test_browser_type_overrides_any_case(session, user, mock_queue, mock_save):
+    request = _request(
+        [
+            ("types", json.dumps({".DOCX": "CPT_DOCX"})),
+            ("files", _upload("a.docx")),
+        ]
+    )
+    result = await BatchHandler("browser").process(request, user, session)
+    assert result["accepted"][0]["type"] == "CPT_DOCX"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("types", ["{not json", "[1]", '{".docx": 1}'])
+async def test_browser_type_overrides_invalid(
+    session, user, mock_queue, mock_save, types
+):
+    request = _request([("types", types), ("files", _upload("a.docx"))])
+    with pytest.raises(HTTPException) as error:
+        await BatchHandler("browser").process(request, user, session)
+    assert error.value.status_code == 400
+    assert "'types' field" in error.value.detail
+    assert session.query(ImportBatchDB).count() == 0
+    mock_queue.enqueue.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_browser_rejected(session, user, mock_queue, mock_save, monkeypatch):
+    handler = BatchHandler("browser")
+    handler.max_size_mb = 1
+    request = _request(
+        [
+            ("files", _upload("a.txt")),
+            ("NOT_A_TYPE", _upload("b.docx")),
+            ("M11_DOCX", _upload("c.json")),
+            ("files", _upload("d.docx", b"x" * (1024 * 1024 + 1))),
+        ]
+    )
+    result = await handler.process(request, user, session)
+    assert result["accepted"] == []
+    assert result["rejected"] == [
+        {"filename": "a.txt", "reason": "No import type for '.txt'"},
+        {"filename": "b.docx", "reason": "Unknown import type 'NOT_A_TYPE'"},
+        {"filename": "c.json", "reason": "Not a '.docx' file for a M11_DOCX import"},
+        {"filename": "d.docx", "reason": "Larger than the 1 MB limit"},
+    ]
+    assert ImportBatch.find(result["batch_id"], session).rejected == result["rejected"]
+    mock_queue.enqueue.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_save_failure(session, user, mock_queue, mock_save):
+    mock_save.return_value = None
+    request = _request([("files", _upload("a.docx"))])
+    result = await BatchHandler("browser").process(request, user, session)
+    assert result["rejected"] == [
+        {"filename": "a.docx", "reason": "Failed to save the file"}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_os_dir(session, user, mock_queue, mock_save, tmp_path, mocker):
+    mocker.patch(
+        "app.model.file_handling.local_files.application_configuration.local_file_path",
+        str(tmp_path),
+    )
+    dir = tmp_path / "nightly"
+    dir.mkdir()
+    for name in ["b.xlsx", "a.docx", ".hidden.docx", "notes.txt"]:
+        (dir / name).write_bytes(b"data")
+    request = _request([("dir", "nightly")])
+    result = await BatchHandler("os").process(request, user, session)
+    assert [x["filename"] for x in result["accepted"]] == ["a.docx", "b.xlsx"]
+    assert result["rejected"] == [
+        {"filename": "notes.txt", "reason": "No import type for '.txt'"}
+    ]
+    contents = mock_save.call_args_list[0].args[0]["contents"]
+    assert contents.closed
+
+
+@pytest.mark.asyncio
+async def test_os_dir_outside_root(session, user, mock_queue, tmp_path, mocker):
+    mocker.patch(
+        "app.model.file_handling.local_files.application_configuration.local_file_path",
+        str(tmp_path / "root"),
+    )
+    (tmp_path / "root").mkdir()
+    request = _request([("dir", "../")])
+    result = await BatchHandler("os").process(request, user, session)
+    assert result["accepted"] == []
+    assert result["rejected"][0]["filename"] == "../"
+    assert "outside the local files dir" in result["rejected"][0]["reason"]
+
+
+class FakeWebSocket:
+    def __init__(self, userinfo):
+        self.session = {"userinfo": userinfo} if userinfo else {}
+        self.sent = []
+        self.close_code = None
+        self.accept = AsyncMock()
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def _progress_patches(session, user):
+    return (
+        patch("app.imports.batch_handler.SessionLocal", return_value=session),
+        patch(
+            "app.imports.batch_handler.User.check",
+            return_value=(MagicMock(id=user.id), True),
+        ),
+        patch("app.imports.batch_handler.asyncio.sleep", new=AsyncMock()),
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_progress(session, user):
+    batch = ImportBatch.create(user.id, session)
+    statuses = [{"finished": False}, {"finished": True, "summary": {}}]
+    websocket = FakeWebSocket({"sub": "x"})
+    p1, p2, p3 = _progress_patches(session, user)
+    with p1, p2, p3, patch.object(ImportBatch, "status", side_effect=statuses):
+        session.close = MagicMock()
+        await batch_progress(websocket, batch.id)
+    assert websocket.sent == statuses
+    assert websocket.close_code == 1000
+
+
+@pytest.mark.asyncio
+async def test_batch_progress_other_user(session, user):
+    batch = ImportBatch.create(user.id, session)
+    websocket = FakeWebSocket({"sub": "x"})
+    p1, p2, p3 = _progress_patches(session, user)
+    with p1, p2 as check, p3:
+        check.return_value = (MagicMock(id=user.id + 1), True)
+        session.close = MagicMock()
+        await batch_progress(websocket, batch.id)
+    assert websocket.sent == []
+    assert websocket.close_code == 1008
+
+
+@pytest.mark.asyncio
+async def test_batch_progress_no_session(session, user):
+    batch = ImportBatch.create(user.id, session)
+    websocket = FakeWebSocket(None)
+    with patch("app.imports.batch_handler.SessionLocal", return_value=session):
+        session.close = MagicMock()
+        await batch_progress(websocket, batch.id)
+    assert websocket.close_code == 1008
+
+
+@pytest.mark.asyncio
+async def test_batch_progress_disconnect(session, user):
+    batch = ImportBatch.create(user.id, session)
+    websocket = FakeWebSocket({"sub": "x"})
+    websocket.send_json = AsyncMock(side_effect=WebSocketDisconnect())
+    p1, p2, p3 = _progress_patches(session, user)
+    with p1, p2, p3:
+        session.close = MagicMock()
+        await batch_progress(websocket, batch.id)
+    assert websocket.close_code is None
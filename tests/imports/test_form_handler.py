@@ -26,6 +26,7 @@ def mock_upload_file():
     """Create a mock upload file."""
     file = MagicMock(spec=UploadFile)
     file.filename = "test.xlsx"
+    file.size = 12
     file.read = AsyncMock(return_value=b"file content")
     return file
 
@@ -35,6 +36,7 @@ def mock_image_file():
     """Create a mock image file."""
     file = MagicMock(spec=UploadFile)
     file.filename = "test.png"
+    file.size = 13
     file.read = AsyncMock(return_value=b"image content")
     return file
 
@@ -182,6 +184,66 @@ class TestFormHandler:
         assert messages[1] == "Image file 'test.png' accepted"
         mock_logger.info.assert_called()
 
+    @pytest.mark.asyncio
+    async def test_get_files_browser_stream(
+        self, mock_request, mock_upload_file, mock_image_file, mock_logger
+    ):
+        """In streaming mode the spooled file objects are passed on
+        unread."""
+        form = MagicMock()
+        form.getlist.return_value = [mock_upload_file, mock_image_file]
+        mock_upload_file.file = MagicMock()
+        mock_image_file.file = MagicMock()
+
+        handler = FormHandler(mock_request, True, ".xlsx", "browser", stream=True)
+        main_file, image_files, messages = await handler._get_files_browser(form)
+
+        assert main_file == {"filename": "test.xlsx", "contents": mock_upload_file.file}
+        assert image_files == [
+            {"filename": "test.png", "contents": mock_image_file.file}
+        ]
+        mock_upload_file.read.assert_not_called()
+        mock_image_file.read.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_files_browser_too_large(
+        self, mock_request, mock_upload_file, mock_image_file, mock_logger
+    ):
+        form = MagicMock()
+        mock_upload_file.size = 2 * 1024 * 1024 + 1
+        form.getlist.return_value = [mock_upload_file, mock_image_file]
+
+        handler = FormHandler(mock_request, True, ".xlsx", "browser")
+        handler.max_size_mb = 2
+        main_file, image_files, messages = await handler._get_files_browser(form)
+
+        assert main_file is None
+        assert len(image_files) == 1
+        assert messages[0] == "File 'test.xlsx' was ignored, larger than the 2 MB limit"
+        mock_upload_file.read.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_files_request_too_large(self, mock_logger):
+        """An oversize request is refused before the form is parsed."""
+        request = MagicMock(spec=Request)
+        request.headers = {"content-length": str(3 * 1024 * 1024)}
+        request.form = AsyncMock()
+
+        handler = FormHandler(request, True, ".xlsx", "browser")
+        handler.max_size_mb = 2
+
+        assert await handler.get_files() == (
+            None,
+            [],
+            ["Upload rejected, larger than the 2 MB limit"],
+        )
+        request.form.assert_not_called()
+        handler.max_size_mb = 0
+        request.form.return_value = MagicMock()
+        handler._files_method["browser"] = AsyncMock(return_value=(None, [], []))
+        await handler.get_files()
+        request.form.assert_awaited_once()
+
     @pytest.mark.asyncio
     async def test_get_files_os(self, mock_request, mock_local_files, mock_logger):
         """Test _get_files_os method."""
@@ -1,15 +1,19 @@
+import hashlib
+import os
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from app.database.user import User
-from app.imports.import_manager import ImportManager, execute_import
+from app.imports.import_manager import ImportManager
 from app.imports.import_processors import (
     ImportExcel,
     ImportFhirPRISM2,
     ImportM11,
     ImportUSDM4,
 )
+from app.model.file_handling.blob_store import blob_store
+from app.model.file_handling.data_files import DataFiles
 
 
 @pytest.fixture
@@ -26,6 +30,7 @@ def mock_data_files():
         instance.new.return_value = "test-uuid"
         instance.save.return_value = ("/path/to/file", "filename.ext")
         instance.path.return_value = ("/path/to/file", "filename.ext", True)
+        instance.sources.return_value = {}
         yield mock
 
 
@@ -440,6 +445,68 @@ class TestImportManager:
             )
             mock_session_local.return_value.close.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_process_timing(
+        self,
+        mock_user,
+        mock_data_files,
+        mock_session_local,
+        mock_file_import,
+        mock_study,
+        mock_connection_manager,
+        mock_import_processor,
+    ):
+        with (
+            patch(
+                "app.imports.import_manager.ImportExcel",
+                return_value=mock_import_processor.return_value,
+            ) as mock_processor,
+            patch("app.imports.import_manager.ImportTiming") as mock_timing,
+        ):
+            manager = ImportManager(mock_user, ImportManager.USDM_EXCEL)
+            manager.files = mock_data_files.return_value
+            manager.uuid = "test-uuid"
+            manager.main_full_path = "/path/to/file"
+            manager.original_filename = "filename.ext"
+            await manager.process()
+            timing = mock_timing.return_value
+            mock_processor.assert_called_once_with(
+                ImportManager.USDM_EXCEL, "test-uuid", "/path/to/file", timing
+            )
+            assert [x.args[0] for x in timing.stage.call_args_list] == [
+                "save",
+                "study",
+                "digest",
+            ]
+            timing.save.assert_called_once_with(
+                mock_file_import.return_value.id, mock_session_local.return_value
+            )
+
+    @pytest.mark.asyncio
+    async def test_process_exception_timing(
+        self,
+        mock_user,
+        mock_data_files,
+        mock_session_local,
+        mock_file_import,
+        mock_connection_manager,
+        mock_logger,
+    ):
+        with (
+            patch("app.imports.import_manager.ImportExcel") as mock_processor,
+            patch("app.imports.import_manager.ImportTiming") as mock_timing,
+        ):
+            mock_processor.return_value.process.side_effect = Exception("boom")
+            manager = ImportManager(mock_user, ImportManager.USDM_EXCEL)
+            manager.files = mock_data_files.return_value
+            manager.uuid = "test-uuid"
+            manager.main_full_path = "/path/to/file"
+            manager.original_filename = "filename.ext"
+            await manager.process()
+            mock_timing.return_value.save.assert_called_once_with(
+                mock_file_import.return_value.id, mock_session_local.return_value
+            )
+
     def test_imports_with_errors(self):
         result = ImportManager.imports_with_errors()
         assert ImportManager.USDM_EXCEL in result
@@ -490,16 +557,210 @@ class TestImportManager:
         assert result == ("/path/to/file", "filename.ext")
         manager.files.save.assert_called_once_with("xlsx", b"file content", "test.xlsx")
 
-    def test_execute_import(self, mock_user):
-        """Test execute_import function."""
-        # Setup
-        with patch("app.imports.import_manager.threading.Thread") as mock_thread:
-            manager = ImportManager(mock_user, ImportManager.USDM_EXCEL)
-            manager.process = AsyncMock()
+    def test_restore(self, mock_user, mock_data_files):
+        """Test restore rebuilds a manager from a queued job."""
+        # Execute
+        manager = ImportManager.restore(
+            mock_user,
+            ImportManager.M11_DOCX,
+            "test-uuid",
+            "/path/to/file.docx",
+            "file.docx",
+        )
 
-            # Execute
-            execute_import(manager)
+        # Assert
+        mock_data_files.assert_called_once_with("test-uuid")
+        assert manager.files == mock_data_files.return_value
+        assert manager.uuid == "test-uuid"
+        assert manager.type == ImportManager.M11_DOCX
+        assert manager.main_full_path == "/path/to/file.docx"
+        assert manager.original_filename == "file.docx"
 
-            # Assert
-            mock_thread.assert_called_once()
-            mock_thread.return_value.start.assert_called_once()
+    def test_save_compare_digest(self, mock_user, mock_data_files):
+        """Test _save_compare_digest saves the digest built from the USDM."""
+        manager = ImportManager(mock_user, ImportManager.M11_DOCX)
+        manager.files = mock_data_files.return_value
+        with patch("app.imports.import_manager.CompareDigest") as mock_digest:
+            manager._save_compare_digest()
+            mock_digest.assert_called_once_with(manager.files)
+            digest = mock_digest.return_value
+            digest.build.assert_called_once_with(
+                digest.wrapper.return_value, ImportManager.M11_DOCX
+            )
+            digest.save.assert_called_once_with(digest.build.return_value)
+
+    def test_save_compare_digest_exception(self, mock_user, mock_data_files):
+        """Test _save_compare_digest never fails the import."""
+        manager = ImportManager(mock_user, ImportManager.M11_DOCX)
+        manager.files = mock_data_files.return_value
+        with (
+            patch("app.imports.import_manager.CompareDigest") as mock_digest,
+            patch("app.imports.import_manager.application_logger") as mock_logger,
+        ):
+            mock_digest.return_value.wrapper.side_effect = OSError("missing")
+            manager._save_compare_digest()
+            mock_digest.return_value.save.assert_not_called()
+            mock_logger.exception.assert_called_once()
+
+    def test_source_digest(self, mock_user, mock_data_files):
+        """The digest changes with the type and the files uploaded."""
+        manager = ImportManager(mock_user, ImportManager.USDM_EXCEL)
+        manager.files = mock_data_files.return_value
+        assert manager._source_digest() is None
+        manager.files.sources.return_value = {
+            "study.xlsx": {"sha256": "abc", "size": 8}
+        }
+        digest = manager._source_digest()
+        assert len(digest) == 64
+        assert manager._source_digest() == digest
+        manager.files.sources.return_value["study.xlsx"]["sha256"] = "abd"
+        assert manager._source_digest() != digest
+        manager.type = ImportManager.M11_DOCX
+        manager.files.sources.return_value["study.xlsx"]["sha256"] = "abc"
+        assert manager._source_digest() != digest
+
+    @pytest.mark.asyncio
+    async def test_process_reuse(
+        self,
+        mock_user,
+        mock_data_files,
+        mock_session_local,
+        mock_file_import,
+        mock_study,
+        mock_connection_manager,
+    ):
+        """An import of files imported before takes the earlier results
+        instead of running again."""
+        prior = MagicMock(id=7, uuid="prior-uuid")
+        mock_file_import.find_reusable.return_value = [prior]
+        files = mock_data_files.return_value
+        files.sources.return_value = {"study.xlsx": {"sha256": "abc", "size": 8}}
+        files.exists.side_effect = lambda type: type != "m11_validation"
+        files.read.return_value = '{"study": {}}'
+        with (
+            patch("app.imports.import_manager.ImportExcel") as mock_processor,
+            patch("app.imports.import_manager.ImportTiming") as mock_timing,
+        ):
+            processor = mock_processor.return_value
+            processor.process = AsyncMock()
+            processor.errors = None
+            manager = ImportManager(mock_user, ImportManager.USDM_EXCEL, reuse=True)
+            manager.files = files
+            manager.uuid = "test-uuid"
+            manager.main_full_path = "/path/to/file"
+            manager.original_filename = "study.xlsx"
+            await manager.process()
+            digest = mock_file_import.create.call_args.args[7]
+            mock_file_import.find_reusable.assert_called_once_with(
+                digest, mock_session_local.return_value
+            )
+            assert [x.args for x in files.copy.call_args_list] == [
+                (files, "usdm"),
+                (files, "extra"),
+                (files, "errors"),
+            ]
+            processor.reuse.assert_called_once_with('{"study": {}}')
+            processor.process.assert_not_called()
+            assert not [x for x in files.save.call_args_list if x.args[0] == "usdm"]
+            mock_file_import.return_value.set_reused_from.assert_called_once_with(
+                7, mock_session_local.return_value
+            )
+            mock_study.study_and_version.assert_called_once()
+            assert [
+                x.args[0] for x in mock_timing.return_value.stage.call_args_list
+            ] == [
+                "reuse",
+                "study",
+                "digest",
+            ]
+
+    @pytest.mark.asyncio
+    async def test_process_reuse_fallback(
+        self,
+        mock_user,
+        mock_data_files,
+        mock_session_local,
+        mock_file_import,
+        mock_study,
+        mock_connection_manager,
+        mock_import_processor,
+    ):
+        """The import runs when the earlier results cannot be used."""
+        mock_file_import.find_reusable.return_value = [
+            MagicMock(id=7, uuid="prior-uuid")
+        ]
+        files = mock_data_files.return_value
+        files.sources.return_value = {"study.xlsx": {"sha256": "abc", "size": 8}}
+        files.copy.return_value = False
+        with patch(
+            "app.imports.import_manager.ImportExcel",
+            return_value=mock_import_processor.return_value,
+        ):
+            manager = ImportManager(mock_user, ImportManager.USDM_EXCEL, reuse=True)
+            manager.files = files
+            manager.uuid = "test-uuid"
+            manager.main_full_path = "/path/to/file"
+            manager.original_filename = "study.xlsx"
+            await manager.process()
+            mock_import_processor.return_value.process.assert_called_once()
+            files.save.assert_any_call("usdm", mock_import_processor.return_value.usdm)
+            mock_file_import.return_value.set_reused_from.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_process_reuse_off(
+        self,
+        mock_user,
+        mock_data_files,
+        mock_session_local,
+        mock_file_import,
+        mock_study,
+        mock_connection_manager,
+        mock_import_processor,
+    ):
+        with patch(
+            "app.imports.import_manager.ImportExcel",
+            return_value=mock_import_processor.return_value,
+        ):
+            manager = ImportManager(mock_user, ImportManager.USDM_EXCEL, reuse=False)
+            manager.files = mock_data_files.return_value
+            manager.uuid = "test-uuid"
+            manager.main_full_path = "/path/to/file"
+            manager.original_filename = "study.xlsx"
+            await manager.process()
+            mock_file_import.find_reusable.assert_not_called()
+            mock_import_processor.return_value.process.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_process_usdm_json_keeps_blob(
+        self,
+        mock_user,
+        mock_session_local,
+        mock_file_import,
+        mock_study,
+        mock_connection_manager,
+        tmp_path,
+    ):
+        """The upload of a USDM import stays linked from the blob store,
+        not replaced by a copy of itself."""
+        usdm = b'{"study": {"name": "test-study"}}'
+        files = DataFiles()
+        files.dir = str(tmp_path)
+        uuid = files.new()
+        full_path, _ = files.save("usdm", usdm, "study.json")
+        blob = blob_store.path(files.dir, hashlib.sha256(usdm).hexdigest())
+        assert os.stat(blob).st_nlink == 2
+        with patch("app.imports.import_manager.ImportUSDM4") as mock_processor:
+            processor = mock_processor.return_value
+            processor.process = AsyncMock(return_value=True)
+            processor.usdm = usdm.decode()
+            processor.errors = None
+            processor.extra = {}
+            manager = ImportManager(mock_user, ImportManager.USDM4_JSON, reuse=False)
+            manager.files = files
+            manager.uuid = uuid
+            manager.main_full_path = full_path
+            manager.original_filename = "study.json"
+            await manager.process()
+        assert os.path.samefile(full_path, blob)
+        assert files.read("usdm") == usdm.decode()
+        assert files.exists("extra")
@@ -12,6 +12,7 @@ from app.imports.import_processors import (
     ImportProcessorBase,
     ImportUSDM4,
 )
+from app.imports.import_timing import ImportTiming
 
 
 @pytest.fixture
@@ -182,6 +183,21 @@ class TestImportProcessorBase:
         assert result is None
         mock_logger.exception.assert_called_once()
 
+    def test_reuse(self):
+        """Test reuse takes the USDM given and its study parameters."""
+        processor = ImportProcessorBase("TEST_TYPE", "test-uuid", "/path/to/file")
+        with patch.object(
+            processor, "_extract_study_parameters", side_effect=[{"name": "x"}, None]
+        ):
+            assert processor.reuse('{"study": {}}') is True
+            assert processor.usdm == '{"study": {}}'
+            assert processor.study_parameters == {"name": "x"}
+            assert processor.reuse('{"study": {}}') is False
+        assert [x["name"] for x in processor.timing.stages] == [
+            "parameters",
+            "parameters",
+        ]
+
     def test_get_parameter(self, mock_object_path):
         """Test _get_parameter method."""
         # Setup
@@ -232,6 +248,15 @@ class TestImportExcel:
         assert processor.usdm == instance.from_excel.return_value.to_json.return_value
         assert processor.errors == {"errors": []}
 
+    @pytest.mark.asyncio
+    async def test_process_timing(self, mock_usdm4_excel):
+        timing = ImportTiming()
+        processor = ImportExcel("USDM_EXCEL", "test-uuid", "/path/to/file", timing)
+        with patch.object(processor, "_extract_study_parameters", return_value={}):
+            await processor.process()
+        assert processor.timing is timing
+        assert [x["name"] for x in timing.stages] == ["convert", "parameters"]
+
     @pytest.mark.asyncio
     async def test_process_failure(self, mock_usdm4_excel):
         """No wrapper back from usdm4_excel means a fatal import error."""
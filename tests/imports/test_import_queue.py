@@ -0,0 +1,152 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.database.database_tables import (
+    ImportJob as ImportJobDB,
+)
+from app.database.database_tables import (
+    User as UserDB,
+)
+from app.database.import_job import ImportJob
+from app.imports.import_queue import ImportQueue
+
+
+@pytest.fixture
+def session(db):
+    db.query(ImportJobDB).delete()
+    db.query(UserDB).delete()
+    db.commit()
+    with patch("app.imports.import_queue.SessionLocal", return_value=db):
+        yield db
+
+
+@pytest.fixture
+def user(session):
+    user = UserDB(identifier="user_iq", email="iq@example.com", display_name="IQ")
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    session.expunge(user)
+    return user
+
+
+@pytest.fixture
+def mock_thread():
+    with patch("app.imports.import_queue.threading.Thread") as mock:
+        yield mock
+
+
+def _manager(user, index=1, type="USDM_EXCEL"):
+    return MagicMock(
+        user=MagicMock(id=user.id),
+        type=type,
+        uuid=f"uuid-{index}",
+        main_full_path=f"path/to/file{index}",
+        original_filename=f"file{index}",
+    )
+
+
+def test_limit():
+    queue = ImportQueue(2, {"M11_DOCX": 1, "CPT_DOCX": 0})
+    assert queue.limit("USDM_EXCEL") == 2
+    assert queue.limit("M11_DOCX") == 1
+    assert queue.limit("CPT_DOCX") == 1
+
+
+def test_enqueue_respects_limits(session, user, mock_thread):
+    queue = ImportQueue(2, {"M11_DOCX": 1})
+    for index in range(3):
+        queue.enqueue(_manager(user, index))
+    for index in range(3, 5):
+        queue.enqueue(_manager(user, index, "M11_DOCX"))
+    assert mock_thread.call_count == 3
+    assert queue._running == {"USDM_EXCEL": 2, "M11_DOCX": 1}
+    assert ImportJob.queued_counts(session) == {"USDM_EXCEL": 1, "M11_DOCX": 1}
+
+
+def test_enqueue_batch(session, user, mock_thread):
+    queue = ImportQueue(1, {})
+    id = queue.enqueue(_manager(user, 1), 7)
+    assert ImportJob.find(id, session).batch_id == 7
+    id = queue.enqueue(_manager(user, 2))
+    assert ImportJob.find(id, session).batch_id is None
+
+
+def test_run_completes_and_dispatches_next(session, user, mock_thread):
+    queue = ImportQueue(1, {})
+    queue.enqueue(_manager(user, 1))
+    queue.enqueue(_manager(user, 2))
+    job = mock_thread.call_args.kwargs["args"][0]
+    with patch("app.imports.import_queue.ImportManager") as mock_im:
+        mock_im.restore.return_value.process = AsyncMock()
+        queue._run(job)
+    mock_im.restore.assert_called_once_with(
+        mock_im.restore.call_args.args[0],
+        "USDM_EXCEL",
+        "uuid-1",
+        "path/to/file1",
+        "file1",
+    )
+    mock_im.restore.return_value.process.assert_awaited_once()
+    assert ImportJob.find(job.id, session).status == ImportJob.COMPLETE
+    assert queue.completed == 1
+    assert mock_thread.call_count == 2
+    assert queue._running == {"USDM_EXCEL": 1}
+
+
+def test_run_exception_still_completes(session, user, mock_thread):
+    queue = ImportQueue(1, {})
+    queue.enqueue(_manager(user, 1))
+    job = mock_thread.call_args.kwargs["args"][0]
+    with patch("app.imports.import_queue.ImportManager") as mock_im:
+        mock_im.restore.side_effect = Exception("boom")
+        queue._run(job)
+    assert ImportJob.find(job.id, session).status == ImportJob.COMPLETE
+    assert queue._running == {"USDM_EXCEL": 0}
+
+
+def test_recover(session, user, mock_thread):
+    """A restarted process, with the pid of the last, requeues the
+    jobs it left running and starts the heartbeat."""
+    previous = ImportQueue(1, {})
+    previous.enqueue(_manager(user, 1))
+    queue = ImportQueue(1, {})
+    assert queue.owner != previous.owner
+    mock_thread.reset_mock()
+    assert queue.recover() == 1
+    targets = [x.kwargs["target"] for x in mock_thread.call_args_list]
+    assert targets == [queue._beat, queue._run]
+    job = ImportJob.find(mock_thread.call_args.kwargs["args"][0].id, session)
+    assert job.owner == queue.owner
+
+
+def test_recover_leaves_own_jobs(session, user, mock_thread):
+    queue = ImportQueue(1, {})
+    queue.enqueue(_manager(user, 1))
+    assert queue.recover() == 0
+    assert queue._running == {"USDM_EXCEL": 1}
+
+
+def test_beat(session, user, mock_thread):
+    queue = ImportQueue(1, {})
+    queue.enqueue(_manager(user, 1))
+    with (
+        patch.object(queue._stop, "wait", side_effect=[False, True]),
+        patch("app.imports.import_queue.ImportJob.renew") as mock_renew,
+    ):
+        queue._beat()
+    mock_renew.assert_called_once_with(queue.owner, session)
+
+
+def test_metrics(session, user, mock_thread):
+    queue = ImportQueue(1, {"M11_DOCX": 1})
+    queue.enqueue(_manager(user, 1))
+    queue.enqueue(_manager(user, 2))
+    result = queue.metrics()
+    assert result["workers"] == {"M11_DOCX": 1, "USDM_EXCEL": 1}
+    assert result["queued"] == {"USDM_EXCEL": 1}
+    assert result["queue_depth"] == 1
+    assert result["running"] == {"USDM_EXCEL": 1}
+    assert result["completed"] == 0
+    assert result["wait_seconds"]["sample"] == 1
@@ -0,0 +1,68 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.imports.import_timing import ImportTiming, MemorySampler
+
+
+def test_stage():
+    timing = ImportTiming()
+    with timing.stage("convert"):
+        time.sleep(0.01)
+    with timing.stage("study"):
+        pass
+    assert [x["name"] for x in timing.stages] == ["convert", "study"]
+    stage = timing.stages[0]
+    assert stage["seconds"] >= 0.01
+    assert stage["finished"] >= stage["started"]
+    assert stage["started"].tzinfo is not None
+    assert stage["peak_memory"] > 0
+
+
+def test_stage_exception():
+    timing = ImportTiming()
+    with pytest.raises(ValueError), timing.stage("convert"):
+        raise ValueError("boom")
+    assert [x["name"] for x in timing.stages] == ["convert"]
+
+
+def test_sampler_peak():
+    sampler = MemorySampler(0.01)
+    start = sampler.peak
+    sampler.start()
+    data = bytearray(64 * 1024 * 1024)
+    time.sleep(0.05)
+    del data
+    peak = sampler.stop()
+    assert peak >= start + 32 * 1024 * 1024
+    assert not sampler._thread.is_alive()
+
+
+def test_sampler_unavailable():
+    with patch.object(MemorySampler, "rss", return_value=None):
+        sampler = MemorySampler(0.01)
+        sampler.start()
+        assert sampler._thread is None
+        assert sampler.stop() is None
+
+
+def test_save():
+    timing = ImportTiming()
+    with timing.stage("convert"):
+        pass
+    session = MagicMock()
+    with patch("app.imports.import_timing.ImportStage.create") as mock_create:
+        timing.save(5, session)
+    mock_create.assert_called_once_with(5, timing.stages, session)
+
+
+@patch("app.imports.import_timing.application_logger")
+def test_save_exception(mock_logger):
+    session = MagicMock()
+    with patch(
+        "app.imports.import_timing.ImportStage.create", side_effect=Exception("db")
+    ):
+        ImportTiming().save(5, session)
+    session.rollback.assert_called_once()
+    mock_logger.exception.assert_called_once()
@@ -26,7 +26,7 @@ class TestRequestHandler:
         with (
             patch("app.imports.request_handler.ImportManager") as mock_im,
             patch("app.imports.request_handler.FormHandler") as mock_fh,
-            patch("app.imports.request_handler.execute_import"),
+            patch("app.imports.request_handler.import_queue") as mock_queue,
         ):
             mock_im_instance = mock_im.return_value
             mock_im_instance.images = False
@@ -43,6 +43,10 @@ class TestRequestHandler:
             mock_im_instance.save_files.return_value = "test-uuid"
             result = await handler.process(mock_request, mock_templates, mock_user)
         assert result == "success_response"
+        mock_fh.assert_called_once_with(
+            mock_request, False, ".docx", "browser", stream=True
+        )
+        mock_queue.enqueue.assert_called_once_with(mock_im_instance)
         mock_templates.TemplateResponse.assert_called_once()
         call_args = mock_templates.TemplateResponse.call_args
         assert call_args[0][1] == "import/partials/upload_success.html"
@@ -76,6 +80,33 @@ class TestRequestHandler:
         call_args = mock_templates.TemplateResponse.call_args
         assert call_args[0][1] == "import/partials/upload_fail.html"
 
+    @pytest.mark.asyncio
+    async def test_process_rejected(self):
+        """An upload refused by the form handler (e.g. over the size
+        limit) fails with its message rather than raising."""
+        handler = RequestHandler("M11_DOCX", "browser")
+        mock_request = MagicMock()
+        mock_templates = MagicMock()
+        mock_templates.TemplateResponse.return_value = "fail_response"
+        with (
+            patch("app.imports.request_handler.ImportManager") as mock_im,
+            patch("app.imports.request_handler.FormHandler") as mock_fh,
+        ):
+            mock_im_instance = mock_im.return_value
+            mock_im_instance.save_error = None
+            mock_im_instance.save_files.return_value = None
+            mock_fh.return_value.get_files = AsyncMock(
+                return_value=(None, [], ["Upload rejected, larger than the 1 MB limit"])
+            )
+            result = await handler.process(mock_request, mock_templates, MagicMock())
+        assert result == "fail_response"
+        call_args = mock_templates.TemplateResponse.call_args
+        assert call_args[0][1] == "import/partials/upload_fail.html"
+        assert call_args[0][2]["filename"] == ""
+        assert call_args[0][2]["messages"][0] == (
+            "Upload rejected, larger than the 1 MB limit"
+        )
+
     @pytest.mark.asyncio
     async def test_process_exception(self):
         handler = RequestHandler("M11_DOCX", "browser")
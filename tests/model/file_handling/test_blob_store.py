@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from app.model.file_handling.blob_store import BlobStore
+
+
+@pytest.fixture
+def mock_logger(mocker):
+    return mocker.patch("app.model.file_handling.blob_store.application_logger")
+
+
+def _file(dir, name: str, contents: bytes) -> str:
+    path = os.path.join(dir, name)
+    with open(path, "wb") as f:
+        f.write(contents)
+    return path
+
+
+def test_share(tmp_path):
+    store = BlobStore()
+    root = str(tmp_path)
+    first = _file(root, "a.xlsx", b"workbook")
+    second = _file(root, "b.xlsx", b"workbook")
+
+    assert store.share(root, first, "ab12") == 0
+    assert store.share(root, first, "ab12") == 0
+    assert store.share(root, second, "ab12") == 8
+    assert os.path.samefile(first, second)
+    assert store.path(root, "ab12") == os.path.join(root, "blobs", "ab", "ab12")
+    assert store.report(root) == {
+        "blobs": 1,
+        "links": 2,
+        "bytes_stored": 8,
+        "bytes_saved": 8,
+    }
+    assert sorted(os.listdir(root)) == ["a.xlsx", "b.xlsx", "blobs"]
+
+
+def test_share_without_links(tmp_path, mock_logger, mocker):
+    mocker.patch("os.link", side_effect=PermissionError("no links"))
+    path = _file(str(tmp_path), "a.xlsx", b"workbook")
+
+    assert BlobStore().share(str(tmp_path), path, "ab12") == 0
+    mock_logger.info.assert_called_once()
+
+
+def test_release(tmp_path):
+    store = BlobStore()
+    root = str(tmp_path)
+    path = _file(root, "a.xlsx", b"workbook")
+    store.share(root, path, "ab12")
+
+    assert store.release(root, "ab12") is False
+    os.remove(path)
+    assert store.release(root, "ab12") is True
+    assert not os.path.exists(store.path(root, "ab12"))
+    assert store.release(root, "ab12") is False
+
+
+def test_report_empty(tmp_path):
+    assert BlobStore().report(str(tmp_path))["blobs"] == 0
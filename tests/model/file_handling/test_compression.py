@@ -0,0 +1,68 @@
+import gzip
+
+import pytest
+
+from app.model.file_handling.compression import Compression
+
+
+@pytest.fixture
+def mock_config(mocker):
+    mock = mocker.patch("app.model.file_handling.compression.application_configuration")
+    mock.datafile_compression = ""
+    return mock
+
+
+@pytest.fixture
+def mock_logger(mocker):
+    return mocker.patch("app.model.file_handling.compression.application_logger")
+
+
+def test_configured(mock_config, mock_logger, mocker):
+    assert Compression.configured() is None
+    mock_config.datafile_compression = "gzip"
+    assert Compression.configured() == Compression.GZIP
+    mocker.patch.object(Compression, "zstd_available", return_value=True)
+    mock_config.datafile_compression = "zstd"
+    assert Compression.configured() == Compression.ZSTD
+    mock_logger.error.assert_not_called()
+
+
+def test_configured_zstd_missing(mock_config, mock_logger, mocker):
+    mocker.patch.object(Compression, "zstd_available", return_value=False)
+    mock_config.datafile_compression = "zstd"
+    assert Compression.configured() == Compression.GZIP
+    mock_logger.error.assert_called_once()
+
+
+def test_configured_unknown(mock_config, mock_logger):
+    mock_config.datafile_compression = "lz4"
+    assert Compression.configured() is None
+    mock_logger.error.assert_called_once()
+
+
+def test_of():
+    assert Compression.of("/data/usdm.json") is None
+    assert Compression.of("/data/usdm.json.gz") == Compression.GZIP
+    assert Compression.of("/data/usdm.json.zst") == Compression.ZSTD
+    assert Compression.suffix(None) == ""
+    assert Compression.suffix(Compression.ZSTD) == ".zst"
+
+
+def test_open_gzip(tmp_path):
+    path = str(tmp_path / "usdm.json.gz")
+    with Compression.open(path, "w", Compression.GZIP) as f:
+        f.write('{"name": "Étude"}')
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert f.read() == '{"name": "Étude"}'
+    with Compression.open(path, "r") as f:
+        assert f.read() == '{"name": "Étude"}'
+    with Compression.open(path, "rb") as f:
+        assert f.read() == '{"name": "Étude"}'.encode()
+
+
+def test_open_plain(tmp_path):
+    path = str(tmp_path / "usdm.json")
+    with Compression.open(path, "w") as f:
+        f.write("{}")
+    with Compression.open(path, "r") as f:
+        assert f.read() == "{}"
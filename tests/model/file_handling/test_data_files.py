@@ -1,7 +1,13 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
 from unittest.mock import mock_open
 
 import pytest
 
+from app.model.file_handling.blob_store import blob_store
 from app.model.file_handling.data_files import DataFiles
 
 
@@ -39,6 +45,29 @@ class TestDataFiles:
         """Create a DataFiles instance with a predefined UUID."""
         return DataFiles(uuid="test-uuid")
 
+    @pytest.fixture
+    def compression_config(self, mocker):
+        """Mock the configuration read for the compression setting."""
+        mock = mocker.patch(
+            "app.model.file_handling.compression.application_configuration"
+        )
+        mock.datafile_compression = ""
+        return mock
+
+    @pytest.fixture
+    def stored_files(self, data_files_with_uuid, compression_config, tmp_path, mocker):
+        """A DataFiles instance over a real study dir under ``tmp_path``."""
+        data_files_with_uuid.dir = str(tmp_path / "data")
+        os.makedirs(tmp_path / "data" / "test-uuid")
+        mocker.patch.object(DataFiles, "EXPANDED_DIR", str(tmp_path / "expanded"))
+        return data_files_with_uuid
+
+    @pytest.fixture
+    def indexed_files(self, stored_files):
+        """As ``stored_files``, for a dir created with a manifest."""
+        stored_files._save_manifest({})
+        return stored_files
+
     def test_init_without_uuid(self, data_files, mock_config):
         """Test initialization without a UUID."""
         assert data_files.uuid is None
@@ -147,29 +176,12 @@ class TestDataFiles:
         data_files_with_uuid._form_filename.assert_called_once_with("usdm")
         mock_save_method.assert_called_once_with('{"test": "content"}', "usdm.json")
 
-    def test_read(self, data_files_with_uuid, mocker):
+    def test_read(self, stored_files):
         """Test read method."""
-        mock_open_file = mock_open(read_data="test content")
-        mocker.patch("builtins.open", mock_open_file)
-
-        # Mock the _form_filename and _file_path methods
-        mocker.patch.object(
-            data_files_with_uuid, "_form_filename", return_value="test.txt"
-        )
-        mocker.patch.object(
-            data_files_with_uuid,
-            "_file_path",
-            return_value="/test/data/path/test-uuid/test.txt",
-        )
+        with open(os.path.join(stored_files._dir_path(), "errors.csv"), "w") as f:
+            f.write("test content")
 
-        result = data_files_with_uuid.read("test")
-
-        assert result == "test content"
-        data_files_with_uuid._form_filename.assert_called_once_with("test")
-        data_files_with_uuid._file_path.assert_called_once_with("test.txt")
-        mock_open_file.assert_called_once_with(
-            "/test/data/path/test-uuid/test.txt", "r"
-        )
+        assert stored_files.read("errors") == "test content"
 
     def test_path_with_original_filename(self, data_files_with_uuid, mocker):
         """Test path method with original filename."""
@@ -624,38 +636,392 @@ class TestDataFiles:
         )
         mock_open_file().write.assert_called_once_with(b"test content")
 
-    def test_save_json_file(self, data_files_with_uuid, mocker):
-        """Test _save_json_file method."""
-        # Mock the _file_path method
+    def test_save_json_file(self, stored_files):
+        """JSON text is written as given, via a temporary file."""
+        full_path, filename = stored_files.save("usdm", '{"test":  "content"}')
+
+        assert filename == "usdm.json"
+        assert full_path == os.path.join(stored_files._dir_path(), "usdm.json")
+        with open(full_path) as f:
+            assert f.read() == '{"test":  "content"}'
+        assert os.listdir(stored_files._dir_path()) == ["usdm.json"]
+
+    @pytest.mark.parametrize(
+        "contents",
+        [
+            '{"test": ',
+            b"not json",
+            io.BytesIO(b'{"test": [1, 2}'),
+        ],
+    )
+    def test_save_json_file_invalid(
+        self, stored_files, compression_config, mock_logger, contents
+    ):
+        """Invalid JSON, as text, bytes or an upload, fails the save and
+        leaves the previous file whole."""
+        full_path, _ = stored_files.save("usdm", '{"a": 1}')
+
+        assert stored_files.save("usdm", contents)[0] is None
+        with open(full_path) as f:
+            assert f.read() == '{"a": 1}'
+        assert os.listdir(stored_files._dir_path()) == ["usdm.json"]
+        mock_logger.exception.assert_called_once()
+
+    def test_save_json_file_dict(self, stored_files):
+        """A dict is serialised straight to the file."""
+        full_path, _ = stored_files.save("validation", {"findings": [1]})
+
+        with open(full_path) as f:
+            assert json.load(f) == {"findings": [1]}
+        assert stored_files.read("validation") == '{"findings": [1]}'
+
+    def test_save_json_file_failure_keeps_file(self, stored_files, mock_logger):
+        """A failed write leaves the previous file whole."""
+        full_path, _ = stored_files.save("usdm", '{"a": 1}')
+
+        assert stored_files._save_json_file({"a": object()}, "usdm.json") is None
+        with open(full_path) as f:
+            assert f.read() == '{"a": 1}'
+        assert os.listdir(stored_files._dir_path()) == ["usdm.json"]
+        mock_logger.exception.assert_called_once()
+
+    @pytest.mark.parametrize("compression, extension", [("gzip", ".gz")])
+    def test_save_json_file_compressed(
+        self, stored_files, compression_config, compression, extension
+    ):
+        """Compressed types are stored compressed and read, or expanded
+        for a path, transparently."""
+        compression_config.datafile_compression = compression
+        text = json.dumps({"study": {"name": "x" * 1000}})
+
+        full_path, filename = stored_files.save("usdm", text)
+
+        assert full_path.endswith(f"usdm.json{extension}")
+        assert os.listdir(stored_files._dir_path()) == [f"usdm.json{extension}"]
+        assert os.path.getsize(full_path) < len(text)
+        assert stored_files.stored_path("usdm") == full_path
+        assert stored_files.read("usdm") == text
+        path, filename, exists = stored_files.path("usdm")
+        assert exists is True
+        assert filename == "usdm.json"
+        assert path == os.path.join(DataFiles.EXPANDED_DIR, "test-uuid", "usdm.json")
+        with open(path) as f:
+            assert f.read() == text
+        assert stored_files.path("usdm")[0] == path
+
+    def test_save_json_file_not_compressed(self, stored_files, compression_config):
+        """Types opened by path elsewhere are never compressed."""
+        compression_config.datafile_compression = "gzip"
+
+        full_path, _ = stored_files.save("m11_validation", "{}")
+
+        assert full_path.endswith("m11_validation.json")
+
+    def test_save_json_file_variants(self, stored_files, compression_config):
+        """Saving under a new setting replaces the file stored under the
+        old one, and any expanded copy."""
+        compression_config.datafile_compression = "gzip"
+        stored_files.save("usdm", '{"a": 1}')
+        expanded, _, _ = stored_files.path("usdm")
+        compression_config.datafile_compression = ""
+
+        full_path, _ = stored_files.save("usdm", '{"a": 2}')
+
+        assert os.listdir(stored_files._dir_path()) == ["usdm.json"]
+        assert not os.path.exists(expanded)
+        assert stored_files.path("usdm") == (full_path, "usdm.json", True)
+        assert stored_files.read("usdm") == '{"a": 2}'
+
+    def test_manifest(self, indexed_files, mocker):
+        """Saves are recorded in the manifest, which answers lookups
+        without listing or stat'ing the dir."""
+        assert indexed_files.manifest() == {}
+        indexed_files.save("xlsx", b"workbook", "study.xlsx")
+        indexed_files.save("usdm", '{"a": 1}')
+        indexed_files.save("rendered-protocol", "<p/>", "rendered-protocol-1.html")
+
+        files = DataFiles("test-uuid")
+        files.dir = indexed_files.dir
+        manifest = files.manifest()
+        assert sorted(manifest) == ["source", "usdm", "xlsx"]
+        assert manifest["xlsx"]["filename"] == "study.xlsx"
+        assert manifest["xlsx"]["size"] == 8
+        assert manifest["xlsx"]["sha256"] == hashlib.sha256(b"workbook").hexdigest()
+        assert manifest["usdm"]["sha256"] == hashlib.sha256(b'{"a": 1}').hexdigest()
+        listdir = mocker.patch("os.listdir")
+        stat = mocker.spy(os, "stat")
+        dir = files._dir_path()
+        assert files.path("xlsx") == (
+            os.path.join(dir, "study.xlsx"),
+            "study.xlsx",
+            True,
+        )
+        assert files.path("usdm") == (os.path.join(dir, "usdm.json"), "usdm.json", True)
+        assert files.path("extra")[2] is False
+        assert files.exists("usdm") is True
+        assert files.exists("costs") is False
+        assert files.generic_path("m11_validation")[2] is False
+        assert files.generic_path("usdm")[2] is True
+        assert files.read("usdm") == '{"a": 1}'
+        listdir.assert_not_called()
+        stat.assert_not_called()
+
+    def test_manifest_compressed(self, indexed_files, compression_config):
+        compression_config.datafile_compression = "gzip"
+        indexed_files.save("usdm", '{"a": 1}')
+
+        assert indexed_files.manifest()["usdm"]["filename"] == "usdm.json.gz"
+        assert indexed_files.stored_path("usdm").endswith("usdm.json.gz")
+        path, _, exists = indexed_files.path("usdm")
+        assert path.startswith(DataFiles.EXPANDED_DIR)
+        assert exists is True
+        assert indexed_files.read("usdm") == '{"a": 1}'
+
+    def test_manifest_new(self, data_files, tmp_path):
+        data_files.dir = str(tmp_path)
+
+        uuid = data_files.new()
+
+        assert os.listdir(tmp_path / uuid) == [DataFiles.MANIFEST]
+        assert data_files.manifest() == {}
+        assert data_files._dir_files() == []
+
+    def test_manifest_merge(self, indexed_files):
+        """Saves through other instances are kept."""
+        other = DataFiles("test-uuid")
+        other.dir = indexed_files.dir
+        other.manifest()
+        indexed_files.save("usdm", "{}")
+        other.save("extra", {"a": 1})
+
+        assert sorted(other.manifest()) == ["extra", "usdm"]
+        assert sorted(indexed_files._read_manifest()) == ["extra", "usdm"]
+
+    def test_manifest_merge_across_processes(self, indexed_files):
+        """A worker process saving while another updates the manifest
+        waits for it, so both entries are kept."""
+        context = multiprocessing.get_context("fork")
+        go = context.Event()
+
+        def save():
+            go.wait(5)
+            files = DataFiles("test-uuid")
+            files.dir = indexed_files.dir
+            files.save("extra", {"a": 1})
+
+        process = context.Process(target=save)
+        process.start()
+        with indexed_files._locked_manifest():
+            files = indexed_files._read_manifest()
+            go.set()
+            process.join(0.5)
+            assert process.is_alive()
+            files["usdm"] = {"filename": "usdm.json"}
+            indexed_files._save_manifest(files)
+        process.join(5)
+
+        assert process.exitcode == 0
+        assert sorted(indexed_files._read_manifest()) == ["extra", "usdm"]
+
+    def test_manifest_forget(self, indexed_files):
+        indexed_files.save("usdm", "{}")
+        indexed_files.save("m11-protocol", "<p/>")
+
+        assert indexed_files.delete_files("m11-") == 1
+        assert list(indexed_files.manifest()) == ["usdm"]
+        assert indexed_files.discard("usdm") is True
+        assert indexed_files.manifest() == {}
+        assert indexed_files.exists("usdm") is False
+
+    def test_manifest_legacy(self, stored_files):
+        """Dirs without a manifest are scanned as before, and saves do
+        not start an incomplete one."""
+        stored_files.save("xlsx", b"workbook", "study.xlsx")
+
+        assert stored_files.manifest() is None
+        assert not os.path.exists(stored_files._manifest_path())
+        assert stored_files.path("xlsx")[1] == "study.xlsx"
+        assert stored_files.exists("usdm") is False
+
+    def test_rebuild_manifest(self, stored_files, compression_config):
+        compression_config.datafile_compression = "gzip"
+        stored_files.save("xlsx", b"workbook", "study.xlsx")
+        stored_files.save("usdm", '{"a": 1}')
+        stored_files.save("fhir_prism3", b"{}", "message.json")
+        stored_files.save("rendered-protocol", "<p/>", "rendered-protocol-1.html")
+
+        files = stored_files.rebuild_manifest()
+
+        assert sorted(files) == ["source", "usdm", "xlsx"]
+        assert files["usdm"]["filename"] == "usdm.json.gz"
+        assert files["xlsx"]["sha256"] == hashlib.sha256(b"workbook").hexdigest()
+        fresh = DataFiles("test-uuid")
+        fresh.dir = stored_files.dir
+        assert fresh.manifest() == files
+        assert fresh.path("fhir_prism3")[1] == "message.json"
+        assert fresh.read("usdm") == '{"a": 1}'
+
+    def test_discard(self, stored_files, compression_config, mock_logger):
+        compression_config.datafile_compression = "gzip"
+        stored_files.save("usdm", '{"a": 1}')
+        expanded, _, _ = stored_files.path("usdm")
+
+        assert stored_files.discard("usdm") is True
+        assert os.listdir(stored_files._dir_path()) == []
+        assert not os.path.exists(expanded)
+        assert stored_files.discard("usdm") is False
+        mock_logger.exception.assert_called_once()
+
+    def test_save_shares_uploads(self, stored_files):
+        """Uploads are listed in the source record and stored once in the
+        blob store, linked from each study dir they were uploaded to."""
+        full_path, _ = stored_files.save("xlsx", b"workbook", "study.xlsx")
+        sha256 = hashlib.sha256(b"workbook").hexdigest()
+        other = DataFiles("other-uuid")
+        other.dir = stored_files.dir
+        os.makedirs(other._dir_path())
+        other_path, _ = other.save("xlsx", b"workbook", "copy.xlsx")
+
+        assert stored_files.sources() == {"study.xlsx": {"sha256": sha256, "size": 8}}
+        assert os.path.samefile(full_path, other_path)
+        assert os.path.samefile(full_path, blob_store.path(stored_files.dir, sha256))
+        assert blob_store.report(stored_files.dir)["bytes_saved"] == 8
+
+        other.save("xlsx", b"changed", "copy.xlsx")
+
+        assert not os.path.samefile(full_path, other_path)
+        with open(full_path, "rb") as f:
+            assert f.read() == b"workbook"
+
+    def test_delete_releases_blobs(self, stored_files):
+        stored_files.save("xlsx", b"workbook", "study.xlsx")
+        blob = blob_store.path(
+            stored_files.dir, hashlib.sha256(b"workbook").hexdigest()
+        )
+
+        assert stored_files.delete() is True
+        assert not os.path.exists(blob)
+
+    def test_copy(self, stored_files, compression_config):
+        compression_config.datafile_compression = "gzip"
+        stored_files._save_manifest({})
+        stored_files.save("usdm", '{"a": 1}')
+        other = DataFiles("other-uuid")
+        other.dir = stored_files.dir
+        os.makedirs(other._dir_path())
+        other._save_manifest({})
+
+        assert other.copy(stored_files, "usdm") is True
+        assert other.manifest()["usdm"]["filename"] == "usdm.json.gz"
+        assert other.read("usdm") == '{"a": 1}'
+        assert other.copy(stored_files, "extra") is False
+
+    def test_save_binary_file_stream(self, data_files_with_uuid, mocker, tmp_path):
+        """A file object is copied in chunks and hashed as it is written."""
         mocker.patch.object(
-            data_files_with_uuid,
-            "_file_path",
-            return_value="/test/data/path/test-uuid/test.json",
+            data_files_with_uuid, "_file_path", return_value=str(tmp_path / "big.xlsx")
         )
+        mocker.patch.object(DataFiles, "CHUNK_SIZE", 4)
+        source = io.BytesIO(b"0123456789")
+        source.read = mocker.Mock(side_effect=source.read)
+
+        result = data_files_with_uuid._save_binary_file(source, "big.xlsx")
+
+        assert result == str(tmp_path / "big.xlsx")
+        assert (tmp_path / "big.xlsx").read_bytes() == b"0123456789"
+        assert [x.args for x in source.read.call_args_list] == [(4,)] * 4
+        assert data_files_with_uuid.digests["big.xlsx"] == {
+            "sha256": hashlib.sha256(b"0123456789").hexdigest(),
+            "size": 10,
+        }
 
-        # Mock open
-        mock_open_file = mock_open()
-        mocker.patch("builtins.open", mock_open_file)
+    def test_save_binary_file_digest(self, data_files_with_uuid, mocker, tmp_path):
+        mocker.patch.object(
+            data_files_with_uuid, "_file_path", return_value=str(tmp_path / "a.docx")
+        )
+        data_files_with_uuid._save_binary_file(b"abc", "a.docx")
+        assert data_files_with_uuid.digests["a.docx"] == {
+            "sha256": hashlib.sha256(b"abc").hexdigest(),
+            "size": 3,
+        }
 
-        # Mock json.loads and json.dumps
-        mock_json_loads = mocker.patch("json.loads")
-        mock_json_loads.return_value = {"test": "content"}
+    def test_save_json_file_stream(self, stored_files, compression_config):
+        """An uploaded JSON file object is copied as is, compressed or
+        not, and hashed as it is written."""
+        raw = b'{"a": [1, 2]}'
+
+        full_path, _ = stored_files.save("usdm", io.BytesIO(raw))
+
+        with open(full_path, "rb") as f:
+            assert f.read() == raw
+        digest = {"sha256": hashlib.sha256(raw).hexdigest(), "size": len(raw)}
+        assert stored_files.digests["usdm.json"] == digest
+        compression_config.datafile_compression = "gzip"
+        full_path, _ = stored_files.save("usdm", io.BytesIO(raw))
+        assert full_path.endswith(".gz")
+        assert stored_files.read("usdm") == raw.decode()
+        assert stored_files.digests["usdm.json"] == digest
+
+    def test_save_rendered_file(self, data_files_with_uuid, tmp_path):
+        """Rendered views are written whole via a temporary file."""
+        data_files_with_uuid.dir = str(tmp_path)
+        (tmp_path / "test-uuid").mkdir()
+
+        full_path, filename = data_files_with_uuid.save(
+            "rendered-protocol", "<p>Protocol</p>", "rendered-protocol-m11-1.html"
+        )
 
-        mock_json_dumps = mocker.patch("json.dumps")
-        mock_json_dumps.return_value = '{\n  "test": "content"\n}'
+        assert filename == "rendered-protocol-m11-1.html"
+        assert full_path == str(tmp_path / "test-uuid" / filename)
+        assert os.listdir(tmp_path / "test-uuid") == [filename]
+        assert data_files_with_uuid.named_path(filename) == (full_path, True)
+        assert data_files_with_uuid.named_path("other.html")[1] is False
 
-        result = data_files_with_uuid._save_json_file(
-            '{"test": "content"}', "test.json"
+    def test_save_rendered_file_exception(self, data_files_with_uuid, mock_logger):
+        result = data_files_with_uuid._save_rendered_file("<p/>", "missing.html")
+
+        assert result is None
+        mock_logger.exception.assert_called_once()
+
+    def test_delete_files(self, data_files_with_uuid, tmp_path):
+        data_files_with_uuid.dir = str(tmp_path)
+        dir = tmp_path / "test-uuid"
+        dir.mkdir()
+        for name in [
+            "rendered-a.html",
+            "rendered-b.html",
+            "rendered-c.tmp",
+            "usdm.json",
+        ]:
+            (dir / name).write_text("x")
+
+        assert (
+            data_files_with_uuid.delete_files("rendered-", keep="rendered-b.html") == 1
         )
+        assert sorted(os.listdir(dir)) == [
+            "rendered-b.html",
+            "rendered-c.tmp",
+            "usdm.json",
+        ]
 
-        assert result == "/test/data/path/test-uuid/test.json"
-        data_files_with_uuid._file_path.assert_called_once_with("test.json")
-        mock_open_file.assert_called_once_with(
-            "/test/data/path/test-uuid/test.json", "w", encoding="utf-8"
+    def test_delete_files_keep_several(self, data_files_with_uuid, tmp_path):
+        data_files_with_uuid.dir = str(tmp_path)
+        dir = tmp_path / "test-uuid"
+        dir.mkdir()
+        for name in ["rendered-a.html", "rendered-b.html", "rendered-c.html"]:
+            (dir / name).write_text("x")
+
+        assert (
+            data_files_with_uuid.delete_files(
+                "rendered-", keep={"rendered-a.html", "rendered-c.html"}
+            )
+            == 1
         )
-        mock_json_loads.assert_called_once_with('{"test": "content"}')
-        mock_json_dumps.assert_called_once_with({"test": "content"}, indent=2)
-        mock_open_file().write.assert_called_once_with('{\n  "test": "content"\n}')
+        assert sorted(os.listdir(dir)) == ["rendered-a.html", "rendered-c.html"]
+
+    def test_delete_files_exception(self, data_files_with_uuid, mock_logger):
+        assert data_files_with_uuid.delete_files("rendered-") == 0
+        mock_logger.exception.assert_called_once()
 
     def test_save_json_file_exception(self, data_files_with_uuid, mocker, mock_logger):
         """Test _save_json_file method with exception."""
@@ -666,9 +1032,8 @@ class TestDataFiles:
             return_value="/test/data/path/test-uuid/test.json",
         )
 
-        # Mock json.loads to raise an exception
-        mock_json_loads = mocker.patch("json.loads")
-        mock_json_loads.side_effect = Exception("Test error")
+        # Mock open to raise an exception
+        mocker.patch("builtins.open", side_effect=OSError("Test error"))
 
         result = data_files_with_uuid._save_json_file(
             '{"test": "content"}', "test.json"
@@ -743,7 +1108,7 @@ class TestDataFiles:
         assert result == "/test/data/path/test-uuid/test.pdf"
         data_files_with_uuid._file_path.assert_called_once_with("test.pdf")
         mock_open_file.assert_called_once_with(
-            "/test/data/path/test-uuid/test.pdf", "w+b"
+            "/test/data/path/test-uuid/test.pdf", "wb"
         )
         mock_open_file().write.assert_called_once_with(b"test content")
 
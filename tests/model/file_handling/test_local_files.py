@@ -1,5 +1,7 @@
 from unittest.mock import patch
 
+import pytest
+
 from app.model.file_handling.local_files import LocalFiles
 
 
@@ -91,6 +93,33 @@ class TestLocalFilesDir:
         assert "scandir fail" in error
 
 
+class TestLocalFilesFiles:
+    @patch("app.model.file_handling.local_files.application_configuration")
+    def test_files(self, mock_config, tmp_path):
+        mock_config.local_file_path = str(tmp_path)
+        dir = tmp_path / "batch"
+        dir.mkdir()
+        (dir / "b.docx").write_text("b")
+        (dir / "a.xlsx").write_text("a")
+        (dir / ".hidden").write_text("h")
+        (dir / "~$a.xlsx").write_text("lock")
+        (dir / "subdir").mkdir()
+        lf = LocalFiles()
+        expected = [str(dir / "a.xlsx"), str(dir / "b.docx")]
+        assert lf.files("batch") == expected
+        assert lf.files(str(dir)) == expected
+
+    @patch("app.model.file_handling.local_files.application_configuration")
+    def test_files_outside_root(self, mock_config, tmp_path):
+        mock_config.local_file_path = str(tmp_path / "root")
+        (tmp_path / "root").mkdir()
+        lf = LocalFiles()
+        with pytest.raises(ValueError):
+            lf.files("../")
+        with pytest.raises(ValueError):
+            lf.files(str(tmp_path))
+
+
 class TestLocalFilesDownload:
     @patch("app.model.file_handling.local_files.application_configuration")
     def test_download(self, mock_config, tmp_path):
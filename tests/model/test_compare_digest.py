@@ -0,0 +1,130 @@
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.model.compare_digest import CompareDigest
+from app.model.file_handling.data_files import DataFiles
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "test-uuid").mkdir()
+    files = DataFiles("test-uuid")
+    files.dir = str(tmp_path)
+    return files
+
+
+@pytest.fixture
+def data_view(mocker):
+    data_view = mocker.patch("app.model.compare_digest.DataView")
+    data_view.return_value.title_page.return_value = {"Full Title": "A Trial"}
+    return data_view
+
+
+def nc(number, title, level):
+    return SimpleNamespace(
+        sectionNumber=number, sectionTitle=title, level=lambda: level
+    )
+
+
+def wrapper() -> MagicMock:
+    design_one = MagicMock(label="Design One")
+    design_one.inclusion_criteria.return_value = [
+        {"identifier": "IN1", "criterionItem": {"text": "Adults", "id": "x"}}
+    ]
+    design_one.exclusion_criteria.return_value = [
+        SimpleNamespace(identifier="EX1", criterionItem=SimpleNamespace(text="None"))
+    ]
+    design_two = MagicMock(label=None)
+    design_two.name = "DESIGN 2"
+    design_two.inclusion_criteria.return_value = []
+    design_two.exclusion_criteria.return_value = []
+    version = MagicMock(studyDesigns=[design_one, design_two])
+    version.sponsor_identifier_text.return_value = "PROTO-001"
+    version.eligibility_critieria_item_map.return_value = {"map": True}
+    sddv = MagicMock()
+    sddv.narrative_content_in_order.return_value = [
+        nc("0", "Title Page", 1),
+        nc("1", "Protocol Summary", 1),
+        nc("", "Unnumbered", 1),
+        nc(" 1.1 ", None, 2),
+    ]
+    result = MagicMock()
+    result.first_version.return_value = version
+    result.study_document_version.return_value = sddv
+    return result
+
+
+def filenames(files: DataFiles) -> list[str]:
+    return sorted(os.listdir(os.path.join(files.dir, files.uuid)))
+
+
+def test_build(data_view):
+    usdm = wrapper()
+    digest = CompareDigest.build(usdm, "M11_DOCX")
+    assert digest == {
+        "engine": "1",
+        "import_type": "M11_DOCX",
+        "sponsor_id": "PROTO-001",
+        "title_page": {"Full Title": "A Trial"},
+        "inclusion": [
+            {
+                "design": "Design One",
+                "criteria": [
+                    {"identifier": "IN1", "criterionItem": {"text": "Adults"}}
+                ],
+            },
+            {"design": "DESIGN 2", "criteria": []},
+        ],
+        "exclusion": [
+            {
+                "design": "Design One",
+                "criteria": [{"identifier": "EX1", "criterionItem": {"text": "None"}}],
+            },
+            {"design": "DESIGN 2", "criteria": []},
+        ],
+        "sections": [
+            {"number": "1", "title": "Protocol Summary", "level": 1},
+            {"number": "1.1", "title": "", "level": 2},
+        ],
+    }
+    design = usdm.first_version.return_value.studyDesigns[0]
+    design.inclusion_criteria.assert_called_once_with({"map": True})
+    usdm.study_document_version.assert_called_once_with("M11")
+
+
+def test_sections_none():
+    assert CompareDigest.sections(None) == []
+
+
+def test_get_saved_once(files, data_view, mocker):
+    load = mocker.patch.object(CompareDigest, "wrapper", return_value=wrapper())
+    digest = CompareDigest(files).get("USDM4")
+    assert digest["import_type"] == "USDM4"
+    assert CompareDigest(files).get("USDM4") == digest
+    assert load.call_count == 1
+    filename = CompareDigest._filename()
+    assert filenames(files) == [filename]
+    with open(files.named_path(filename)[0]) as f:
+        assert json.load(f) == digest
+
+
+def test_get_unreadable(files, data_view, mocker):
+    mocker.patch.object(CompareDigest, "wrapper", return_value=wrapper())
+    full_path, _ = files.named_path(CompareDigest._filename())
+    with open(full_path, "w") as f:
+        f.write("not json")
+    assert CompareDigest(files).get("USDM4")["sponsor_id"] == "PROTO-001"
+    with open(full_path) as f:
+        assert json.load(f)["sponsor_id"] == "PROTO-001"
+
+
+def test_superseded_removed(files):
+    full_path, _ = files.named_path("compare-digest-0000000000000000.json")
+    with open(full_path, "w") as f:
+        f.write("{}")
+    CompareDigest(files).save({"engine": "1"})
+    assert filenames(files) == [CompareDigest._filename()]
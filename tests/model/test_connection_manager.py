@@ -1,13 +1,18 @@
+import asyncio
+import threading
+import time
 from unittest.mock import AsyncMock, patch
 
 import pytest
 
-from app.model.connection_manager import ConnectionManager
+from app.model.connection_manager import ConnectionManager, NotificationBroker
 
 
 @pytest.fixture
 def manager():
-    return ConnectionManager()
+    manager = ConnectionManager()
+    manager.COALESCE_SECONDS = 0.05
+    return manager
 
 
 @pytest.fixture
@@ -16,15 +21,30 @@ def mock_ws():
     return ws
 
 
+async def settle(seconds: float = 0.01):
+    await asyncio.sleep(seconds)
+
+
+async def until(condition, seconds: float = 5.0):
+    end = time.monotonic() + seconds
+    while not condition() and time.monotonic() < end:
+        await asyncio.sleep(0.01)
+
+
+def sent(ws) -> list[str]:
+    return [x[0][0] for x in ws.send_text.call_args_list]
+
+
 class TestConnectionManager:
     @pytest.mark.asyncio
     async def test_connect(self, manager, mock_ws):
         await manager.connect("user1", mock_ws)
         mock_ws.accept.assert_awaited_once()
-        assert "user1" in manager.active_connections
+        assert manager.active_connections["user1"] == {mock_ws}
 
-    def test_disconnect(self, manager, mock_ws):
-        manager.active_connections["user1"] = mock_ws
+    @pytest.mark.asyncio
+    async def test_disconnect(self, manager, mock_ws):
+        await manager.connect("user1", mock_ws)
         manager.disconnect("user1")
         assert "user1" not in manager.active_connections
 
@@ -33,8 +53,9 @@ class TestConnectionManager:
 
     @pytest.mark.asyncio
     async def test_success_with_connection(self, manager, mock_ws):
-        manager.active_connections["user1"] = mock_ws
+        await manager.connect("user1", mock_ws)
         await manager.success("It worked", "user1")
+        await until(lambda: manager.stats()["sent"] == 1)
         mock_ws.send_text.assert_awaited_once()
         call_arg = mock_ws.send_text.call_args[0][0]
         assert "success" in call_arg
@@ -46,18 +67,28 @@ class TestConnectionManager:
         await manager.success("msg", "unknown_user")
         mock_logger.error.assert_called_once()
 
+    @pytest.mark.asyncio
+    @patch("app.model.connection_manager.application_logger")
+    async def test_success_other_user(self, mock_logger, manager, mock_ws):
+        await manager.connect("user1", mock_ws)
+        await manager.success("msg", "unknown_user")
+        mock_logger.error.assert_called_once()
+        mock_ws.send_text.assert_not_awaited()
+
     @pytest.mark.asyncio
     async def test_warning_with_connection(self, manager, mock_ws):
-        manager.active_connections["user1"] = mock_ws
+        await manager.connect("user1", mock_ws)
         await manager.warning("Watch out", "user1")
+        await until(lambda: manager.stats()["sent"] == 1)
         mock_ws.send_text.assert_awaited_once()
         call_arg = mock_ws.send_text.call_args[0][0]
         assert "warning" in call_arg
 
     @pytest.mark.asyncio
     async def test_error_with_connection(self, manager, mock_ws):
-        manager.active_connections["user1"] = mock_ws
+        await manager.connect("user1", mock_ws)
         await manager.error("Something broke", "user1")
+        await until(lambda: manager.stats()["sent"] == 1)
         mock_ws.send_text.assert_awaited_once()
         call_arg = mock_ws.send_text.call_args[0][0]
         assert "danger" in call_arg
@@ -66,40 +97,251 @@ class TestConnectionManager:
     async def test_broadcast(self, manager):
         ws1 = AsyncMock()
         ws2 = AsyncMock()
-        manager.active_connections["u1"] = ws1
-        manager.active_connections["u2"] = ws2
+        await manager.connect("u1", ws1)
+        await manager.connect("u2", ws2)
         await manager.broadcast("Alert everyone")
+        await until(lambda: manager.stats()["sent"] == 2)
         ws1.send_text.assert_awaited_once()
         ws2.send_text.assert_awaited_once()
+        assert 'ws-connect="/alerts/u2"' in sent(ws2)[0]
 
     def test_to_html(self, manager):
-        html = manager._to_html("u1", "Success:", "success", "Done!")
+        html = manager._to_html("u1", [("success", "Done!")])
         assert "alert-success" in html
         assert "Done!" in html
         assert "Success:" in html
+        assert 'ws-connect="/alerts/u1"' in html
+
+    def test_to_html_repeats(self, manager):
+        html = manager._to_html(
+            "u1", [("error", "Failed"), ("success", "Done"), ("error", "Failed")]
+        )
+        assert html.count("Failed") == 1
+        assert "Failed (&times;2)" in html
+        assert "Done" in html
+        assert "not shown" not in html
+
+    def test_to_html_limit(self, manager):
+        html = manager._to_html("u1", [("warning", f"Message {x}") for x in range(8)])
+        assert "Message 2" not in html
+        assert "Message 3" in html
+        assert "Message 7" in html
+        assert "3 earlier notifications not shown" in html
+
+    @pytest.mark.asyncio
+    async def test_stats(self, manager, mock_ws):
+        await manager.connect("user1", mock_ws)
+        await manager.connect("user1", AsyncMock())
+        await manager.success("msg", "user1")
+        await until(lambda: manager.stats()["sent"] == 2)
+        assert manager.stats() == {
+            "users": 1,
+            "sockets": 2,
+            "broker": None,
+            "published": 1,
+            "sent": 2,
+            "coalesced": 0,
+            "dropped": 0,
+        }
 
 
 class TestEvictionRace:
-    """Regression tests for the alert-loss bug: a stale socket closing
-    must not evict a newer socket registered under the same user_id."""
+    """A user has a socket per tab; a stale socket closing must not
+    evict the others registered under the same user_id."""
 
     @pytest.mark.asyncio
-    async def test_stale_socket_close_does_not_evict_new_socket(self, manager):
+    async def test_second_socket_kept(self, manager):
         ws1 = AsyncMock()
+        ws2 = AsyncMock()
         await manager.connect("2", ws1)
+        await manager.connect("2", ws2)
+        assert manager.active_connections["2"] == {ws1, ws2}
+        ws1.close.assert_not_awaited()
+        await manager.success("Both", "2")
+        await until(lambda: manager.stats()["sent"] == 2)
+        ws1.send_text.assert_awaited_once()
+        ws2.send_text.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_stale_socket_close_does_not_evict_new_socket(self, manager):
+        ws1 = AsyncMock()
         ws2 = AsyncMock()
+        await manager.connect("2", ws1)
         await manager.connect("2", ws2)
-        assert manager.active_connections["2"] is ws2
-        ws1.close.assert_awaited_once()
-        # old socket closes after the new one replaced it
         manager.disconnect("2", ws1)
-        assert manager.active_connections.get("2") is ws2
+        assert manager.active_connections["2"] == {ws2}
+        manager.disconnect("2", ws1)
+        assert manager.active_connections["2"] == {ws2}
 
-    def test_disconnect_matching_socket_removes_it(self, manager, mock_ws):
-        manager.active_connections["2"] = mock_ws
+    @pytest.mark.asyncio
+    async def test_disconnect_matching_socket_removes_it(self, manager, mock_ws):
+        await manager.connect("2", mock_ws)
         manager.disconnect("2", mock_ws)
         assert "2" not in manager.active_connections
 
     @pytest.mark.asyncio
     async def test_error_no_connection_does_not_raise(self, manager):
         await manager.error("boom", "nobody")  # should log, not KeyError
+
+    @pytest.mark.asyncio
+    async def test_failed_send_drops_socket(self, manager):
+        ws1 = AsyncMock()
+        ws2 = AsyncMock()
+        ws1.send_text.side_effect = RuntimeError("closed")
+        await manager.connect("2", ws1)
+        await manager.connect("2", ws2)
+        await manager.success("msg", "2")
+        await until(lambda: manager.stats()["dropped"] == 1)
+        assert manager.active_connections["2"] == {ws2}
+        assert manager.stats()["dropped"] == 1
+        assert manager.stats()["sent"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_send_drops_socket(self, manager, mock_ws):
+        manager.SEND_TIMEOUT = 0.01
+
+        async def stuck(html):
+            await asyncio.sleep(1)
+
+        mock_ws.send_text.side_effect = stuck
+        await manager.connect("2", mock_ws)
+        await manager.success("msg", "2")
+        await until(lambda: "2" not in manager.active_connections)
+        assert "2" not in manager.active_connections
+
+    @pytest.mark.asyncio
+    async def test_many_sockets(self, manager):
+        sockets = [AsyncMock() for _ in range(300)]
+        for index, ws in enumerate(sockets):
+            await manager.connect(str(index % 30), ws)
+        assert manager.stats()["users"] == 30
+        assert manager.stats()["sockets"] == 300
+        for user in range(30):
+            await manager.success(f"Done {user}", str(user))
+        await until(lambda: manager.stats()["sent"] == 300)
+        for index, ws in enumerate(sockets):
+            ws.send_text.assert_awaited_once()
+            assert f"Done {index % 30}" in sent(ws)[0]
+        assert manager.stats()["sent"] == 300
+
+
+class TestCoalescing:
+    @pytest.mark.asyncio
+    async def test_burst(self, manager, mock_ws):
+        await manager.connect("1", mock_ws)
+        for index in range(4):
+            await manager.success(f"Imported {index}", "1")
+        await until(lambda: manager.stats()["sent"] == 1)
+        assert len(sent(mock_ws)) == 1
+        assert "Imported 0" in sent(mock_ws)[0]
+        await until(lambda: manager.stats()["sent"] == 2)
+        assert len(sent(mock_ws)) == 2
+        assert "Imported 0" not in sent(mock_ws)[1]
+        for index in range(1, 4):
+            assert f"Imported {index}" in sent(mock_ws)[1]
+        assert manager.stats()["coalesced"] == 3
+
+    @pytest.mark.asyncio
+    async def test_window_reopens(self, manager, mock_ws):
+        await manager.connect("1", mock_ws)
+        await manager.success("First", "1")
+        await settle(0.2)
+        await manager.success("Second", "1")
+        await until(lambda: manager.stats()["sent"] == 2)
+        assert len(sent(mock_ws)) == 2
+        assert "Second" in sent(mock_ws)[1]
+        assert manager.stats()["coalesced"] == 0
+
+    @pytest.mark.asyncio
+    async def test_users_independent(self, manager):
+        ws1 = AsyncMock()
+        ws2 = AsyncMock()
+        await manager.connect("1", ws1)
+        await manager.connect("2", ws2)
+        await manager.success("One", "1")
+        await manager.success("Two", "2")
+        await until(lambda: manager.stats()["sent"] == 2)
+        assert "One" in sent(ws1)[0]
+        assert "Two" in sent(ws2)[0]
+
+
+class TestThreads:
+    @pytest.mark.asyncio
+    async def test_other_loop(self, manager, mock_ws):
+        await manager.connect("1", mock_ws)
+        loop = asyncio.get_running_loop()
+        loops = []
+
+        async def send_text(html):
+            loops.append(asyncio.get_running_loop())
+
+        mock_ws.send_text.side_effect = send_text
+        thread = threading.Thread(
+            target=asyncio.run, args=(manager.success("Imported", "1"),)
+        )
+        thread.start()
+        await asyncio.to_thread(thread.join)
+        await until(lambda: manager.stats()["sent"] == 1)
+        assert loops == [loop]
+        assert "Imported" in sent(mock_ws)[0]
+
+
+class TestBroker:
+    @pytest.mark.asyncio
+    async def test_across_managers(self, tmp_path):
+        path = str(tmp_path / "notifications.db")
+        first = ConnectionManager(path, 0.01)
+        second = ConnectionManager(path, 0.01)
+        ws1 = AsyncMock()
+        ws2 = AsyncMock()
+        try:
+            await first.connect("1", ws1)
+            await second.connect("2", ws2)
+            await first.success("From first", "2")
+            await second.error("From second", "1")
+            await first.broadcast("Everyone")
+            await until(
+                lambda: (
+                    "Everyone" in "".join(sent(ws1))
+                    and "Everyone" in "".join(sent(ws2))
+                )
+            )
+        finally:
+            await first.close()
+            await second.close()
+        assert "From second" in "".join(sent(ws1))
+        assert "From first" in "".join(sent(ws2))
+        assert "Everyone" in "".join(sent(ws1))
+        assert "Everyone" in "".join(sent(ws2))
+        assert "From first" not in "".join(sent(ws1))
+        assert first.stats()["broker"] == path
+
+    @pytest.mark.asyncio
+    @patch("app.model.connection_manager.application_logger")
+    async def test_no_local_connection(self, mock_logger, tmp_path):
+        manager = ConnectionManager(str(tmp_path / "notifications.db"), 0.01)
+        await manager.success("msg", "1")
+        mock_logger.error.assert_not_called()
+        assert manager._broker.read(0) == [(1, "1", "success", "msg")]
+
+    @pytest.mark.asyncio
+    async def test_earlier_not_replayed(self, tmp_path, mock_ws):
+        path = str(tmp_path / "notifications.db")
+        NotificationBroker(path).publish("1", "success", "Old")
+        manager = ConnectionManager(path, 0.01)
+        try:
+            await manager.connect("1", mock_ws)
+            await settle(0.05)
+        finally:
+            await manager.close()
+        mock_ws.send_text.assert_not_awaited()
+
+    def test_prune(self, tmp_path):
+        broker = NotificationBroker(str(tmp_path / "notifications.db"))
+        broker.publish("1", "success", "Old")
+        broker.RETAIN_SECONDS = -1
+        broker.prune()
+        assert broker.read(0) == []
+        broker.publish("1", "success", "New")
+        assert broker.last_id() == 2
+        assert broker.read(0) == [(2, "1", "success", "New")]
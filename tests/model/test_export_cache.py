@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from app.model.export_cache import ExportCache, ExportStats, export_stats
+from app.model.file_handling.data_files import DataFiles
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "test-uuid").mkdir()
+    files = DataFiles("test-uuid")
+    files.dir = str(tmp_path)
+    return files
+
+
+def writer(contents: str, calls: list):
+    def generate(path: str) -> None:
+        calls.append(path)
+        with open(path, "w") as f:
+            f.write(contents)
+
+    return generate
+
+
+def filenames(files: DataFiles) -> list[str]:
+    return sorted(os.listdir(os.path.join(files.dir, files.uuid)))
+
+
+def test_generated_once(files):
+    calls = []
+    cache = ExportCache(files)
+    path = cache.get("fhir", "prism3", "usdm4_fhir", "json", writer("{}", calls))
+    assert (
+        cache.get("fhir", "prism3", "usdm4_fhir", "json", writer("{}", calls)) == path
+    )
+    assert len(calls) == 1
+    assert calls[0].startswith(path) and calls[0].endswith(".tmp")
+    with open(path) as f:
+        assert f.read() == "{}"
+    name = os.path.basename(path)
+    assert name.startswith("export-fhir-prism3-") and name.endswith(".json")
+    assert filenames(files) == [name]
+
+
+def test_variants(files):
+    calls = []
+    cache = ExportCache(files)
+    soa_1 = cache.get(
+        "fhir_soa", "Timeline 1", "usdm4_fhir", "json", writer("1", calls)
+    )
+    soa_2 = cache.get(
+        "fhir_soa", "Timeline 2", "usdm4_fhir", "json", writer("2", calls)
+    )
+    assert soa_1 != soa_2
+    assert os.path.basename(soa_1).startswith("export-fhir_soa-timeline_1-")
+    assert len(filenames(files)) == 2
+
+
+def test_superseded_removed(files, mocker):
+    calls = []
+    cache = ExportCache(files)
+    old = cache.get("excel", "legacy", "usdm4_excel", "xlsx", writer("old", calls))
+    mocker.patch.object(ExportCache, "_package_version", return_value="99.0.0")
+    new = cache.get("excel", "legacy", "usdm4_excel", "xlsx", writer("new", calls))
+    assert new != old
+    assert len(calls) == 2
+    assert filenames(files) == [os.path.basename(new)]
+
+
+def test_generate_fails(files):
+    def generate(path: str) -> None:
+        with open(path, "w") as f:
+            f.write("partial")
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        ExportCache(files).get("fhir", "prism3", "usdm4_fhir", "json", generate)
+    assert filenames(files) == []
+
+
+def test_stats(files, mocker):
+    stats = ExportStats()
+    mocker.patch("app.model.export_cache.export_stats", stats)
+    calls = []
+    cache = ExportCache(files)
+    cache.get("fhir", "prism3", "usdm4_fhir", "json", writer("{}", calls))
+    cache.get("fhir", "prism3", "usdm4_fhir", "json", writer("{}", calls))
+    stats.unchanged()
+    result = stats.stats()
+    assert result["not_modified"] == 1
+    fhir = result["kinds"]["fhir"]
+    assert fhir["hits"] == 1
+    assert fhir["generated"] == 1
+    assert fhir["max_seconds"] >= fhir["last_seconds"] >= 0.0
+
+
+def test_singleton():
+    assert isinstance(export_stats, ExportStats)
@@ -0,0 +1,111 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.model.file_handling.data_files import DataFiles
+from app.model.rendered_protocol import RenderedProtocol
+from app.utility.m11_annotate import AnnotatedDocument
+
+FINDINGS = [{"rule_id": "M11_001", "element": "study_title"}]
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "test-uuid").mkdir()
+    files = DataFiles("test-uuid")
+    files.dir = str(tmp_path)
+    return files
+
+
+def rendered_files(files: DataFiles) -> list[str]:
+    return sorted(x for x in files._dir_files() if x.startswith("rendered-"))
+
+
+def test_html_rendered_once(files):
+    render = MagicMock(return_value="<p>Protocol</p>")
+    assert RenderedProtocol(files).html("M11", render) == "<p>Protocol</p>"
+    assert RenderedProtocol(files).html("M11", render) == "<p>Protocol</p>"
+    render.assert_called_once()
+    assert len(rendered_files(files)) == 1
+
+
+def test_html_per_template(files):
+    rendered = RenderedProtocol(files)
+    assert rendered.html("M11", lambda: "<p>M11</p>") == "<p>M11</p>"
+    assert rendered.html("CPT", lambda: "<p>CPT</p>") == "<p>CPT</p>"
+    assert rendered.html("Sponsor A/B", lambda: "<p>A</p>") == "<p>A</p>"
+    names = rendered_files(files)
+    assert len(names) == 3
+    assert any(x.startswith("rendered-protocol-sponsor_a_b-") for x in names)
+
+
+def test_html_renderer_upgrade(files, mocker):
+    rendered = RenderedProtocol(files)
+    rendered.html("M11", lambda: "<p>Old</p>")
+    old = rendered_files(files)
+    mocker.patch.object(RenderedProtocol, "_package_version", return_value="99.0")
+    assert rendered.html("M11", lambda: "<p>New</p>") == "<p>New</p>"
+    new = rendered_files(files)
+    assert len(new) == 1
+    assert new != old
+
+
+def test_html_save_failure(files, mocker):
+    mocker.patch.object(files, "save", return_value=(None, None))
+    render = MagicMock(return_value="<p>Protocol</p>")
+    assert RenderedProtocol(files).html("M11", render) == "<p>Protocol</p>"
+    assert RenderedProtocol(files).html("M11", render) == "<p>Protocol</p>"
+    assert render.call_count == 2
+
+
+def test_annotated(files):
+    render = MagicMock(return_value="<p>Protocol</p>")
+    annotate = MagicMock(
+        return_value=AnnotatedDocument(
+            html="<p>Annotated</p>", unplaced=[{"rule_id": "X"}], placed_count=1
+        )
+    )
+    rendered = RenderedProtocol(files)
+    first = rendered.annotated(FINDINGS, render, annotate)
+    second = rendered.annotated(FINDINGS, render, annotate)
+    assert first == second
+    assert second.html == "<p>Annotated</p>"
+    assert second.unplaced == [{"rule_id": "X"}]
+    assert second.placed_count == 1
+    annotate.assert_called_once_with("<p>Protocol</p>", FINDINGS)
+    render.assert_called_once()
+    assert len(rendered_files(files)) == 2
+
+
+def test_annotated_findings_changed(files):
+    annotate = MagicMock(return_value=AnnotatedDocument(html="<p>A</p>"))
+    rendered = RenderedProtocol(files)
+    rendered.annotated(FINDINGS, lambda: "<p/>", annotate)
+    rendered.annotated([], lambda: "<p/>", annotate)
+    assert annotate.call_count == 2
+    assert len(rendered_files(files)) == 2
+
+
+def test_annotated_corrupt(files):
+    annotate = MagicMock(return_value=AnnotatedDocument(html="<p>A</p>"))
+    rendered = RenderedProtocol(files)
+    rendered.annotated(FINDINGS, lambda: "<p/>", annotate)
+    name = next(x for x in rendered_files(files) if x.endswith(".json"))
+    full_path, _ = files.named_path(name)
+    with open(full_path, "w") as f:
+        json.dump({"html": "missing keys"}, f)
+    assert rendered.annotated(FINDINGS, lambda: "<p/>", annotate).html == "<p>A</p>"
+    assert annotate.call_count == 2
+
+
+def test_invalidate(files):
+    rendered = RenderedProtocol(files)
+    rendered.html("M11", lambda: "<p>M11</p>")
+    rendered.annotated(
+        FINDINGS, lambda: "<p/>", lambda html, findings: AnnotatedDocument(html=html)
+    )
+    files.save("usdm", "{}")
+    assert rendered.invalidate() == 2
+    assert rendered_files(files) == []
+    assert files._dir_files() == ["usdm.json"]
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.model.startup import Startup
+
+
+@pytest.mark.asyncio
+async def test_steps_run_in_order():
+    startup = Startup()
+    calls = []
+    startup.step("first", lambda: calls.append("first"))
+    startup.step("second", lambda: calls.append("second"))
+    assert not startup.started
+    assert not startup.ready
+    startup.start()
+    assert startup.started
+    assert await startup.wait()
+    assert calls == ["first", "second"]
+    assert startup.ready
+    status = startup.status()
+    assert status["ready"]
+    assert status["error"] is None
+    assert list(status["steps"]) == ["first", "second"]
+    assert all(x is not None for x in status["steps"].values())
+
+
+@pytest.mark.asyncio
+async def test_start_once():
+    startup = Startup()
+    calls = []
+    startup.step("first", lambda: calls.append("first"))
+    startup.start()
+    startup.start()
+    await startup.wait()
+    assert calls == ["first"]
+
+
+@pytest.mark.asyncio
+async def test_wait_not_started():
+    assert await Startup().wait()
+
+
+@pytest.mark.asyncio
+async def test_step_fails():
+    startup = Startup()
+    calls = []
+
+    def fail():
+        raise ValueError("no database")
+
+    startup.step("database", fail)
+    startup.step("recover", lambda: calls.append("recover"))
+    startup.start()
+    assert not await startup.wait()
+    assert not startup.ready
+    assert calls == []
+    status = startup.status()
+    assert status["error"] == "Startup step 'database' failed: no database"
+    assert status["steps"] == {"database": None, "recover": None}
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout(monkeypatch):
+    startup = Startup()
+    monkeypatch.setattr(startup, "WAIT_TIMEOUT", 0.05)
+    release = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    startup.step(
+        "slow",
+        lambda: asyncio.run_coroutine_threadsafe(release.wait(), loop).result(),
+    )
+    startup.start()
+    assert not await startup.wait()
+    assert not startup.ready
+    release.set()
+    startup.WAIT_TIMEOUT = 5
+    assert await startup.wait()
+    assert startup.ready
@@ -0,0 +1,131 @@
+import threading
+
+import pytest
+
+from app.model.usdm_cache import USDMCache
+
+
+def _write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def _loader(calls, value="data"):
+    def load():
+        calls.append(value)
+        return {"value": value}, f"wrapper-{value}", {"extra": value}
+
+    return load
+
+
+@pytest.fixture
+def files(tmp_path):
+    usdm = _write(tmp_path / "usdm.json", "x" * 100)
+    extra = _write(tmp_path / "extra.yaml", "y" * 10)
+    return [usdm, extra]
+
+
+def test_miss_then_hit(files):
+    cache = USDMCache(1024 * 1024)
+    calls = []
+    first = cache.get("a", files, _loader(calls))
+    second = cache.get("a", files, _loader(calls))
+    assert first is second
+    assert first.data == {"value": "data"}
+    assert first.wrapper == "wrapper-data"
+    assert first.extra == {"extra": "data"}
+    assert calls == ["data"]
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert stats["bytes"] == 110 * USDMCache.INFLATION
+
+
+def test_file_change_invalidates(files):
+    cache = USDMCache(1024 * 1024)
+    calls = []
+    cache.get("a", files, _loader(calls, "old"))
+    with open(files[1], "w") as f:
+        f.write("changed size")
+    entry = cache.get("a", files, _loader(calls, "new"))
+    assert entry.data == {"value": "new"}
+    assert calls == ["old", "new"]
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_lru_eviction(files):
+    cost = 110 * USDMCache.INFLATION
+    cache = USDMCache(cost * 2)
+    calls = []
+    cache.get("a", files, _loader(calls))
+    cache.get("b", files, _loader(calls))
+    cache.get("a", files, _loader(calls))
+    cache.get("c", files, _loader(calls))
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == cost * 2
+    cache.get("a", files, _loader(calls))
+    assert cache.stats()["hits"] == 2
+    cache.get("b", files, _loader(calls))
+    assert cache.stats()["misses"] == 4
+
+
+def test_disabled(files):
+    cache = USDMCache(0)
+    calls = []
+    cache.get("a", files, _loader(calls))
+    cache.get("a", files, _loader(calls))
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+    assert not cache.stats()["enabled"]
+
+
+def test_oversized_entry_not_cached(files):
+    cache = USDMCache(10)
+    calls = []
+    entry = cache.get("a", files, _loader(calls))
+    assert entry.data == {"value": "data"}
+    assert cache.stats()["entries"] == 0
+
+
+def test_missing_file(tmp_path):
+    cache = USDMCache(1024)
+    calls = []
+    cache.get("a", [str(tmp_path / "missing.json")], _loader(calls))
+    cache.get("a", [str(tmp_path / "missing.json")], _loader(calls))
+    assert calls == ["data"]
+
+
+def test_invalidate_and_clear(files):
+    cache = USDMCache(1024 * 1024)
+    calls = []
+    cache.get("a", files, _loader(calls))
+    cache.invalidate("a")
+    cache.invalidate("unknown")
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+    cache.get("a", files, _loader(calls))
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_concurrent_access(files):
+    cache = USDMCache(1024 * 1024)
+    calls = []
+
+    def worker():
+        for _ in range(50):
+            cache.get("a", files, _loader(calls))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 400
+    assert stats["entries"] == 1
+    assert stats["bytes"] == 110 * USDMCache.INFLATION
@@ -0,0 +1,182 @@
+import json
+import os
+
+import pytest
+
+from app.model.file_handling.data_files import DataFiles
+from app.model.usdm_diff import USDMDiff
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "test-uuid").mkdir()
+    files = DataFiles("test-uuid")
+    files.dir = str(tmp_path)
+    return files
+
+
+def entity(id: str, klass: str, **kwargs) -> dict:
+    return {"id": id, "instanceType": klass, **kwargs}
+
+
+def usdm() -> dict:
+    return {
+        "usdmVersion": "4.0.0",
+        "study": entity(
+            "study-1",
+            "Study",
+            name="STUDY",
+            versions=[
+                entity(
+                    "sv-1",
+                    "StudyVersion",
+                    versionIdentifier="1",
+                    titles=[
+                        entity("t-1", "StudyTitle", text="Official title"),
+                        entity("t-2", "StudyTitle", text="Short title"),
+                    ],
+                    amendments=[],
+                    studyPhase=entity(
+                        "ac-1",
+                        "AliasCode",
+                        standardCode=entity(
+                            "c-1", "Code", code="C15600", decode="Phase I Trial"
+                        ),
+                    ),
+                    activityIds=["a-1", "a-2"],
+                )
+            ],
+        ),
+    }
+
+
+def changes(diff: dict, action: str) -> dict:
+    return {x["id"]: x for x in diff["changes"] if x["action"] == action}
+
+
+def test_same():
+    diff = USDMDiff.compare(usdm(), usdm())
+    assert diff["changes"] == []
+    assert diff["summary"] == {}
+    assert diff["totals"] == {"added": 0, "removed": 0, "changed": 0}
+    assert diff["entities"] == {"old": 7, "new": 7}
+
+
+def test_changed_attribute():
+    new = usdm()
+    new["study"]["versions"][0]["studyPhase"]["standardCode"]["code"] = "C15601"
+    new["study"]["versions"][0]["studyPhase"]["standardCode"]["decode"] = "Phase II"
+    diff = USDMDiff.compare(usdm(), new)
+    assert diff["totals"] == {"added": 0, "removed": 0, "changed": 1}
+    change = changes(diff, "changed")["c-1"]
+    assert change["class"] == "Code"
+    assert change["label"] == "Phase II"
+    assert sorted(change["attributes"], key=lambda x: x["name"]) == [
+        {"name": "code", "old": "C15600", "new": "C15601"},
+        {"name": "decode", "old": "Phase I Trial", "new": "Phase II"},
+    ]
+
+
+def test_reordered_children_not_changed():
+    new = usdm()
+    titles = new["study"]["versions"][0]["titles"]
+    titles.reverse()
+    diff = USDMDiff.compare(usdm(), new)
+    assert diff["changes"] == []
+
+
+def test_reordered_id_list_changed():
+    new = usdm()
+    new["study"]["versions"][0]["activityIds"] = ["a-2", "a-1"]
+    diff = USDMDiff.compare(usdm(), new)
+    change = changes(diff, "changed")["sv-1"]
+    assert change["attributes"] == [
+        {"name": "activityIds", "old": ["a-1", "a-2"], "new": ["a-2", "a-1"]}
+    ]
+
+
+def test_added_and_removed():
+    new = usdm()
+    version = new["study"]["versions"][0]
+    version["titles"][1] = entity("t-3", "StudyTitle", text="Acronym")
+    version["amendments"].append(entity("am-1", "StudyAmendment", name="AMEND 1"))
+    diff = USDMDiff.compare(usdm(), new)
+    assert set(changes(diff, "added")) == {"t-3", "am-1"}
+    assert set(changes(diff, "removed")) == {"t-2"}
+    assert set(changes(diff, "changed")) == {"sv-1"}
+    added = changes(diff, "added")["am-1"]
+    assert added["label"] == "AMEND 1"
+    assert {"name": "name", "old": None, "new": "AMEND 1"} in added["attributes"]
+    removed = changes(diff, "removed")["t-2"]
+    assert {"name": "text", "old": "Short title", "new": None} in removed["attributes"]
+    attributes = changes(diff, "changed")["sv-1"]["attributes"]
+    assert {x["name"] for x in attributes} == {"titles", "amendments"}
+    assert diff["summary"] == {
+        "StudyAmendment": {"added": 1, "removed": 0, "changed": 0},
+        "StudyTitle": {"added": 1, "removed": 1, "changed": 0},
+        "StudyVersion": {"added": 0, "removed": 0, "changed": 1},
+    }
+    assert [x["class"] for x in diff["changes"]] == sorted(
+        x["class"] for x in diff["changes"]
+    )
+
+
+def test_root_attributes():
+    new = usdm()
+    new["usdmVersion"] = "4.1.0"
+    diff = USDMDiff.compare(usdm(), new)
+    change = changes(diff, "changed")[USDMDiff.ROOT]
+    assert change["class"] == "Wrapper"
+    assert change["attributes"] == [
+        {"name": "usdmVersion", "old": "4.0.0", "new": "4.1.0"}
+    ]
+
+
+def test_long_label():
+    new = usdm()
+    new["study"]["versions"][0]["titles"][0]["text"] = "x" * 100
+    diff = USDMDiff.compare(usdm(), new)
+    assert changes(diff, "changed")["t-1"]["label"] == f"{'x' * 80}..."
+
+
+def test_page():
+    new = usdm()
+    new["study"]["versions"][0]["titles"] = [
+        entity(f"t-{i}", "StudyTitle", text=f"Title {i}") for i in range(3, 28)
+    ]
+    diff = USDMDiff.compare(usdm(), new)
+    page = USDMDiff.page(diff, 2, 10)
+    assert page["count"] == 28
+    assert page["page"] == 2
+    assert page["size"] == 10
+    assert len(page["items"]) == 10
+    page = USDMDiff.page(diff, 3, 10)
+    assert len(page["items"]) == 8
+    assert USDMDiff.page(diff, 1, 10, "removed")["count"] == 2
+    assert USDMDiff.page(diff, 1, 10, "studyversion")["count"] == 1
+    assert USDMDiff.page(diff, 1, 10, "Title 2")["count"] == 8
+    assert USDMDiff.page(diff, 0, 0)["size"] == 10
+
+
+def test_get_saved_once(files, mocker):
+    new = usdm()
+    new["study"]["name"] = "NEW"
+    compare = mocker.spy(USDMDiff, "compare")
+    diff = USDMDiff(files).get(usdm(), "old-uuid", new)
+    assert diff == USDMDiff(files).get(usdm(), "old-uuid", new)
+    assert compare.call_count == 1
+    full_path, exists = files.named_path("usdm-diff-old-uuid-1.json")
+    assert exists
+    with open(full_path) as f:
+        assert json.load(f) == diff
+    USDMDiff(files).get(usdm(), "other-uuid", new)
+    assert compare.call_count == 2
+
+
+def test_get_unreadable(files):
+    full_path, _ = files.named_path("usdm-diff-old-uuid-1.json")
+    with open(full_path, "w") as f:
+        f.write("not json")
+    diff = USDMDiff(files).get(usdm(), "old-uuid", usdm())
+    assert diff["changes"] == []
+    assert os.path.getsize(full_path) > len("not json")
@@ -0,0 +1,179 @@
+import os
+
+import pytest
+
+from app.model.file_handling.data_files import DataFiles
+from app.model.usdm_explorer import USDMExplorer
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "test-uuid").mkdir()
+    files = DataFiles("test-uuid")
+    files.dir = str(tmp_path)
+    return files
+
+
+def entity(id: str, klass: str, **kwargs) -> dict:
+    return {"id": id, "instanceType": klass, **kwargs}
+
+
+def usdm() -> dict:
+    return {
+        "usdmVersion": "4.0.0",
+        "study": entity(
+            "study-1",
+            "Study",
+            name="STUDY",
+            versions=[
+                entity(
+                    "sv-1",
+                    "StudyVersion",
+                    titles=[
+                        entity("t-2", "StudyTitle", text="Short title"),
+                        entity("t-1", "StudyTitle", text="Official title"),
+                    ],
+                    studyPhase=entity(
+                        "ac-1",
+                        "AliasCode",
+                        standardCode=entity("c-1", "Code", code="C15600"),
+                    ),
+                    extension={"note": entity("c-2", "Code", code="C1")},
+                    activityIds=["a-1"],
+                )
+            ],
+        ),
+    }
+
+
+def filenames(files: DataFiles) -> list[str]:
+    return sorted(os.listdir(os.path.join(files.dir, files.uuid)))
+
+
+def test_build():
+    klasses = USDMExplorer.build(usdm())
+    assert list(klasses) == ["AliasCode", "Code", "Study", "StudyTitle", "StudyVersion"]
+    assert list(klasses["StudyTitle"]) == ["t-1", "t-2"]
+    assert list(klasses["Code"]) == ["c-1", "c-2"]
+    assert "Wrapper" not in klasses
+
+
+def test_build_shallow():
+    klasses = USDMExplorer.build(usdm())
+    version = klasses["StudyVersion"]["sv-1"]
+    assert version["titles"] == [
+        {"id": "t-2", "instanceType": "StudyTitle"},
+        {"id": "t-1", "instanceType": "StudyTitle"},
+    ]
+    assert version["studyPhase"] == {"id": "ac-1", "instanceType": "AliasCode"}
+    assert version["extension"] == {"note": {"id": "c-2", "instanceType": "Code"}}
+    assert version["activityIds"] == ["a-1"]
+    assert klasses["Study"]["study-1"]["versions"] == [
+        {"id": "sv-1", "instanceType": "StudyVersion"}
+    ]
+
+
+def test_classes(files):
+    result = USDMExplorer(files, usdm()).classes()
+    assert result == {
+        "classes": [
+            {"name": "AliasCode", "count": 1},
+            {"name": "Code", "count": 2},
+            {"name": "Study", "count": 1},
+            {"name": "StudyTitle", "count": 2},
+            {"name": "StudyVersion", "count": 1},
+        ],
+        "count": 7,
+    }
+    assert filenames(files) == [
+        "usdm-explore-1-class-0.json",
+        "usdm-explore-1-class-1.json",
+        "usdm-explore-1-class-2.json",
+        "usdm-explore-1-class-3.json",
+        "usdm-explore-1-class-4.json",
+        "usdm-explore-1-ids.json",
+        "usdm-explore-1-index.json",
+    ]
+
+
+def test_built_once(files, mocker):
+    build = mocker.spy(USDMExplorer, "build")
+    USDMExplorer(files, usdm()).classes()
+    explorer = USDMExplorer(files, usdm())
+    assert explorer.classes()["count"] == 7
+    assert explorer.instances("Code", 1, 10)["count"] == 2
+    assert explorer.lookup(["t-1"])["t-1"]["class"] == "StudyTitle"
+    assert build.call_count == 1
+
+
+def test_instances(files):
+    explorer = USDMExplorer(files, usdm())
+    assert explorer.instances("StudyTitle", 1, 1) == {
+        "items": ["t-1"],
+        "page": 1,
+        "size": 1,
+        "filter": "",
+        "count": 2,
+    }
+    assert explorer.instances("StudyTitle", 2, 1)["items"] == ["t-2"]
+    assert explorer.instances("StudyTitle", 1, 10, "T-2")["items"] == ["t-2"]
+    assert explorer.instances("StudyTitle", 0, 0)["size"] == 100
+    assert explorer.instances("Missing", 1, 10) is None
+
+
+def test_lookup(files):
+    explorer = USDMExplorer(files, usdm())
+    result = explorer.lookup(["c-1", "t-2", "missing"])
+    assert result == {
+        "c-1": {
+            "class": "Code",
+            "data": {"id": "c-1", "instanceType": "Code", "code": "C15600"},
+        },
+        "t-2": {
+            "class": "StudyTitle",
+            "data": {"id": "t-2", "instanceType": "StudyTitle", "text": "Short title"},
+        },
+    }
+
+
+def test_rebuilt_when_class_file_removed(files, mocker):
+    explorer = USDMExplorer(files, usdm())
+    explorer.classes()
+    os.unlink(files.named_path("usdm-explore-1-class-1.json")[0])
+    build = mocker.spy(USDMExplorer, "build")
+    assert explorer.instances("Code", 1, 10)["items"] == ["c-1", "c-2"]
+    assert build.call_count == 1
+
+
+def test_superseded_engine_removed(files):
+    full_path, _ = files.named_path("usdm-explore-0-index.json")
+    with open(full_path, "w") as f:
+        f.write("{}")
+    USDMExplorer(files, usdm()).classes()
+    assert "usdm-explore-0-index.json" not in filenames(files)
+
+
+def test_stale_files_removed_after_new_ones_saved(files, mocker):
+    full_path, _ = files.named_path("usdm-explore-1-class-9.json")
+    with open(full_path, "w") as f:
+        f.write("{}")
+    present = []
+    delete_files = files.delete_files
+
+    def delete(*args, **kwargs):
+        present.extend(filenames(files))
+        return delete_files(*args, **kwargs)
+
+    mocker.patch.object(files, "delete_files", side_effect=delete)
+    USDMExplorer(files, usdm()).classes()
+    assert "usdm-explore-1-index.json" in present
+    assert filenames(files) == [
+        x for x in present if x != "usdm-explore-1-class-9.json"
+    ]
+
+
+def test_unreadable_index(files):
+    full_path, _ = files.named_path("usdm-explore-1-index.json")
+    with open(full_path, "w") as f:
+        f.write("not json")
+    assert USDMExplorer(files, usdm()).classes()["count"] == 7
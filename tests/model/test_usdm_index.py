@@ -0,0 +1,50 @@
+from app.model.usdm_index import USDMIndex
+from tests.helpers.usdm_test_data import build_usdm_data
+
+
+def test_index():
+    data = build_usdm_data()
+    index = USDMIndex(data)
+    version = data["study"]["versions"][0]
+    document = data["study"]["documentedBy"][0]["versions"][0]
+    assert index.version is version
+    assert index.document is document
+    assert index.study_designs["design-1"] is version["studyDesigns"][0]
+    assert index.interventions["int-1"]["name"] == "Drug A"
+    assert index.content_item_text["nci-1"] == "<p>Overall Design Content</p>"
+    assert index.contents["nc-1"] is next(
+        x for x in document["contents"] if x["id"] == "nc-1"
+    )
+    assert index.first_content is next(
+        x for x in document["contents"] if not x["previousId"] and x["nextId"]
+    )
+    assert index.section_numbers["1.1.2"]["sectionTitle"] == "Overall Design"
+    assert ("OVERALL DESIGN", index.section_numbers["1.1.2"]) in index.section_titles
+
+
+def test_first_occurrence_wins():
+    data = build_usdm_data()
+    version = data["study"]["versions"][0]
+    version["studyInterventions"].append({"id": "int-1", "name": "Drug B"})
+    version["narrativeContentItems"].append({"id": "nci-1", "text": "Duplicate"})
+    index = USDMIndex(data)
+    assert index.interventions["int-1"]["name"] == "Drug A"
+    assert index.content_item_text["nci-1"] == "<p>Overall Design Content</p>"
+
+
+def test_no_document():
+    data = build_usdm_data()
+    data["study"]["documentedBy"] = []
+    index = USDMIndex(data)
+    assert index.document is None
+    assert index.contents == {}
+    assert index.section_numbers == {}
+    assert index.first_content is None
+    assert index.study_designs
+
+
+def test_no_version():
+    index = USDMIndex({"study": {"versions": []}})
+    assert index.version is None
+    assert index.document is None
+    assert index.study_designs == {}
@@ -1,6 +1,10 @@
 import copy
+import os
 from unittest.mock import MagicMock, patch
 
+import pytest
+
+from app.model.file_handling.data_files import DataFiles
 from app.model.usdm_json import USDMJson
 from tests.helpers.usdm_test_data import build_usdm_data
 
@@ -28,6 +32,16 @@ def _build_usdm(data=None, m11=True, extra=None):
     return usdm
 
 
+def _generate(export_path: str):
+    """ExportCache.get stand-in generating straight to ``export_path``."""
+
+    def get(kind, variant, package, extension, generate):
+        generate(export_path)
+        return export_path
+
+    return get
+
+
 # --- study_version ---
 
 
@@ -588,6 +602,22 @@ class TestProtocolSections:
         result = usdm.protocol_sections()
         assert result is None
 
+    def test_uses_index(self):
+        usdm = _build_usdm()
+        index = usdm._usdm_index()
+        assert usdm._usdm_index() is index
+        result = usdm.protocol_sections()
+        assert [x["id"] for x in result] == [f"nc-{x}" for x in range(11)]
+        index.contents.clear()
+        index.first_content = None
+        assert usdm.protocol_sections() == []
+
+    def test_other_document_scanned(self):
+        usdm = _build_usdm()
+        document = copy.deepcopy(usdm._document())
+        assert usdm._first_narrative_content(document)["id"] == "nc-0"
+        assert usdm._find_narrative_content(document, "nc-3")["id"] == "nc-3"
+
 
 # --- section ---
 
@@ -609,6 +639,12 @@ class TestSection:
         result = usdm.section("nc-1")
         assert result is None
 
+    def test_does_not_modify_shared_document(self):
+        usdm = _build_usdm()
+        usdm.section("nc-1")
+        content = usdm._find_narrative_content(usdm._document(), "nc-1")
+        assert "heading" not in content
+
 
 # --- _format_heading ---
 
@@ -1016,14 +1052,22 @@ class TestFhirAndExport:
         result = usdm.fhir_data()
         assert result == '{"bundle": "data"}'
 
+    @patch("app.model.usdm_json.ExportCache")
     @patch("app.model.usdm_json.FHIRM11")
-    def test_fhir(self, mock_fhir_cls):
+    def test_fhir(self, mock_fhir_cls, mock_cache_cls, tmp_path):
         usdm = _build_usdm()
         mock_fhir_cls.return_value.to_message.return_value = '{"bundle": "data"}'
-        usdm._files.save.return_value = ("/tmp/fhir.json", "fhir.json")
-        fullpath, filename, content_type = usdm.fhir()
-        assert fullpath == "/tmp/fhir.json"
+        export_path = str(tmp_path / "export.json")
+        mock_cache_cls.return_value.get.side_effect = _generate(export_path)
+        fullpath, filename, content_type = usdm.fhir("prism3")
+        assert fullpath == export_path
+        assert filename == "fhir_prism3.json"
         assert content_type == "text/plain"
+        mock_cache_cls.assert_called_once_with(usdm._files)
+        args = mock_cache_cls.return_value.get.call_args.args
+        assert args[:4] == ("fhir", "prism3", "usdm4_fhir", "json")
+        with open(export_path) as f:
+            assert f.read() == '{\n  "bundle": "data"\n}'
 
     @patch("app.model.usdm_json.FHIRSoA")
     def test_fhir_soa_data(self, mock_soa_cls):
@@ -1032,14 +1076,53 @@ class TestFhirAndExport:
         result = usdm.fhir_soa_data("timeline-1")
         assert result == '{"soa": "data"}'
 
+    @patch("app.model.usdm_json.ExportCache")
     @patch("app.model.usdm_json.FHIRSoA")
-    def test_fhir_soa(self, mock_soa_cls):
+    def test_fhir_soa(self, mock_soa_cls, mock_cache_cls, tmp_path):
         usdm = _build_usdm()
         mock_soa_cls.return_value.to_message.return_value = '{"soa": "data"}'
-        usdm._files.save.return_value = ("/tmp/soa.json", "soa.json")
+        export_path = str(tmp_path / "soa.json")
+        mock_cache_cls.return_value.get.side_effect = _generate(export_path)
         fullpath, filename, content_type = usdm.fhir_soa("timeline-1")
-        assert fullpath == "/tmp/soa.json"
+        assert fullpath == export_path
+        assert filename == "fhir_soa.json"
         assert content_type == "application/json"
+        args = mock_cache_cls.return_value.get.call_args.args
+        assert args[:4] == ("fhir_soa", "timeline-1", "usdm4_fhir", "json")
+        with open(export_path) as f:
+            assert f.read() == '{\n  "soa": "data"\n}'
+
+    @pytest.mark.parametrize("message", [None, "not json"])
+    @patch("app.model.usdm_json.FHIRSoA")
+    @patch("app.model.usdm_json.FHIRM11")
+    def test_fhir_not_generated(self, mock_fhir_cls, mock_soa_cls, message, tmp_path):
+        (tmp_path / "test-uuid").mkdir()
+        usdm = _build_usdm()
+        usdm._files = DataFiles("test-uuid")
+        usdm._files.dir = str(tmp_path)
+        mock_fhir_cls.return_value.to_message.return_value = message
+        mock_soa_cls.return_value.to_message.return_value = message
+        assert usdm.fhir("prism3") == (None, None, None)
+        assert usdm.fhir_soa("timeline-1") == (None, None, None)
+        assert os.listdir(tmp_path / "test-uuid") == []
+
+    @patch("app.model.usdm_json.USDMDiff")
+    def test_diff(self, mock_diff_cls):
+        usdm = _build_usdm()
+        previous = _build_usdm()
+        previous.uuid = "previous-uuid"
+        mock_diff_cls.return_value.get.return_value = {"changes": []}
+        assert usdm.diff(previous) == {"changes": []}
+        mock_diff_cls.assert_called_once_with(usdm._files)
+        mock_diff_cls.return_value.get.assert_called_once_with(
+            previous._data, "previous-uuid", usdm._data
+        )
+
+    @patch("app.model.usdm_json.USDMExplorer")
+    def test_explorer(self, mock_explorer_cls):
+        usdm = _build_usdm()
+        assert usdm.explorer() is mock_explorer_cls.return_value
+        mock_explorer_cls.assert_called_once_with(usdm._files, usdm._data)
 
     def test_json(self):
         usdm = _build_usdm()
@@ -1067,13 +1150,12 @@ class TestFhirAndExport:
 
 
 class TestGetFiles:
-    def test_get_usdm(self, tmp_path):
+    def test_get_usdm(self):
         usdm = _build_usdm()
-        test_file = tmp_path / "test.json"
-        test_file.write_text('{"key": "value"}')
-        usdm._files.path.return_value = (str(test_file), "test.json", True)
+        usdm._files.read.return_value = '{"key": "value"}'
         result = usdm._get_usdm()
         assert result == {"key": "value"}
+        usdm._files.read.assert_called_once_with("usdm")
 
     def test_get_extra(self, tmp_path):
         usdm = _build_usdm()
@@ -1083,11 +1165,9 @@ class TestGetFiles:
         result = usdm._get_extra()
         assert result == {"key": "value"}
 
-    def test_get_raw(self, tmp_path):
+    def test_get_raw(self):
         usdm = _build_usdm()
-        test_file = tmp_path / "raw.json"
-        test_file.write_text('{"raw": true}')
-        usdm._files.path.return_value = (str(test_file), "raw.json", True)
+        usdm._files.read.return_value = '{"raw": true}'
         result = usdm._get_raw()
         assert result == '{"raw": true}'
 
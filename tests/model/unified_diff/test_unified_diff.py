@@ -1,123 +0,0 @@
-from app.model.unified_diff.unified_diff import Hunk, LineRange, UnifiedDiff
-
-
-def test_line_range():
-    lr = LineRange("12", "2")
-    assert lr.line == 12
-    assert lr.count == 2
-
-
-def test_line_range_error_1():
-    lr = LineRange("12", "2x")
-    assert lr.line == 12
-    assert lr.count == 1
-
-
-def test_line_range_error_2():
-    lr = LineRange("", "")
-    assert lr.line == 1
-    assert lr.count == 1
-
-
-def test_hunk():
-    data = [
-        ("@@ -1,9 +1,9 @@", 1, 9, 1, 9),
-        ("@@ -0,0 +1,27 @@", 0, 0, 1, 27),
-        ("@@ -32,6 +32,7 @@", 32, 6, 32, 7),
-        ("@@ -454,6 +454,11 @@ Some text", 454, 6, 454, 11),
-        ("@@ -18, +18, @@", 18, 1, 18, 1),
-    ]
-    for item in data:
-        hunk = Hunk(item[0])
-        assert hunk.old.line == item[1]
-        assert hunk.old.count == item[2]
-        assert hunk.new.line == item[3]
-        assert hunk.new.count == item[4]
-
-
-def test_hunk_error(caplog):
-    hunk = Hunk("@@ 1,xxx 1,9 @@")
-    assert hunk.old is None
-    assert hunk.new is None
-    assert error_logged(caplog, "Failed to decode hunk header '@@ 1,xxx 1,9 @@'")
-
-
-def test_unified_diff_1(caplog):
-    caplog.set_level("INFO")
-    old_lines = [
-        "line 1",
-        "line 2",
-        "line 3",
-        "line 4",
-        "line 5",
-        "line 6",
-        "line 7",
-        "line 8",
-        "line 9",
-        "line 10",
-    ]
-    new_lines = [
-        "line 1",
-        "line 2 plus",
-        "line 3",
-        "line 4",
-        "line 5",
-        "line 6",
-        "line 8",
-        "line 9",
-        "line 10",
-        "New line 11",
-    ]
-    ud = UnifiedDiff(old_lines, new_lines)
-    # print(f"CAPLOG: {caplog.records}")
-    assert len(caplog.records) == 0
-    assert len(ud._hunks) == 1
-    # assert ud.to_html() == "xxx"
-    # print(f"HTML: {ud.to_html()}")
-
-
-def test_unified_diff_to_html():
-    old_lines = ["line 1", "line 2", "line 3"]
-    new_lines = ["line 1", "line 2 changed", "line 3"]
-    ud = UnifiedDiff(old_lines, new_lines)
-    html = ud.to_html()
-    assert "<table" in html
-    assert "</table>" in html
-    assert "<tr" in html
-
-
-def test_hunk_line_to_html_deleted():
-    from app.model.unified_diff.unified_diff import HunkLine
-
-    hl = HunkLine("-removed line", 5, None, "deleted")
-    html = hl.to_html()
-    assert "table-danger" in html
-    assert "removed line" in html
-
-
-def test_hunk_line_to_html_inserted():
-    from app.model.unified_diff.unified_diff import HunkLine
-
-    hl = HunkLine("+added line", None, 6, "inserted")
-    html = hl.to_html()
-    assert "table-success" in html
-    assert "added line" in html
-
-
-def test_hunk_line_to_html_nochange():
-    from app.model.unified_diff.unified_diff import HunkLine
-
-    hl = HunkLine(" unchanged", 5, 5, "nochange")
-    html = hl.to_html()
-    assert "unchanged" in html
-
-
-def test_hunk_set_type_error():
-    hunk = Hunk("@@ -1,3 +1,3 @@")
-    hunk.add("\\No newline at end of file")
-    assert hunk.lines[-1].type == "error"
-
-
-def error_logged(caplog, text):
-    correct_level = caplog.records[-1].levelname == "ERROR"
-    return text in caplog.records[-1].message and correct_level
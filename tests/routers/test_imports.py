@@ -1,3 +1,5 @@
+import datetime
+
 import pytest
 from usdm4.__info__ import __model_version__ as usdm_version
 
@@ -107,6 +109,47 @@ def mock_process_xl(mocker):
     return mock
 
 
+@pytest.mark.anyio
+async def test_import_batch_execute(mocker, monkeypatch):
+    protect_endpoint()
+    async_client = mock_async_client(monkeypatch)
+    uc = mock_user_check_exists(mocker)
+    process = mocker.patch("app.routers.imports.BatchHandler.process")
+    process.return_value = {"batch_id": 3, "accepted": [], "rejected": []}
+    response = await async_client.post("/import/batch?source=os")
+    assert response.status_code == 200
+    assert response.json()["batch_id"] == 3
+    assert mock_called(uc)
+    assert process.call_args.args[1].id == 1
+
+
+def test_import_batch_status(mocker, monkeypatch):
+    from app.database.import_batch import ImportBatch
+
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    uc = mock_user_check_exists(mocker)
+    batch = mocker.MagicMock(user_id=1)
+    batch.status.return_value = {"id": 5, "finished": True}
+    mocker.patch.object(ImportBatch, "find", return_value=batch)
+    response = client.get("/import/batch/5/status")
+    assert response.status_code == 200
+    assert response.json() == {"id": 5, "finished": True}
+    assert mock_called(uc)
+
+
+def test_import_batch_status_not_found(mocker, monkeypatch):
+    from app.database.import_batch import ImportBatch
+
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mocker.patch.object(ImportBatch, "find", return_value=mocker.MagicMock(user_id=99))
+    response = client.get("/import/batch/5/status")
+    assert response.status_code == 404
+    assert response.json() == {"error": "Import batch not found"}
+
+
 def test_import_status(mocker, monkeypatch):
     protect_endpoint()
     client = mock_client(monkeypatch)
@@ -114,6 +157,7 @@ def test_import_status(mocker, monkeypatch):
     response = client.get("/import/status?page=1&size=10&filter=")
     assert response.status_code == 200
     assert '<h5 class="card-title">Import Status</h5>' in response.text
+    assert 'hx-get="/import/status/timings"' in response.text
     assert mock_called(uc)
 
 
@@ -139,6 +183,7 @@ def test_import_status_data_renders_m11_validation_link(mocker, monkeypatch):
     client = mock_client(monkeypatch)
     uc = mock_user_check_exists(mocker)
     fip = mocker.patch("app.database.file_import.FileImport.page")
+    mocker.patch("app.routers.imports.ImportStage.for_imports", return_value={})
     fip.side_effect = [
         {
             "page": 1,
@@ -174,6 +219,108 @@ def test_import_status_data_renders_m11_validation_link(mocker, monkeypatch):
     assert mock_called(fip)
 
 
+def test_import_status_data_timings(mocker, monkeypatch):
+    from app.database.import_stage import ImportStage
+
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    fip = mocker.patch("app.database.file_import.FileImport.page")
+    fip.side_effect = [
+        {
+            "page": 1,
+            "size": 10,
+            "count": 2,
+            "filter": "",
+            "items": [
+                {
+                    "id": 42,
+                    "type": "M11_DOCX",
+                    "created": "2026-04-20",
+                    "filename": "protocol.docx",
+                    "status": "Success",
+                },
+                {
+                    "id": 43,
+                    "type": "USDM_EXCEL",
+                    "created": "2026-04-20",
+                    "filename": "study.xlsx",
+                    "status": "Success",
+                },
+            ],
+        }
+    ]
+    started = datetime.datetime(2026, 4, 20, 12, 0, 0)
+    stages = [
+        ImportStage(
+            id=1,
+            import_id=42,
+            name="convert",
+            started=started,
+            finished=started + datetime.timedelta(seconds=12),
+            seconds=12.0,
+            peak_memory=512 * 1048576,
+        ),
+        ImportStage(
+            id=2,
+            import_id=42,
+            name="study",
+            started=started + datetime.timedelta(seconds=12),
+            finished=started + datetime.timedelta(seconds=12.5),
+            seconds=0.5,
+        ),
+    ]
+    fi = mocker.patch(
+        "app.routers.imports.ImportStage.for_imports", return_value={42: stages}
+    )
+    response = client.get("/import/status/data?page=1&size=10&filter=")
+    assert response.status_code == 200
+    assert '<th scope="col">Time</th>' in response.text
+    assert "<summary>12.5s</summary>" in response.text
+    assert "<td>convert</td>" in response.text
+    assert "512 MB" in response.text
+    fi.assert_called_once()
+    assert fi.call_args[0][0] == [42, 43]
+
+
+def test_import_status_timings(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mocker.patch(
+        "app.routers.imports.ImportStage.percentiles",
+        return_value={
+            "M11_DOCX": [
+                {
+                    "stage": "convert",
+                    "count": 10,
+                    "p50": 5.0,
+                    "p90": 9.0,
+                    "p95": 10.0,
+                    "max": 10.0,
+                    "peak_mb_p95": 640.0,
+                }
+            ]
+        },
+    )
+    response = client.get("/import/status/timings")
+    assert response.status_code == 200
+    assert '<div id="timings_div">' in response.text
+    assert '<h6 class="mt-3">M11_DOCX</h6>' in response.text
+    assert "9.00s" in response.text
+    assert "640.0 MB" in response.text
+
+
+def test_import_status_timings_empty(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mocker.patch("app.routers.imports.ImportStage.percentiles", return_value={})
+    response = client.get("/import/status/timings")
+    assert response.status_code == 200
+    assert "No import timings recorded yet" in response.text
+
+
 def mock_file_import_page(mocker):
     mock = mocker.patch("app.database.file_import.FileImport.page")
     mock.side_effect = [{"page": 1, "size": 10, "count": 0, "filter": "", "items": []}]
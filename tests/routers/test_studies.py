@@ -150,43 +150,18 @@ def test_study_list(mocker, monkeypatch):
 
     mock_vlv = mocker.patch("app.routers.studies.Version.find_latest_version")
     mock_vlv.return_value = MagicMock(id=1)
-    mock_wrapper = MagicMock()
-    mock_sv = MagicMock()
-    mock_sd = MagicMock()
-    mock_sv.studyDesigns = [mock_sd]
-    mock_sv.eligibility_critieria_item_map.return_value = {}
-    mock_sd.inclusion_criteria.return_value = []
-    mock_sd.exclusion_criteria.return_value = []
-    mock_wrapper.first_version.return_value = mock_sv
-
-    def custom_init(self, *args, **kwargs):
-        pass
-
-    mocker.patch("app.routers.studies.USDMJson.__init__", new=custom_init)
-    mocker.patch("app.routers.studies.USDMJson.wrapper", return_value=mock_wrapper)
-    # import_errors() reads errors.csv from the study's DataFiles at
-    # request time; mock it so the route doesn't touch the filesystem.
-    from simple_error_log import Errors as RealErrors
-
-    mocker.patch(
-        "app.routers.studies.USDMJson.import_errors",
-        return_value=RealErrors(),
-    )
-    mock_dv = mocker.patch("app.routers.studies.DataView")
-    mock_dv_instance = mock_dv.return_value
-    mock_dv_instance.title_page.return_value = {"title": "Test"}
     # The compare view labels each column with an input-source pill, read
     # from the latest version's FileImport. Stub it so the route doesn't
     # touch the DB.
     mocker.patch(
         "app.routers.studies.FileImport.find",
-        return_value=MagicMock(type="M11_DOCX"),
+        return_value=MagicMock(uuid="test-uuid", type="M11_DOCX"),
     )
-    mock_dv_instance.amendment_details.return_value = {"amendment": "None"}
-    # The compare view runs M11 DOCX-layer validation per study. The
-    # helper reaches into DataFiles + M11Validator + the adapter — stub
-    # it at the seam the template actually consumes (a dict of element
-    # name → list[finding_dict]) rather than mocking the whole chain.
+    mock_digest = mocker.patch("app.routers.studies.CompareDigest")
+    mock_digest.return_value.get.return_value = _digest(title_page={"title": "Test"})
+    # The compare view shows the M11 DOCX-layer validation findings per
+    # study. The helper reaches into DataFiles — stub it at the seam the
+    # template actually consumes (a dict of element name → list[finding_dict]).
     m11_helper = mocker.patch(
         "app.routers.studies._m11_validation_for_study",
         return_value={},
@@ -201,7 +176,56 @@ def test_study_list(mocker, monkeypatch):
     assert mock_called(uc)
     # The helper must be invoked once per study listed — that guarantees
     # findings are anchored to the same protocol the cell displays.
-    m11_helper.assert_called_once()
+    m11_helper.assert_called_once_with("test-uuid", "M11_DOCX")
+    mock_digest.return_value.get.assert_called_once_with("M11_DOCX")
+
+
+def test_study_list_concurrent(mocker, monkeypatch):
+    """The digests of the selected studies are read at the same time,
+    and the columns keep the selection order."""
+    import threading
+    from unittest.mock import MagicMock
+
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mocker.patch(
+        "app.routers.studies.Version.find_latest_version",
+        side_effect=lambda id, session: MagicMock(import_id=int(id)),
+    )
+    mocker.patch(
+        "app.routers.studies.FileImport.find",
+        side_effect=lambda id, session: MagicMock(uuid=f"uuid-{id}", type="USDM4"),
+    )
+    barrier = threading.Barrier(3, timeout=5)
+
+    def column(uuid, import_type):
+        barrier.wait()
+        return _digest(sponsor_id=f"SPONSOR-{uuid}"), {}
+
+    mocker.patch("app.routers.studies._compare_column", side_effect=column)
+    mocker.patch("app.routers.studies.transmit_role_enabled", return_value=False)
+    mocker.patch("app.routers.studies.fhir_versions", return_value=[])
+    response = client.get("/studies/list?list_studies=1,2,3")
+    assert response.status_code == 200
+    body = response.text
+    positions = [body.index(f"SPONSOR-uuid-{id}") for id in [1, 2, 3]]
+    assert positions == sorted(positions)
+
+
+def test_compare_column(mocker):
+    mock_digest = mocker.patch("app.routers.studies.CompareDigest")
+    mock_digest.return_value.get.return_value = {"sponsor_id": "X"}
+    m11_helper = mocker.patch(
+        "app.routers.studies._m11_validation_for_study", return_value={"a": []}
+    )
+    mock_files = mocker.patch("app.routers.studies.DataFiles")
+    from app.routers.studies import _compare_column
+
+    assert _compare_column("test-uuid", "M11_DOCX") == ({"sponsor_id": "X"}, {"a": []})
+    mock_files.assert_called_once_with("test-uuid")
+    mock_digest.assert_called_once_with(mock_files.return_value)
+    m11_helper.assert_called_once_with("test-uuid", "M11_DOCX")
 
 
 def test_study_list_multi_design_criteria(mocker, monkeypatch):
@@ -216,43 +240,30 @@ def test_study_list_multi_design_criteria(mocker, monkeypatch):
 
     mock_vlv = mocker.patch("app.routers.studies.Version.find_latest_version")
     mock_vlv.return_value = MagicMock(id=1)
-    mock_wrapper = MagicMock()
-    mock_sv = MagicMock()
-    sd1 = MagicMock()
-    sd1.label = "Design One"
-    sd1.inclusion_criteria.return_value = [
-        {"identifier": "IN1", "criterionItem": {"text": "Adults over 18"}}
-    ]
-    sd1.exclusion_criteria.return_value = []
-    sd2 = MagicMock()
-    sd2.label = "Design Two"
-    sd2.inclusion_criteria.return_value = [
-        {"identifier": "IN1", "criterionItem": {"text": "Healthy volunteers"}}
-    ]
-    sd2.exclusion_criteria.return_value = []
-    mock_sv.studyDesigns = [sd1, sd2]
-    mock_sv.eligibility_critieria_item_map.return_value = {}
-    mock_wrapper.first_version.return_value = mock_sv
-
-    def custom_init(self, *args, **kwargs):
-        pass
-
-    mocker.patch("app.routers.studies.USDMJson.__init__", new=custom_init)
-    mocker.patch("app.routers.studies.USDMJson.wrapper", return_value=mock_wrapper)
-    from simple_error_log import Errors as RealErrors
-
-    mocker.patch(
-        "app.routers.studies.USDMJson.import_errors",
-        return_value=RealErrors(),
-    )
-    mock_dv = mocker.patch("app.routers.studies.DataView")
-    mock_dv_instance = mock_dv.return_value
-    mock_dv_instance.title_page.return_value = {"title": "Test"}
     mocker.patch(
         "app.routers.studies.FileImport.find",
-        return_value=MagicMock(type="M11_DOCX"),
+        return_value=MagicMock(uuid="test-uuid", type="M11_DOCX"),
+    )
+    mock_digest = mocker.patch("app.routers.studies.CompareDigest")
+    mock_digest.return_value.get.return_value = _digest(
+        inclusion=[
+            {
+                "design": "Design One",
+                "criteria": [
+                    {"identifier": "IN1", "criterionItem": {"text": "Adults over 18"}}
+                ],
+            },
+            {
+                "design": "Design Two",
+                "criteria": [
+                    {
+                        "identifier": "IN1",
+                        "criterionItem": {"text": "Healthy volunteers"},
+                    }
+                ],
+            },
+        ],
     )
-    mock_dv_instance.amendment_details.return_value = {"amendment": "None"}
     mocker.patch(
         "app.routers.studies._m11_validation_for_study",
         return_value={},
@@ -270,9 +281,6 @@ def test_study_list_multi_design_criteria(mocker, monkeypatch):
     assert "Design Two" in text
     assert "Adults over 18" in text
     assert "Healthy volunteers" in text
-    # Both designs' criteria collected via the shared item map
-    sd1.inclusion_criteria.assert_called_once()
-    sd2.inclusion_criteria.assert_called_once()
 
 
 def test_study_list_renders_validation_badges(mocker, monkeypatch):
@@ -286,34 +294,13 @@ def test_study_list_renders_validation_badges(mocker, monkeypatch):
 
     mock_vlv = mocker.patch("app.routers.studies.Version.find_latest_version")
     mock_vlv.return_value = MagicMock(id=1)
-    mock_wrapper = MagicMock()
-    mock_sv = MagicMock()
-    mock_sd = MagicMock()
-    mock_sv.studyDesigns = [mock_sd]
-    mock_sv.eligibility_critieria_item_map.return_value = {}
-    mock_sd.inclusion_criteria.return_value = []
-    mock_sd.exclusion_criteria.return_value = []
-    mock_wrapper.first_version.return_value = mock_sv
-
-    def custom_init(self, *args, **kwargs):
-        pass
-
-    mocker.patch("app.routers.studies.USDMJson.__init__", new=custom_init)
-    mocker.patch("app.routers.studies.USDMJson.wrapper", return_value=mock_wrapper)
-    # import_errors() reads errors.csv from the study's DataFiles at
-    # request time; mock it so the route doesn't touch the filesystem.
-    from simple_error_log import Errors as RealErrors
-
-    mocker.patch(
-        "app.routers.studies.USDMJson.import_errors",
-        return_value=RealErrors(),
-    )
-
-    mock_dv = mocker.patch("app.routers.studies.DataView")
-    mock_dv.return_value.title_page.return_value = {"Full Title": "A Trial"}
     mocker.patch(
         "app.routers.studies.FileImport.find",
-        return_value=MagicMock(type="M11_DOCX"),
+        return_value=MagicMock(uuid="test-uuid", type="M11_DOCX"),
+    )
+    mock_digest = mocker.patch("app.routers.studies.CompareDigest")
+    mock_digest.return_value.get.return_value = _digest(
+        title_page={"Full Title": "A Trial"}
     )
 
     # Build a fake finding that will decorate the 'Full Title' cell.
@@ -449,6 +436,7 @@ def test_section_toc_unions_and_sorts():
     1.9)."""
     from unittest.mock import MagicMock
 
+    from app.model.compare_digest import CompareDigest
     from app.routers.studies import _section_toc
 
     def nc(number, title, level):
@@ -471,7 +459,13 @@ def test_section_toc_unions_and_sorts():
         nc("2", "Introduction", 1),
     ]
 
-    toc = _section_toc([doc_a, None, doc_b])
+    toc = _section_toc(
+        [
+            CompareDigest.sections(doc_a),
+            CompareDigest.sections(None),
+            CompareDigest.sections(doc_b),
+        ]
+    )
     numbers = [s["number"] for s in toc]
     assert numbers == ["1", "1.9", "1.10", "2"]  # 0 skipped, deduped, natural sort
 
@@ -486,3 +480,17 @@ def test_study_list_empty(mocker, monkeypatch):
     response = client.get("/studies/list")
     assert response.status_code == 200
     assert mock_called(uc)
+
+
+def _digest(**kwargs) -> dict:
+    digest = {
+        "engine": "1",
+        "import_type": "M11_DOCX",
+        "sponsor_id": "PROTO-001",
+        "title_page": None,
+        "inclusion": [{"design": "Main", "criteria": []}],
+        "exclusion": [{"design": "Main", "criteria": []}],
+        "sections": [],
+    }
+    digest.update(kwargs)
+    return digest
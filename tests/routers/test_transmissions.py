@@ -85,3 +85,149 @@ def test_transmission_status_data_with_uuid(mocker, monkeypatch):
     assert response.status_code == 200
     assert mock_called(uc)
     assert mock_called(ift)
+
+
+def _endpoints(mocker):
+    mock = mocker.patch("app.routers.transmissions.User.endpoints_page")
+    mock.return_value = {
+        "items": [{"id": 3, "name": "FHIR Server"}],
+        "page": 1,
+        "size": 100,
+        "filter": "",
+        "count": 1,
+    }
+    return mock
+
+
+def test_bulk_transmit(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    uc = mock_user_check_exists(mocker)
+    ift = mock_transmit_role_enabled_true(mocker)
+    ss = mocker.patch("app.routers.transmissions.Study.summary")
+    ss.side_effect = lambda id, session: {
+        "name": f"STUDY{id}",
+        "title": f"Title {id}",
+        "versions": 1,
+    }
+    _endpoints(mocker)
+    mocker.patch("app.routers.transmissions.backbone_enabled", return_value=True)
+    response = client.get("/transmissions/bulk?list_studies=1,2")
+    assert response.status_code == 200
+    assert "Transmit Selected Studies" in response.text
+    assert "STUDY1" in response.text
+    assert "STUDY2" in response.text
+    assert '<option value="3">FHIR Server</option>' in response.text
+    assert '<option value="backbone">' in response.text
+    assert '<option value="prism3">IG (PRISM 3)</option>' in response.text
+    assert '<option value="transaction">Transaction Bundles</option>' in response.text
+    assert mock_called(uc)
+    assert mock_called(ift)
+
+
+def test_bulk_transmit_not_authorised(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mock_transmit_role_enabled_false(mocker)
+    response = client.get("/transmissions/bulk?list_studies=1")
+    assert response.status_code == 200
+    assert "User is not authorised to transmit FHIR messages." in response.text
+
+
+def test_bulk_transmit_process(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mock_transmit_role_enabled_true(mocker)
+    _endpoints(mocker)
+    rbt = mocker.patch("app.routers.transmissions.run_bulk_transmit")
+    response = client.post(
+        "/transmissions/bulk",
+        data={
+            "list_studies": "1,2,x",
+            "target": "3",
+            "version": "prism3",
+            "mode": "batch",
+        },
+        follow_redirects=False,
+    )
+    assert response.status_code == 303
+    assert response.headers["location"] == "/transmissions/status?page=1&size=10"
+    rbt.assert_called_once_with([1, 2], 3, "prism3", "batch", mocker.ANY)
+
+
+def test_bulk_transmit_process_backbone(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mock_transmit_role_enabled_true(mocker)
+    mocker.patch("app.routers.transmissions.backbone_enabled", return_value=True)
+    rbt = mocker.patch("app.routers.transmissions.run_bulk_transmit")
+    response = client.post(
+        "/transmissions/bulk",
+        data={"list_studies": "1", "target": "backbone"},
+        follow_redirects=False,
+    )
+    assert response.status_code == 303
+    rbt.assert_called_once_with([1], None, "", "single", mocker.ANY)
+
+
+def test_bulk_transmit_process_backbone_not_configured(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mock_transmit_role_enabled_true(mocker)
+    mocker.patch("app.routers.transmissions.backbone_enabled", return_value=False)
+    rbt = mocker.patch("app.routers.transmissions.run_bulk_transmit")
+    response = client.post(
+        "/transmissions/bulk", data={"list_studies": "1", "target": "backbone"}
+    )
+    assert response.status_code == 200
+    assert "No backbone has been configured" in response.text
+    assert not mock_called(rbt)
+
+
+def test_bulk_transmit_process_unknown_endpoint(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mock_transmit_role_enabled_true(mocker)
+    _endpoints(mocker)
+    rbt = mocker.patch("app.routers.transmissions.run_bulk_transmit")
+    response = client.post(
+        "/transmissions/bulk",
+        data={"list_studies": "1", "target": "4", "version": "prism3"},
+    )
+    assert response.status_code == 200
+    assert "Unknown endpoint &#39;4&#39; requested." in response.text
+    assert not mock_called(rbt)
+
+
+def test_bulk_transmit_process_invalid_version(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mock_transmit_role_enabled_true(mocker)
+    _endpoints(mocker)
+    rbt = mocker.patch("app.routers.transmissions.run_bulk_transmit")
+    response = client.post(
+        "/transmissions/bulk",
+        data={"list_studies": "1", "target": "3", "version": "prism2"},
+    )
+    assert response.status_code == 200
+    assert "Invalid FHIR M11 message version transmission requested" in response.text
+    assert not mock_called(rbt)
+
+
+def test_bulk_transmit_process_not_authorised(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mock_transmit_role_enabled_false(mocker)
+    rbt = mocker.patch("app.routers.transmissions.run_bulk_transmit")
+    response = client.post(
+        "/transmissions/bulk", data={"list_studies": "1", "target": "backbone"}
+    )
+    assert "User is not authorised to transmit FHIR messages." in response.text
+    assert not mock_called(rbt)
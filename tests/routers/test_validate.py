@@ -1,8 +1,11 @@
-from unittest.mock import AsyncMock, MagicMock
+import datetime
+import json
+from unittest.mock import AsyncMock
 
 import pytest
 
 from app.configuration.configuration import application_configuration
+from app.database.validation_job import ValidationJob
 from tests.mocks.fastapi_mocks import mock_async_client, mock_client, protect_endpoint
 from tests.mocks.general_mocks import mock_called
 from tests.mocks.user_mocks import mock_user_check_exists
@@ -27,55 +30,110 @@ def test_validate_usdm_get(mocker, monkeypatch):
     assert response.status_code == 200
 
 
-@pytest.mark.anyio
-async def test_validate_usdm_post(mocker, monkeypatch):
-    """POST /validate/usdm now defers to ``_process_usdm_engine`` with
-    the CDISC engine (the workbench default). That path calls
-    ``USDM4.validate_core`` and projects the result via
-    ``project_usdm_cdisc_result`` / ``project_usdm_cdisc_summary``, so
-    the result mock needs the (empty) ``findings`` list / iterable
-    surface those projectors duck-type on."""
-    protect_endpoint()
-    async_client = mock_async_client(monkeypatch)
-    uc = mock_user_check_exists(mocker)
+def _mock_files(mocker, filename, contents):
     fh = mocker.patch("app.routers.validate.FormHandler")
-    fh_instance = fh.return_value
-    fh_instance.get_files = AsyncMock(
+    fh.return_value.get_files = AsyncMock(
         return_value=(
-            {"filename": "test.json", "contents": b'{"test": true}'},
+            {"filename": filename, "contents": contents},
             [],
-            ["File accepted"],
+            [f"File '{filename}' accepted"],
         )
     )
-    df = mocker.patch("app.routers.validate.DataFiles")
-    df_instance = df.return_value
-    df_instance.new.return_value = "test-uuid"
-    df_instance.save.return_value = ("/tmp/test.json", "test.json")
-    df_instance.path.return_value = (
-        "tests/test_files/main/simple.txt",
-        "simple.txt",
-        True,
+    df = mocker.patch("app.validation.validation_manager.DataFiles")
+    df.return_value.new.return_value = "test-uuid"
+    return fh, df
+
+
+def _job(status="Queued", engine="cdisc", filename="test.json", findings=None):
+    return ValidationJob(
+        id=7,
+        uuid="test-uuid",
+        engine=engine,
+        filename=filename,
+        status=status,
+        findings=findings,
+        user_id=1,
+        created=datetime.datetime(2026, 4, 20),
     )
-    df_instance.delete.return_value = True
-    usdm4 = mocker.patch("app.routers.validate.USDM4")
-    usdm4_instance = usdm4.return_value
-    # CORE-shaped mock: the projectors duck-type on ``findings``,
-    # ``rules_executed``, ``ct_packages_loaded``, ``execution_errors``.
-    # Empty-list defaults keep the projection paths exercised but
-    # produce zero rows / counts.
-    results_mock = MagicMock()
-    results_mock.findings = []
-    results_mock.rules_executed = 0
-    results_mock.rules_skipped = 0
-    results_mock.execution_errors = []
-    results_mock.ct_packages_loaded = []
-    results_mock.ct_packages_available = 0
-    results_mock.version = "4.0.0"
-    results_mock.file_path = "/tmp/test.json"
-    usdm4_instance.validate_core.return_value = results_mock
+
+
+def _mock_submit(mocker, job):
+    vq = mocker.patch("app.routers.validate.validation_queue")
+    vq.submit.return_value = job.id
+    mocker.patch("app.routers.validate.ValidationJob.find", return_value=job)
+    return vq
+
+
+@pytest.mark.anyio
+async def test_validate_usdm_post(mocker, monkeypatch):
+    """POST /validate/usdm submits a CDISC engine job (the workbench
+    default) and returns the job straight away rather than running
+    CORE inside the request."""
+    protect_endpoint()
+    async_client = mock_async_client(monkeypatch)
+    uc = mock_user_check_exists(mocker)
+    fh, df = _mock_files(mocker, "test.json", b'{"test": true}')
+    vq = _mock_submit(mocker, _job())
     response = await async_client.post("/validate/usdm")
     assert response.status_code == 200
     assert mock_called(uc)
+    manager = vq.submit.call_args.args[0]
+    assert manager.engine == "cdisc"
+    assert manager.uuid == "test-uuid"
+    assert df.return_value.save.call_args.args[0] == "usdm"
+    assert response.headers["X-Validation-Job"] == "7"
+    assert response.headers["HX-Retarget"] == "#picker_card"
+    assert "USDM v4 CDISC Validation Submitted" in response.text
+    assert 'href="/validate/jobs/7"' in response.text
+    assert "accepted" not in response.text
+
+
+@pytest.mark.anyio
+async def test_validate_usdm_d4k_post(mocker, monkeypatch):
+    protect_endpoint()
+    async_client = mock_async_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    _mock_files(mocker, "test.json", b'{"test": true}')
+    vq = _mock_submit(mocker, _job(engine="d4k"))
+    response = await async_client.post("/validate/usdm/d4k")
+    assert response.status_code == 200
+    assert vq.submit.call_args.args[0].engine == "d4k"
+    assert "USDM v4 d4k Validation Submitted" in response.text
+
+
+@pytest.mark.anyio
+async def test_validate_usdm_d4k_post_cached(mocker, monkeypatch):
+    """A file the engine has already validated completes at submission,
+    so the findings render in place of the submitted card."""
+    protect_endpoint()
+    async_client = mock_async_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    fh, df = _mock_files(mocker, "test.json", b'{"test": true}')
+    df.return_value.read.return_value = json.dumps(
+        {
+            "findings": [
+                {
+                    "rule_id": "DDF00082",
+                    "severity": "error",
+                    "section": "",
+                    "element": "StudyVersion",
+                    "message": "Cached finding",
+                    "rule_text": "",
+                    "path": "",
+                }
+            ],
+            "summary": {"engine": "d4k"},
+            "messages": [],
+        }
+    )
+    _mock_submit(mocker, _job("Complete", engine="d4k", findings=1))
+    response = await async_client.post("/validate/usdm/d4k")
+    assert response.status_code == 200
+    assert response.headers["X-Validation-Job"] == "7"
+    df.return_value.read.assert_called_once_with("validation")
+    assert "DDF00082" in response.text
+    assert "Cached finding" in response.text
+    assert "Validation Submitted" not in response.text
 
 
 @pytest.mark.anyio
@@ -86,9 +144,12 @@ async def test_validate_post_no_file(mocker, monkeypatch):
     fh = mocker.patch("app.routers.validate.FormHandler")
     fh_instance = fh.return_value
     fh_instance.get_files = AsyncMock(return_value=(None, [], ["No file"]))
+    vq = mocker.patch("app.routers.validate.validation_queue")
     response = await async_client.post("/validate/usdm")
     assert response.status_code == 200
     assert mock_called(uc)
+    vq.submit.assert_not_called()
+    assert "Failed to process the validation file" in response.text
 
 
 # --- M11 docx validation ------------------------------------------------
@@ -111,138 +172,180 @@ def test_validate_m11_docx_get(mocker, monkeypatch):
 
 @pytest.mark.anyio
 async def test_validate_m11_docx_post(mocker, monkeypatch):
-    """POST runs M11Validator against the stored DOCX and renders the
-    findings table. The annotated-protocol view was removed from this
-    flow in task #36 — the route now only projects findings and passes
-    download metadata to the results partial."""
+    """POST submits an M11 job. Lock in the DataFiles convention: the
+    upload must use the existing "docx" media_type. Inventing a new one
+    (e.g. "m11") raises KeyError from DataFiles.path — a hazard we
+    already hit once."""
     protect_endpoint()
     async_client = mock_async_client(monkeypatch)
     uc = mock_user_check_exists(mocker)
+    fh, df = _mock_files(mocker, "protocol.docx", b"docx bytes")
+    vq = _mock_submit(mocker, _job(engine="m11", filename="protocol.docx"))
+    response = await async_client.post("/validate/m11-docx")
+    assert response.status_code == 200
+    assert mock_called(uc)
+    assert fh.call_args.args[2] == ".docx"
+    assert vq.submit.call_args.args[0].engine == "m11"
+    assert df.return_value.save.call_args.args[0] == "docx"
+    assert "ICH M11 Validation Submitted" in response.text
+
+
+@pytest.mark.anyio
+async def test_validate_m11_docx_post_no_file(mocker, monkeypatch):
+    protect_endpoint()
+    async_client = mock_async_client(monkeypatch)
+    mock_user_check_exists(mocker)
     fh = mocker.patch("app.routers.validate.FormHandler")
     fh_instance = fh.return_value
-    fh_instance.get_files = AsyncMock(
-        return_value=(
-            {"filename": "protocol.docx", "contents": b"docx bytes"},
-            [],
-            ["File accepted"],
-        )
-    )
-    df = mocker.patch("app.routers.validate.DataFiles")
-    df_instance = df.return_value
-    df_instance.new.return_value = "test-uuid"
-    df_instance.save.return_value = ("/tmp/protocol.docx", "protocol.docx")
-    df_instance.path.return_value = (
-        "tests/test_files/main/simple.txt",
-        "simple.txt",
-        True,
-    )
-    df_instance.delete.return_value = True
-
-    # Validator runs standalone against the stored docx path — no
-    # Wrapper involvement.  Mock count() > 0 so the route takes the
-    # happy path and doesn't emit the "extraction failed" message.
-    validator_cls = mocker.patch("app.routers.validate.M11Validator")
-    validator_instance = validator_cls.return_value
-    results_mock = MagicMock()
-    results_mock.count.return_value = 1
-    validator_instance.validate.return_value = results_mock
-
-    # Stub the projection so we control the finding dicts exactly —
-    # the template renders ``rule_id``, ``severity``, ``section``,
-    # ``element``, and ``message`` for each row.
-    mocker.patch(
-        "app.routers.validate.project_m11_result",
-        return_value=[
+    fh_instance.get_files = AsyncMock(return_value=(None, [], ["No file"]))
+    response = await async_client.post("/validate/m11-docx")
+    assert response.status_code == 200
+
+
+# --- Validation jobs ------------------------------------------------------
+
+
+def test_validation_jobs(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    uc = mock_user_check_exists(mocker)
+    response = client.get("/validate/jobs?page=1&size=10&filter=")
+    assert response.status_code == 200
+    assert '<h5 class="card-title">Validations</h5>' in response.text
+    assert mock_called(uc)
+
+
+def test_validation_jobs_data(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    vjp = mocker.patch("app.routers.validate.ValidationJob.page")
+    vjp.return_value = {
+        "page": 1,
+        "size": 10,
+        "count": 1,
+        "filter": "",
+        "items": [
             {
-                "rule_id": "M11_001",
-                "severity": "error",
-                "section": "Title Page",
-                "element": "Full Title",
-                "message": "Required element 'Full Title' is missing.",
-                "rule_text": "",
-                "path": "",
+                "id": 7,
+                "engine": "cdisc",
+                "created": "2026-04-20",
+                "filename": "test.json",
+                "status": "Complete",
+                "findings": 3,
             }
         ],
-    )
+    }
+    response = client.get("/validate/jobs/data?page=1&size=10&filter=")
+    assert response.status_code == 200
+    assert '<div id="data_div">' in response.text
+    assert 'href="/validate/jobs/7"' in response.text
+    vjp.assert_called_once()
 
-    response = await async_client.post("/validate/m11-docx")
+
+def test_validation_job_complete(mocker, monkeypatch):
+    """A completed job renders its persisted findings with the shared
+    results partial."""
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mocker.patch(
+        "app.routers.validate.ValidationJob.find",
+        return_value=_job("Complete", "m11", "protocol.docx", 1),
+    )
+    df = mocker.patch("app.validation.validation_manager.DataFiles")
+    df.return_value.read.return_value = json.dumps(
+        {
+            "findings": [
+                {
+                    "rule_id": "M11_001",
+                    "severity": "error",
+                    "section": "Title Page",
+                    "element": "Full Title",
+                    "message": "Required element 'Full Title' is missing.",
+                    "rule_text": "",
+                    "path": "",
+                }
+            ],
+            "summary": {"engine": "m11"},
+            "messages": [],
+        }
+    )
+    response = client.get("/validate/jobs/7")
     assert response.status_code == 200
-    assert mock_called(uc)
-    validator_instance.validate.assert_called_once()
-    # Lock in the DataFiles convention: the route must use the existing
-    # "docx" media_type. Inventing a new one (e.g. "m11") raises KeyError
-    # from DataFiles.path — a hazard we already hit once.
-    save_type = df_instance.save.call_args.args[0]
-    path_type = df_instance.path.call_args.args[0]
-    assert save_type == "docx"
-    assert path_type == "docx"
-    # Finding row rendered in the shared findings table.
+    df.assert_called_with("test-uuid")
+    df.return_value.read.assert_called_once_with("validation")
     body = response.text
     assert "M11_001" in body
     assert "Full Title" in body
-    # Jinja autoescape converts apostrophes to ``&#39;`` in HTML output —
-    # the rendered cell carries the escaped form, not the raw string.
+    # Jinja autoescape converts apostrophes to ``&#39;`` in HTML output.
     assert "Required element &#39;Full Title&#39; is missing." in body
-    # Annotated-document artifacts must not appear — task #36 stripped
-    # the tab entirely from the standalone flow.
-    assert "m11-doc-marker" not in body
-    assert "m11-annotated-doc" not in body
-    assert "data-m11-finding-index" not in body
-    assert "Annotated document" not in body
+    assert 'value="m11-findings"' in body
 
 
-@pytest.mark.anyio
-async def test_validate_m11_docx_post_extraction_failure(mocker, monkeypatch):
-    """When the validator couldn't even run (count==0 but the operational
-    error log is non-empty), the route surfaces the "extraction failed"
-    message instead of silently claiming success."""
+def test_validation_job_running(mocker, monkeypatch):
     protect_endpoint()
-    async_client = mock_async_client(monkeypatch)
+    client = mock_client(monkeypatch)
     mock_user_check_exists(mocker)
-    fh = mocker.patch("app.routers.validate.FormHandler")
-    fh_instance = fh.return_value
-    fh_instance.get_files = AsyncMock(
-        return_value=(
-            {"filename": "broken.docx", "contents": b"not a docx"},
-            [],
-            ["File accepted"],
-        )
-    )
-    df = mocker.patch("app.routers.validate.DataFiles")
-    df_instance = df.return_value
-    df_instance.new.return_value = "test-uuid"
-    df_instance.save.return_value = ("/tmp/broken.docx", "broken.docx")
-    df_instance.path.return_value = (
-        "tests/test_files/main/simple.txt",
-        "simple.txt",
-        True,
+    mocker.patch(
+        "app.routers.validate.ValidationJob.find", return_value=_job("Running")
     )
-    df_instance.delete.return_value = True
+    df = mocker.patch("app.validation.validation_manager.DataFiles")
+    response = client.get("/validate/jobs/7")
+    assert response.status_code == 200
+    assert "The validation is running." in response.text
+    df.return_value.read.assert_not_called()
 
-    # Validator ran but produced no rule outcomes AND the operational
-    # error log records a reader failure — the two-channel signal the
-    # route watches for.  Patch the Errors instance the route creates so
-    # count() reports at least one entry.
-    validator_cls = mocker.patch("app.routers.validate.M11Validator")
-    validator_cls.return_value.validate.return_value = MagicMock(count=lambda: 0)
-    errors_cls = mocker.patch("app.routers.validate.M11Errors")
-    errors_cls.return_value.count.return_value = 1
 
-    response = await async_client.post("/validate/m11-docx")
+def test_validation_job_failed(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mocker.patch("app.routers.validate.ValidationJob.find", return_value=_job("Failed"))
+    mocker.patch("app.validation.validation_manager.DataFiles")
+    response = client.get("/validate/jobs/7")
     assert response.status_code == 200
-    assert "Validation could not be completed" in response.text
+    assert "Validation failed, see logs for more information" in response.text
 
 
-@pytest.mark.anyio
-async def test_validate_m11_docx_post_no_file(mocker, monkeypatch):
+def test_validation_job_not_found(mocker, monkeypatch):
     protect_endpoint()
-    async_client = mock_async_client(monkeypatch)
+    client = mock_client(monkeypatch)
     mock_user_check_exists(mocker)
-    fh = mocker.patch("app.routers.validate.FormHandler")
-    fh_instance = fh.return_value
-    fh_instance.get_files = AsyncMock(return_value=(None, [], ["No file"]))
-    response = await async_client.post("/validate/m11-docx")
+    mocker.patch("app.routers.validate.ValidationJob.find", return_value=None)
+    response = client.get("/validate/jobs/7")
     assert response.status_code == 200
+    assert "Validation job not found" in response.text
+
+
+def test_validation_job_status(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    mocker.patch(
+        "app.routers.validate.ValidationJob.find",
+        return_value=_job("Complete", findings=3),
+    )
+    response = client.get("/validate/jobs/7/status")
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": 7,
+        "engine": "cdisc",
+        "filename": "test.json",
+        "status": "Complete",
+        "findings": 3,
+    }
+
+
+def test_validation_job_status_other_user(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    job = _job()
+    job.user_id = 2
+    mocker.patch("app.routers.validate.ValidationJob.find", return_value=job)
+    response = client.get("/validate/jobs/7/status")
+    assert response.status_code == 404
 
 
 # --- Download endpoints (one per format, server-side) ------------------
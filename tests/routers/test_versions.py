@@ -4,6 +4,9 @@ import pytest
 
 from app.configuration.configuration import application_configuration
 from app.database.version import Version
+from app.model.file_handling.data_files import DataFiles
+from app.model.usdm_json import USDMJson
+from tests.mocks.factory_mocks import factory_user
 from tests.mocks.fastapi_mocks import mock_client, protect_endpoint
 from tests.mocks.fhir_version_mocks import mock_fhir_versions
 from tests.mocks.file_mocks import mock_file_import_find
@@ -25,6 +28,17 @@ def anyio_backend():
     return "asyncio"
 
 
+@pytest.fixture
+def version_files(mocker, monkeypatch, tmp_path):
+    """A real data file dir for the version, so rendered protocols are
+    saved and read back."""
+    monkeypatch.setattr(application_configuration, "data_file_path", str(tmp_path))
+    (tmp_path / "test-uuid").mkdir()
+    files = DataFiles("test-uuid")
+    mocker.patch.object(USDMJson, "_files", files, create=True)
+    return files
+
+
 def test_version_summary_fhir_authorised(mocker, monkeypatch):
     protect_endpoint()
     client = mock_client(monkeypatch)
@@ -285,8 +299,8 @@ def test_export_excel_success(mocker, monkeypatch):
         "application/vnd.ms-excel",
     )
 
-    # Mock FileResponse to return our mock response
-    mock_file_response = mocker.patch("app.routers.versions.FileResponse")
+    # Mock download_response to return our mock response
+    mock_file_response = mocker.patch("app.routers.versions.download_response")
     mock_file_response.return_value = mock_response
 
     # Call the endpoint
@@ -299,9 +313,10 @@ def test_export_excel_success(mocker, monkeypatch):
     mock_usdm_db_init.assert_called_once()
     mock_usdm_db_excel.assert_called_once()
     mock_file_response.assert_called_once_with(
-        path="/path/to/excel.xlsx",
-        filename="excel.xlsx",
-        media_type="application/vnd.ms-excel",
+        mocker.ANY,
+        "/path/to/excel.xlsx",
+        "excel.xlsx",
+        "application/vnd.ms-excel",
     )
 
 
@@ -378,7 +393,7 @@ def test_import_xl_get(mocker, monkeypatch):
     assert mock_called(uc)
 
 
-def test_protocol_m11(mocker, monkeypatch):
+def test_protocol_m11(mocker, monkeypatch, version_files):
     protect_endpoint()
     client = mock_client(monkeypatch)
     uc = mock_user_check_exists(mocker)
@@ -400,7 +415,7 @@ def test_protocol_m11(mocker, monkeypatch):
     assert mock_called(uc)
 
 
-def test_protocol_cpt(mocker, monkeypatch):
+def test_protocol_cpt(mocker, monkeypatch, version_files):
     protect_endpoint()
     client = mock_client(monkeypatch)
     uc = mock_user_check_exists(mocker)
@@ -422,6 +437,34 @@ def test_protocol_cpt(mocker, monkeypatch):
     assert mock_called(uc)
 
 
+def test_protocol_m11_rendered_once(mocker, monkeypatch, version_files):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    uc = mock_user_check_exists(mocker)
+    uc.side_effect = [(factory_user(), True)] * 2
+    mocker.patch("app.routers.versions.USDMJson.__init__", return_value=None)
+    usv = mock_usdm_study_version(mocker, "app.routers.versions")
+    usv.side_effect = None
+    usv.return_value = {"id": "1", "version_identifier": "1", "identifiers": {}}
+    mocker.patch(
+        "app.routers.versions.USDMJson.json",
+        return_value=(
+            "tests/test_files/main/simple.txt",
+            "simple.txt",
+            "application/json",
+        ),
+    )
+    m11 = mocker.patch("app.routers.versions.USDM4M11")
+    m11.return_value.to_html.return_value = "<p>Rendered Protocol</p>"
+    for _ in range(2):
+        response = client.get("/versions/1/protocol?template=M11")
+        assert response.status_code == 200
+        assert "<p>Rendered Protocol</p>" in response.text
+    m11.return_value.to_html.assert_called_once()
+    files = [x for x in version_files._dir_files() if x.startswith("rendered-")]
+    assert len(files) == 1
+
+
 def test_protocol_no_file(mocker, monkeypatch):
     protect_endpoint()
     client = mock_client(monkeypatch)
@@ -440,6 +483,7 @@ def test_export_protocol_success(mocker, monkeypatch):
     uc = mock_user_check_exists(mocker)
     files_mock = MagicMock()
     files_mock.save.return_value = ("tests/test_files/main/simple.txt", "simple.txt")
+    files_mock.named_path.return_value = ("", False)
 
     def custom_init(self, *args, **kwargs):
         self._files = files_mock
@@ -467,6 +511,7 @@ def test_export_protocol_error(mocker, monkeypatch):
     uc = mock_user_check_exists(mocker)
     files_mock = MagicMock()
     files_mock.save.return_value = ("", "")
+    files_mock.named_path.return_value = ("", False)
 
     def custom_init(self, *args, **kwargs):
         self._files = files_mock
@@ -489,7 +534,7 @@ def test_export_protocol_error(mocker, monkeypatch):
     assert mock_called(uc)
 
 
-def test_protocol_other(mocker, monkeypatch):
+def test_protocol_other(mocker, monkeypatch, version_files):
     protect_endpoint()
     client = mock_client(monkeypatch)
     uc = mock_user_check_exists(mocker)
@@ -537,10 +582,12 @@ async def test_versions_post_load_success(mocker, monkeypatch):
     df = mocker.patch("app.routers.versions.DataFiles")
     df_instance = df.return_value
     df_instance.save.return_value = ("/tmp/costs.yaml", "costs.yaml")
+    df_instance.delete_files.return_value = 2
     mocker.patch("app.routers.versions.yaml.safe_load", return_value={"key": "value"})
     response = await async_client.post("/versions/1/load/costs")
     assert response.status_code == 200
     assert mock_called(uc)
+    df_instance.delete_files.assert_called_once_with("rendered-")
 
 
 @pytest.mark.anyio
@@ -573,6 +620,7 @@ async def test_versions_post_load_failure(mocker, monkeypatch):
     response = await async_client.post("/versions/1/load/costs")
     assert response.status_code == 200
     assert mock_called(uc)
+    df_instance.delete_files.assert_not_called()
 
 
 # ---------------------------------------------------------------------------
@@ -669,6 +717,7 @@ def test_version_validation_m11_with_findings(mocker, monkeypatch, tmp_path):
         "m11_validation.json",
         True,
     )
+    df.return_value.named_path.return_value = ("", False)
     mocker.patch(
         "app.routers.versions.USDM4M11"
     ).return_value.to_html.return_value = (
@@ -1,3 +1,8 @@
+import asyncio
+import subprocess
+import sys
+import threading
+import time
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -8,6 +13,7 @@ from app.database.file_import import FileImport
 from app.database.study import Study
 from app.database.user import User
 from app.database.version import Version
+from app.model.startup import startup
 from tests.mocks.fastapi_mocks import (
     mock_async_client,
     mock_client,
@@ -40,6 +46,75 @@ def test_home(mocker, monkeypatch):
     assert """Our privacy policy can be viewed""" in response.text
 
 
+def test_ready(mocker, monkeypatch):
+    client = mock_client(monkeypatch)
+    mocker.patch("app.main.startup.status", return_value={"ready": True})
+    mocker.patch.object(type(startup), "ready", new=True)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"ready": True}
+
+
+def test_not_ready(mocker, monkeypatch):
+    client = mock_client(monkeypatch)
+    mocker.patch("app.main.startup.status", return_value={"ready": False})
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"ready": False}
+
+
+def test_server_timing(mocker, monkeypatch):
+    client = mock_client(monkeypatch)
+    mocker.patch.object(type(startup), "ready", new=True)
+    response = client.get("/")
+    assert response.status_code == 200
+    header = response.headers["Server-Timing"]
+    assert 'template;dur=' in header
+    assert "total;dur=" in header
+
+
+def test_metrics(mocker, monkeypatch):
+    client = mock_client(monkeypatch)
+    mocker.patch("app.main.startup.status", return_value={"ready": True})
+    mocker.patch.object(type(startup), "ready", new=True)
+    client.get("/ready")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        'workbench_responses_total{method="GET",route="/ready",status="200"}'
+        in response.text
+    )
+
+
+def test_metrics_disabled(mocker, monkeypatch):
+    client = mock_client(monkeypatch)
+    mocker.patch("app.main.request_timing.enabled", False)
+    response = client.get("/metrics")
+    assert response.status_code == 404
+    assert "Server-Timing" not in response.headers
+
+
+def test_startup_failed(mocker, monkeypatch):
+    client = mock_client(monkeypatch)
+    mocker.patch("app.main.startup.wait", AsyncMock(return_value=False))
+    mocker.patch("app.main.startup.status", return_value={"error": "failed"})
+    response = client.get("/")
+    assert response.status_code == 503
+    assert response.json() == {"error": "failed"}
+
+
+def test_import_defers_heavy_libraries():
+    # The USDM, FHIR, protocol and Excel libraries load on first use, not
+    # when the application is imported.
+    heavy = ["usdm4", "usdm4_fhir", "usdm4_protocol", "usdm4_excel", "usdm4_pj"]
+    code = f"import sys, app.main; print([x for x in {heavy} if x in sys.modules])"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
 def test_home_single(mocker, monkeypatch):
     application_configuration.single_user = True
     application_configuration.multiple_user = False
@@ -552,6 +627,40 @@ def test_usdm_view(mocker, monkeypatch):
     assert response.status_code == 200
 
 
+@pytest.mark.anyio
+async def test_usdm_view_render_off_event_loop(mocker, monkeypatch):
+    # A slow USDM read must run on the render pool, leaving the event loop
+    # free to answer a light request made while it is in progress.
+    protect_endpoint()
+    async_client = mock_async_client(monkeypatch)
+    uc = mock_user_check_exists(mocker)
+    uc.side_effect = [(factory_user(), True)] * 2
+    mock_usdm_json_init(mocker)
+    mock_usdm_study_version(mocker)
+    mocker.patch(
+        "app.database.study.Study.page",
+        return_value={"page": 1, "size": 10, "count": 0, "filter": "", "items": []},
+    )
+    started = threading.Event()
+
+    def slow_raw():
+        started.set()
+        time.sleep(1.5)
+        return '{"test": true}'
+
+    mocker.patch("app.main.USDMJson._get_raw", side_effect=slow_raw)
+    heavy = asyncio.create_task(async_client.get("/versions/1/usdm"))
+    assert await asyncio.to_thread(started.wait, 5)
+    start = time.perf_counter()
+    response = await async_client.get("/index/page?page=1&size=10&initial=true")
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    assert elapsed < 0.75
+    assert not heavy.done()
+    response = await heavy
+    assert response.status_code == 200
+
+
 # --- Export routes ---
 
 
@@ -606,6 +715,31 @@ def test_export_json_success(mocker, monkeypatch):
     assert response.status_code == 200
 
 
+def test_export_json_not_modified(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    uc = mock_user_check_exists(mocker)
+    uc.side_effect = [(factory_user(), True)] * 2
+    init = mocker.patch("app.main.USDMJson.__init__", return_value=None)
+    mocker.patch(
+        "app.main.USDMJson.json",
+        return_value=(
+            "tests/test_files/main/simple.txt",
+            "simple.txt",
+            "application/json",
+        ),
+    )
+    response = client.get("/versions/1/export/json")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    response = client.get("/versions/1/export/json", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    assert init.call_count == 2
+
+
 def test_export_json_no_file(mocker, monkeypatch):
     protect_endpoint()
     client = mock_client(monkeypatch)
@@ -676,8 +810,11 @@ def test_database_debug_admin(mocker, monkeypatch):
     mocker.patch("app.main.FileImport.debug", return_value=[])
     mocker.patch("app.main.Endpoint.debug", return_value=[])
     mocker.patch("app.main.UserEndpoint.debug", return_value=[])
+    mocker.patch("app.main.ImportJob.debug", return_value=[])
+    mocker.patch("app.main.ValidationJob.debug", return_value=[])
     response = client.get("/database/debug")
     assert response.status_code == 200
+    assert "Export Cache" in response.text
 
 
 def test_database_debug_not_admin(mocker, monkeypatch):
@@ -858,24 +995,62 @@ def test_usdm_explore(mocker, monkeypatch):
     mock_user_check_exists(mocker)
     mock_usdm_json_init(mocker)
     mock_usdm_study_version(mocker)
-    mock_version = MagicMock()
-    mock_version.import_id = 1
-    mocker.patch("app.main.Version.find", return_value=mock_version)
-    mock_fi = MagicMock()
-    mock_fi.uuid = "test-uuid"
-    mocker.patch("app.main.FileImport.find", return_value=mock_fi)
-    mock_df = mocker.patch("app.main.DataFiles")
-    mock_df.return_value.path.return_value = (
-        "tests/test_files/main/simple.txt",
-        "simple.txt",
-        True,
-    )
-    mock_ds = mocker.patch("app.main.DataStore")
-    mock_ds_instance = MagicMock()
-    mock_ds_instance._klasses = {"Wrapper": {}, "Study": {"data": "test"}}
-    mock_ds.return_value = mock_ds_instance
+    explorer = mocker.patch("app.main.USDMJson.explorer")
     response = client.get("/versions/1/usdmExplore")
     assert response.status_code == 200
+    assert "/versions/1/usdmExplore" in response.text
+    explorer.assert_not_called()
+
+
+def test_usdm_explore_classes(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_usdm_json_init(mocker)
+    explorer = mocker.patch("app.main.USDMJson.explorer")
+    explorer.return_value.classes.return_value = {
+        "classes": [{"name": "Study", "count": 1}],
+        "count": 1,
+    }
+    response = client.get("/versions/1/usdmExplore/classes")
+    assert response.status_code == 200
+    assert response.json() == {"classes": [{"name": "Study", "count": 1}], "count": 1}
+
+
+def test_usdm_explore_class(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_usdm_json_init(mocker)
+    explorer = mocker.patch("app.main.USDMJson.explorer")
+    data = {"items": ["c-2"], "page": 2, "size": 1, "filter": "c", "count": 2}
+    explorer.return_value.instances.return_value = data
+    response = client.get("/versions/1/usdmExplore/classes/Code?page=2&size=1&filter=c")
+    assert response.status_code == 200
+    assert response.json() == data
+    explorer.return_value.instances.assert_called_once_with("Code", 2, 1, "c")
+
+
+def test_usdm_explore_class_not_found(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_usdm_json_init(mocker)
+    explorer = mocker.patch("app.main.USDMJson.explorer")
+    explorer.return_value.instances.return_value = None
+    response = client.get("/versions/1/usdmExplore/classes/Missing")
+    assert response.status_code == 404
+    assert response.json() == {"error": "Class 'Missing' not found"}
+
+
+def test_usdm_explore_instances(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_usdm_json_init(mocker)
+    explorer = mocker.patch("app.main.USDMJson.explorer")
+    items = {"c-1": {"class": "Code", "data": {"id": "c-1", "code": "X"}}}
+    explorer.return_value.lookup.return_value = items
+    response = client.get("/versions/1/usdmExplore/instances?ids=c-1&ids=c-9")
+    assert response.status_code == 200
+    assert response.json() == {"items": items}
+    explorer.return_value.lookup.assert_called_once_with(["c-1", "c-9"])
 
 
 def test_usdm_diff(mocker, monkeypatch):
@@ -884,6 +1059,49 @@ def test_usdm_diff(mocker, monkeypatch):
     mock_user_check_exists(mocker)
     mocker.patch("app.main.USDMJson.__init__", return_value=None)
     mock_usdm_study_version(mocker)
-    mocker.patch("app.main.USDMJson._get_raw", return_value='{"test": true}')
+    mocker.patch("app.main.USDMJson.diff", return_value=USDM_DIFF)
     response = client.get("/versions/1/usdmDiff?previous=2")
     assert response.status_code == 200
+    assert "<td>StudyTitle</td>" in response.text
+    url = "/versions/1/usdmDiff/data?page=1&size=20&filter=&previous=2"
+    assert url in response.text
+
+
+def test_usdm_diff_data(mocker, monkeypatch):
+    protect_endpoint()
+    client = mock_client(monkeypatch)
+    mock_user_check_exists(mocker)
+    init = mocker.patch("app.main.USDMJson.__init__", return_value=None)
+    mocker.patch("app.main.USDMJson.diff", return_value=USDM_DIFF)
+    response = client.get(
+        "/versions/1/usdmDiff/data?previous=2&page=1&size=10&filter=removed"
+    )
+    assert response.status_code == 200
+    assert "Short title" in response.text
+    assert "Acronym" not in response.text
+    assert "previous=2" in response.text
+    assert [x.args[0] for x in init.call_args_list] == [1, 2]
+
+
+USDM_DIFF = {
+    "engine": "1",
+    "entities": {"old": 7, "new": 7},
+    "totals": {"added": 1, "removed": 1, "changed": 0},
+    "summary": {"StudyTitle": {"added": 1, "removed": 1, "changed": 0}},
+    "changes": [
+        {
+            "id": "t-3",
+            "class": "StudyTitle",
+            "label": "Acronym",
+            "action": "added",
+            "attributes": [{"name": "text", "old": None, "new": "Acronym"}],
+        },
+        {
+            "id": "t-2",
+            "class": "StudyTitle",
+            "label": "Short title",
+            "action": "removed",
+            "attributes": [{"name": "text", "old": "Short title", "new": None}],
+        },
+    ],
+}
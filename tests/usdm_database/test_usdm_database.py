@@ -99,6 +99,10 @@ class TestUSDMDatabase:
             "app.usdm_database.usdm_database.USDM4Excel", return_value=mock_usdm4excel
         )
 
+        # Generate through the export cache
+        mock_export_cache = mocker.patch("app.usdm_database.usdm_database.ExportCache")
+        mock_export_cache.return_value.get.side_effect = _generate
+
         # Create USDMDatabase instance
         usdm_db = USDMDatabase(1, mock_session)
 
@@ -114,8 +118,11 @@ class TestUSDMDatabase:
 
         # Verify the mocks were called correctly
         mock_usdm4excel_class.assert_called_once()
+        mock_export_cache.return_value.get.assert_called_once_with(
+            "excel", "legacy", "usdm4_excel", "xlsx", mocker.ANY
+        )
         mock_usdm4excel.to_excel.assert_called_once_with(
-            "/path/to/usdm.json", "/path/to/excel.xlsx", format="legacy"
+            "/path/to/usdm.json", "/path/to/excel.xlsx.tmp", format="legacy"
         )
 
     def test_excel_with_exception(
@@ -148,6 +155,10 @@ class TestUSDMDatabase:
             "app.usdm_database.usdm_database.USDM4Excel", return_value=mock_usdm4excel
         )
 
+        # Generate through the export cache
+        mock_export_cache = mocker.patch("app.usdm_database.usdm_database.ExportCache")
+        mock_export_cache.return_value.get.side_effect = _generate
+
         # Create USDMDatabase instance
         usdm_db = USDMDatabase(1, mock_session)
 
@@ -160,5 +171,10 @@ class TestUSDMDatabase:
 
         # Verify the mocks were called correctly
         mock_usdm4excel.to_excel.assert_called_once_with(
-            "/path/to/usdm.json", "/path/to/excel.xlsx", format="legacy"
+            "/path/to/usdm.json", "/path/to/excel.xlsx.tmp", format="legacy"
         )
+
+
+def _generate(kind, variant, package, extension, generate):
+    generate("/path/to/excel.xlsx.tmp")
+    return "/path/to/excel.xlsx"
@@ -5,7 +5,7 @@ import pytest
 
 from app.configuration.configuration import application_configuration
 from app.utility.backbone_transmit import (
-    _outcome_message,
+    backbone_outcome_message,
     backbone_enabled,
     backbone_headers,
     backbone_load_url,
@@ -38,13 +38,12 @@ def _response(status_code, body=None, text=""):
 
 
 def _http_client(response):
-    """A mock for the httpx.AsyncClient async-context-manager usage."""
+    """A mock for the shared outbound HTTP client."""
     client = MagicMock()
     client.post = AsyncMock(return_value=response)
-    client_cls = MagicMock()
-    client_cls.return_value.__aenter__ = AsyncMock(return_value=client)
-    client_cls.return_value.__aexit__ = AsyncMock(return_value=False)
-    return client_cls, client
+    outbound = MagicMock()
+    outbound.client.return_value = client
+    return outbound, client
 
 
 class TestConfiguration:
@@ -78,24 +77,24 @@ class TestOutcomeMessage:
                 "triple_count": 16265,
             },
         )
-        success, message = _outcome_message(response)
+        success, message = backbone_outcome_message(response)
         assert success is True
         assert "NCT12345678" in message
         assert "16265" in message
 
     def test_conflict(self):
-        success, message = _outcome_message(_response(409, text="exists"))
+        success, message = backbone_outcome_message(_response(409, text="exists"))
         assert success is False
         assert "already loaded" in message
 
     def test_other_failure(self):
-        success, message = _outcome_message(_response(422, text="no slug"))
+        success, message = backbone_outcome_message(_response(422, text="no slug"))
         assert success is False
         assert "HTTP 422" in message
         assert "no slug" in message
 
     def test_failure_long_message_truncated(self):
-        success, message = _outcome_message(_response(400, text="x" * 300))
+        success, message = backbone_outcome_message(_response(400, text="x" * 300))
         assert success is False
         assert "..." in message
 
@@ -122,7 +121,7 @@ class TestBackboneTransmit:
         tx = MagicMock()
         mock_tx.create.return_value = tx
         mock_cm.success = AsyncMock()
-        client_cls, client = _http_client(
+        outbound, client = _http_client(
             _response(
                 200,
                 {
@@ -133,13 +132,14 @@ class TestBackboneTransmit:
                 },
             )
         )
-        with patch("app.utility.backbone_transmit.httpx.AsyncClient", client_cls):
+        with patch("app.utility.backbone_transmit.outbound_http", outbound):
             await backbone_transmit(1, mock_user)
         client.post.assert_awaited_once()
         url = client.post.call_args[0][0]
         assert url == "http://backbone:8000/v1/studies"
         assert "file" in client.post.call_args[1]["files"]
         assert client.post.call_args[1]["headers"] == {}
+        outbound.client.assert_called_once_with(timeout=120.0)
         tx.update_status.assert_called_once()
         mock_cm.success.assert_awaited_once()
 
@@ -156,8 +156,8 @@ class TestBackboneTransmit:
         tx = MagicMock()
         mock_tx.create.return_value = tx
         mock_cm.error = AsyncMock()
-        client_cls, _ = _http_client(_response(409, text="exists"))
-        with patch("app.utility.backbone_transmit.httpx.AsyncClient", client_cls):
+        outbound, _ = _http_client(_response(409, text="exists"))
+        with patch("app.utility.backbone_transmit.outbound_http", outbound):
             await backbone_transmit(1, mock_user)
         tx.update_status.assert_called_once()
         mock_cm.error.assert_awaited_once()
@@ -0,0 +1,201 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.utility.bulk_transmit import BulkTransmit, run_bulk_transmit
+
+
+@pytest.fixture
+def mock_user():
+    user = MagicMock()
+    user.id = 1
+    return user
+
+
+@pytest.fixture
+def env(mocker, tmp_path):
+    """The database, USDM and notifications of three studies, the
+    second of which has no version and the third fails to load."""
+    message = tmp_path / "fhir.json"
+    message.write_text('{"resourceType": "Bundle", "id": "m"}')
+    usdm_file = tmp_path / "usdm.json"
+    usdm_file.write_text('{"study": {}}')
+    mocker.patch("app.utility.bulk_transmit.SessionLocal")
+    summaries = {
+        1: {"latest_version_id": 10, "name": "STUDY1"},
+        2: {"latest_version_id": None, "name": "STUDY2"},
+        3: {"latest_version_id": 30, "name": "STUDY3"},
+    }
+    mocker.patch(
+        "app.utility.bulk_transmit.Study.summary",
+        side_effect=lambda id, session: summaries[id],
+    )
+
+    def usdm_json(version_id, session):
+        if version_id == 30:
+            raise ValueError("boom")
+        usdm = MagicMock()
+        usdm.study_version.return_value = {"titles": {"C207616": "Official Title"}}
+        usdm.fhir.return_value = (str(message), "fhir_prism3.json", "text/plain")
+        usdm.json.return_value = (str(usdm_file), "usdm.json", "application/json")
+        return usdm
+
+    mocker.patch("app.utility.bulk_transmit.USDMJson", side_effect=usdm_json)
+    mocker.patch("app.utility.bulk_transmit.Endpoint").find.return_value = MagicMock(
+        endpoint="https://fhir.test/api"
+    )
+    server = MagicMock()
+    mocker.patch("app.utility.bulk_transmit.FHIRService", return_value=server)
+    tx = mocker.patch("app.utility.bulk_transmit.Transmission")
+    cm = mocker.patch("app.utility.bulk_transmit.connection_manager")
+    cm.success = AsyncMock()
+    cm.error = AsyncMock()
+    return {"server": server, "tx": tx, "cm": cm}
+
+
+def statuses(tx) -> dict:
+    return {
+        x.kwargs["version"]: (x.kwargs["study"], x.kwargs["status"])
+        for x in tx.create.call_args_list
+    }
+
+
+@pytest.mark.asyncio
+async def test_fhir_single(env, mock_user):
+    env["server"].put = AsyncMock(
+        return_value={"success": True, "data": {"id": "bundle-1"}}
+    )
+    summary = await BulkTransmit([1, 2, 3], 5, "prism3", "single", mock_user).process()
+    env["server"].put.assert_awaited_once_with(
+        "Bundle", '{"resourceType": "Bundle", "id": "m"}', 60.0
+    )
+    assert statuses(env["tx"]) == {
+        10: ("Official Title", "Succesful transmission of FHIR M11 message: bundle-1"),
+        30: (
+            "STUDY3",
+            "Error encountered preparing version '30' for transmission",
+        ),
+    }
+    assert summary["count"] == 2
+    assert summary["succeeded"] == 1
+    assert summary["failed"] == 1
+    assert summary["bytes"] == len('{"resourceType": "Bundle", "id": "m"}')
+    assert "1 of 2 versions sent" in summary["message"]
+    env["cm"].error.assert_awaited_once_with(summary["message"], "1")
+
+
+@pytest.mark.asyncio
+async def test_fhir_batch(env, mock_user):
+    env["server"].batch = AsyncMock(
+        return_value={
+            "success": True,
+            "data": {
+                "resourceType": "Bundle",
+                "type": "batch-response",
+                "entry": [
+                    {
+                        "resource": {"id": "bundle-2"},
+                        "response": {"status": "201 Created"},
+                    }
+                ],
+            },
+        }
+    )
+    summary = await BulkTransmit([1], 5, "prism3", "batch", mock_user).process()
+    data, timeout = env["server"].batch.call_args[0]
+    bundle = json.loads(data)
+    assert bundle["type"] == "batch"
+    assert bundle["entry"] == [
+        {
+            "resource": {"resourceType": "Bundle", "id": "m"},
+            "request": {"method": "POST", "url": "Bundle"},
+        }
+    ]
+    assert timeout == 60.0
+    assert statuses(env["tx"]) == {
+        10: ("Official Title", "Succesful transmission of FHIR M11 message: bundle-2"),
+    }
+    assert summary["succeeded"] == 1
+    env["cm"].success.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_backbone(env, mock_user, mocker):
+    response = MagicMock()
+    response.status_code = 201
+    response.json.return_value = {"slug": "S", "triple_count": 1, "graph_uri": "g"}
+    send = mocker.patch(
+        "app.utility.bulk_transmit.backbone_send", new=AsyncMock(return_value=response)
+    )
+    summary = await BulkTransmit([1], None, "", "single", mock_user).process()
+    send.assert_awaited_once_with("usdm.json", b'{"study": {}}')
+    assert statuses(env["tx"])[10][1].startswith("Successful backbone load")
+    assert summary["succeeded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_send_exception(env, mock_user):
+    env["server"].put = AsyncMock(side_effect=Exception("boom"))
+    summary = await BulkTransmit([1], 5, "prism3", "single", mock_user).process()
+    assert statuses(env["tx"]) == {
+        10: ("STUDY1", "Error encountered transmitting version '10' to FHIR"),
+    }
+    assert summary["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_exception(env, mock_user, mocker):
+    mocker.patch(
+        "app.utility.bulk_transmit.Study.summary", side_effect=Exception("boom")
+    )
+    summary = await BulkTransmit([1], 5, "prism3", "single", mock_user).process()
+    assert summary["count"] == 0
+    env["cm"].error.assert_awaited_once_with(
+        "Error encountered in the bulk transmission to FHIR", "1"
+    )
+
+
+def test_mode(mock_user):
+    assert BulkTransmit([1], 5, "prism3", "other", mock_user).mode == "single"
+    assert BulkTransmit([1], 5, "prism3", "transaction", mock_user).mode == (
+        "transaction"
+    )
+
+
+def test_outcomes():
+    items = [{"data": "{}"}, {"data": "{}"}, {"data": "{}"}]
+    response = {
+        "success": True,
+        "data": {
+            "entry": [
+                {"response": {"status": "201", "location": "Bundle/b-1/_history/1"}},
+                {"response": {"status": "400", "outcome": {"issue": []}}},
+            ]
+        },
+    }
+    result = BulkTransmit.outcomes(items, response)
+    assert result[0] == (
+        True,
+        "Succesful transmission of FHIR M11 message: Bundle/b-1/_history/1",
+    )
+    assert result[1][0] is False
+    assert "issue" in result[1][1]
+    assert result[2][0] is False
+
+
+def test_outcomes_failed():
+    items = [{"data": "{}"}, {"data": "{}"}]
+    result = BulkTransmit.outcomes(items, {"success": False, "message": "rolled back"})
+    assert (
+        result
+        == [(False, "Unsuccesful transmission of FHIR M11 message: rolled back")] * 2
+    )
+
+
+@patch("app.utility.bulk_transmit.threading.Thread")
+def test_run(mock_thread, mock_user):
+    run_bulk_transmit([1], 5, "prism3", "single", mock_user)
+    mock_thread.assert_called_once()
+    mock_thread.return_value.start.assert_called_once()
+    mock_thread.call_args[1]["args"][0].close()
@@ -105,3 +105,28 @@ class TestFHIRServiceWrappers:
         fhir_service._client.post = AsyncMock(return_value=mock_response)
         result = await fhir_service.post("/Bundle", data='{"data": "test"}')
         assert result["success"] is True
+
+
+class TestFHIRServiceBatch:
+    @pytest.mark.asyncio
+    async def test_batch(self, fhir_service):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.text = '{"resourceType": "Bundle", "type": "batch-response"}'
+        fhir_service._client.post = AsyncMock(return_value=mock_response)
+        result = await fhir_service.batch('{"type": "batch"}', 60.0)
+        assert result["success"] is True
+        args, kwargs = fhir_service._client.post.call_args
+        assert args[0] == "https://fhir.example.com/"
+        assert kwargs["auth"] == ("user", "pass")
+        assert kwargs["timeout"] == 60.0
+
+    @pytest.mark.asyncio
+    async def test_batch_failure(self, fhir_service):
+        mock_response = MagicMock()
+        mock_response.status_code = 400
+        mock_response.text = "Bad Bundle"
+        fhir_service._client.post = AsyncMock(return_value=mock_response)
+        result = await fhir_service.batch('{"type": "transaction"}')
+        assert result["success"] is False
+        assert "'POST'" in result["message"]
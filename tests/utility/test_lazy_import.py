@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from app.utility.lazy_import import LazyImport
+
+
+def test_import_on_first_use(mocker):
+    mock_import = mocker.patch(
+        "app.utility.lazy_import.importlib.import_module", return_value=json
+    )
+    dumps = LazyImport("json", "dumps")
+    assert not dumps.loaded
+    mock_import.assert_not_called()
+    assert dumps({"a": 1}) == '{"a": 1}'
+    assert dumps.loaded
+    assert dumps.__name__ == "dumps"
+    mock_import.assert_called_once_with("json")
+
+
+def test_module():
+    module = LazyImport("json")
+    assert module.dumps([1]) == "[1]"
+    assert module.loaded
+
+
+def test_attribute():
+    decoder = LazyImport("json", "JSONDecoder")
+    assert decoder.__name__ == "JSONDecoder"
+    assert isinstance(decoder(), json.JSONDecoder)
+
+
+def test_missing_module():
+    missing = LazyImport("not_a_module_xyz", "Thing")
+    with pytest.raises(ModuleNotFoundError):
+        missing()
+    assert not missing.loaded
+
+
+def test_repr():
+    lazy = LazyImport("json", "dumps")
+    assert repr(lazy) == "<LazyImport json.dumps (not loaded)>"
+    lazy._load()
+    assert repr(lazy) == "<LazyImport json.dumps (loaded)>"
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.utility.fhir_service import FHIRService
+from app.utility.outbound_http import OutboundHTTP
+
+
+class FHIRServer(ThreadingHTTPServer):
+    """Stand-in FHIR server answering PUT and POST /Bundle and GET
+    /metadata, failing the first ``failures`` requests with a 503."""
+
+    daemon_threads = True
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), FHIRHandler)
+        self.failures = failures
+        self.delay = delay
+        self.requests = []
+        self.clients = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FHIRHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        with server.lock:
+            server.requests.append((self.command, self.path))
+            server.clients.add(self.client_address)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            fail = server.failures > 0
+            server.failures -= 1 if fail else 0
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        status, body = (503, b"unavailable") if fail else (200, b'{"id": "bundle-1"}')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(failures: int = 0, delay: float = 0.0) -> FHIRServer:
+        server = FHIRServer(failures, delay)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+async def manager():
+    manager = OutboundHTTP(4, 4, 5.0, 2, 0.0)
+    yield manager
+    await manager.close()
+
+
+def fhir_service(manager: OutboundHTTP, url: str) -> FHIRService:
+    with (
+        patch("app.utility.fhir_service.ServiceEnvironment") as mock_se,
+        patch("app.utility.service.outbound_http", manager),
+    ):
+        mock_se.return_value.get.return_value = "user"
+        return FHIRService(url)
+
+
+@pytest.mark.anyio
+async def test_put_reuses_connection(server, manager):
+    fhir = server()
+    service = fhir_service(manager, fhir.url)
+    for _ in range(3):
+        result = await service.put("Bundle", '{"resourceType": "Bundle"}', 10.0)
+        assert result["success"] is True
+        assert result["data"] == {"id": "bundle-1"}
+    assert fhir.requests == [("PUT", "/Bundle")] * 3
+    assert len(fhir.clients) == 1
+    metrics = manager.metrics()["endpoints"][fhir.url]
+    assert metrics["requests"] == 3
+    assert metrics["errors"] == 0
+    assert metrics["retries"] == 0
+    assert metrics["in_flight"] == 0
+    assert metrics["last_status"] == 200
+    assert metrics["latency_seconds"]["sample"] == 3
+
+
+@pytest.mark.anyio
+async def test_put_retried(server, manager):
+    fhir = server(failures=2)
+    service = fhir_service(manager, fhir.url)
+    result = await service.put("Bundle", "{}")
+    assert result["success"] is True
+    metrics = manager.metrics()["endpoints"][fhir.url]
+    assert metrics["requests"] == 3
+    assert metrics["errors"] == 2
+    assert metrics["retries"] == 2
+
+
+@pytest.mark.anyio
+async def test_put_retries_exhausted(server, manager):
+    fhir = server(failures=5)
+    service = fhir_service(manager, fhir.url)
+    result = await service.put("Bundle", "{}")
+    assert result["success"] is False
+    assert result["status"] == 503
+    assert len(fhir.requests) == 3
+
+
+@pytest.mark.anyio
+async def test_post_not_retried(server, manager):
+    fhir = server(failures=1)
+    service = fhir_service(manager, fhir.url)
+    result = await service.post("Bundle", "{}")
+    assert result["success"] is False
+    assert result["status"] == 503
+    assert len(fhir.requests) == 1
+    assert manager.metrics()["endpoints"][fhir.url]["retries"] == 0
+
+
+@pytest.mark.anyio
+async def test_transport_error(manager):
+    fhir = FHIRServer()
+    url = fhir.url
+    fhir.server_close()
+    with pytest.raises(httpx.TransportError):
+        await manager.request("PUT", f"{url}/Bundle", content="{}")
+    metrics = manager.metrics()["endpoints"][url]
+    assert metrics["requests"] == 3
+    assert metrics["errors"] == 3
+    assert metrics["last_status"] is None
+
+
+@pytest.mark.anyio
+async def test_concurrency_bounded(server):
+    fhir = server(delay=0.1)
+    manager = OutboundHTTP(4, 2, 5.0, 0, 0.0)
+    try:
+        client = manager.client()
+        responses = await asyncio.gather(
+            *[client.get(f"{fhir.url}/metadata") for _ in range(6)]
+        )
+    finally:
+        await manager.close()
+    assert [x.status_code for x in responses] == [200] * 6
+    assert fhir.max_active == 2
+
+
+def test_shared_across_loops(server):
+    fhir = server()
+    manager = OutboundHTTP(4, 4, 5.0, 0, 0.0)
+    results = []
+
+    def send():
+        response = asyncio.run(manager.request("GET", f"{fhir.url}/metadata"))
+        results.append(json.loads(response.text))
+
+    threads = [threading.Thread(target=send) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [{"id": "bundle-1"}] * 3
+    assert list(manager.metrics()["endpoints"]) == [fhir.url]
+    asyncio.run(manager.close())
+
+
+@pytest.mark.anyio
+async def test_client_timeout(server, manager):
+    fhir = server(delay=0.5)
+    with pytest.raises(httpx.TimeoutException):
+        await manager.client(timeout=0.05).get(f"{fhir.url}/metadata")
+
+
+@pytest.mark.anyio
+async def test_close(server, manager):
+    fhir = server()
+    await manager.request("GET", f"{fhir.url}/metadata")
+    thread = manager._thread
+    await manager.close()
+    assert not thread.is_alive()
+    assert manager.metrics()["endpoints"] == {}
+    response = await manager.request("GET", f"{fhir.url}/metadata")
+    assert response.status_code == 200
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utility.render_pool import RenderPool
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.mark.anyio
+async def test_run_returns_result():
+    pool = RenderPool(2)
+    result = await pool.run(lambda a, b=0: a + b, 1, b=2)
+    assert result == 3
+    metrics = pool.metrics()
+    assert metrics["workers"] == 2
+    assert metrics["completed"] == 1
+    assert metrics["queued"] == 0
+    assert metrics["running"] == 0
+    assert metrics["wait_seconds"]["sample"] == 1
+
+
+@pytest.mark.anyio
+async def test_run_off_event_loop():
+    pool = RenderPool(1)
+    loop_thread = threading.current_thread()
+    thread = await pool.run(threading.current_thread)
+    assert thread is not loop_thread
+    assert thread.name.startswith("render")
+
+
+@pytest.mark.anyio
+async def test_run_raises():
+    pool = RenderPool(1)
+
+    def fail():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError, match="bad"):
+        await pool.run(fail)
+    assert pool.metrics()["completed"] == 1
+    assert pool.metrics()["running"] == 0
+
+
+@pytest.mark.anyio
+async def test_run_bounded():
+    pool = RenderPool(2)
+    release = threading.Event()
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        release.wait(5)
+        with lock:
+            active.pop()
+
+    tasks = [asyncio.create_task(pool.run(work)) for _ in range(5)]
+    while pool.metrics()["running"] < 2:
+        await asyncio.sleep(0.01)
+    metrics = pool.metrics()
+    assert metrics["running"] == 2
+    assert metrics["queued"] == 3
+    release.set()
+    await asyncio.gather(*tasks)
+    assert max(peak) == 2
+    assert pool.metrics()["completed"] == 5
+
+
+def test_minimum_one_worker():
+    assert RenderPool(0).workers == 1
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.utility.render_pool import RenderPool
+from app.utility.request_timing import RequestTimer, RequestTiming
+
+
+@pytest.fixture
+def timing():
+    return RequestTiming(True)
+
+
+def test_stage_outside_request(timing):
+    with timing.stage("db") as stage:
+        pass
+    assert stage is None
+    assert timing.stage("db") is timing.stage("usdm")
+
+
+def test_stages(timing):
+    timer = timing.begin()
+    with timing.stage("usdm"):
+        time.sleep(0.01)
+    with timing.stage("db"):
+        pass
+    with timing.stage("db"):
+        pass
+    totals = {name: (seconds, count) for name, seconds, count in timer.totals()}
+    assert totals["usdm"][0] >= 0.01
+    assert totals["usdm"][1] == 1
+    assert totals["db"][1] == 2
+
+
+def test_timed(timing):
+    @timing.timed("render")
+    def render(value):
+        return value * 2
+
+    assert render(2) == 4
+    timer = timing.begin()
+    assert render(3) == 6
+    assert [x[0] for x in timer.totals()] == ["render"]
+
+
+def test_server_timing():
+    timer = RequestTimer()
+    timer.add("db", 0.0123)
+    timer.add("db", 0.001)
+    timer.add("template", 0.002)
+    assert timer.server_timing(0.05) == (
+        'db;dur=13.3;desc="2", template;dur=2.0;desc="1", total;dur=50.0'
+    )
+
+
+def test_end(timing):
+    timer = timing.begin()
+    timer.add("db", 0.02)
+    header = timing.end(timer, "GET", "/versions/{id}/summary", 200)
+    assert header.startswith('db;dur=20.0;desc="1", total;dur=')
+    timer = timing.begin()
+    timing.end(timer, "GET", "/versions/{id}/summary", 404)
+    metrics = timing.prometheus()
+    assert (
+        'workbench_request_duration_seconds_count{method="GET",route="/versions/{id}/summary"} 2'
+        in metrics
+    )
+    assert (
+        'workbench_request_duration_seconds_bucket{method="GET",route="/versions/{id}/summary",le="+Inf"} 2'
+        in metrics
+    )
+    assert (
+        'workbench_request_stage_seconds_bucket{method="GET",route="/versions/{id}/summary",stage="db",le="0.025"} 1'
+        in metrics
+    )
+    assert (
+        'workbench_request_stage_seconds_bucket{method="GET",route="/versions/{id}/summary",stage="db",le="0.01"} 0'
+        in metrics
+    )
+    assert (
+        'workbench_responses_total{method="GET",route="/versions/{id}/summary",status="404"} 1'
+        in metrics
+    )
+    assert "# TYPE workbench_request_duration_seconds histogram" in metrics
+    timing.reset()
+    assert "_count" not in timing.prometheus()
+
+
+def test_route():
+    route = SimpleNamespace(path="/versions/{id}/summary")
+    assert RequestTiming.route({"route": route}) == "/versions/{id}/summary"
+    assert RequestTiming.route({}) == "unmatched"
+
+
+def test_escape(timing):
+    timer = timing.begin()
+    timing.end(timer, "GET", '/a"b', 200)
+    assert 'route="/a\\"b"' in timing.prometheus()
+
+
+def test_instrument(timing):
+    engine = create_engine("sqlite://")
+    timing.instrument(engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        timer = timing.begin()
+        connection.execute(text("SELECT 1"))
+        connection.execute(text("SELECT 2"))
+    assert [(x[0], x[2]) for x in timer.totals()] == [("db", 2)]
+
+
+def test_instrument_failed_statement(timing):
+    engine = create_engine("sqlite://")
+    timing.instrument(engine)
+    with engine.connect() as connection:
+        timer = timing.begin()
+        for _ in range(2):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing"))
+        connection.execute(text("SELECT 1"))
+        assert "request_timing" not in connection.info
+    assert [(x[0], x[2]) for x in timer.totals()] == [("db", 3)]
+
+
+def test_instrument_disabled():
+    timing = RequestTiming(False)
+    engine = create_engine("sqlite://")
+    timing.instrument(engine)
+    with engine.connect() as connection:
+        timer = timing.begin()
+        connection.execute(text("SELECT 1"))
+    assert timer.totals() == []
+
+
+def test_other_threads(timing):
+    # The render pool runs calls in the request's context, so their
+    # stages are added to the request, several threads at once.
+    pool = RenderPool(4)
+
+    def load():
+        with timing.stage("usdm"):
+            time.sleep(0.01)
+
+    async def request():
+        timer = timing.begin()
+        await asyncio.gather(*[pool.run(load) for _ in range(4)])
+        await asyncio.to_thread(load)
+        return timer
+
+    timer = asyncio.run(request())
+    assert [(x[0], x[2]) for x in timer.totals()] == [("usdm", 5)]
+    other = threading.Thread(target=load)
+    other.start()
+    other.join()
+    assert [(x[0], x[2]) for x in timer.totals()] == [("usdm", 5)]
@@ -0,0 +1,150 @@
+import os
+import time
+
+import pytest
+
+from app.validation.validation_cache import ValidationCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ValidationCache(str(tmp_path / "validation_cache"), 1024 * 1024)
+
+
+def _results(count=1):
+    return {
+        "findings": [{"rule_id": f"R{x}"} for x in range(count)],
+        "summary": {"engine": "d4k"},
+        "messages": [],
+    }
+
+
+def test_digest(tmp_path):
+    path = tmp_path / "file.json"
+    path.write_bytes(b'{"a": 1}')
+    assert ValidationCache.digest(str(path)) == (
+        "f9d86028c6e0d64e225186f96acb69338b2c59764df79162107f5c4bb34d1310"
+    )
+
+
+def test_key_depends_on_engine_and_digest(cache, mocker):
+    mocker.patch.object(ValidationCache, "_core_fingerprint", return_value="core")
+    keys = {
+        cache.key("abc", "d4k"),
+        cache.key("abc", "cdisc"),
+        cache.key("abc", "m11"),
+        cache.key("abd", "d4k"),
+    }
+    assert len(keys) == 4
+    assert cache.key("abc", "d4k") == cache.key("abc", "d4k")
+
+
+def test_key_depends_on_rules_version(cache, mocker):
+    mock = mocker.patch.object(
+        ValidationCache, "_package_version", return_value="0.29.0"
+    )
+    key = cache.key("abc", "d4k")
+    mock.return_value = "0.30.0"
+    assert cache.key("abc", "d4k") != key
+
+
+def test_key_depends_on_core_cache(cache, mocker):
+    mock = mocker.patch.object(ValidationCache, "_core_fingerprint", return_value="a")
+    key = cache.key("abc", "cdisc")
+    mock.return_value = "b"
+    assert cache.key("abc", "cdisc") != key
+
+
+def test_core_fingerprint(tmp_path, mocker):
+    mocker.patch(
+        "app.validation.validation_cache.CoreCacheManager"
+    ).return_value.cache_dir = str(tmp_path)
+    first = ValidationCache._core_fingerprint()
+    assert ValidationCache._core_fingerprint() == first
+    (tmp_path / "rules.json").write_text("[]")
+    assert ValidationCache._core_fingerprint() != first
+
+
+def test_core_fingerprint_kept_until_dirs_change(tmp_path, mocker):
+    mocker.patch(
+        "app.validation.validation_cache.CoreCacheManager"
+    ).return_value.cache_dir = str(tmp_path)
+    (tmp_path / "ct").mkdir()
+    first = ValidationCache._core_fingerprint()
+    walk = mocker.spy(os, "walk")
+    assert ValidationCache._core_fingerprint() == first
+    walk.assert_not_called()
+    (tmp_path / "ct" / "package.json").write_text("{}")
+    assert ValidationCache._core_fingerprint() != first
+    walk.assert_called_once()
+
+
+def test_core_fingerprint_expires(tmp_path, mocker):
+    mocker.patch(
+        "app.validation.validation_cache.CoreCacheManager"
+    ).return_value.cache_dir = str(tmp_path)
+    monotonic = mocker.patch("app.validation.validation_cache.time").monotonic
+    monotonic.return_value = 1000.0
+    (tmp_path / "ct" / "sdtmct").mkdir(parents=True)
+    package = tmp_path / "ct" / "sdtmct" / "package.json"
+    package.write_text("{}")
+    first = ValidationCache._core_fingerprint()
+    mtimes = ValidationCache._core_mtimes(str(tmp_path))
+    package.write_text('{"codelists": []}')
+    assert ValidationCache._core_mtimes(str(tmp_path)) == mtimes
+    monotonic.return_value += ValidationCache.FINGERPRINT_SECONDS - 1
+    assert ValidationCache._core_fingerprint() == first
+    monotonic.return_value += 1
+    assert ValidationCache._core_fingerprint() != first
+
+
+def test_get_put(cache):
+    assert cache.get("key") is None
+    cache.put("key", _results())
+    assert cache.get("key") == _results()
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["bytes"] > 0
+
+
+def test_corrupt_entry_is_a_miss(cache):
+    cache.put("key", _results())
+    with open(cache._path("key"), "w") as f:
+        f.write("not json")
+    assert cache.get("key") is None
+
+
+def test_eviction_least_recently_used(tmp_path):
+    size = len(
+        '{"findings": [{"rule_id": "R0"}], "summary": {"engine": "d4k"}, "messages": []}'
+    )
+    cache = ValidationCache(str(tmp_path), size * 2)
+    cache.put("a", _results())
+    cache.put("b", _results())
+    old = time.time() - 100
+    os.utime(cache._path("a"), (old, old))
+    os.utime(cache._path("b"), (old + 1, old + 1))
+    assert cache.get("a") is not None
+    cache.put("c", _results())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disabled(tmp_path):
+    cache = ValidationCache(str(tmp_path), 0)
+    cache.put("key", _results())
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["enabled"] is False
+
+
+def test_clear(cache):
+    cache.put("a", _results())
+    cache.put("b", _results())
+    cache.clear()
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,276 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.database.user import User
+from app.database.validation_job import ValidationJob
+from app.validation.validation_manager import ValidationManager
+
+
+@pytest.fixture
+def mock_user():
+    return MagicMock(spec=User, id=1)
+
+
+@pytest.fixture
+def mock_data_files():
+    with patch("app.validation.validation_manager.DataFiles") as mock:
+        instance = mock.return_value
+        instance.new.return_value = "test-uuid"
+        instance.path.return_value = ("/path/to/file", "file", True)
+        yield mock
+
+
+@pytest.fixture
+def mock_connection_manager():
+    with patch("app.validation.validation_manager.connection_manager") as mock:
+        mock.success = AsyncMock()
+        mock.error = AsyncMock()
+        yield mock
+
+
+@pytest.fixture
+def mock_session():
+    with patch("app.validation.validation_manager.SessionLocal") as mock:
+        yield mock
+
+
+@pytest.fixture
+def mock_cache():
+    with patch("app.validation.validation_manager.validation_cache") as mock:
+        mock.get.return_value = None
+        mock.digest.return_value = "digest"
+        mock.key.return_value = "key"
+        yield mock
+
+
+def test_init_unknown_engine_defaults_to_d4k(mock_user):
+    manager = ValidationManager(mock_user, "typo")
+    assert manager.engine == ValidationManager.D4K
+    assert manager.file_type == "usdm"
+
+
+def test_download(mock_user):
+    manager = ValidationManager(mock_user, ValidationManager.CDISC)
+    assert manager.download() == {
+        "download_kind": "usdm-cdisc-findings",
+        "download_title": "USDM v4 CDISC Findings",
+        "download_sheet": "USDM CDISC Findings",
+    }
+
+
+def test_save_file(mock_user, mock_data_files):
+    manager = ValidationManager(mock_user, ValidationManager.M11)
+    uuid = manager.save_file({"filename": "protocol.docx", "contents": b"docx"})
+    assert uuid == "test-uuid"
+    assert manager.original_filename == "protocol.docx"
+    mock_data_files.return_value.save.assert_called_once_with(
+        "docx", b"docx", "protocol.docx"
+    )
+
+
+def test_save_file_no_file(mock_user, mock_data_files):
+    manager = ValidationManager(mock_user, ValidationManager.M11)
+    assert manager.save_file(None) is None
+    mock_data_files.assert_not_called()
+
+
+def test_restore(mock_user, mock_data_files):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.CDISC, "test-uuid", "test.json"
+    )
+    mock_data_files.assert_called_once_with("test-uuid")
+    assert manager.uuid == "test-uuid"
+    assert manager.original_filename == "test.json"
+
+
+def test_validate_cdisc(mock_user, mock_data_files):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.CDISC, "test-uuid", "test.json"
+    )
+    with (
+        patch("app.validation.validation_manager.USDM4") as mock_usdm4,
+        patch(
+            "app.validation.validation_manager.project_usdm_cdisc_result",
+            return_value=[{"rule_id": "CORE-1"}],
+        ),
+        patch(
+            "app.validation.validation_manager.project_usdm_cdisc_summary",
+            return_value={"engine": "cdisc"},
+        ),
+    ):
+        result = manager.validate()
+    mock_usdm4.return_value.validate_core.assert_called_once_with("/path/to/file")
+    assert result == {
+        "findings": [{"rule_id": "CORE-1"}],
+        "summary": {"engine": "cdisc"},
+        "messages": [],
+    }
+
+
+def test_validate_d4k(mock_user, mock_data_files):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.D4K, "test-uuid", "test.json"
+    )
+    with (
+        patch("app.validation.validation_manager.USDM4") as mock_usdm4,
+        patch(
+            "app.validation.validation_manager.project_usdm_d4k_result",
+            return_value=[],
+        ),
+        patch(
+            "app.validation.validation_manager.project_usdm_d4k_summary",
+            return_value={"engine": "d4k"},
+        ),
+    ):
+        result = manager.validate()
+    mock_usdm4.return_value.validate.assert_called_once_with("/path/to/file")
+    assert result["summary"]["engine"] == "d4k"
+    assert "version" in result["summary"]
+
+
+def test_validate_m11(mock_user, mock_data_files):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.M11, "test-uuid", "protocol.docx"
+    )
+    with (
+        patch("app.validation.validation_manager.M11Validator") as mock_validator,
+        patch("app.validation.validation_manager.M11Errors"),
+        patch(
+            "app.validation.validation_manager.project_m11_result",
+            return_value=[{"rule_id": "M11_001"}],
+        ),
+        patch(
+            "app.validation.validation_manager.project_m11_summary",
+            return_value={"engine": "m11"},
+        ),
+    ):
+        mock_validator.return_value.validate.return_value.count.return_value = 1
+        result = manager.validate()
+    mock_data_files.return_value.path.assert_called_once_with("docx")
+    assert result["findings"] == [{"rule_id": "M11_001"}]
+    assert result["messages"] == []
+
+
+def test_validate_m11_extraction_failure(mock_user, mock_data_files):
+    """When the validator couldn't even run (count==0 but the
+    operational error log is non-empty) the results carry the
+    "extraction failed" message instead of silently claiming success."""
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.M11, "test-uuid", "broken.docx"
+    )
+    with (
+        patch("app.validation.validation_manager.M11Validator") as mock_validator,
+        patch("app.validation.validation_manager.M11Errors") as mock_errors,
+        patch("app.validation.validation_manager.project_m11_result", return_value=[]),
+        patch("app.validation.validation_manager.project_m11_summary", return_value={}),
+    ):
+        mock_validator.return_value.validate.return_value.count.return_value = 0
+        mock_errors.return_value.count.return_value = 1
+        result = manager.validate()
+    assert result["messages"] == [
+        "Validation could not be completed (extraction failed)."
+    ]
+
+
+def test_results(mock_user, mock_data_files):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.D4K, "test-uuid", "test.json"
+    )
+    mock_data_files.return_value.read.return_value = '{"findings": []}'
+    assert manager.results() == {"findings": []}
+    mock_data_files.return_value.read.return_value = "not json"
+    assert manager.results() is None
+    mock_data_files.return_value.read.return_value = None
+    assert manager.results() is None
+
+
+@pytest.mark.asyncio
+async def test_process_success(
+    mock_user, mock_data_files, mock_session, mock_connection_manager, mock_cache
+):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.D4K, "test-uuid", "test.json"
+    )
+    results = {"findings": [{"rule_id": "A"}], "summary": {}, "messages": []}
+    manager.validate = MagicMock(return_value=results)
+    job = MagicMock(spec=ValidationJob)
+    job.update_status.return_value = job
+    job.id = 7
+    await manager.process(job)
+    mock_data_files.return_value.save.assert_called_once_with("validation", results)
+    mock_data_files.return_value.discard.assert_called_once_with("usdm")
+    job.update_status.assert_called_with(
+        ValidationJob.COMPLETE, mock_session.return_value, 1
+    )
+    message = mock_connection_manager.success.call_args.args[0]
+    assert "/validate/jobs/7" in message
+    assert mock_connection_manager.success.call_args.args[1] == "1"
+    mock_cache.digest.assert_called_once_with("/path/to/file")
+    mock_cache.key.assert_called_with("digest", ValidationManager.D4K)
+    mock_cache.put.assert_called_once_with("key", results)
+
+
+@pytest.mark.asyncio
+async def test_process_cached(
+    mock_user, mock_data_files, mock_session, mock_connection_manager, mock_cache
+):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.CDISC, "test-uuid", "test.json"
+    )
+    results = {"findings": [], "summary": {}, "messages": []}
+    mock_cache.get.return_value = results
+    manager.validate = MagicMock()
+    job = MagicMock(spec=ValidationJob)
+    job.update_status.return_value = job
+    job.id = 7
+    await manager.process(job)
+    manager.validate.assert_not_called()
+    mock_cache.put.assert_not_called()
+    job.update_status.assert_called_with(
+        ValidationJob.COMPLETE, mock_session.return_value, 0
+    )
+    mock_connection_manager.success.assert_awaited_once()
+
+
+def test_cached(mock_user, mock_data_files, mock_cache):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.M11, "test-uuid", "test.docx"
+    )
+    assert manager.cached() is None
+    mock_cache.get.return_value = {"findings": []}
+    assert manager.cached() == {"findings": []}
+    mock_cache.digest.assert_called_once_with("/path/to/file")
+    mock_cache.key.assert_called_with("digest", ValidationManager.M11)
+    mock_cache.get.assert_called_with("key")
+
+
+def test_complete(mock_user, mock_data_files):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.D4K, "test-uuid", "test.json"
+    )
+    results = {"findings": [{"rule_id": "A"}, {"rule_id": "B"}], "summary": {}}
+    job = MagicMock(spec=ValidationJob)
+    session = MagicMock()
+    manager.complete(job, results, session)
+    mock_data_files.return_value.save.assert_called_once_with("validation", results)
+    mock_data_files.return_value.discard.assert_called_once_with("usdm")
+    job.update_status.assert_called_once_with(ValidationJob.COMPLETE, session, 2)
+
+
+@pytest.mark.asyncio
+async def test_process_exception(
+    mock_user, mock_data_files, mock_session, mock_connection_manager, mock_cache
+):
+    manager = ValidationManager.restore(
+        mock_user, ValidationManager.D4K, "test-uuid", "test.json"
+    )
+    manager.validate = MagicMock(side_effect=Exception("boom"))
+    job = MagicMock(spec=ValidationJob)
+    job.update_status.return_value = job
+    await manager.process(job)
+    job.update_status.assert_called_with(
+        ValidationJob.FAILED, mock_session.return_value
+    )
+    mock_data_files.return_value.save.assert_not_called()
+    mock_connection_manager.error.assert_awaited_once()
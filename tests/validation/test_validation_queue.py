@@ -0,0 +1,144 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.database.database_tables import (
+    User as UserDB,
+)
+from app.database.database_tables import (
+    ValidationJob as ValidationJobDB,
+)
+from app.database.validation_job import ValidationJob
+from app.validation.validation_queue import ValidationQueue
+
+
+@pytest.fixture
+def session(db):
+    db.query(ValidationJobDB).delete()
+    db.query(UserDB).delete()
+    db.commit()
+    with patch("app.validation.validation_queue.SessionLocal", return_value=db):
+        yield db
+
+
+@pytest.fixture
+def mock_thread():
+    with patch("app.validation.validation_queue.threading.Thread") as mock:
+        yield mock
+
+
+@pytest.fixture
+def user(session):
+    user = UserDB(identifier="user_vq", email="vq@example.com", display_name="VQ")
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    session.expunge(user)
+    return user
+
+
+def _manager(user, index=1, engine="d4k"):
+    manager = MagicMock(
+        user=MagicMock(id=user.id),
+        engine=engine,
+        uuid=f"uuid-{index}",
+        original_filename=f"file{index}.json",
+    )
+    manager.cached.return_value = None
+    return manager
+
+
+def test_workers_minimum():
+    assert ValidationQueue(0).workers == 1
+
+
+def test_submit(session, user):
+    queue = ValidationQueue(1)
+    queue._executor = MagicMock()
+    manager = _manager(user)
+    id = queue.submit(manager)
+    job = ValidationJob.find(id, session)
+    assert job.status == ValidationJob.QUEUED
+    assert job.engine == "d4k"
+    assert job.owner == queue.owner
+    queue._executor.submit.assert_called_once_with(queue._run, manager, job)
+
+
+def test_submit_cached(session, user):
+    queue = ValidationQueue(1)
+    queue._executor = MagicMock()
+    manager = _manager(user)
+    results = {"findings": [], "summary": {}, "messages": []}
+    manager.cached.return_value = results
+    manager.complete.side_effect = lambda job, results, session: job.update_status(
+        ValidationJob.COMPLETE, session, 0
+    )
+    id = queue.submit(manager)
+    job = ValidationJob.find(id, session)
+    assert job.status == ValidationJob.COMPLETE
+    assert job.findings == 0
+    queue._executor.submit.assert_not_called()
+
+
+def test_submit_runs_job(session, user):
+    queue = ValidationQueue(1)
+    manager = _manager(user)
+    manager.process = AsyncMock()
+    queue.submit(manager)
+    queue._executor.shutdown(wait=True)
+    manager.process.assert_awaited_once()
+
+
+def test_recover(session, user, mock_thread):
+    queue = ValidationQueue(1)
+    queue._executor = MagicMock()
+    ValidationJob.create("uuid-1", "cdisc", "file1.json", user.id, session)
+    running = ValidationJob.create("uuid-2", "m11", "file2.docx", user.id, session)
+    running.update_status(ValidationJob.RUNNING, session)
+    done = ValidationJob.create("uuid-3", "d4k", "file3.json", user.id, session)
+    done.update_status(ValidationJob.COMPLETE, session)
+    with patch("app.validation.validation_queue.ValidationManager") as mock_vm:
+        assert queue.recover() == 2
+    assert [x.args[1:] for x in mock_vm.restore.call_args_list] == [
+        ("cdisc", "uuid-1", "file1.json"),
+        ("m11", "uuid-2", "file2.docx"),
+    ]
+    assert queue._executor.submit.call_count == 2
+    assert mock_thread.call_args.kwargs["target"] == queue._beat
+
+
+def test_recover_missing_user_fails_job(session, user, mock_thread):
+    queue = ValidationQueue(1)
+    queue._executor = MagicMock()
+    job = ValidationJob.create("uuid-1", "d4k", "file1.json", user.id, session)
+    with patch(
+        "app.validation.validation_queue.User.find", side_effect=Exception("gone")
+    ):
+        assert queue.recover() == 0
+    assert ValidationJob.find(job.id, session).status == ValidationJob.FAILED
+    queue._executor.submit.assert_not_called()
+
+
+def test_recover_leaves_live_jobs(session, user, mock_thread):
+    """A worker starting beside another does not rerun its jobs."""
+    other = ValidationQueue(1)
+    other._executor = MagicMock()
+    other.submit(_manager(user))
+    queue = ValidationQueue(1)
+    queue._executor = MagicMock()
+    queue._owner = "elsewhere:1:cccc"
+    queue._owner_pid = other._owner_pid
+    assert queue.recover() == 0
+    queue._executor.submit.assert_not_called()
+
+
+def test_beat(session, user, mock_thread):
+    queue = ValidationQueue(1)
+    queue._executor = MagicMock()
+    queue.submit(_manager(user))
+    with (
+        patch.object(queue._stop, "wait", side_effect=[False, True]),
+        patch("app.validation.validation_queue.ValidationJob.renew") as mock_renew,
+    ):
+        queue._beat()
+    mock_renew.assert_called_once_with(queue.owner, session)